@@ -1,25 +1,434 @@
 # backend/app.py
 
-from flask import Flask, request, jsonify, Response
-from flask_cors import CORS
-import csv
-import io
+from flask import Flask, Blueprint, current_app, request, jsonify, Response
+import logging
+import os
+import threading
 from datetime import datetime
-from utils import setup_logger, StockFileHandler, StockError
+from functools import partial, wraps
+from typing import Optional
+from utils import StockFileHandler, StockError
+from utils.exceptions import CapacityError, ValidationError
 from models.nav_sys import NavSys
-from config import DevelopmentConfig
+from config import config
 from utils.sale_handler import SalesHandler
+from utils.reorder import ReorderIndex
+from utils.forecasting import DemandForecaster
+from utils.idempotency import IdempotencyStore, request_fingerprint
+from utils.events import EventBus
+from utils.change_log import ChangeLog
+from utils.item_cache import ItemCache
+from utils.admission import get_admission_controller
+from utils.profiling import get_profiler
+from utils.reporting import SnapshotPublisher, build_snapshot, items_csv, sales_csv
+from utils.warehouse import WarehouseInventory, shard_path
+from utils.partitioned import PartitionedCatalog
+from utils.pricing import PriceBook, format_timestamp, install as install_price_book, to_timestamp
+from utils.repricing import DEFAULT_DIFF_LIMIT, RepricingRule, reprice
+from utils.runtime import runtime_report
+from utils.tracing import phase
 
-app = Flask(__name__)
-app.config.from_object(DevelopmentConfig)
-app.config['JSON_AS_ASCII'] = False # Ensure UTF-8 encoding
-CORS(app)
+logger = logging.getLogger(__name__)
+api = Blueprint('api', __name__)
 
-logger = setup_logger(__name__)
-file_handler = StockFileHandler()
-sales_handler = SalesHandler()
+# Guards lazy creation of the storage handlers shared by request threads
+_storage_lock = threading.Lock()
 
-@app.route('/api/items', methods=['GET'])
+def create_app(config_name: str = None) -> Flask:
+    """
+    Create and configure the Flask application.
+
+    Args:
+        config_name (str): Key of config.config; defaults to $APP_CONFIG or 'default'
+
+    Storage handlers are not created here but on first use, so building
+    the app (and importing this module) touches no data files.
+    """
+    # Deferred so importing app.py does not configure logging or load Flask-CORS
+    from flask_cors import CORS
+    from utils.logger import LoggerSetup
+    from utils.compression import ResponseCompressor
+    from utils.profiling import RequestProfiler
+    from utils.tracing import RequestTracer
+    from utils.admission import AdmissionController
+
+    config_name = config_name or os.environ.get('APP_CONFIG', 'default')
+    config_class = config[config_name]
+
+    logger_setup = LoggerSetup()
+    # Items resolve VAT through the price book of the app serving them, created on first use
+    install_price_book(None)
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+    config_class.init_app(app)
+    app.config['JSON_AS_ASCII'] = False # Ensure UTF-8 encoding
+    logger_setup.set_format(app.config.get('LOG_OUTPUT', 'text'))
+    CORS(app)
+    # Registered first so a request's trace spans the other hooks
+    RequestTracer(app)
+    ResponseCompressor(app)
+    # Before the profiler, so refused requests are never sampled
+    AdmissionController(app)
+    RequestProfiler(app)
+    app.register_blueprint(api)
+    return app
+
+def get_file_handler() -> StockFileHandler:
+    """Get the app's stock file handler, creating it on first use."""
+    # Every caller catches up with prices and VAT rates other workers changed
+    price_book = get_price_book()
+    handler = current_app.extensions.get('stock_file_handler')
+    if handler is None:
+        with _storage_lock:
+            handler = current_app.extensions.get('stock_file_handler')
+            if handler is None:
+                handler = StockFileHandler(str(current_app.config['CSV_FILE']),
+                                           reader=current_app.config.get('STOCK_READER', 'csv'),
+                                           snapshot_file=current_app.config.get('STOCK_SNAPSHOT_FILE'),
+                                           durability=current_app.config.get('DURABILITY', 'always'),
+                                           change_log=_create_change_log(current_app.config.get('CHANGE_LOG_FILE')),
+                                           parallel_load=current_app.config.get('PARALLEL_LOAD_WORKERS', 0),
+                                           item_cache=_create_item_cache(),
+                                           snapshot_every=current_app.config.get('STOCK_SNAPSHOT_EVERY', 0))
+                handler.add_listener(price_book.on_storage_event, batches=True)
+                current_app.extensions['stock_file_handler'] = handler
+    return handler
+
+def get_price_book() -> PriceBook:
+    """
+    Get the app's price and VAT history, loaded and installed for StockItem
+    on first use and brought up to date with other server processes' changes
+    on every call.
+    """
+    price_book = current_app.extensions.get('price_book')
+    if price_book is not None:
+        price_book.refresh()
+    else:
+        with _storage_lock:
+            price_book = current_app.extensions.get('price_book')
+            if price_book is None:
+                pricing_file = current_app.config.get('PRICING_FILE')
+                price_book = PriceBook(str(pricing_file) if pricing_file else None,
+                                       default_vat=current_app.config.get('DEFAULT_VAT_RATE', 17.5),
+                                       durability=current_app.config.get('DURABILITY', 'always'))
+                install_price_book(price_book)
+                current_app.extensions['price_book'] = price_book
+    return price_book
+
+def _create_change_log(path):
+    """Create a change log at `path`, or None when change logging is disabled."""
+    if not path:
+        return None
+    return ChangeLog(str(path),
+                     durability=current_app.config.get('DURABILITY', 'always'),
+                     retain=current_app.config.get('CHANGE_LOG_RETAIN', 100000))
+
+def _create_item_cache(warehouse: Optional[str] = None):
+    """
+    Create the two-level item cache, or None when ITEM_CACHE_MAX_BYTES is 0.
+
+    A branch warehouse gets its own cache, shared through its own file.
+    """
+    max_bytes = current_app.config.get('ITEM_CACHE_MAX_BYTES', 0)
+    if not max_bytes:
+        return None
+    shared_file = current_app.config.get('ITEM_CACHE_FILE')
+    if shared_file and warehouse:
+        shared_file = shard_path(shared_file, warehouse)
+    return ItemCache(str(shared_file) if shared_file else None, max_bytes=max_bytes)
+
+def _create_reorder_index(warehouse: Optional[str] = None) -> ReorderIndex:
+    """Create a reorder index logging threshold crossings; every warehouse shares the thresholds."""
+    index = ReorderIndex(
+        current_app.config['REORDER_DEFAULT_THRESHOLD'],
+        str(current_app.config['REORDER_THRESHOLDS_FILE']),
+        durability=current_app.config.get('DURABILITY', 'always')
+    )
+    index.add_listener(partial(log_reorder_event, warehouse=warehouse))
+    return index
+
+def get_warehouses() -> WarehouseInventory:
+    """
+    Get the app's warehouse shards; the default warehouse shares get_file_handler().
+
+    Each branch shard has its own item cache and reorder index (see
+    get_reorder_index), and publishes its changes on the event bus with a
+    'warehouse' field. Price history (the price book is keyed by SKU
+    alone) and demand forecasts follow the default warehouse only.
+    """
+    warehouses = current_app.extensions.get('warehouses')
+    if warehouses is None:
+        file_handler = get_file_handler()
+        bus = get_event_bus()
+        with _storage_lock:
+            warehouses = current_app.extensions.get('warehouses')
+            if warehouses is None:
+                default = current_app.config.get('WAREHOUSE_DEFAULT', 'main')
+                change_log_file = current_app.config.get('CHANGE_LOG_FILE')
+                shards = {default: file_handler}
+                reorder_indexes = {}
+                for name in current_app.config.get('WAREHOUSES', [default]):
+                    if name not in shards:
+                        shard = StockFileHandler(
+                            str(shard_path(current_app.config['CSV_FILE'], name)),
+                            reader=current_app.config.get('STOCK_READER', 'csv'),
+                            durability=current_app.config.get('DURABILITY', 'always'),
+                            change_log=_create_change_log(
+                                shard_path(change_log_file, name) if change_log_file else None),
+                            item_cache=_create_item_cache(name)
+                        )
+                        shard.add_listener(partial(bus.on_storage_event, warehouse=name), batches=True)
+                        index = _create_reorder_index(name)
+                        shard.add_listener(index.on_storage_event)
+                        index.sync(shard)
+                        shards[name] = shard
+                        reorder_indexes[name] = index
+                warehouses = WarehouseInventory(shards, default)
+                current_app.extensions['warehouse_reorder_indexes'] = reorder_indexes
+                current_app.extensions['warehouses'] = warehouses
+    return warehouses
+
+def get_sales_handler() -> SalesHandler:
+    """Get the app's sales handler, creating it on first use."""
+    price_book = get_price_book()
+    handler = current_app.extensions.get('sales_handler')
+    if handler is None:
+        with _storage_lock:
+            handler = current_app.extensions.get('sales_handler')
+            if handler is None:
+                handler = SalesHandler(str(current_app.config['SALES_FILE']),
+                                       durability=current_app.config.get('DURABILITY', 'always'),
+                                       flush_rows=current_app.config.get('SALES_FLUSH_ROWS', 1000),
+                                       flush_interval=current_app.config.get('SALES_FLUSH_INTERVAL', 1.0),
+                                       parallel_load=current_app.config.get('PARALLEL_LOAD_WORKERS', 0))
+                handler.analytics.pricing = price_book
+                current_app.extensions['sales_handler'] = handler
+    return handler
+
+def get_reorder_index(warehouse: Optional[str] = None) -> ReorderIndex:
+    """
+    Get the app's reorder index, built on first use and kept in sync with storage.
+
+    warehouse selects a branch warehouse's index, which follows that
+    warehouse's shard; None (or the default warehouse) gets the default one.
+
+    Raises:
+        ValidationError: If the warehouse is unknown
+    """
+    if warehouse is not None:
+        warehouses = get_warehouses()
+        if warehouse != warehouses.default:
+            shard = warehouses.shard(warehouse)
+            index = current_app.extensions['warehouse_reorder_indexes'][warehouse]
+            index.sync(shard)
+            return index
+    file_handler = get_file_handler()
+    index = current_app.extensions.get('reorder_index')
+    if index is None:
+        with _storage_lock:
+            index = current_app.extensions.get('reorder_index')
+            if index is None:
+                index = _create_reorder_index()
+                file_handler.add_listener(index.on_storage_event)
+                current_app.extensions['reorder_index'] = index
+    index.sync(file_handler)
+    return index
+
+def get_forecaster() -> DemandForecaster:
+    """Get the app's demand forecaster, fitted on first use and updated per sale."""
+    file_handler = get_file_handler()
+    sales_handler = get_sales_handler()
+    forecaster = current_app.extensions.get('forecaster')
+    if forecaster is None:
+        with _storage_lock:
+            forecaster = current_app.extensions.get('forecaster')
+            if forecaster is None:
+                forecaster = DemandForecaster(current_app.config['FORECAST_ALPHA'])
+                sales_handler.add_listener(forecaster.on_sale)
+                file_handler.add_listener(forecaster.on_storage_event)
+                current_app.extensions['forecaster'] = forecaster
+    forecaster.sync(file_handler, sales_handler)
+    return forecaster
+
+def get_partitioned_catalog():
+    """Get the app's partitioned catalogue workers, or None when CATALOG_PARTITIONS is 0."""
+    if not current_app.config.get('CATALOG_PARTITIONS'):
+        return None
+    catalog = current_app.extensions.get('partitioned_catalog')
+    if catalog is None:
+        file_handler = get_file_handler()
+        with _storage_lock:
+            catalog = current_app.extensions.get('partitioned_catalog')
+            if catalog is None:
+                price_book = get_price_book()
+                catalog = PartitionedCatalog(file_handler, current_app.config['CATALOG_PARTITIONS'],
+                                             pricing_file=price_book.file_path,
+                                             default_vat=price_book.default_vat)
+                current_app.extensions['partitioned_catalog'] = catalog
+    return catalog
+
+def get_report_publisher() -> Optional[SnapshotPublisher]:
+    """Get the report snapshot publisher, started on first use; None unless REPORTING_MODE is on."""
+    if not current_app.config.get('REPORTING_MODE'):
+        return None
+    publisher = current_app.extensions.get('report_publisher')
+    if publisher is None:
+        file_handler = get_file_handler()
+        sales_handler = get_sales_handler()
+        with _storage_lock:
+            publisher = current_app.extensions.get('report_publisher')
+            if publisher is None:
+                publisher = SnapshotPublisher(
+                    lambda previous: build_snapshot(file_handler, sales_handler, previous),
+                    interval=current_app.config.get('REPORT_SNAPSHOT_INTERVAL', 5.0),
+                    max_staleness=current_app.config.get('REPORT_MAX_STALENESS', 30.0))
+                publisher.start()
+                current_app.extensions['report_publisher'] = publisher
+    return publisher
+
+def snapshot_headers(publisher: SnapshotPublisher, snapshot, headers: Optional[dict] = None) -> dict:
+    """Add the snapshot version and age to response headers."""
+    headers = dict(headers or {})
+    headers['X-Snapshot-Version'] = str(snapshot.version)
+    headers['X-Snapshot-Age'] = f"{publisher.age():.3f}"
+    return headers
+
+def get_event_bus() -> EventBus:
+    """Get the app's event bus, subscribed to storage and sales changes on first use."""
+    bus = current_app.extensions.get('event_bus')
+    if bus is None:
+        file_handler = get_file_handler()
+        sales_handler = get_sales_handler()
+        with _storage_lock:
+            bus = current_app.extensions.get('event_bus')
+            if bus is None:
+                bus = EventBus(
+                    history_size=current_app.config.get('EVENTS_HISTORY_SIZE', 1000),
+                    max_queue=current_app.config.get('EVENTS_QUEUE_SIZE', 500),
+                    max_subscribers=current_app.config.get('EVENTS_MAX_SUBSCRIBERS', 1000)
+                )
+                file_handler.add_listener(bus.on_storage_event, batches=True)
+                sales_handler.add_listener(bus.on_sale)
+                current_app.extensions['event_bus'] = bus
+    return bus
+
+def parse_last_event_id(value):
+    """
+    Parse a Last-Event-ID header or last_event_id query value.
+
+    Raises:
+        ValidationError: If the value is not a non-negative integer
+    """
+    if value in (None, ''):
+        return None
+    try:
+        event_id = int(value)
+    except (TypeError, ValueError):
+        raise ValidationError("Last event ID must be an integer")
+    if event_id < 0:
+        raise ValidationError("Last event ID must not be negative")
+    return event_id
+
+def get_idempotency_store() -> IdempotencyStore:
+    """Get the app's idempotency key store, loaded from disk on first use."""
+    store = current_app.extensions.get('idempotency_store')
+    if store is None:
+        with _storage_lock:
+            store = current_app.extensions.get('idempotency_store')
+            if store is None:
+                store = IdempotencyStore(
+                    str(current_app.config['IDEMPOTENCY_FILE']),
+                    ttl_seconds=current_app.config.get('IDEMPOTENCY_TTL_SECONDS', 86400),
+                    max_entries=current_app.config.get('IDEMPOTENCY_MAX_KEYS', 10000),
+                    durability=current_app.config.get('DURABILITY', 'always')
+                )
+                current_app.extensions['idempotency_store'] = store
+    return store
+
+def idempotent(view):
+    """
+    Make a mutating endpoint safe to retry with an Idempotency-Key header.
+
+    The first request with a key runs normally and its response (unless a
+    5xx) is stored; a retry with the same key and body gets the stored
+    response back without running the handler again. Reusing a key for a
+    different request is rejected with 422.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({'error': 'Idempotency-Key must be at most 255 characters'}), 400
+
+        store = get_idempotency_store()
+        fingerprint = request_fingerprint(request.method, request.path, request.get_data())
+        with store.locked(key):
+            entry = store.get(key)
+            if entry is not None:
+                if entry['fingerprint'] != fingerprint:
+                    return jsonify({
+                        'error': 'Idempotency-Key was already used for a different request'
+                    }), 422
+                logger.info("Replaying stored response for idempotency key %s", key)
+                response = Response(entry['body'], status=entry['status'],
+                                    mimetype=entry['mimetype'])
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code < 500:
+                store.put(key, fingerprint, response.status_code,
+                          response.get_data(as_text=True), response.mimetype)
+            return response
+    return wrapper
+
+def log_reorder_event(event: dict, warehouse: Optional[str] = None) -> None:
+    """Default reorder hook: log items crossing their threshold (in a branch `warehouse`)."""
+    where = f" in warehouse {warehouse}" if warehouse else ""
+    if event['type'] == 'low_stock':
+        logger.warning("Low stock: %s has %s units%s (threshold %s)",
+                       event['stock_code'], event['quantity'], where, event['threshold'])
+    elif event['type'] == 'restocked':
+        logger.info("Restocked: %s back to %s units%s", event['stock_code'], event['quantity'], where)
+
+# Fields a client may request through ?fields= on item listings
+ITEM_FIELDS = (
+    'stock_category', 'stock_code', 'stock_name', 'description',
+    'quantity', 'price', 'price_with_vat', 'brand'
+)
+# Listing sections a client may drop through ?exclude=
+OPTIONAL_SECTIONS = ('statistics', 'available_brands')
+
+def parse_csv_arg(name: str) -> list:
+    """Split a comma separated query parameter into a list of values."""
+    value = request.args.get(name, '')
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+def project_item(item_dict: dict, fields: list) -> dict:
+    """Keep only the requested fields of a serialized item."""
+    if not fields:
+        return item_dict
+    return {field: item_dict[field] for field in fields if field in item_dict}
+
+@api.route('/api/health', methods=['GET'])
+def health():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({'status': 'ok'})
+
+@api.route('/api/ready', methods=['GET'])
+def ready():
+    """Readiness probe: storage is reachable; reports startup and memory figures"""
+    try:
+        get_file_handler().load_all_items()
+        get_sales_handler().get_sales_history()
+        return jsonify({'status': 'ready', 'runtime': runtime_report()})
+    except Exception as e:
+        logger.error(f"Readiness check failed: {str(e)}")
+        return jsonify({'status': 'unavailable', 'error': str(e)}), 503
+
+@api.route('/api/items', methods=['GET'])
 def get_items():
     """Get items with filtering, sorting, and pagination"""
     try:
@@ -30,15 +439,38 @@ def get_items():
         brand_filter = request.args.get('brand', '').lower()
         sort_by = request.args.get('sort_by', 'stock_code')
         sort_order = request.args.get('sort_order', 'asc')
+        fields = parse_csv_arg('fields')
+        exclude = set(parse_csv_arg('exclude'))
 
-        # Load all items first
-        all_items = file_handler.load_items()
+        unknown_fields = [field for field in fields if field not in ITEM_FIELDS]
+        if unknown_fields:
+            return jsonify({'error': f"Unknown fields: {', '.join(unknown_fields)}"}), 400
+        unknown_sections = exclude.difference(OPTIONAL_SECTIONS)
+        if unknown_sections:
+            return jsonify({'error': f"Cannot exclude: {', '.join(sorted(unknown_sections))}"}), 400
 
-        # Get all available brands
-        all_brands = sorted(list(set(
-            item.brand for item in all_items
-            if hasattr(item, 'brand') and item.brand and item.brand.strip()
-        )))
+        # Unfiltered storage-order pages without aggregates need only their own rows
+        if (sort_by == 'none' and not search and not brand_filter
+                and exclude.issuperset(OPTIONAL_SECTIONS)):
+            start_idx = (page - 1) * per_page
+            paginated_items, total_items = get_file_handler().load_page(start_idx, per_page)
+            return jsonify({
+                'items': [project_item(item.to_dict(), fields) for item in paginated_items],
+                'pagination': {
+                    'current_page': page,
+                    'total_pages': (total_items + per_page - 1) // per_page,
+                    'total_items': total_items,
+                    'per_page': per_page
+                }
+            })
+
+        catalog = get_partitioned_catalog()
+        if catalog is not None:
+            return jsonify(query_partitioned(catalog, page, per_page, search, brand_filter,
+                                             sort_by, sort_order, fields, exclude))
+
+        # Load all items first
+        all_items = get_file_handler().load_items()
 
         # Apply filters before pagination
         filtered_items = all_items
@@ -60,19 +492,12 @@ def get_items():
                 if hasattr(item, 'brand') and brand_filter in item.brand.lower()
             ]
 
-        # Calculate statistics
-        stats = {
-            'total_items': len(filtered_items),
-            'total_value': sum(item.price * item.quantity for item in filtered_items),
-            'total_value_vat': sum(item.get_price_with_VAT() * item.quantity for item in filtered_items),
-            'low_stock_items': sum(1 for item in filtered_items if item.quantity < 10)
-        }
-
-        # Sort items
-        filtered_items.sort(
-            key=lambda x: getattr(x, sort_by, x.stock_code),
-            reverse=sort_order == 'desc'
-        )
+        # Sort items (sort_by=none keeps storage order)
+        if sort_by != 'none':
+            filtered_items.sort(
+                key=lambda x: getattr(x, sort_by, x.stock_code),
+                reverse=sort_order == 'desc'
+            )
 
         # Paginate after filtering
         total_items = len(filtered_items)
@@ -81,143 +506,319 @@ def get_items():
         end_idx = min(start_idx + per_page, total_items)
         paginated_items = filtered_items[start_idx:end_idx]
 
-        return jsonify({
-            'items': [item.to_dict() for item in paginated_items],
+        response = {
+            'items': [project_item(item.to_dict(), fields) for item in paginated_items],
             'pagination': {
                 'current_page': page,
                 'total_pages': total_pages,
                 'total_items': total_items,
                 'per_page': per_page
-            },
-            'statistics': stats,
-            'available_brands': all_brands
-        })
+            }
+        }
+
+        # Statistics and brands are skipped (not just hidden) when excluded
+        if 'statistics' not in exclude:
+            reorder_index = get_reorder_index()
+            if search or brand_filter:
+                low_stock_items = sum(1 for item in filtered_items
+                                      if reorder_index.is_low(item.stock_code))
+            else:
+                low_stock_items = reorder_index.low_count()
+            response['statistics'] = {
+                'total_items': len(filtered_items),
+                'total_value': sum(item.price * item.quantity for item in filtered_items),
+                'total_value_vat': sum(item.get_price_with_VAT() * item.quantity for item in filtered_items),
+                'low_stock_items': low_stock_items
+            }
+
+        if 'available_brands' not in exclude:
+            response['available_brands'] = sorted(list(set(
+                item.brand for item in all_items
+                if hasattr(item, 'brand') and item.brand and item.brand.strip()
+            )))
+
+        return jsonify(response)
 
     except Exception as e:
         logger.error(f"Error getting items: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/items', methods=['POST'])
+def query_partitioned(catalog, page, per_page, search, brand_filter, sort_by, sort_order,
+                      fields, exclude) -> dict:
+    """Build the get_items response from a scatter/gather query over the partitions."""
+    statistics = 'statistics' not in exclude
+    reorder_index = get_reorder_index() if statistics else None
+    filtered = bool(search or brand_filter)
+    result = catalog.query(
+        search=search, brand=brand_filter, sort_by=sort_by, reverse=sort_order == 'desc',
+        offset=(page - 1) * per_page, limit=per_page, statistics=statistics,
+        brands='available_brands' not in exclude,
+        low_codes=reorder_index.low_codes() if statistics and filtered else None
+    )
+    total_items = result['total_items']
+    response = {
+        'items': [project_item(item, fields) for item in result['items']],
+        'pagination': {
+            'current_page': page,
+            'total_pages': (total_items + per_page - 1) // per_page,
+            'total_items': total_items,
+            'per_page': per_page
+        }
+    }
+    if statistics:
+        response['statistics'] = result['statistics']
+        if not filtered:
+            response['statistics']['low_stock_items'] = reorder_index.low_count()
+    if 'brands' in result:
+        response['available_brands'] = result['brands']
+    return response
+
+@api.route('/api/items/low-stock', methods=['GET'])
+def get_low_stock():
+    """
+    Get items below their reorder threshold, most urgent first.
+
+    ?warehouse=<name> lists that warehouse's items instead of the default one's.
+    """
+    try:
+        limit = request.args.get('limit')
+        limit = int(limit) if limit else None
+        if limit is not None and limit <= 0:
+            return jsonify({'error': 'Limit must be greater than 0'}), 400
+        brand = request.args.get('brand') or None
+
+        reorder_index = get_reorder_index(request.args.get('warehouse'))
+        items = reorder_index.low_stock(limit=limit, brand=brand)
+        return jsonify({
+            'items': items,
+            'total_low_stock': reorder_index.low_count(),
+            'thresholds': reorder_index.get_thresholds()
+        })
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError:
+        return jsonify({'error': 'Invalid limit format'}), 400
+    except Exception as e:
+        logger.error(f"Error getting low stock items: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/reorder/thresholds', methods=['GET'])
+def get_reorder_thresholds():
+    """Get default, per-SKU and per-brand reorder thresholds"""
+    try:
+        return jsonify(get_reorder_index().get_thresholds())
+    except Exception as e:
+        logger.error(f"Error getting reorder thresholds: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/reorder/thresholds', methods=['PUT'])
+def update_reorder_thresholds():
+    """Update reorder thresholds; a null SKU/brand value removes the override"""
+    try:
+        data = request.json or {}
+        thresholds = get_reorder_index().update_thresholds(
+            default=data.get('default'),
+            sku=data.get('sku'),
+            brand=data.get('brand')
+        )
+        return jsonify({
+            'message': 'Thresholds updated successfully',
+            'thresholds': thresholds
+        })
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error updating reorder thresholds: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+@api.route('/api/pricing/vat', methods=['GET'])
+def get_vat_schedule():
+    """Get the standard VAT schedule, or a SKU's override schedule with ?stock_code="""
+    try:
+        price_book = get_price_book()
+        stock_code = request.args.get('stock_code') or None
+        return jsonify({
+            'stock_code': stock_code,
+            'current_rate': price_book.vat_rate(stock_code),
+            'default_rate': price_book.default_vat,
+            'schedule': price_book.vat_schedule(stock_code)
+        })
+    except Exception as e:
+        logger.error(f"Error getting VAT schedule: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/pricing/vat', methods=['PUT'])
+def update_vat_rate():
+    """Set the VAT rate from effective_from (default now), for every item or one stock_code"""
+    try:
+        data = request.json or {}
+        if 'rate' not in data:
+            return jsonify({'error': 'rate is required'}), 400
+        stock_code = data.get('stock_code') or None
+        price_book = get_price_book()
+        price_book.set_vat_rate(data['rate'], data.get('effective_from'), stock_code)
+        return jsonify({
+            'message': 'VAT rate updated successfully',
+            'stock_code': stock_code,
+            'schedule': price_book.vat_schedule(stock_code)
+        })
+    except (ValidationError, ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error updating VAT rate: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/items/<stock_code>/pricing', methods=['GET'])
+def get_item_pricing(stock_code):
+    """Get an item's price, VAT rate and price with VAT at ?at= (default now), and its price history"""
+    try:
+        item = get_file_handler().get_item(stock_code)
+        if not item:
+            return jsonify({'error': 'Item not found'}), 404
+        price_book = get_price_book()
+        at = to_timestamp(request.args.get('at') or None)
+        return jsonify({
+            'stock_code': stock_code,
+            'at': format_timestamp(at),
+            'price': price_book.price_at(stock_code, at, default=item.price),
+            'vat_rate': item.get_VAT(at),
+            'price_with_vat': round(item.get_price_with_VAT(at), 2),
+            'history': price_book.price_history(stock_code)
+        })
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting item pricing: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/items', methods=['POST'])
+@idempotent
 def add_item():
     """Add a new stock item or update if it exists"""
     try:
         data = request.json
 
-        # Load existing items to check for duplicates
-        existing_items = file_handler.load_items()
-        existing_item = next((item for item in existing_items
-                            if item.stock_code == data['stock_code']), None)
+        # Stock is read and written back under the file's lock, so workers
+        # adding to the same SKU cannot lose each other's quantities
+        with get_file_handler().write_lock():
+            # Load existing items to check for duplicates
+            existing_items = get_file_handler().load_items()
+            existing_item = next((item for item in existing_items
+                                if item.stock_code == data['stock_code']), None)
 
-        if existing_item:
-            # If item exists, validate the total quantity before updating
-            try:
-                new_quantity = int(data['quantity'])
-                total_quantity = existing_item.quantity + new_quantity
+            if existing_item:
+                # If item exists, validate the total quantity before updating
+                try:
+                    new_quantity = int(data['quantity'])
+                    total_quantity = existing_item.quantity + new_quantity
 
-                # Check if total quantity would exceed limit
-                if total_quantity > 100:
-                    return jsonify({
-                        'error': f'Cannot add {new_quantity} items. Total quantity ({total_quantity}) would exceed 100 items limit'
-                    }), 400
+                    # Check if total quantity would exceed limit
+                    if total_quantity > 100:
+                        return jsonify({
+                            'error': f'Cannot add {new_quantity} items. Total quantity ({total_quantity}) would exceed 100 items limit'
+                        }), 400
 
-                # Add the new quantity to existing quantity
-                existing_item.increase_stock(new_quantity)
+                    # Add the new quantity to existing quantity
+                    existing_item.increase_stock(new_quantity)
 
-                # Update price if different
-                if float(data['price']) != existing_item.price:
-                    existing_item.price = float(data['price'])
-                # Update brand if different
-                if hasattr(existing_item, 'brand') and data['brand'] != existing_item.brand:
-                    existing_item._brand = data['brand']
+                    # Update price if different
+                    if float(data['price']) != existing_item.price:
+                        existing_item.price = float(data['price'])
+                    # Update brand if different
+                    if hasattr(existing_item, 'brand') and data['brand'] != existing_item.brand:
+                        existing_item._brand = data['brand']
 
-                file_handler.save_item(existing_item)
-                logger.info(f"Updated existing item: {existing_item.stock_code}")
-                return jsonify({
-                    'message': 'Item updated successfully',
-                    'item': existing_item.to_dict()
-                }), 200
-            except Exception as e:
-                logger.error(f"Error updating existing item: {str(e)}")
-                return jsonify({'error': str(e)}), 400
-        else:
-            # Create new item if it doesn't exist
-            # Validate initial quantity
-            if int(data['quantity']) > 100:
+                    get_file_handler().save_item(existing_item)
+                    logger.info("Updated existing item: %s", existing_item.stock_code)
+                    return jsonify({
+                        'message': 'Item updated successfully',
+                        'item': existing_item.to_dict()
+                    }), 200
+                except Exception as e:
+                    logger.error(f"Error updating existing item: {str(e)}")
+                    return jsonify({'error': str(e)}), 400
+            else:
+                # Create new item if it doesn't exist
+                # Validate initial quantity
+                if int(data['quantity']) > 100:
+                    return jsonify({
+                        'error': 'Initial quantity cannot exceed 100 items'
+                    }), 400
+
+                nav_sys = NavSys(
+                    data['stock_code'],
+                    int(data['quantity']),
+                    float(data['price']),
+                    data['brand']
+                )
+                get_file_handler().save_item(nav_sys)
+                logger.info("Added new item: %s", nav_sys.stock_code)
                 return jsonify({
-                    'error': 'Initial quantity cannot exceed 100 items'
-                }), 400
-
-            nav_sys = NavSys(
-                data['stock_code'],
-                int(data['quantity']),
-                float(data['price']),
-                data['brand']
-            )
-            file_handler.save_item(nav_sys)
-            logger.info(f"Added new item: {nav_sys.stock_code}")
-            return jsonify({
-                'message': 'Item added successfully',
-                'item': nav_sys.to_dict()
-            }), 201
+                    'message': 'Item added successfully',
+                    'item': nav_sys.to_dict()
+                }), 201
 
     except Exception as e:
         logger.error(f"Error in add_item: {str(e)}")
         return jsonify({'error': str(e)}), 400
 
-@app.route('/api/items/<stock_code>', methods=['PUT'])
+@api.route('/api/items/<stock_code>', methods=['PUT'])
 def update_item(stock_code):
     """Update an existing stock item"""
     try:
         data = request.json
-        items = file_handler.load_items()
-        item = next((item for item in items if item.stock_code == stock_code), None)
+        # Read, changed and saved under the file's lock: a concurrent sale or
+        # reprice in another worker is not overwritten with stale values
+        with get_file_handler().write_lock():
+            with phase('lookup'):
+                item = get_file_handler().get_item(stock_code)
 
-        if not item:
-            return jsonify({'error': 'Item not found'}), 404
+            if not item:
+                return jsonify({'error': 'Item not found'}), 404
 
-        if 'price' in data:
-            # Validate price
-            try:
-                new_price = float(data['price'])
-                if new_price <= 0:
-                    return jsonify({'error': 'Price must be greater than 0'}), 400
-                item.price = new_price
-                logger.info(f"Updated price for {stock_code} to {new_price}")
-            except ValueError:
-                return jsonify({'error': 'Invalid price format'}), 400
-
-        if 'quantity' in data:
-            try:
-                new_quantity = int(data['quantity'])
-                if new_quantity <= 0:
-                    return jsonify({'error': 'Quantity must be greater than 0'}), 400
-
-                # Check if adding this quantity would exceed 100
-                total_quantity = item.quantity + new_quantity
-                if total_quantity > 100:
-                    return jsonify({
-                        'error': f'Cannot add {new_quantity} items. Total quantity ({total_quantity}) would exceed 100 items limit'
-                    }), 400
+            if 'price' in data:
+                # Validate price
+                try:
+                    new_price = float(data['price'])
+                    if new_price <= 0:
+                        return jsonify({'error': 'Price must be greater than 0'}), 400
+                    item.price = new_price
+                    logger.info("Updated price for %s to %s", stock_code, new_price)
+                except ValueError:
+                    return jsonify({'error': 'Invalid price format'}), 400
+
+            if 'quantity' in data:
+                try:
+                    new_quantity = int(data['quantity'])
+                    if new_quantity <= 0:
+                        return jsonify({'error': 'Quantity must be greater than 0'}), 400
 
-                item.increase_stock(new_quantity)
-                logger.info(f"Updated quantity for {stock_code} by adding {new_quantity}")
-            except ValueError:
-                return jsonify({'error': 'Invalid quantity format'}), 400
-            except StockError as e:
-                return jsonify({'error': str(e)}), 400
-
-        if 'brand' in data:
-            try:
-                if not data['brand'].strip():
-                    return jsonify({'error': 'Brand cannot be empty'}), 400
-                # Handle UTF-8 encoding for brand
-                brand = data['brand'].encode('utf-8').decode('utf-8')
-                item._brand = brand
-                logger.info(f"Updated brand for {stock_code} to {brand}")
-            except UnicodeError:
-                return jsonify({'error': 'Invalid brand format. Please use valid characters.'}), 400
-
-        file_handler.save_item(item)
+                    # Check if adding this quantity would exceed 100
+                    total_quantity = item.quantity + new_quantity
+                    if total_quantity > 100:
+                        return jsonify({
+                            'error': f'Cannot add {new_quantity} items. Total quantity ({total_quantity}) would exceed 100 items limit'
+                        }), 400
+
+                    item.increase_stock(new_quantity)
+                    logger.info("Updated quantity for %s by adding %s", stock_code, new_quantity)
+                except ValueError:
+                    return jsonify({'error': 'Invalid quantity format'}), 400
+                except StockError as e:
+                    return jsonify({'error': str(e)}), 400
+
+            if 'brand' in data:
+                try:
+                    if not data['brand'].strip():
+                        return jsonify({'error': 'Brand cannot be empty'}), 400
+                    # Handle UTF-8 encoding for brand
+                    brand = data['brand'].encode('utf-8').decode('utf-8')
+                    item._brand = brand
+                    logger.info("Updated brand for %s to %s", stock_code, brand)
+                except UnicodeError:
+                    return jsonify({'error': 'Invalid brand format. Please use valid characters.'}), 400
+
+            get_file_handler().save_item(item)
         return jsonify({
             'message': 'Item updated successfully',
             'item': item.to_dict()
@@ -226,7 +827,37 @@ def update_item(stock_code):
         logger.error(f"Error updating item: {str(e)}")
         return jsonify({'error': str(e)}), 400
 
-@app.route('/api/items/<stock_code>/sell', methods=['POST'])
+@api.route('/api/items/reprice', methods=['POST'])
+@idempotent
+def reprice_items():
+    """
+    Reprice the items matching brand/search/stock_codes by rule in one write.
+
+    Body: {"rule": {uplift_percent, brand_uplift, ending, floor, ceiling},
+    "brand": str or list, "search": str, "stock_codes": list,
+    "dry_run": bool, "diff_limit": int}
+    """
+    try:
+        data = request.json or {}
+        rule = RepricingRule.from_dict(data.get('rule') or {})
+        brands = data.get('brand')
+        if isinstance(brands, str):
+            brands = [brands]
+        diff_limit = int(data.get('diff_limit', DEFAULT_DIFF_LIMIT))
+        if diff_limit < 0:
+            return jsonify({'error': 'diff_limit must not be negative'}), 400
+        result = reprice(get_file_handler(), rule, brands=brands, search=data.get('search'),
+                         stock_codes=data.get('stock_codes'), dry_run=bool(data.get('dry_run')),
+                         diff_limit=diff_limit)
+        return jsonify(result)
+    except (ValidationError, ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error repricing items: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/items/<stock_code>/sell', methods=['POST'])
+@idempotent
 def sell_item(stock_code):
     """Sell quantity of an item"""
     try:
@@ -236,142 +867,479 @@ def sell_item(stock_code):
         if quantity <= 0:
             return jsonify({'error': 'Quantity must be greater than 0'}), 400
 
-        items = file_handler.load_items()
-        item = next((item for item in items if item.stock_code == stock_code), None)
+        # Checked and saved under the file's lock, so two workers cannot both
+        # sell the last units
+        with get_file_handler().write_lock():
+            with phase('lookup'):
+                item = get_file_handler().get_item(stock_code)
 
-        if not item:
-            return jsonify({'error': 'Item not found'}), 404
+            if not item:
+                return jsonify({'error': 'Item not found'}), 404
 
-        if quantity > item.quantity:
-            return jsonify({
-                'error': f'Cannot sell {quantity} items. Only {item.quantity} items available in stock'
-            }), 400
+            with phase('mutate'):
+                if quantity > item.quantity:
+                    return jsonify({
+                        'error': f'Cannot sell {quantity} items. Only {item.quantity} items available in stock'
+                    }), 400
 
-        if item.sell_stock(quantity):
+                if not item.sell_stock(quantity):
+                    return jsonify({'error': 'Failed to sell items'}), 400
             # Save updated inventory
-            file_handler.save_item(item)
-
-            # Record the sale
-            sales_handler.record_sale(
-                stock_code=stock_code,
-                quantity=quantity,
-                price=item.price,
-                brand=getattr(item, 'brand', 'N/A')
-            )
+            get_file_handler().save_item(item)
 
-            logger.info(f"Sold {quantity} units of {stock_code}")
-            return jsonify({
-                'message': f'Successfully sold {quantity} units',
-                'item': item.to_dict()
-            })
+        # Record the sale
+        get_sales_handler().record_sale(
+            stock_code=stock_code,
+            quantity=quantity,
+            price=item.price,
+            brand=getattr(item, 'brand', 'N/A')
+        )
 
-        return jsonify({'error': 'Failed to sell items'}), 400
+        logger.info("Sold %s units of %s", quantity, stock_code)
+        return jsonify({
+            'message': f'Successfully sold {quantity} units',
+            'item': item.to_dict()
+        })
     except ValueError:
         return jsonify({'error': 'Invalid quantity format'}), 400
     except Exception as e:
-        logger.error(f"Error selling item: {str(e)}")
+        logger.error("Error selling item: %s", e)
+        return jsonify({'error': str(e)}), 400
+
+
+@api.route('/api/events', methods=['GET'])
+def stream_events():
+    """
+    Stream item_changed and sale_recorded events as server-sent events.
+
+    Reconnecting clients send Last-Event-ID (or ?last_event_id=) to be
+    replayed the events they missed. Under the preforking sync server
+    (EVENTS_SYNC_STREAM off) the stream is refused: it is served by asgi.py.
+    """
+    if not current_app.config.get('EVENTS_SYNC_STREAM', True):
+        return jsonify({'error': 'The event stream is served by the ASGI front end (asgi.py)'}), 503
+    try:
+        last_event_id = parse_last_event_id(
+            request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+        subscription = get_event_bus().subscribe(last_event_id)
+    except ValidationError as e:
         return jsonify({'error': str(e)}), 400
+    except CapacityError as e:
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    heartbeat = current_app.config.get('EVENTS_HEARTBEAT_SECONDS', 15)
+
+    def generate():
+        try:
+            yield b'retry: 3000\n\n'
+            while True:
+                event = subscription.get(heartbeat)
+                if event is not None:
+                    yield event
+                elif subscription.closed:
+                    break  # Too slow: the client reconnects and resumes
+                else:
+                    yield b': keepalive\n\n'
+        finally:
+            subscription.close()
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@api.route('/api/warehouses', methods=['GET'])
+def get_warehouse_summary():
+    """List warehouses with their SKU and unit counts"""
+    try:
+        return jsonify({'warehouses': get_warehouses().summary()})
+    except Exception as e:
+        logger.error(f"Error listing warehouses: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
+@api.route('/api/warehouses/<warehouse>/items', methods=['GET'])
+def get_warehouse_items(warehouse):
+    """List the items stocked in one warehouse"""
+    try:
+        items = get_warehouses().shard(warehouse).load_items()
+        return jsonify({'warehouse': warehouse, 'items': [item.to_dict() for item in items]})
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        logger.error(f"Error listing warehouse items: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
-@app.route('/api/sales/history', methods=['GET'])
+@api.route('/api/warehouses/<warehouse>/items/<stock_code>/sell', methods=['POST'])
+@idempotent
+def sell_warehouse_item(warehouse, stock_code):
+    """Sell quantity of an item from one warehouse"""
+    try:
+        quantity = int(request.json['quantity'])
+        item = get_warehouses().sell(warehouse, stock_code, quantity)
+        get_sales_handler().record_sale(
+            stock_code=stock_code,
+            quantity=quantity,
+            price=item.price,
+            brand=getattr(item, 'brand', 'N/A')
+        )
+        return jsonify({
+            'message': f'Successfully sold {quantity} units',
+            'warehouse': warehouse,
+            'item': item.to_dict()
+        })
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Invalid quantity format'}), 400
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 400 if warehouse in get_warehouses().names else 404
+    except StockError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error selling warehouse item: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/warehouses/<warehouse>/items/<stock_code>/restock', methods=['POST'])
+@idempotent
+def restock_warehouse_item(warehouse, stock_code):
+    """Add stock of an item to one warehouse (price and brand needed for a new SKU)"""
+    try:
+        data = request.json
+        quantity = int(data['quantity'])
+        price = float(data['price']) if data.get('price') is not None else None
+        item = get_warehouses().restock(warehouse, stock_code, quantity,
+                                        price=price, brand=data.get('brand'))
+        return jsonify({
+            'message': 'Item restocked successfully',
+            'warehouse': warehouse,
+            'item': item.to_dict()
+        })
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Invalid quantity or price format'}), 400
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 400 if warehouse in get_warehouses().names else 404
+    except StockError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error restocking warehouse item: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/inventory', methods=['GET'])
+def get_inventory():
+    """List every SKU with its total quantity across warehouses (?stock_code= for one)"""
+    try:
+        warehouses = get_warehouses()
+        stock_code = request.args.get('stock_code')
+        if stock_code:
+            locations = warehouses.locations(stock_code)
+            if not locations:
+                return jsonify({'error': 'Item not found'}), 404
+            return jsonify({'stock_code': stock_code, 'quantity': sum(locations.values()),
+                            'warehouses': locations})
+        items = warehouses.aggregate()
+        return jsonify({'items': items, 'total': len(items)})
+    except Exception as e:
+        logger.error(f"Error getting inventory: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/changes', methods=['GET'])
+def get_changes():
+    """
+    Get inventory changes after sequence number `since` (default 0), oldest first.
+
+    ?warehouse=<name> reads that warehouse's log instead of the default one.
+
+    Consumers store next_since and pass it back, repeating while has_more
+    is true. A 410 means the position is no longer retained: resync from
+    /api/items/export and continue from its X-Change-Seq header.
+    """
+    try:
+        warehouse = request.args.get('warehouse')
+        file_handler = get_warehouses().shard(warehouse) if warehouse else get_file_handler()
+        change_log = file_handler.change_log
+        if change_log is None:
+            return jsonify({'error': 'Change log is not enabled'}), 404
+        since = int(request.args.get('since', 0))
+        limit = int(request.args.get('limit', 1000))
+        if since < 0 or limit <= 0:
+            return jsonify({'error': 'since must be >= 0 and limit > 0'}), 400
+        limit = min(limit, 10000)
+
+        result = change_log.read(since, limit)
+        if result is None:
+            return jsonify({
+                'error': 'Changes after this sequence number are no longer available; resync',
+                'first_seq': change_log.first_seq,
+                'last_seq': change_log.last_seq
+            }), 410
+        changes, has_more = result
+        return jsonify({
+            'changes': changes,
+            'next_since': changes[-1]['seq'] if changes else since,
+            'last_seq': change_log.last_seq,
+            'has_more': has_more
+        })
+    except ValidationError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError:
+        return jsonify({'error': 'since and limit must be integers'}), 400
+    except Exception as e:
+        logger.error(f"Error getting changes: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/admin/profile', methods=['GET'])
+def get_profile():
+    """Get per-route profile aggregates (?route= filters, ?limit= caps entries per list)"""
+    try:
+        limit = request.args.get('limit')
+        return jsonify(get_profiler().report(route=request.args.get('route') or None,
+                                             limit=int(limit) if limit else None))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting profile: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/admin/profile', methods=['PUT'])
+def update_profile_settings():
+    """Switch profiling on or off and set sample_rate and modes (cpu, memory) at runtime"""
+    try:
+        data = request.json or {}
+        settings = get_profiler().configure(enabled=data.get('enabled'),
+                                            sample_rate=data.get('sample_rate'),
+                                            modes=data.get('modes'))
+        return jsonify({'message': 'Profiling settings updated', 'settings': settings})
+    except (ValidationError, ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error updating profiling settings: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/admin/profile', methods=['DELETE'])
+def reset_profile():
+    """Drop the aggregated profile samples"""
+    get_profiler().reset()
+    return jsonify({'message': 'Profile samples cleared'})
+
+@api.route('/api/admin/profile/dump', methods=['POST'])
+def dump_profile():
+    """Write per-route .pstats and text reports to the logs directory"""
+    try:
+        return jsonify({'files': get_profiler().dump()})
+    except Exception as e:
+        logger.error(f"Error dumping profile: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/admin/admission', methods=['GET'])
+def get_admission_stats():
+    """Get admission settings and running, queued and refused requests per traffic class"""
+    return jsonify(get_admission_controller().stats())
+
+@api.route('/api/admin/admission', methods=['PUT'])
+def update_admission_settings():
+    """Switch admission control on or off and set rate, burst and concurrency limits at runtime"""
+    try:
+        data = request.json or {}
+        settings = get_admission_controller().configure(enabled=data.get('enabled'),
+                                                        rate=data.get('rate'),
+                                                        burst=data.get('burst'),
+                                                        max_concurrent=data.get('max_concurrent'),
+                                                        class_limits=data.get('class_limits'))
+        return jsonify({'message': 'Admission settings updated', 'settings': settings})
+    except (ValidationError, ValueError, TypeError, AttributeError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error updating admission settings: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/admin/admission', methods=['DELETE'])
+def reset_admission():
+    """Refill every client's token bucket and zero the admission counters"""
+    get_admission_controller().reset()
+    return jsonify({'message': 'Admission counters reset'})
+
+@api.route('/api/admin/reporting', methods=['GET'])
+def get_reporting_status():
+    """Get the report snapshot version, age and publisher counters"""
+    try:
+        publisher = get_report_publisher()
+        if publisher is None:
+            return jsonify({'error': 'Reporting mode is disabled'}), 404
+        return jsonify(publisher.status())
+    except Exception as e:
+        logger.error(f"Error getting reporting status: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/admin/reporting/refresh', methods=['POST'])
+def refresh_reporting_snapshot():
+    """Publish a new report snapshot now"""
+    try:
+        publisher = get_report_publisher()
+        if publisher is None:
+            return jsonify({'error': 'Reporting mode is disabled'}), 404
+        publisher.refresh()
+        return jsonify(publisher.status())
+    except Exception as e:
+        logger.error(f"Error refreshing report snapshot: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/admin/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get item cache hit rates, evictions and sizes"""
+    try:
+        item_cache = get_file_handler().item_cache
+        if item_cache is None:
+            return jsonify({'error': 'Item cache is disabled'}), 404
+        return jsonify(item_cache.stats())
+    except Exception as e:
+        logger.error(f"Error getting cache stats: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/admin/cache', methods=['DELETE'])
+def clear_cache():
+    """Drop every item cache entry in this process and the shared file"""
+    try:
+        item_cache = get_file_handler().item_cache
+        if item_cache is None:
+            return jsonify({'error': 'Item cache is disabled'}), 404
+        item_cache.clear()
+        return jsonify({'message': 'Item cache cleared'})
+    except Exception as e:
+        logger.error(f"Error clearing cache: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/sales/history', methods=['GET'])
 def get_sales_history():
     """Get sales history data"""
     try:
-        sales_data = sales_handler.get_sales_history()
+        publisher = get_report_publisher()
+        if publisher is not None:
+            snapshot = publisher.latest()
+            response = jsonify(snapshot.sales_history)
+            response.headers.update(snapshot_headers(publisher, snapshot))
+            return response
+        sales_data = get_sales_handler().get_sales_history()
         return jsonify(sales_data)
     except Exception as e:
         logger.error(f"Error getting sales history: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/sales/export', methods=['GET'])
-def export_sales():
-    """Export sales history to CSV"""
+@api.route('/api/sales/reports/<report>', methods=['GET'])
+def get_sales_report(report):
+    """Get an analytics report: revenue (period=week|month), brand-month, velocity or moving-average (window=N)"""
     try:
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        writer.writerow([
-            'Date', 'Stock Code', 'Quantity', 'Price', 'Brand', 'Revenue'
-        ])
+        analytics = get_sales_handler().analytics
+        if report == 'revenue':
+            data = analytics.revenue_by_period(request.args.get('period', 'month'))
+        elif report == 'brand-month':
+            data = analytics.brand_month_pivot()
+        elif report == 'velocity':
+            data = analytics.sku_velocity()
+        elif report == 'moving-average':
+            data = analytics.moving_average(int(request.args.get('window', 7)))
+        else:
+            return jsonify({'error': f'Unknown report: {report}'}), 404
+        return jsonify({'report': report, 'data': data})
+    except (ValidationError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting sales report: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
-        sales_rows = sales_handler.get_all_sales()
-        writer.writerows(sales_rows)
+@api.route('/api/forecast/at-risk', methods=['GET'])
+def get_at_risk_items():
+    """Get SKUs forecast to stock out within the lead time, soonest first"""
+    try:
+        lead_time = float(request.args.get(
+            'lead_time_days', current_app.config['FORECAST_LEAD_TIME_DAYS']))
+        limit = request.args.get('limit')
+        limit = int(limit) if limit else None
+        items = get_forecaster().at_risk(lead_time, limit=limit)
+        return jsonify({'lead_time_days': lead_time, 'items': items})
+    except (ValidationError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Error getting at-risk items: {str(e)}")
+        return jsonify({'error': str(e)}), 500
 
-        output.seek(0)
-        return Response(
-            output.getvalue(),
-            mimetype='text/csv',
-            headers={
-                'Content-Disposition':
-                f'attachment; filename=sales_history_{datetime.now().strftime("%Y%m%d")}.csv'
-            }
-        )
+@api.route('/api/sales/export', methods=['GET'])
+def export_sales():
+    """Export sales history to CSV"""
+    try:
+        headers = {
+            'Content-Disposition':
+            f'attachment; filename=sales_history_{datetime.now().strftime("%Y%m%d")}.csv'
+        }
+        publisher = get_report_publisher()
+        if publisher is not None:
+            snapshot = publisher.latest()
+            return Response(snapshot.sales_csv, mimetype='text/csv',
+                            headers=snapshot_headers(publisher, snapshot, headers))
+        return Response(sales_csv(get_sales_handler().get_all_sales()),
+                        mimetype='text/csv', headers=headers)
     except Exception as e:
         logger.error(f"Error exporting sales: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/sales/summary', methods=['GET'])
+@api.route('/api/sales/summary', methods=['GET'])
 def get_sales_summary():
     """Get sales summary statistics"""
     try:
-        summary = sales_handler.get_sales_summary()
+        publisher = get_report_publisher()
+        if publisher is not None:
+            snapshot = publisher.latest()
+            response = jsonify(snapshot.sales_summary)
+            response.headers.update(snapshot_headers(publisher, snapshot))
+            return response
+        summary = get_sales_handler().get_sales_summary()
         return jsonify(summary)
     except Exception as e:
         logger.error(f"Error getting sales summary: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/items/<stock_code>', methods=['DELETE'])
+@api.route('/api/items/<stock_code>', methods=['DELETE'])
 def delete_item(stock_code):
     """Delete a stock item"""
     try:
-        if file_handler.delete_item(stock_code):
-            logger.info(f"Deleted item: {stock_code}")
+        if get_file_handler().delete_item(stock_code):
+            logger.info("Deleted item: %s", stock_code)
             return jsonify({'message': 'Item deleted successfully'}), 200
         return jsonify({'error': 'Item not found'}), 404
     except Exception as e:
         logger.error(f"Error deleting item: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/items/export', methods=['GET'])
+@api.route('/api/items/export', methods=['GET'])
 def export_items():
     """Export items to CSV"""
     try:
+        headers = {
+            'Content-Disposition':
+            f'attachment; filename=stock_items_{datetime.now().strftime("%Y%m%d")}.csv'
+        }
+        publisher = get_report_publisher()
+        if publisher is not None:
+            snapshot = publisher.latest()
+            if snapshot.change_seq is not None:
+                headers['X-Change-Seq'] = str(snapshot.change_seq)
+            return Response(snapshot.items_csv, mimetype='text/csv',
+                            headers=snapshot_headers(publisher, snapshot, headers))
+
+        file_handler = get_file_handler()
+        # Taken before the load: replaying from here may repeat, never miss, a change
+        change_seq = file_handler.change_log.last_seq if file_handler.change_log else None
         items = file_handler.load_items()
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        # Write headers
-        writer.writerow([
-            'Stock Code', 'Name', 'Description', 'Quantity',
-            'Price', 'Price with VAT', 'Brand'
-        ])
-
-        # Write data
-        for item in items:
-            writer.writerow([
-                item.stock_code,
-                item.get_stock_name(),
-                item.get_stock_description(),
-                item.quantity,
-                item.price,
-                item.get_price_with_VAT(),
-                getattr(item, 'brand', 'N/A')
-            ])
-
-        # Prepare response
-        output.seek(0)
-        return Response(
-            output.getvalue(),
-            mimetype='text/csv',
-            headers={
-                'Content-Disposition':
-                f'attachment; filename=stock_items_{datetime.now().strftime("%Y%m%d")}.csv'
-            }
-        )
+        if change_seq is not None:
+            headers['X-Change-Seq'] = str(change_seq)
+        return Response(items_csv(items), mimetype='text/csv', headers=headers)
     except Exception as e:
         logger.error(f"Error exporting items: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 
 if __name__ == '__main__':
+    from utils.runtime import warm_up
+
+    app = create_app('development')
+    with app.app_context():
+        # Also recompacts the snapshot the last run's writes left stale
+        warm_up(get_file_handler(), get_sales_handler(), freeze=False)
     app.run(debug=True, port=5000)
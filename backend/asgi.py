@@ -0,0 +1,401 @@
+# backend/asgi.py
+
+"""
+Production entry point for the stock API (ASGI).
+
+Serves the same /api/... routes as app.py without a thread per connection:
+requests are received and answered on the event loop, the Flask handlers
+(which block on CSV I/O) run on a bounded thread pool, and every mutating
+request (sell, add/restock, update, delete) is queued to a single writer
+task so writes to the stock and sales files are applied one at a time.
+The writer queue is ordered by traffic class (utils/admission.py), so a
+sale queued behind a bulk reprice is applied first.
+Writes to a branch warehouse (/api/warehouses/<name>/..., other than the
+default warehouse) skip that queue: each warehouse's shard lock orders
+them, so different branches are written in parallel.
+The /api/events stream is served natively on the event loop, so each
+connected dashboard costs a coroutine rather than a pool thread.
+Admission control (utils/admission.py) can be enabled here whatever the
+config, as every request shares this process's limits. It runs on the
+event loop before a request takes a pool thread or a writer queue
+place, with max_concurrent capped at the pool size, so a report waiting
+for a slot never holds a thread a sale needs.
+
+The app is built with ProductionConfig unless APP_CONFIG names another;
+ProductionConfig turns admission control on. At lifespan startup the
+inventory and sales caches are warmed and a stale inventory snapshot is
+recompacted (utils/runtime.warm_up) before requests are served.
+
+Run as a single process, since the limits and the writer queue are held
+in it:
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+(or `python asgi.py`, which binds to BIND). wsgi.py and gunicorn.conf.py
+serve the same routes from prefork workers, without admission control or
+the event stream.
+"""
+
+import asyncio
+import io
+import itertools
+import json
+import logging
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+from werkzeug.exceptions import HTTPException
+from app import create_app, get_event_bus, get_file_handler, get_sales_handler, parse_last_event_id
+from utils.admission import ADMITTED_ENVIRON_KEY, PRIORITY, AdmissionRejected, retry_after_header
+from utils.exceptions import CapacityError, ValidationError
+from utils.runtime import warm_up
+
+logger = logging.getLogger(__name__)
+
+# Methods that change stock or sales files and must go through the writer queue
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+EVENTS_PATH = '/api/events'
+WAREHOUSES_PREFIX = '/api/warehouses/'
+
+Result = Tuple[int, List[Tuple[bytes, bytes]], object]
+
+
+class AsgiStockApp:
+    """Async front end dispatching to the Flask handlers off the event loop."""
+
+    def __init__(self, wsgi_app, io_workers: int = 8, write_queue_size: int = 1000,
+                 warm: bool = False):
+        self.wsgi_app = wsgi_app
+        self.io_workers = io_workers
+        self.write_queue_size = write_queue_size
+        # Warm the caches and recompact the snapshot at startup
+        self.warm = warm
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._write_queue: Optional[asyncio.PriorityQueue] = None
+        self._write_seq = itertools.count()
+        self._writer_task: Optional[asyncio.Task] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise RuntimeError(f"Unsupported ASGI scope type: {scope['type']}")
+
+    # --- lifecycle -------------------------------------------------------
+
+    async def startup(self) -> None:
+        """Create the I/O thread pool, start the single writer task and warm up if asked to."""
+        if self._writer_task is not None:
+            return
+        # Every admitted request must have a pool thread to run on
+        self._admission.cap_concurrency(self.io_workers)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.io_workers, thread_name_prefix='asgi-io'
+        )
+        self._write_queue = asyncio.PriorityQueue(maxsize=self.write_queue_size)
+        self._writer_task = asyncio.get_running_loop().create_task(self._writer())
+        if self.warm:
+            await self._run_blocking(self._warm_up)
+        logger.info("ASGI app started with %s I/O workers", self.io_workers)
+
+    async def shutdown(self) -> None:
+        """Drain pending writes, then stop the writer and the thread pool."""
+        if self._writer_task is None:
+            return
+        await self._write_queue.join()
+        self._writer_task.cancel()
+        try:
+            await self._writer_task
+        except asyncio.CancelledError:
+            pass
+        self._executor.shutdown(wait=True)
+        self._writer_task = None
+        self._executor = None
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await self.startup()
+                    await send({'type': 'lifespan.startup.complete'})
+                except Exception as e:
+                    logger.error(f"ASGI startup failed: {str(e)}")
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.shutdown()
+                logger.info("ASGI app stopped")
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # --- request handling ------------------------------------------------
+
+    async def _http(self, scope, receive, send) -> None:
+        # Servers without lifespan support start us lazily
+        await self.startup()
+
+        if scope['path'] == EVENTS_PATH and scope['method'] == 'GET':
+            await self._events(scope, receive, send)
+            return
+
+        body = await self._read_body(receive)
+        environ = self._build_environ(scope, body)
+        traffic_class = self._traffic_class(environ)
+
+        admission = self._admission
+        admitted = admission.enabled and traffic_class is not None
+        if admitted:
+            try:
+                await admission.admit_async(traffic_class, admission.client_id(environ),
+                                            f"{scope['method']} {scope['path']}")
+            except AdmissionRejected as e:
+                retry_after = retry_after_header(e.retry_after).encode('latin-1')
+                await self._send_json(send, 429, {'error': str(e)}, [(b'retry-after', retry_after)])
+                return
+            environ[ADMITTED_ENVIRON_KEY] = traffic_class
+        try:
+            await self._respond(scope, environ, traffic_class, send)
+        finally:
+            if admitted:
+                admission.limiter.release(traffic_class)
+
+    async def _respond(self, scope, environ: Dict, traffic_class: Optional[str], send) -> None:
+        """Run the request on the pool or through the writer queue and send the response."""
+        if scope['method'] in WRITE_METHODS and not self._is_branch_write(scope['path']):
+            future = asyncio.get_running_loop().create_future()
+            priority = PRIORITY.get(traffic_class, PRIORITY['write'])
+            await self._write_queue.put((priority, next(self._write_seq), environ, future))
+            status, headers, content = await future
+        else:
+            status, headers, content = await self._run_blocking(self._call_wsgi, environ)
+
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        if isinstance(content, bytes):
+            await send({'type': 'http.response.body', 'body': content})
+            return
+
+        # Streamed response: pull each chunk on the pool, send it from the loop
+        iterator = iter(content)
+        try:
+            while True:
+                chunk = await self._run_blocking(next, iterator, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            close = getattr(content, 'close', None)
+            if close is not None:
+                await self._run_blocking(close)
+
+    async def _events(self, scope, receive, send) -> None:
+        """Stream server-sent events from the app's event bus without a pool thread."""
+        await self._read_body(receive)
+        headers = dict(scope.get('headers', []))
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        raw_id = headers.get(b'last-event-id', b'').decode('latin-1') or \
+            query.get('last_event_id', [''])[0]
+        try:
+            bus = await self._run_blocking(self._event_bus)
+            subscription = bus.subscribe(parse_last_event_id(raw_id))
+        except ValidationError as e:
+            await self._send_json(send, 400, {'error': str(e)})
+            return
+        except CapacityError as e:
+            await self._send_json(send, 503, {'error': str(e)}, [(b'retry-after', b'5')])
+            return
+
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+        subscription.set_waker(lambda: loop.call_soon_threadsafe(wake.set))
+        disconnected = loop.create_task(self._wait_for_disconnect(receive))
+        heartbeat = self.wsgi_app.config.get('EVENTS_HEARTBEAT_SECONDS', 15)
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ]})
+            await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+            while not disconnected.done():
+                wake.clear()
+                events = subscription.drain()
+                if events:
+                    await send({'type': 'http.response.body', 'body': b''.join(events),
+                                'more_body': True})
+                    continue
+                if subscription.closed:
+                    break  # Too slow: the client reconnects and resumes
+                waiter = loop.create_task(wake.wait())
+                done, _ = await asyncio.wait({waiter, disconnected}, timeout=heartbeat,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if waiter not in done:
+                    waiter.cancel()
+                if not done:
+                    await send({'type': 'http.response.body', 'body': b': keepalive\n\n',
+                                'more_body': True})
+            if not disconnected.done():
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            subscription.close()
+            disconnected.cancel()
+
+    @property
+    def _admission(self):
+        return self.wsgi_app.extensions['admission_controller']
+
+    def _traffic_class(self, environ: Dict) -> Optional[str]:
+        """Get a request's admission traffic class from the route it matches."""
+        try:
+            endpoint, _ = self.wsgi_app.url_map.bind_to_environ(environ).match()
+        except HTTPException:
+            return None  # Unrouted: Flask answers it without touching the files
+        return self._admission.classify_endpoint(endpoint, environ['REQUEST_METHOD'],
+                                                 environ['PATH_INFO'])
+
+    def _warm_up(self) -> None:
+        with self.wsgi_app.app_context():
+            # One long-lived process: there are no forked workers to share frozen pages with
+            warm_up(get_file_handler(), get_sales_handler(), freeze=False)
+
+    def _event_bus(self):
+        with self.wsgi_app.app_context():
+            return get_event_bus()
+
+    @staticmethod
+    async def _wait_for_disconnect(receive) -> None:
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    @staticmethod
+    async def _send_json(send, status: int, payload: Dict, extra_headers=()) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        await send({'type': 'http.response.start', 'status': status, 'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('latin-1')),
+            *extra_headers,
+        ]})
+        await send({'type': 'http.response.body', 'body': body})
+
+    def _is_branch_write(self, path: str) -> bool:
+        """Check whether a path writes to a non-default warehouse shard."""
+        if not path.startswith(WAREHOUSES_PREFIX):
+            return False
+        warehouse = path[len(WAREHOUSES_PREFIX):].split('/', 1)[0]
+        config = self.wsgi_app.config
+        return (warehouse != config.get('WAREHOUSE_DEFAULT', 'main')
+                and warehouse in config.get('WAREHOUSES', []))
+
+    async def _writer(self) -> None:
+        """Apply queued mutating requests one at a time, highest priority class first."""
+        while True:
+            _, _, environ, future = await self._write_queue.get()
+            try:
+                result = await self._run_blocking(self._call_wsgi, environ)
+                if not future.cancelled():
+                    future.set_result(result)
+            except Exception as e:
+                logger.error(f"Error applying queued write: {str(e)}")
+                if not future.cancelled():
+                    future.set_exception(e)
+            finally:
+                self._write_queue.task_done()
+
+    async def _run_blocking(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    @staticmethod
+    async def _read_body(receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                break
+        return b''.join(chunks)
+
+    @staticmethod
+    def _build_environ(scope, body: bytes) -> Dict:
+        """Translate an ASGI HTTP scope into a WSGI environ."""
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for raw_name, raw_value in scope.get('headers', []):
+            name = raw_name.decode('latin-1').upper().replace('-', '_')
+            value = raw_value.decode('latin-1')
+            if name == 'CONTENT_TYPE':
+                environ['CONTENT_TYPE'] = value
+                continue
+            if name == 'CONTENT_LENGTH':
+                continue
+            key = f'HTTP_{name}'
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+        return environ
+
+    def _call_wsgi(self, environ: Dict) -> Result:
+        """Run the Flask app for one request (on a pool thread)."""
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in headers
+            ]
+
+        app_iter = self.wsgi_app(environ, start_response)
+        has_length = any(name == b'content-length' for name, _ in response['headers'])
+        if not has_length:
+            # No Content-Length means a generator body; stream it chunk by chunk
+            return response['status'], response['headers'], app_iter
+        try:
+            return response['status'], response['headers'], b''.join(app_iter)
+        finally:
+            close = getattr(app_iter, 'close', None)
+            if close is not None:
+                close()
+
+
+flask_app = create_app(os.environ.get('APP_CONFIG', 'production'))
+# Every request runs in this one process, so admission limits hold here even
+# under a config written for prefork workers (ADMISSION_SUPPORTED False)
+admission = flask_app.extensions['admission_controller']
+admission.supported = True
+admission.configure(enabled=flask_app.config.get('ADMISSION_ENABLED', False))
+application = AsgiStockApp(
+    flask_app,
+    io_workers=flask_app.config.get('ASGI_IO_WORKERS', 8),
+    write_queue_size=flask_app.config.get('ASGI_WRITE_QUEUE_SIZE', 1000),
+    warm=True,
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    host, _, port = flask_app.config.get('BIND', '0.0.0.0:5000').rpartition(':')
+    uvicorn.run('asgi:application', host=host or '0.0.0.0', port=int(port))
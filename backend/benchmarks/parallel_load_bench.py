@@ -0,0 +1,65 @@
+# backend/benchmarks/parallel_load_bench.py
+
+"""
+Compare cold-load times of the stock and sales files parsed serially and
+with the parallel loader at increasing worker counts.
+
+Usage:
+    python benchmarks/parallel_load_bench.py [--rows 2000000] [--max-workers 8]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils import parallel_csv
+from utils.analytics import SalesAnalytics
+from utils.file_handler import StockFileHandler
+
+BRANDS = ['TomTom', 'Garmin', 'GeoVision', 'Navman', 'Mio']
+
+
+def timed(label: str, func) -> None:
+    start = time.perf_counter()
+    func()
+    print(f"{label:40} {time.perf_counter() - start:8.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    parallel_csv.MIN_PARALLEL_BYTES = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stock = Path(tmp) / 'stock_items.csv'
+        with open(stock, 'w', encoding='utf-8') as file:
+            file.write('item_type,stock_code,quantity,price,brand\n')
+            for i in range(args.rows):
+                file.write(f"NavSys,NS{i},{i % 100 + 1},{10 + i % 997}.5,{BRANDS[i % len(BRANDS)]}\n")
+        sales = Path(tmp) / 'sales_history.csv'
+        with open(sales, 'w', encoding='utf-8') as file:
+            file.write('date,stock_code,quantity,price,brand,revenue\n')
+            for i in range(args.rows):
+                file.write(f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d},NS{i % 5000},{i % 5 + 1},"
+                           f"99.5,{BRANDS[i % len(BRANDS)]},{(i % 5 + 1) * 99.5}\n")
+
+        workers = 1
+        while workers <= args.max_workers:
+            label = 'serial' if workers == 1 else f'{workers} workers'
+            timed(f'stock rows, {label}',
+                  lambda: StockFileHandler(str(stock), parallel_load=workers).load_all_items())
+            timed(f'sales frame, {label}',
+                  lambda: SalesAnalytics(str(sales), parallel_load=workers).frame())
+            workers *= 2
+        parallel_csv.shutdown_pool()
+
+
+if __name__ == '__main__':
+    main()
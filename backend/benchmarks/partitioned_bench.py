@@ -0,0 +1,72 @@
+# backend/benchmarks/partitioned_bench.py
+
+"""
+Compare /api/items-style listing queries run in one process against the
+hash-partitioned worker processes.
+
+Usage:
+    python benchmarks/partitioned_bench.py [--items 200000] [--workers 4] [--queries 20]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.file_handler import StockFileHandler
+from utils.partitioned import PartitionedCatalog
+
+BRANDS = ['TomTom', 'Garmin', 'GeoVision', 'Navman', 'Mio']
+
+
+def local_query(handler: StockFileHandler, brand: str) -> int:
+    """The single-process path of get_items: hydrate, filter, sort, aggregate."""
+    items = [item for item in handler.load_items() if brand in item.brand.lower()]
+    items.sort(key=lambda item: item.price, reverse=True)
+    page = [item.to_dict() for item in items[:20]]
+    total = sum(item.get_price_with_VAT() * item.quantity for item in items)
+    return len(page) + int(total > 0)
+
+
+def timed(label: str, queries: int, func) -> None:
+    start = time.perf_counter()
+    for i in range(queries):
+        func(BRANDS[i % len(BRANDS)].lower())
+    elapsed = time.perf_counter() - start
+    print(f"{label:40} {queries / elapsed:10,.1f} queries/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--items', type=int, default=200_000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--queries', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'stock_items.csv'
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('item_type,stock_code,quantity,price,brand\n')
+            for i in range(args.items):
+                file.write(f"NavSys,NS{i},{i % 100 + 1},{10 + i % 997}.5,{BRANDS[i % len(BRANDS)]}\n")
+
+        handler = StockFileHandler(str(path))
+        # Each query re-hydrates, as get_items does after every write
+        timed('single process', args.queries,
+              lambda brand: (handler.invalidate_cache(), local_query(handler, brand)))
+
+        catalog = PartitionedCatalog(handler, args.workers)
+        try:
+            catalog.query(limit=1)  # Workers load their partitions
+            timed(f'partitioned ({args.workers} workers)', args.queries,
+                  lambda brand: catalog.query(brand=brand, sort_by='price', reverse=True, limit=20))
+        finally:
+            catalog.close()
+
+
+if __name__ == '__main__':
+    main()
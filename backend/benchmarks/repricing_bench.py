@@ -0,0 +1,63 @@
+# backend/benchmarks/repricing_bench.py
+
+"""
+Time a bulk reprice of every SKU in a generated stock file against the
+same change applied one item at a time through save_item.
+
+Usage:
+    python benchmarks/repricing_bench.py [--rows 100000] [--single 200]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models.registry import get_item_type
+from utils.change_log import ChangeLog
+from utils.file_handler import StockFileHandler
+from utils.pricing import PriceBook
+from utils.repricing import RepricingRule, reprice
+
+BRANDS = ['TomTom', 'Garmin', 'GeoVision', 'Navman', 'Mio']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--single', type=int, default=200,
+                        help='items to reprice one by one (extrapolated to --rows)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stock = Path(tmp) / 'stock_items.csv'
+        with open(stock, 'w', encoding='utf-8') as file:
+            file.write('item_type,stock_code,quantity,price,brand\n')
+            for i in range(args.rows):
+                file.write(f"NavSys,NS{i},{i % 100 + 1},{10 + i % 997}.5,{BRANDS[i % len(BRANDS)]}\n")
+        handler = StockFileHandler(str(stock), change_log=ChangeLog(str(Path(tmp) / 'changes.jsonl')))
+        book = PriceBook(str(Path(tmp) / 'pricing.jsonl'))
+        handler.add_listener(book.on_storage_event, batches=True)
+        rule = RepricingRule(uplift_percent=5, brand_uplift={'Garmin': 8}, ending=0.99)
+
+        start = time.perf_counter()
+        result = reprice(handler, rule)
+        bulk = time.perf_counter() - start
+        print(f"bulk reprice of {result['changed']} items: {bulk:8.2f} s")
+
+        rows = handler.load_all_items()[:args.single]
+        start = time.perf_counter()
+        for row in rows:
+            item = get_item_type(row[0]).from_row(row)
+            item.price = item.price * 1.05
+            handler.save_item(item)
+        single = (time.perf_counter() - start) / len(rows)
+        print(f"save_item per SKU:            {single * 1000:8.2f} ms "
+              f"(~{single * args.rows:.0f} s for {args.rows} SKUs)")
+
+
+if __name__ == '__main__':
+    main()
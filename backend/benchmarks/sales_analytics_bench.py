@@ -0,0 +1,81 @@
+# backend/benchmarks/sales_analytics_bench.py
+
+"""
+Compare the pandas analytics engine against the old DictReader aggregation.
+
+Usage:
+    python benchmarks/sales_analytics_bench.py [--rows 1000000]
+"""
+
+import argparse
+import csv
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.analytics import SalesAnalytics
+
+
+def write_sales(path: str, rows: int) -> None:
+    """Write a synthetic sales history file."""
+    brands = ['TomTom', 'Garmin', 'GeoVision', 'COW', 'Navman']
+    start = date(2023, 1, 1)
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['date', 'stock_code', 'quantity', 'price', 'brand', 'revenue'])
+        for _ in range(rows):
+            quantity = random.randint(1, 5)
+            price = round(random.uniform(50, 500), 2)
+            writer.writerow([
+                (start + timedelta(days=random.randint(0, 700))).isoformat(),
+                f"NS{random.randint(1, 5000)}", quantity, price,
+                random.choice(brands), quantity * price
+            ])
+
+
+def dictreader_history(path: str) -> dict:
+    """The row-by-row aggregation SalesHandler used before the analytics engine."""
+    daily_sales, brand_sales = {}, {}
+    with open(path, 'r', newline='') as file:
+        for row in csv.DictReader(file):
+            day = daily_sales.setdefault(row['date'], {'sales': 0, 'revenue': 0.0})
+            day['sales'] += int(row['quantity'])
+            day['revenue'] += float(row['revenue'])
+            brand = brand_sales.setdefault(row['brand'], {'sales': 0, 'revenue': 0.0})
+            brand['sales'] += int(row['quantity'])
+            brand['revenue'] += float(row['revenue'])
+    return {'daily': daily_sales, 'by_brand': brand_sales}
+
+
+def timed(label: str, func) -> None:
+    start = time.perf_counter()
+    func()
+    print(f"{label:40} {(time.perf_counter() - start) * 1000:10.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'sales_history.csv')
+        write_sales(path, args.rows)
+        analytics = SalesAnalytics(path)
+
+        timed('DictReader aggregation', lambda: dictreader_history(path))
+        timed('engine: load + history (cold)', analytics.sales_history)
+        timed('engine: history (cached)', analytics.sales_history)
+        timed('engine: monthly revenue', lambda: analytics.revenue_by_period('month'))
+        timed('engine: brand x month pivot', analytics.brand_month_pivot)
+        timed('engine: SKU velocity', analytics.sku_velocity)
+        timed('engine: 7-day moving average', lambda: analytics.moving_average(7))
+
+
+if __name__ == '__main__':
+    main()
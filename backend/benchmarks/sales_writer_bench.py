@@ -0,0 +1,65 @@
+# backend/benchmarks/sales_writer_bench.py
+
+"""
+Compare sales append throughput: open/append/close per sale against the
+buffered writer in each durability mode.
+
+Usage:
+    python benchmarks/sales_writer_bench.py [--rows 100000]
+"""
+
+import argparse
+import csv
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.sales_writer import SalesWriter, today
+
+
+def open_per_sale(path: str, rows: int) -> None:
+    """The append pattern record_sale used before the buffered writer."""
+    for i in range(rows):
+        with open(path, 'a', newline='') as file:
+            csv.writer(file).writerow([datetime.now().strftime('%Y-%m-%d'), f"NS{i % 500}",
+                                       1, 99.99, 'TomTom', 99.99])
+
+
+def buffered(path: str, rows: int, durability: str) -> None:
+    writer = SalesWriter(path, durability=durability, flush_rows=10_000, flush_interval=0.5)
+    for i in range(rows):
+        writer.append([today(), f"NS{i % 500}", 1, 99.99, 'TomTom', 99.99])
+    writer.close()
+
+
+def timed(label: str, rows: int, func) -> None:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:40} {rows / elapsed:12,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    args = parser.parse_args()
+    # fsync per row is slow; measure 'always' on a smaller sample
+    always_rows = max(args.rows // 100, 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        timed('open/append/close per sale', args.rows,
+              lambda: open_per_sale(str(Path(tmp) / 'a.csv'), args.rows))
+        timed('writer: always (fsync per sale)', always_rows,
+              lambda: buffered(str(Path(tmp) / 'b.csv'), always_rows, 'always'))
+        timed('writer: batched', args.rows,
+              lambda: buffered(str(Path(tmp) / 'c.csv'), args.rows, 'batched'))
+        timed('writer: os', args.rows,
+              lambda: buffered(str(Path(tmp) / 'd.csv'), args.rows, 'os'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# backend/benchmarks/snapshot_bench.py
+
+"""
+Compare cold inventory loads from CSV against the binary snapshot.
+
+Usage:
+    python benchmarks/snapshot_bench.py [--rows 1000000]
+"""
+
+import argparse
+import csv
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.file_handler import StockFileHandler
+from utils.snapshot import load_snapshot
+
+
+def write_stock(path: str, rows: int) -> None:
+    """Write a synthetic stock items file."""
+    brands = ['TomTom', 'Garmin', 'GeoVision', 'COW', 'Navman']
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['item_type', 'stock_code', 'quantity', 'price', 'brand'])
+        for i in range(rows):
+            writer.writerow(['NavSys', f"NS{i}", random.randint(0, 100),
+                             round(random.uniform(50, 500), 2), random.choice(brands)])
+
+
+def timed(label: str, func) -> None:
+    start = time.perf_counter()
+    func()
+    print(f"{label:40} {(time.perf_counter() - start) * 1000:10.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = str(Path(tmp) / 'stock_items.csv')
+        snap_path = str(Path(tmp) / 'stock_items.snap')
+        write_stock(csv_path, args.rows)
+
+        timed('CSV: load_all_items (cold)', StockFileHandler(csv_path).load_all_items)
+        timed('snapshot: compact', StockFileHandler(csv_path, snapshot_file=snap_path).compact)
+        timed('snapshot: load + verify (columnar)', lambda: load_snapshot(snap_path))
+        timed('snapshot: load_all_items (cold)',
+              StockFileHandler(csv_path, snapshot_file=snap_path).load_all_items)
+
+
+if __name__ == '__main__':
+    main()
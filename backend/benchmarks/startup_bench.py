@@ -0,0 +1,67 @@
+# backend/benchmarks/startup_bench.py
+
+"""
+Measure cold-start cost of the backend.
+
+Each scenario runs in a fresh interpreter so import caches are cold (apart
+from the OS page cache), and reports the median and best wall time.
+
+Usage:
+    python benchmarks/startup_bench.py [--runs 10]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# The first-request scenario points the testing app at throwaway files
+FIRST_REQUEST = """
+import tempfile, app
+tmp = tempfile.mkdtemp()
+a = app.create_app('testing')
+a.config['CSV_FILE'] = tmp + '/stock_items.csv'
+a.config['SALES_FILE'] = tmp + '/sales_history.csv'
+a.test_client().get('/api/items?per_page=1')
+"""
+
+SCENARIOS = {
+    'interpreter only': 'pass',
+    'import models': 'import models',
+    'import utils': 'import utils',
+    'import app': 'import app',
+    'create_app()': "import app; app.create_app('testing')",
+    'create_app() + first request': FIRST_REQUEST,
+}
+
+
+def time_scenario(code: str, runs: int) -> list:
+    """Run code in a fresh interpreter `runs` times and return wall times in ms."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, '-c', code], cwd=BACKEND_DIR, check=True,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'scenario':32} {'median ms':>10} {'best ms':>10}")
+    for name, code in SCENARIOS.items():
+        timings = time_scenario(code, args.runs)
+        print(f"{name:32} {statistics.median(timings):10.1f} {min(timings):10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -23,10 +23,94 @@ class Config:
     DATA_DIR = BASE_DIR / 'data'
     LOG_DIR = BASE_DIR / 'logs'
     CSV_FILE = DATA_DIR / 'stock_items.csv'
-
-    # Ensure directories exist
-    DATA_DIR.mkdir(exist_ok=True)
-    LOG_DIR.mkdir(exist_ok=True)
+    SALES_FILE = DATA_DIR / 'sales_history.csv'
+    REORDER_THRESHOLDS_FILE = DATA_DIR / 'reorder_thresholds.json'
+    # Binary copy of CSV_FILE for fast cold loads (python -m utils.snapshot)
+    STOCK_SNAPSHOT_FILE = DATA_DIR / 'stock_items.snap'
+    # Writes after which a server process recompacts the snapshot, on a
+    # background thread; it is also recompacted at startup. 0 only
+    # recompacts at startup
+    STOCK_SNAPSHOT_EVERY = int(os.environ.get('STOCK_SNAPSHOT_EVERY', 100))
+    # Stored responses for Idempotency-Key retries, kept next to the sales log
+    IDEMPOTENCY_FILE = DATA_DIR / 'idempotency_keys.sqlite3'
+    IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+    IDEMPOTENCY_MAX_KEYS = 10000
+    # Request profiling (utils/profiling.py): the fraction of requests sampled
+    # under cProfile ('cpu') and/or tracemalloc ('memory'); also switchable at
+    # runtime through /api/admin/profile
+    PROFILE_ENABLED = os.environ.get('PROFILE_ENABLED', '').lower() in ('1', 'true', 'yes')
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.01))
+    PROFILE_MODES = [mode.strip() for mode in os.environ.get('PROFILE_MODES', 'cpu').split(',') if mode.strip()]
+    PROFILE_TOP_N = 25
+    PROFILE_DUMP_DIR = LOG_DIR
+    # Admission control (utils/admission.py): per-client token buckets
+    # refilled at ADMISSION_RATE tokens/s up to ADMISSION_BURST, where a
+    # report costs more tokens than a sale, and at most
+    # ADMISSION_MAX_CONCURRENT requests running, handed out by priority
+    # (checkout, write, read, report); also switchable at runtime through
+    # /api/admin/admission. ADMISSION_CLIENT_HEADER names a header set by a
+    # trusted proxy to identify clients instead of the remote address.
+    ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', '').lower() in ('1', 'true', 'yes')
+    ADMISSION_RATE = float(os.environ.get('ADMISSION_RATE', 50.0))
+    ADMISSION_BURST = float(os.environ.get('ADMISSION_BURST', 100.0))
+    ADMISSION_MAX_CONCURRENT = int(os.environ.get('ADMISSION_MAX_CONCURRENT', 32))
+    ADMISSION_CLASS_LIMITS = {'report': 2}
+    ADMISSION_COSTS = {'checkout': 1, 'write': 1, 'read': 1, 'report': 10}
+    ADMISSION_QUEUE_TIMEOUTS = {'checkout': 5.0, 'write': 2.0, 'read': 1.0, 'report': 0.5}
+    ADMISSION_MAX_QUEUE = 64
+    ADMISSION_CLIENT_HEADER = os.environ.get('ADMISSION_CLIENT_HEADER') or None
+    # The buckets and slots are per process: they only limit a server running
+    # every request in one multithreaded process (app.run, asgi.py)
+    ADMISSION_SUPPORTED = True
+    # Reporting mode (utils/reporting.py): exports and sales reports are served
+    # from snapshots republished every REPORT_SNAPSHOT_INTERVAL seconds and
+    # never more than REPORT_MAX_STALENESS seconds old
+    REPORTING_MODE = os.environ.get('REPORTING_MODE', '').lower() in ('1', 'true', 'yes')
+    REPORT_SNAPSHOT_INTERVAL = float(os.environ.get('REPORT_SNAPSHOT_INTERVAL', 5.0))
+    REPORT_MAX_STALENESS = float(os.environ.get('REPORT_MAX_STALENESS', 30.0))
+    # Two-level item cache (utils/item_cache.py): per-process LRU budget in
+    # bytes (0 disables the cache) and the SQLite file shared between processes
+    ITEM_CACHE_MAX_BYTES = int(os.environ.get('ITEM_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+    ITEM_CACHE_FILE = DATA_DIR / 'item_cache.sqlite3'
+    # Effective-dated price and VAT-rate history (utils/pricing.py); the VAT
+    # rate applied before any scheduled change
+    PRICING_FILE = DATA_DIR / 'pricing_history.jsonl'
+    DEFAULT_VAT_RATE = 17.5
+    # Sequence-numbered log of inventory changes served by /api/changes
+    CHANGE_LOG_FILE = DATA_DIR / 'stock_changes.jsonl'
+    CHANGE_LOG_RETAIN = 100000
+
+    # Warehouses, each stored in its own shard file (stock_items.<name>.csv);
+    # the default warehouse is CSV_FILE itself and backs the /api/items routes.
+    # Branches get their own item cache (item_cache.<name>.sqlite3) and low
+    # stock list; price history and demand forecasts cover the default only
+    WAREHOUSES = [name.strip() for name in os.environ.get('WAREHOUSES', 'main').split(',') if name.strip()]
+    WAREHOUSE_DEFAULT = os.environ.get('WAREHOUSE_DEFAULT', 'main')
+
+    # fsync policy for data file writes: 'always', 'batched' or 'os' (see utils/atomic.py)
+    DURABILITY = os.environ.get('DURABILITY', 'always')
+
+    # Buffered sales writer: flush after this many rows or seconds (durability 'batched'/'os')
+    SALES_FLUSH_ROWS = 1000
+    SALES_FLUSH_INTERVAL = 1.0
+
+    # Stock file reader: 'csv' (parse everything) or 'mmap' (index lines, parse on demand)
+    STOCK_READER = os.environ.get('STOCK_READER', 'csv')
+
+    # Worker processes parsing large stock/sales files on cold loads (utils/parallel_csv.py);
+    # files under 32 MB are always parsed in-thread
+    PARALLEL_LOAD_WORKERS = int(os.environ.get('PARALLEL_LOAD_WORKERS', os.cpu_count() or 1))
+
+    # Worker processes for hash-partitioned /api/items listings (utils/partitioned.py);
+    # 0 runs listings in the request thread
+    CATALOG_PARTITIONS = int(os.environ.get('CATALOG_PARTITIONS', 0))
+
+    # Items below this quantity need reordering unless a SKU/brand override applies
+    REORDER_DEFAULT_THRESHOLD = 10
+
+    # Demand forecasting: exponential smoothing factor and supplier lead time
+    FORECAST_ALPHA = 0.3
+    FORECAST_LEAD_TIME_DAYS = 7
 
     # API configurations
     API_PREFIX = '/api'
@@ -34,9 +118,44 @@ class Config:
     # CORS settings
     CORS_HEADERS = 'Content-Type'
 
+    # Response compression (brotli is used when installed, otherwise gzip)
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 500  # bytes; smaller bodies are sent as-is
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_LEVEL = 4
+
+    # ASGI serving (asgi.py): blocking file I/O runs on this many threads,
+    # which also caps ADMISSION_MAX_CONCURRENT; mutating requests wait in a
+    # queue of this size for the single writer, sales first
+    ASGI_IO_WORKERS = 8
+    ASGI_WRITE_QUEUE_SIZE = 1000
+
+    # Server-sent events (/api/events): replay history, per-subscriber queue bound,
+    # subscriber limit and keep-alive interval
+    EVENTS_HISTORY_SIZE = 1000
+    EVENTS_QUEUE_SIZE = 500
+    EVENTS_MAX_SUBSCRIBERS = 1000
+    EVENTS_HEARTBEAT_SECONDS = 15
+    # Whether the Flask route itself streams /api/events. Each stream holds a
+    # thread for as long as the client stays connected, which only a threaded
+    # server can afford; asgi.py serves the stream on its event loop regardless
+    EVENTS_SYNC_STREAM = True
+
     # Logging configuration
     LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     LOG_FILE = LOG_DIR / 'app.log'
+    # 'text' lines or 'json' records carrying request IDs and trace fields
+    LOG_OUTPUT = os.environ.get('LOG_OUTPUT', 'text')
+    # Requests slower than this are logged as warnings with their phase trace
+    # (utils/tracing.py); 0 disables slow-request warnings
+    SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 500))
+
+    @classmethod
+    def init_app(cls, app):
+        """Hook for configuration-specific app setup."""
+        # Ensure directories exist (done here rather than at import time)
+        cls.DATA_DIR.mkdir(exist_ok=True)
+        cls.LOG_DIR.mkdir(exist_ok=True)
 
 class DevelopmentConfig(Config):
     """Development configuration."""
@@ -44,9 +163,14 @@ class DevelopmentConfig(Config):
     ENV = 'development'
 
 class ProductionConfig(Config):
-    """Production configuration."""
+    """Production configuration, served by the ASGI front end (asgi.py)."""
     ENV = 'production'
 
+    BIND = os.environ.get('BIND', '0.0.0.0:5000')
+    # Every request runs in the one asgi.py process, so admission control
+    # can protect sales from the start; ADMISSION_ENABLED=0 turns it off
+    ADMISSION_ENABLED = os.environ.get('ADMISSION_ENABLED', '1').lower() in ('1', 'true', 'yes')
+
     @classmethod
     def init_app(cls, app):
         Config.init_app(app)
@@ -57,6 +181,19 @@ class ProductionConfig(Config):
             # This removes the strict requirement while maintaining security
             os.environ['SECRET_KEY'] = cls.SECRET_KEY
 
+class PreforkConfig(ProductionConfig):
+    """Production configuration for gunicorn's prefork sync workers (wsgi.py)."""
+
+    # Preforking server settings (gunicorn.conf.py); WEB_CONCURRENCY overrides
+    WORKERS = int(os.environ.get('WEB_CONCURRENCY', (os.cpu_count() or 1) * 2 + 1))
+    # A stream would pin a sync worker until gunicorn's timeout kills it, and
+    # would miss the other workers' writes: serve /api/events through asgi.py
+    EVENTS_SYNC_STREAM = False
+    # Each sync worker would keep its own buckets and run one request at a
+    # time: admission control stays off (use asgi.py for it)
+    ADMISSION_ENABLED = False
+    ADMISSION_SUPPORTED = False
+
 class TestingConfig(Config):
     """Testing configuration."""
     TESTING = True
@@ -65,11 +202,19 @@ class TestingConfig(Config):
 
     # Use separate test database/files
     CSV_FILE = Config.DATA_DIR / 'test_stock_items.csv'
+    SALES_FILE = Config.DATA_DIR / 'test_sales_history.csv'
+    REORDER_THRESHOLDS_FILE = Config.DATA_DIR / 'test_reorder_thresholds.json'
+    STOCK_SNAPSHOT_FILE = Config.DATA_DIR / 'test_stock_items.snap'
+    IDEMPOTENCY_FILE = Config.DATA_DIR / 'test_idempotency_keys.sqlite3'
+    CHANGE_LOG_FILE = Config.DATA_DIR / 'test_stock_changes.jsonl'
+    PRICING_FILE = Config.DATA_DIR / 'test_pricing_history.jsonl'
+    ITEM_CACHE_FILE = Config.DATA_DIR / 'test_item_cache.sqlite3'
 
 # Configuration dictionary
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
+    'prefork': PreforkConfig,
     'testing': TestingConfig,
     'default': DevelopmentConfig
 }
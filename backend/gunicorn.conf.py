@@ -0,0 +1,65 @@
+# backend/gunicorn.conf.py
+
+"""
+Gunicorn settings for the prefork server (wsgi.py).
+
+The production entry point is asgi.py; this server is the alternative for
+deployments that rate-limit requests in front of it.
+
+The app is preloaded in the master (wsgi.py warms the caches) and forked
+into WEB_CONCURRENCY sync workers. Reload gracefully with `kill -HUP <master>`:
+new workers are forked from the warm master and old ones finish their
+in-flight requests within graceful_timeout. For a code upgrade use USR2
+followed by WINCH/QUIT on the old master.
+
+Sync workers serve one request at a time and are killed after `timeout`
+seconds, so they cannot hold server-sent event streams: /api/events
+answers 503 here (PreforkConfig.EVENTS_SYNC_STREAM). Route it to the
+ASGI front end (uvicorn asgi:application), which streams it on its event
+loop and sees every write made through it.
+
+Admission control (utils/admission.py) is off here too
+(PreforkConfig.ADMISSION_SUPPORTED): each worker would keep its own
+token buckets and concurrency slots, so clients would get WORKERS times
+the rate and the concurrency limits would never engage. It works in the
+single multithreaded process of the ASGI front end.
+"""
+
+import logging
+import os
+import time
+from config import PreforkConfig
+from utils.runtime import memory_usage, runtime_report
+
+wsgi_app = 'wsgi:application'
+bind = PreforkConfig.BIND
+workers = PreforkConfig.WORKERS
+worker_class = 'sync'
+preload_app = True
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers periodically so slow leaks cannot grow unbounded
+max_requests = 1000
+max_requests_jitter = 100
+
+logger = logging.getLogger('gunicorn.error')
+
+
+def when_ready(server):
+    """Log the master's cold-start time and memory once it can accept connections."""
+    report = runtime_report()
+    cold_start = report['cold_start_seconds'] or 0.0
+    logger.info(f"Master {report['pid']} ready: cold start {cold_start:.3f}s, "
+                f"memory {report['memory']}")
+
+
+def post_fork(server, worker):
+    """Remember when the worker was forked."""
+    worker.forked_at = time.perf_counter()
+
+
+def post_worker_init(worker):
+    """Log worker start-up time and how much memory it shares with the master."""
+    elapsed = time.perf_counter() - getattr(worker, 'forked_at', time.perf_counter())
+    logger.info(f"Worker {os.getpid()} booted in {elapsed:.3f}s, memory {memory_usage()}")
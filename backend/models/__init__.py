@@ -1,6 +1,14 @@
 # models/__init__.py
 
+from .registry import ITEM_TYPES, register_item_type, get_item_type, item_type_schemas
 from .stock_item import StockItem
 from .nav_sys import NavSys
 
-__all__ = ['StockItem', 'NavSys']
+__all__ = [
+    'StockItem',
+    'NavSys',
+    'ITEM_TYPES',
+    'register_item_type',
+    'get_item_type',
+    'item_type_schemas'
+]
@@ -6,18 +6,20 @@ from utils.exceptions import StockError
 
 logger = logging.getLogger(__name__)
 
-class NavSys(StockItem):
+class NavSys(StockItem, type_tag='NavSys'):
     """Navigation system stock item."""
 
+    columns = ('brand',)
+
     def __init__(self, stock_code: str, quantity: int, price: float, brand: str):
         """Initialize a navigation system item."""
         super().__init__(stock_code, quantity, price)
         try:
             self._validate_brand(brand)
             self._brand = brand
-            logger.info(f"Created new NavSys item: {stock_code}, brand: {brand}")
+            logger.info("Created new NavSys item: %s, brand: %s", stock_code, brand)
         except ValueError as e:
-            logger.error(f"Error setting brand: {str(e)}")
+            logger.error("Error setting brand: %s", e)
             raise StockError(f"Invalid brand: {str(e)}")
 
     def _validate_brand(self, brand: str) -> None:
@@ -30,6 +32,13 @@ class NavSys(StockItem):
         except UnicodeError:
             raise StockError("Invalid brand name encoding")
 
+    def _validate_columns(self) -> None:
+        """Validate the brand column of a loaded row."""
+        try:
+            self._validate_brand(self._brand)
+        except StockError as e:
+            raise ValueError(str(e))
+
     @property
     def brand(self) -> str:
         """Get nav system brand."""
@@ -41,9 +50,9 @@ class NavSys(StockItem):
         try:
             self._validate_brand(new_brand)
             self._brand = new_brand
-            logger.info(f"Updated brand for {self.stock_code} to {new_brand}")
+            logger.info("Updated brand for %s to %s", self.stock_code, new_brand)
         except ValueError as e:
-            logger.error(f"Error setting brand: {str(e)}")
+            logger.error("Error setting brand: %s", e)
             raise StockError(f"Invalid brand: {str(e)}")
 
     def get_stock_name(self) -> str:
@@ -0,0 +1,42 @@
+# models/registry.py
+
+from typing import Dict, Tuple, Type
+
+# Type tag (first CSV column) -> StockItem subclass; filled in as subclasses are defined
+ITEM_TYPES: Dict[str, Type] = {}
+
+
+def register_item_type(item_class: Type) -> Type:
+    """
+    Register a StockItem subclass under its type_tag.
+
+    Raises:
+        ValueError: If the tag is already taken by a different class
+    """
+    tag = item_class.type_tag
+    existing = ITEM_TYPES.get(tag)
+    if existing is not None and existing.__qualname__ != item_class.__qualname__:
+        raise ValueError(f"Item type tag '{tag}' already registered by {existing.__name__}")
+    ITEM_TYPES[tag] = item_class
+    return item_class
+
+
+def get_item_type(tag: str) -> Type:
+    """
+    Get the class registered for a type tag.
+
+    Raises:
+        ValueError: If no class is registered for the tag
+    """
+    try:
+        return ITEM_TYPES[tag]
+    except KeyError:
+        raise ValueError(f"Unknown item type: {tag}")
+
+
+def item_type_schemas() -> Dict[str, Tuple[str, ...]]:
+    """Get the full column schema of every registered item type."""
+    return {
+        tag: ('item_type', 'stock_code', 'quantity', 'price') + item_class.columns
+        for tag, item_class in ITEM_TYPES.items()
+    }
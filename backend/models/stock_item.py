@@ -2,6 +2,8 @@
 
 import logging
 from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+from .registry import register_item_type
 from utils.exceptions import StockError
 
 logger = logging.getLogger(__name__)
@@ -12,6 +14,83 @@ class StockItem(ABC):
     # Class variable shared by all instances
     _stock_category = "Car accessories"
 
+    # Tag written to the item_type column; set through the class keyword
+    # argument, e.g. class NavSys(StockItem, type_tag='NavSys')
+    type_tag: Optional[str] = None
+    # Effective-dated price and VAT lookups (utils.pricing.PriceBook); set
+    # through utils.pricing.install, None uses the standard rate
+    pricing = None
+    # Type-specific columns stored after stock_code, quantity and price;
+    # each maps to the instance attribute '_' + name
+    columns: Tuple[str, ...] = ()
+
+    def __init_subclass__(cls, type_tag: Optional[str] = None, **kwargs):
+        """Register subclasses that declare a type tag in the item type registry."""
+        super().__init_subclass__(**kwargs)
+        if type_tag is not None:
+            cls.type_tag = type_tag
+            register_item_type(cls)
+
+    @classmethod
+    def from_row(cls, row: List[str]) -> 'StockItem':
+        """
+        Build an item from a stock file row without going through __init__.
+
+        Applies the same checks as __init__ but skips its per-item logging,
+        which dominates the cost of loading large files.
+
+        Raises:
+            ValueError: If the row is malformed or holds invalid values
+        """
+        if len(row) < 4 + len(cls.columns):
+            raise ValueError("Invalid row format")
+        try:
+            quantity = int(row[2])
+            price = float(row[3])
+        except ValueError:
+            raise ValueError("Invalid quantity or price format")
+        return cls.from_values(row[1], quantity, price, row[4:4 + len(cls.columns)])
+
+    @classmethod
+    def from_values(cls, stock_code: str, quantity: int, price: float,
+                    columns: List[str]) -> 'StockItem':
+        """
+        Build an item from already parsed column values, as from_row does.
+
+        columns holds the type-specific columns, in the order of cls.columns.
+
+        Raises:
+            ValueError: If a value is invalid
+        """
+        if not stock_code:
+            raise ValueError("Stock code must be a non-empty string")
+        if quantity < 0:
+            raise ValueError("Quantity cannot be negative")
+        if price < 0:
+            raise ValueError("Price cannot be negative")
+
+        item = cls.__new__(cls)
+        item._stock_code = stock_code
+        item._quantity = quantity
+        item._price = price
+        for name, value in zip(cls.columns, columns):
+            setattr(item, '_' + name, value)
+        item._validate_columns()
+        return item
+
+    def _validate_columns(self) -> None:
+        """Validate type-specific column values after from_row; override in subclasses."""
+        pass
+
+    def to_row(self) -> list:
+        """Convert the item to a stock file row."""
+        return [
+            self.type_tag or type(self).__name__,
+            self._stock_code,
+            self._quantity,
+            self._price,
+        ] + [getattr(self, '_' + name) for name in self.columns]
+
     def __init__(self, stock_code: str, quantity: int, price: float):
         """
         Initialize a stock item.
@@ -29,9 +108,9 @@ class StockItem(ABC):
             self._stock_code = stock_code
             self._quantity = quantity
             self._price = price
-            logger.info(f"Created new stock item: {stock_code}")
+            logger.info("Created new stock item: %s", stock_code)
         except ValueError as e:
-            logger.error(f"Error creating stock item: {str(e)}")
+            logger.error("Error creating stock item: %s", e)
             raise StockError(f"Invalid parameters: {str(e)}")
 
     def _validate_init_params(self, stock_code: str, quantity: int, price: float):
@@ -66,9 +145,9 @@ class StockItem(ABC):
             if new_price <= 0:
                 raise ValueError("Price must be greater than 0")
             self._price = new_price
-            logger.info(f"Updated price to {new_price}")
+            logger.info("Updated price to %s", new_price)
         except (ValueError, TypeError) as e:
-            logger.error(f"Invalid price value: {str(e)}")
+            logger.error("Invalid price value: %s", e)
             raise ValueError(f"Invalid price value: {str(e)}")
 
 
@@ -88,9 +167,9 @@ class StockItem(ABC):
             if self._quantity + amount > 100:
                 raise ValueError("Stock cannot exceed 100 items")
             self._quantity += amount
-            logger.info(f"Increased stock for {self._stock_code} by {amount}")
+            logger.info("Increased stock for %s by %s", self._stock_code, amount)
         except ValueError as e:
-            logger.error(f"Error increasing stock: {str(e)}")
+            logger.error("Error increasing stock: %s", e)
             raise StockError(f"The error was: {str(e)}")
 
     def sell_stock(self, amount: int) -> bool:
@@ -112,19 +191,29 @@ class StockItem(ABC):
             if amount > self._quantity:
                 return False
             self._quantity -= amount
-            logger.info(f"Sold {amount} units of {self._stock_code}")
+            logger.info("Sold %s units of %s", amount, self._stock_code)
             return True
         except ValueError as e:
-            logger.error(f"Error selling stock: {str(e)}")
+            logger.error("Error selling stock: %s", e)
             raise StockError(f"The error was: {str(e)}")
 
-    def get_VAT(self) -> float:
-        """Return standard VAT rate."""
-        return 17.5
+    def get_VAT(self, at=None) -> float:
+        """
+        Return the VAT rate in effect at `at` (default now).
 
-    def get_price_with_VAT(self) -> float:
-        """Calculate price including VAT."""
-        return self.price * (1 + self.get_VAT() / 100)
+        Rates come from the installed price book (utils.pricing); without
+        one the standard rate of 17.5 applies.
+        """
+        if StockItem.pricing is None:
+            return 17.5
+        return StockItem.pricing.vat_rate(self._stock_code, at)
+
+    def get_price_with_VAT(self, at=None) -> float:
+        """Calculate price including VAT, at the price and rate in effect at `at` (default now)."""
+        price = self.price
+        if at is not None and StockItem.pricing is not None:
+            price = StockItem.pricing.price_at(self._stock_code, at, default=price)
+        return price * (1 + self.get_VAT(at) / 100)
 
     def get_stock_name(self) -> str:
         """Get stock name - can be overridden by subclasses."""
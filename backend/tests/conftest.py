@@ -6,3 +6,34 @@ import os
 
 # Add the parent directory to PYTHONPATH
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Testing app whose stock and sales files live in a temporary directory."""
+    from app import create_app, get_file_handler
+    from models.nav_sys import NavSys
+    from utils.pricing import install as install_price_book
+
+    app = create_app('testing')
+    app.config['CSV_FILE'] = tmp_path / 'stock_items.csv'
+    app.config['SALES_FILE'] = tmp_path / 'sales_history.csv'
+    app.config['REORDER_THRESHOLDS_FILE'] = tmp_path / 'reorder_thresholds.json'
+    app.config['STOCK_SNAPSHOT_FILE'] = tmp_path / 'stock_items.snap'
+    app.config['IDEMPOTENCY_FILE'] = tmp_path / 'idempotency_keys.sqlite3'
+    app.config['CHANGE_LOG_FILE'] = tmp_path / 'stock_changes.jsonl'
+    app.config['PRICING_FILE'] = tmp_path / 'pricing_history.jsonl'
+    app.config['ITEM_CACHE_FILE'] = tmp_path / 'item_cache.sqlite3'
+    with app.app_context():
+        file_handler = get_file_handler()
+        for i, brand in enumerate(['TomTom', 'Garmin', 'GeoVision'] * 5):
+            file_handler.save_item(NavSys(f"NS{i + 100}", 5 + i * 5, 100.0 + i, brand))
+    yield app
+    # The app's price book is process-wide through StockItem.pricing
+    install_price_book(None)
+
+
+@pytest.fixture
+def client(app):
+    with app.test_client() as client:
+        yield client
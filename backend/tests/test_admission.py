@@ -0,0 +1,142 @@
+import threading
+import time
+import pytest
+from flask import Flask
+from utils.admission import AdmissionController, AdmissionRejected, ConcurrencyLimiter, TokenBuckets
+from utils.exceptions import ValidationError
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class TestAdmission:
+    """Test suite for admission control."""
+
+    def test_token_buckets(self):
+        """TC-AC-01: Buckets allow a burst, then refuse with the time until refilled."""
+        try:
+            buckets = TokenBuckets(rate=10.0, burst=20.0)
+            assert buckets.take('a', 10) == 0 and buckets.take('a', 10) == 0
+            assert 0.9 < buckets.take('a', 10) <= 1.0
+            # Clients have their own buckets
+            assert buckets.take('b', 1) == 0
+            assert buckets.take('b', 21) == float('inf')
+
+            buckets.max_clients = 2
+            buckets.take('c', 1)
+            assert buckets.clients() == 2
+
+            logger.info("Token bucket tests passed")
+        except Exception as e:
+            logger.error(f"Token bucket tests failed: {str(e)}")
+            raise
+
+    def test_priority_queue(self):
+        """TC-AC-02: Free slots go to the highest priority waiter; class limits hold."""
+        try:
+            limiter = ConcurrencyLimiter(max_concurrent=1, class_limits={'report': 1})
+            limiter.acquire('read', 1.0)
+            started = []
+
+            def run(traffic_class):
+                limiter.acquire(traffic_class, 5.0)
+                started.append(traffic_class)
+                limiter.release(traffic_class)
+
+            threads = []
+            for traffic_class in ('report', 'read', 'checkout'):
+                thread = threading.Thread(target=run, args=(traffic_class,))
+                thread.start()
+                threads.append(thread)
+                while limiter.queued[traffic_class] == 0:
+                    time.sleep(0.01)
+            limiter.release('read')
+            for thread in threads:
+                thread.join(timeout=5)
+            assert started == ['checkout', 'read', 'report']
+            assert limiter.running == 0 and not any(limiter.queued.values())
+
+            # TC-AC-03: A report over its class limit times out; a sale still starts
+            limiter.max_concurrent = 4
+            limiter.acquire('report', 1.0)
+            try:
+                limiter.acquire('report', 0.05)
+                assert False, "report over its class limit was admitted"
+            except AdmissionRejected as e:
+                assert e.retry_after > 0
+            assert limiter.acquire('checkout', 0.05) == 0.0
+
+            logger.info("Priority queue tests passed")
+        except Exception as e:
+            logger.error(f"Priority queue tests failed: {str(e)}")
+            raise
+
+    def test_admission_endpoints(self, app, client):
+        """TC-AC-04: Overloaded clients get 429 with Retry-After while sales keep going."""
+        try:
+            settings = client.put('/api/admin/admission', json={
+                'enabled': True, 'rate': 1, 'burst': 15}).get_json()['settings']
+            assert settings['enabled'] and settings['class_limits'] == {'report': 2}
+
+            # An export costs 10 tokens: the second one empties the bucket
+            assert client.get('/api/items/export').status_code == 200
+            refused = client.get('/api/items/export')
+            assert refused.status_code == 429 and int(refused.headers['Retry-After']) >= 5
+            assert client.post('/api/items/NS100/sell', json={'quantity': 1}).status_code == 200
+            # Probes and admin endpoints are never limited
+            assert client.get('/api/health').status_code == 200
+
+            stats = client.get('/api/admin/admission').get_json()
+            assert stats['classes']['report']['rate_limited'] == 1
+            assert stats['classes']['checkout']['admitted'] == 1
+            assert stats['running'] == 0
+
+            # TC-AC-05: Reports past their concurrency limit are shed, sales are not
+            client.delete('/api/admin/admission')
+            controller = app.extensions['admission_controller']
+            controller.configure(rate=1000, burst=1000, class_limits={'report': 1})
+            controller.queue_timeouts['report'] = 0.05
+            controller.limiter.acquire('report', 1.0)
+            try:
+                shed = client.get('/api/sales/export')
+                assert shed.status_code == 429 and 'Retry-After' in shed.headers
+                assert client.post('/api/items/NS100/sell', json={'quantity': 1}).status_code == 200
+            finally:
+                controller.limiter.release('report')
+            assert client.get('/api/sales/export').status_code == 200
+            assert client.get('/api/admin/admission').get_json()['classes']['report']['shed'] == 1
+
+            assert client.put('/api/admin/admission', json={'class_limits': {'bulk': 1}}).status_code == 400
+
+            logger.info("Admission endpoint tests passed")
+        except Exception as e:
+            logger.error(f"Admission endpoint tests failed: {str(e)}")
+            raise
+
+    def test_refused_under_prefork_workers(self, app, client):
+        """TC-AC-06: Admission control cannot be enabled where each worker process has its own limits."""
+        try:
+            flask_app = Flask(__name__)
+            flask_app.config.update(ADMISSION_ENABLED=True, ADMISSION_SUPPORTED=False)
+            controller = AdmissionController(flask_app)
+            assert not controller.enabled and not controller.settings()['supported']
+            with pytest.raises(ValidationError):
+                controller.configure(enabled=True)
+            assert controller.configure(rate=10)['rate'] == 10.0
+
+            app.extensions['admission_controller'].supported = False
+            response = client.put('/api/admin/admission', json={'enabled': True})
+            assert response.status_code == 400 and 'asgi.py' in response.get_json()['error']
+            assert not client.get('/api/admin/admission').get_json()['settings']['enabled']
+
+            # Admission control is on behind asgi.py in production, and off under gunicorn
+            from config import PreforkConfig, ProductionConfig
+            for config_class, supported in ((ProductionConfig, True), (PreforkConfig, False)):
+                flask_app = Flask(__name__)
+                flask_app.config.from_object(config_class)
+                controller = AdmissionController(flask_app)
+                assert controller.supported is supported and controller.enabled is supported
+
+            logger.info("Prefork admission tests passed")
+        except Exception as e:
+            logger.error(f"Prefork admission tests failed: {str(e)}")
+            raise
@@ -0,0 +1,116 @@
+import pytest
+from utils.analytics import SalesAnalytics
+from utils.exceptions import ValidationError
+from utils.sale_handler import SalesHandler
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SALES = [
+    ('2024-01-01', 'NS101', 2, 100.0, 'TomTom'),
+    ('2024-01-01', 'NS102', 1, 250.0, 'Garmin'),
+    ('2024-01-03', 'NS101', 4, 100.0, 'TomTom'),
+    ('2024-02-10', 'NS102', 3, 250.0, 'Garmin'),
+]
+
+@pytest.fixture
+def sales_handler(tmp_path):
+    handler = SalesHandler(str(tmp_path / "sales_history.csv"))
+    for date, code, quantity, price, brand in SALES:
+        with open(handler.file_path, 'a', newline='') as file:
+            file.write(f"{date},{code},{quantity},{price},{brand},{quantity * price}\n")
+    return handler
+
+class TestSalesAnalytics:
+    """Test suite for the pandas sales analytics engine."""
+
+    def test_sales_history(self, sales_handler):
+        """TC-AN-01: History keeps the existing response shape."""
+        try:
+            history = sales_handler.get_sales_history()
+            assert history['daily'][0] == {'date': '2024-01-01', 'sales': 3, 'revenue': 450.0}
+            assert [row['date'] for row in history['daily']] == ['2024-01-01', '2024-01-03', '2024-02-10']
+            assert history['by_brand'] == [
+                {'brand': 'TomTom', 'sales': 6, 'revenue': 600.0},
+                {'brand': 'Garmin', 'sales': 4, 'revenue': 1000.0},
+            ]
+
+            summary = sales_handler.get_sales_summary()
+            assert summary['total_sales'] == 10
+            assert summary['top_brands'][0]['brand'] == 'Garmin'
+
+            # Brands and codes that read as NA in pandas are kept
+            sales_handler.record_sale('NA', 1, 10.0, 'N/A')
+            history = sales_handler.get_sales_history()
+            assert {'brand': 'N/A', 'sales': 1, 'revenue': 10.0} in history['by_brand']
+            assert 'NA' in [row['stock_code'] for row in sales_handler.analytics.sku_velocity()]
+
+            logger.info("Sales history tests passed")
+        except Exception as e:
+            logger.error(f"Sales history tests failed: {str(e)}")
+            raise
+
+    def test_reports(self, sales_handler):
+        """TC-AN-02: Period, pivot, velocity and moving average reports."""
+        try:
+            analytics = sales_handler.analytics
+
+            months = analytics.revenue_by_period('month')
+            assert [(row['period'], row['revenue']) for row in months] == [
+                ('2024-01', 850.0), ('2024-02', 750.0)
+            ]
+            with pytest.raises(ValidationError):
+                analytics.revenue_by_period('decade')
+
+            pivot = analytics.brand_month_pivot()
+            assert pivot['months'] == ['2024-01', '2024-02']
+            assert pivot['brands']['Garmin'] == [250.0, 750.0]
+
+            velocity = {row['stock_code']: row for row in analytics.sku_velocity()}
+            assert velocity['NS101']['units_per_day'] == 2.0
+
+            averages = analytics.moving_average(2)
+            assert averages[1] == {'date': '2024-01-02', 'revenue': 0.0, 'moving_average': 225.0}
+
+            logger.info("Report tests passed")
+        except Exception as e:
+            logger.error(f"Report tests failed: {str(e)}")
+            raise
+
+    def test_cache_follows_data_version(self, sales_handler):
+        """TC-AN-03: Reports are cached until a sale changes the file."""
+        try:
+            analytics = sales_handler.analytics
+            first = analytics.frame()
+            assert analytics.frame() is first
+
+            sales_handler.record_sale('NS103', 1, 50.0, 'GeoVision')
+            assert analytics.frame() is not first
+            assert analytics.summary()['total_sales'] == 11
+
+            # A report built from a frame replaced mid-build is not cached for the new one
+            def build(frame):
+                sales_handler.record_sale('NS103', 1, 50.0, 'GeoVision')
+                analytics.frame()
+                return len(frame)
+            assert analytics._cached(('rows',), build) == 5
+            assert analytics._cached(('rows',), lambda frame: len(frame)) == 6
+
+            logger.info("Analytics cache tests passed")
+        except Exception as e:
+            logger.error(f"Analytics cache tests failed: {str(e)}")
+            raise
+
+    def test_report_endpoint(self, client):
+        """TC-AN-04: Report endpoint dispatches and validates."""
+        try:
+            assert client.get('/api/sales/reports/velocity').status_code == 200
+            assert client.get('/api/sales/reports/revenue?period=week').status_code == 200
+            assert client.get('/api/sales/reports/revenue?period=year').status_code == 400
+            assert client.get('/api/sales/reports/unknown').status_code == 404
+            assert client.get('/api/sales/summary').status_code == 200
+
+            logger.info("Report endpoint tests passed")
+        except Exception as e:
+            logger.error(f"Report endpoint tests failed: {str(e)}")
+            raise
@@ -0,0 +1,100 @@
+import gzip
+import json
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class TestItemsPayload:
+    """Test suite for item listing projection and response compression."""
+
+    def test_field_projection(self, client):
+        """TC-PL-01: Only requested fields are returned."""
+        try:
+            response = client.get('/api/items?fields=stock_code,quantity')
+            assert response.status_code == 200
+            data = response.get_json()
+            for item in data['items']:
+                assert set(item) <= {'stock_code', 'quantity'}
+
+            # TC-PL-02: Unknown fields are rejected
+            response = client.get('/api/items?fields=stock_code,colour')
+            assert response.status_code == 400
+            assert 'colour' in response.get_json()['error']
+
+            logger.info("Field projection tests passed")
+        except Exception as e:
+            logger.error(f"Field projection tests failed: {str(e)}")
+            raise
+
+    def test_exclude_sections(self, client):
+        """TC-PL-03: Statistics and brands can be omitted."""
+        try:
+            response = client.get('/api/items?exclude=statistics,available_brands')
+            data = response.get_json()
+            assert 'statistics' not in data
+            assert 'available_brands' not in data
+            assert 'pagination' in data
+
+            response = client.get('/api/items')
+            data = response.get_json()
+            assert 'statistics' in data
+            assert 'available_brands' in data
+
+            # TC-PL-04: Unknown sections are rejected
+            response = client.get('/api/items?exclude=pagination')
+            assert response.status_code == 400
+
+            logger.info("Exclude section tests passed")
+        except Exception as e:
+            logger.error(f"Exclude section tests failed: {str(e)}")
+            raise
+
+    def test_gzip_compression(self, app, client):
+        """TC-PL-05: Large responses are gzip compressed when accepted."""
+        try:
+            min_size = app.config['COMPRESS_MIN_SIZE']
+            app.config['COMPRESS_MIN_SIZE'] = 0
+            plain = client.get('/api/items?per_page=100')
+            compressed = client.get('/api/items?per_page=100',
+                                    headers={'Accept-Encoding': 'gzip'})
+            small = client.get('/api/items?per_page=1&fields=stock_code',
+                               headers={'Accept-Encoding': 'gzip'})
+            app.config['COMPRESS_MIN_SIZE'] = min_size
+            small_again = client.get('/api/items?per_page=1&fields=stock_code&exclude=statistics,available_brands',
+                                     headers={'Accept-Encoding': 'gzip'})
+
+            assert 'Content-Encoding' not in plain.headers
+            assert compressed.headers['Content-Encoding'] in ('gzip', 'br')
+            if compressed.headers['Content-Encoding'] == 'gzip':
+                assert json.loads(gzip.decompress(compressed.data)) == plain.get_json()
+            assert 'Accept-Encoding' in compressed.headers.get('Vary', '')
+
+            # TC-PL-06: Bodies below the threshold are not compressed
+            assert small.headers.get('Content-Encoding') == 'gzip'
+            assert 'Content-Encoding' not in small_again.headers
+
+            logger.info("Compression tests passed")
+        except Exception as e:
+            logger.error(f"Compression tests failed: {str(e)}")
+            raise
+
+class TestProbes:
+    """Test suite for health and readiness endpoints."""
+
+    def test_health_and_ready(self, client):
+        """TC-PR-01: Probes report liveness, readiness and memory figures."""
+        try:
+            response = client.get('/api/health')
+            assert response.status_code == 200
+            assert response.get_json()['status'] == 'ok'
+
+            response = client.get('/api/ready')
+            assert response.status_code == 200
+            data = response.get_json()
+            assert data['status'] == 'ready'
+            assert data['runtime']['memory']['max_rss_kb'] > 0
+
+            logger.info("Probe tests passed")
+        except Exception as e:
+            logger.error(f"Probe tests failed: {str(e)}")
+            raise
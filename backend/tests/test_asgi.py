@@ -0,0 +1,207 @@
+import asyncio
+import json
+import logging
+import threading
+import pytest
+from asgi import AsgiStockApp
+from utils.exceptions import ValidationError
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+async def call(asgi_app, method, path, body=b'', query=b''):
+    """Drive one request through the ASGI app and collect the response."""
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'query_string': query,
+        'headers': [(b'content-type', b'application/json')],
+    }
+    await asgi_app(scope, receive, send)
+    status = sent[0]['status']
+    payload = b''.join(message.get('body', b'') for message in sent[1:])
+    return status, payload
+
+class TestAsgiApp:
+    """Test suite for the ASGI entry point."""
+
+    def test_read_and_write_routes(self, app):
+        """TC-AS-01: Reads and queued writes reach the Flask handlers."""
+        async def scenario():
+            asgi_app = AsgiStockApp(app, io_workers=2)
+            await asgi_app.startup()
+            try:
+                status, payload = await call(asgi_app, 'GET', '/api/items', query=b'per_page=2')
+                assert status == 200
+                assert 'pagination' in json.loads(payload)
+
+                # Writes go through the single writer queue
+                status, payload = await call(
+                    asgi_app, 'PUT', '/api/items/NO-SUCH-ITEM',
+                    body=json.dumps({'price': 10}).encode()
+                )
+                assert status == 404
+                assert asgi_app._write_queue.qsize() == 0
+            finally:
+                await asgi_app.shutdown()
+
+        try:
+            asyncio.run(scenario())
+            logger.info("ASGI route tests passed")
+        except Exception as e:
+            logger.error(f"ASGI route tests failed: {str(e)}")
+            raise
+
+    def test_concurrent_requests(self, app):
+        """TC-AS-02: Many concurrent clients share a small thread pool."""
+        async def scenario():
+            asgi_app = AsgiStockApp(app, io_workers=2)
+            await asgi_app.startup()
+            try:
+                results = await asyncio.gather(*[
+                    call(asgi_app, 'GET', '/api/sales/history') for _ in range(20)
+                ])
+                assert all(status == 200 for status, _ in results)
+                assert asgi_app._executor._max_workers == 2
+            finally:
+                await asgi_app.shutdown()
+
+        try:
+            asyncio.run(scenario())
+            logger.info("ASGI concurrency tests passed")
+        except Exception as e:
+            logger.error(f"ASGI concurrency tests failed: {str(e)}")
+            raise
+
+    def test_priority_writes_and_admission(self, app):
+        """TC-AS-03: Queued sales are written before reprices; admission runs before the pool."""
+        async def scenario():
+            asgi_app = AsgiStockApp(app, io_workers=2)
+            await asgi_app.startup()
+            gate = threading.Event()
+            order = []
+            call_wsgi = asgi_app._call_wsgi
+
+            def gated_call(environ):
+                order.append(environ['PATH_INFO'])
+                if len(order) == 1:
+                    gate.wait(5)
+                return call_wsgi(environ)
+
+            asgi_app._call_wsgi = gated_call
+            try:
+                # The first write holds the writer while three more queue behind it
+                first = asyncio.create_task(call(asgi_app, 'POST', '/api/items/NS100/sell',
+                                                 body=json.dumps({'quantity': 1}).encode()))
+                while not order:
+                    await asyncio.sleep(0.01)
+                queued = [
+                    asyncio.create_task(call(asgi_app, 'POST', '/api/items/reprice',
+                                             body=json.dumps({'rule': {'uplift_percent': 1}}).encode())),
+                    asyncio.create_task(call(asgi_app, 'PUT', '/api/items/NS101',
+                                             body=json.dumps({'price': 10}).encode())),
+                    asyncio.create_task(call(asgi_app, 'POST', '/api/items/NS102/sell',
+                                             body=json.dumps({'quantity': 1}).encode())),
+                ]
+                while asgi_app._write_queue.qsize() < 3:
+                    await asyncio.sleep(0.01)
+                gate.set()
+                results = await asyncio.gather(first, *queued)
+                assert [status for status, _ in results] == [200] * 4
+                assert order == ['/api/items/NS100/sell', '/api/items/NS102/sell',
+                                 '/api/items/NS101', '/api/items/reprice']
+
+                # Admitted requests never outnumber the pool threads
+                controller = app.extensions['admission_controller']
+                assert controller.settings()['max_concurrent'] == 2
+                with pytest.raises(ValidationError):
+                    controller.configure(max_concurrent=3)
+
+                # A report over its class limit is shed on the loop, without a pool thread
+                controller.configure(enabled=True, class_limits={'report': 1})
+                controller.queue_timeouts['report'] = 0.05
+                controller.limiter.acquire('report', 1.0)
+                order.clear()
+                try:
+                    status, _ = await call(asgi_app, 'GET', '/api/sales/export')
+                    assert status == 429 and order == []
+                    status, _ = await call(asgi_app, 'POST', '/api/items/NS100/sell',
+                                           body=json.dumps({'quantity': 1}).encode())
+                    assert status == 200
+                finally:
+                    controller.limiter.release('report')
+                assert controller.stats()['running'] == 0
+                assert controller.stats()['classes']['checkout']['admitted'] == 1
+            finally:
+                gate.set()
+                await asgi_app.shutdown()
+
+        try:
+            asyncio.run(scenario())
+            logger.info("ASGI priority and admission tests passed")
+        except Exception as e:
+            logger.error(f"ASGI priority and admission tests failed: {str(e)}")
+            raise
+
+    def test_lifespan(self, app, caplog):
+        """TC-AS-04: The pool and writer live from lifespan startup to shutdown."""
+        async def scenario():
+            asgi_app = AsgiStockApp(app, io_workers=2)
+            messages = asyncio.Queue()
+            sent = []
+
+            async def send(message):
+                sent.append(message['type'])
+
+            await messages.put({'type': 'lifespan.startup'})
+            lifespan = asyncio.create_task(asgi_app({'type': 'lifespan'}, messages.get, send))
+            while not sent:
+                await asyncio.sleep(0.01)
+            assert sent == ['lifespan.startup.complete']
+            status, _ = await call(asgi_app, 'GET', '/api/health')
+            assert status == 200
+            assert 'ASGI app stopped' not in caplog.text
+
+            await messages.put({'type': 'lifespan.shutdown'})
+            await lifespan
+            assert sent[-1] == 'lifespan.shutdown.complete'
+            assert asgi_app._executor is None
+
+        try:
+            with caplog.at_level(logging.INFO, logger='asgi'):
+                asyncio.run(scenario())
+            assert caplog.text.count('ASGI app stopped') == 1
+            logger.info("ASGI lifespan tests passed")
+        except Exception as e:
+            logger.error(f"ASGI lifespan tests failed: {str(e)}")
+            raise
+
+    def test_warm_startup(self, app):
+        """TC-AS-05: A warm start recompacts the stale inventory snapshot before serving."""
+        from app import get_file_handler
+
+        async def scenario():
+            asgi_app = AsgiStockApp(app, io_workers=1, warm=True)
+            await asgi_app.startup()
+            try:
+                status, _ = await call(asgi_app, 'GET', '/api/items')
+                assert status == 200
+            finally:
+                await asgi_app.shutdown()
+
+        try:
+            asyncio.run(scenario())
+            assert app.config['STOCK_SNAPSHOT_FILE'].exists()
+            with app.app_context():
+                assert not get_file_handler().refresh_snapshot()
+            logger.info("ASGI warm startup tests passed")
+        except Exception as e:
+            logger.error(f"ASGI warm startup tests failed: {str(e)}")
+            raise
@@ -0,0 +1,60 @@
+import os
+import pytest
+from models.nav_sys import NavSys
+from utils.atomic import atomic_write, flush_batched
+from utils.exceptions import ValidationError
+from utils.file_handler import StockFileHandler
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class TestAtomicWrite:
+    """Test suite for crash-safe file writes."""
+
+    def test_replace_or_keep(self, tmp_path):
+        """TC-AW-01: A write either fully replaces the file or leaves it untouched."""
+        try:
+            path = tmp_path / "data.csv"
+            path.write_text("old\n")
+            os.chmod(path, 0o640)
+
+            with pytest.raises(RuntimeError):
+                with atomic_write(path) as file:
+                    file.write("partial")
+                    raise RuntimeError("crash mid-write")
+            assert path.read_text() == "old\n"
+            assert os.listdir(tmp_path) == ["data.csv"]
+
+            for durability in ('always', 'batched', 'os'):
+                with atomic_write(path, durability=durability) as file:
+                    file.write(f"new {durability}\n")
+                assert path.read_text() == f"new {durability}\n"
+            flush_batched()
+            assert os.stat(path).st_mode & 0o777 == 0o640
+
+            with pytest.raises(ValidationError):
+                with atomic_write(path, durability='sometimes'):
+                    pass
+
+            logger.info("Atomic write tests passed")
+        except Exception as e:
+            logger.error(f"Atomic write tests failed: {str(e)}")
+            raise
+
+    def test_reader_keeps_consistent_file(self, tmp_path):
+        """TC-AW-02: A reader opened before a save still sees the complete old file."""
+        try:
+            file_handler = StockFileHandler(str(tmp_path / "stock_items.csv"), durability='os')
+            file_handler.save_item(NavSys("NS101", 10, 199.99, "TomTom"))
+
+            with open(file_handler.filename, 'r', encoding='utf-8') as reader:
+                file_handler.save_item(NavSys("NS102", 20, 99.99, "Garmin"))
+                assert len(reader.read().splitlines()) == 2
+
+            assert [row[1] for row in file_handler.load_all_items()] == ["NS101", "NS102"]
+            assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+            logger.info("Atomic reader consistency tests passed")
+        except Exception as e:
+            logger.error(f"Atomic reader consistency tests failed: {str(e)}")
+            raise
@@ -0,0 +1,123 @@
+from utils.change_log import ChangeLog, classify_change
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class TestChangeLog:
+    """Test suite for the inventory change feed."""
+
+    def test_log_persistence_and_retention(self, tmp_path):
+        """TC-CL-01: Records are classified, survive a restart and are compacted."""
+        try:
+            assert classify_change(['NavSys', 'NS1', '8', '10.0', 'Garmin'],
+                                   ['NavSys', 'NS1', '10', '10.0', 'Garmin']) == \
+                ('sell', {'quantity': [10, 8]})
+            assert classify_change(['NavSys', 'NS1', '12', '11.0', 'Garmin'],
+                                   ['NavSys', 'NS1', '10', '10.0', 'Garmin'])[0] == 'update'
+            assert classify_change(['NavSys', 'NS1', '10', '10.0', 'Garmin'],
+                                   ['NavSys', 'NS1', '10', '10.0', 'Garmin']) == (None, {})
+
+            path = tmp_path / "changes.jsonl"
+            log = ChangeLog(str(path), retain=3)
+            for i in range(5):
+                log.append('restock', f"NS{i}", None)
+            records, has_more = log.read(since=1, limit=2)
+            assert [record['seq'] for record in records] == [2, 3]
+            assert has_more
+
+            # TC-CL-02: A torn final record is dropped on load
+            log.close()
+            with open(path, 'ab') as file:
+                file.write(b'{"seq":6,"op"')
+            log = ChangeLog(str(path), retain=3)
+            assert log.last_seq == 5
+            assert log.append('sell', 'NS9', None)['seq'] == 6
+
+            # TC-CL-03: Compaction drops old positions, which must resync
+            assert log.first_seq == 4
+            assert log.read(since=1) is None
+            assert [record['seq'] for record in log.read(since=3)[0]] == [4, 5, 6]
+            assert log.read(since=7) is None
+            log.close()
+
+            logger.info("Change log tests passed")
+        except Exception as e:
+            logger.error(f"Change log tests failed: {str(e)}")
+            raise
+
+    def test_shared_between_processes(self, tmp_path):
+        """TC-CL-05: Processes appending to one log keep its sequence contiguous."""
+        try:
+            import multiprocessing
+
+            path = str(tmp_path / "changes.jsonl")
+            # Created before the fork, as wsgi.py does in the gunicorn master
+            inherited = ChangeLog(path, retain=1000)
+            inherited.append('add', 'NS0', None)
+
+            def append(worker):
+                for i in range(20):
+                    inherited.append('restock', f"NS{worker}-{i}", None)
+
+            context = multiprocessing.get_context('fork')
+            workers = [context.Process(target=append, args=(worker,)) for worker in range(3)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join(timeout=30)
+                assert worker.exitcode == 0
+
+            reloaded = ChangeLog(path, retain=1000)
+            assert reloaded.last_seq == 61
+            # The parent sees the workers' records and continues after them
+            assert inherited.append('sell', 'NS0', None)['seq'] == 62
+            records, _ = reloaded.read(since=0, limit=100)
+            assert [record['seq'] for record in records] == list(range(1, 63))
+
+            # A log compacted by one process is re-indexed by the others
+            small = ChangeLog(path, retain=30)
+            small.append('sell', 'NS1', None)
+            assert small.first_seq > 1
+            assert reloaded.read(since=0) is None
+            assert reloaded.append('sell', 'NS2', None)['seq'] == 64
+            reloaded.close()
+            small.close()
+            inherited.close()
+
+            logger.info("Shared change log tests passed")
+        except Exception as e:
+            logger.error(f"Shared change log tests failed: {str(e)}")
+            raise
+
+    def test_changes_endpoint(self, client):
+        """TC-CL-04: Mutations through the API appear as incremental changes."""
+        try:
+            export = client.get('/api/items/export')
+            since = int(export.headers['X-Change-Seq'])
+            assert since == 15  # The fixture's adds
+
+            client.post('/api/items/NS101/sell', json={'quantity': 2})
+            client.put('/api/items/NS102', json={'price': 150.0})
+            client.put('/api/items/NS103', json={'quantity': 5, 'brand': 'Garmin'})
+            client.delete('/api/items/NS104')
+
+            data = client.get(f'/api/changes?since={since}').get_json()
+            assert [change['op'] for change in data['changes']] == \
+                ['sell', 'price_change', 'update', 'delete']
+            assert data['changes'][0]['item']['quantity'] == 8
+            assert data['changes'][1]['changes'] == {'price': [102.0, 150.0]}
+            assert data['changes'][3]['item'] is None
+            assert data['next_since'] == data['last_seq'] == since + 4
+            assert not data['has_more']
+
+            page = client.get(f'/api/changes?since={since}&limit=1').get_json()
+            assert page['has_more'] and page['next_since'] == since + 1
+            assert client.get(f"/api/changes?since={data['next_since']}").get_json()['changes'] == []
+
+            assert client.get('/api/changes?since=999').status_code == 410
+            assert client.get('/api/changes?since=x').status_code == 400
+
+            logger.info("Changes endpoint tests passed")
+        except Exception as e:
+            logger.error(f"Changes endpoint tests failed: {str(e)}")
+            raise
@@ -0,0 +1,148 @@
+import asyncio
+import json
+import pytest
+from asgi import AsgiStockApp
+from utils.events import EventBus
+from utils.exceptions import CapacityError
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+def parse_events(chunks):
+    """Split SSE bytes into (id, event, data) tuples, skipping comments and retry lines."""
+    events = []
+    for block in b''.join(chunks).decode('utf-8').split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines()
+                      if ': ' in line and not line.startswith(':'))
+        if 'event' in fields:
+            events.append((int(fields['id']), fields['event'], json.loads(fields['data'])))
+    return events
+
+class TestEventBus:
+    """Test suite for the live event stream."""
+
+    def test_publish_resume_and_backpressure(self):
+        """TC-EV-01: Subscribers get events in order and can resume from an ID."""
+        try:
+            bus = EventBus(history_size=3, max_queue=2, max_subscribers=2)
+            live = bus.subscribe()
+            for n in range(2):
+                bus.publish('sale_recorded', {'n': n})
+            assert [event for _, _, event in parse_events(live.drain())] == [{'n': 0}, {'n': 1}]
+
+            # TC-EV-02: Resuming replays only the missed events still in history
+            for n in range(2, 5):
+                bus.publish('sale_recorded', {'n': n})
+            resumed = bus.subscribe(last_event_id=3)
+            assert [event_id for event_id, _, _ in parse_events(resumed.drain())] == [4, 5]
+            resumed.close()
+
+            stale = bus.subscribe(last_event_id=0)
+            assert parse_events(stale.drain())[0][1] == 'reset'
+            stale.close()
+
+            # TC-EV-03: A subscriber that falls behind is disconnected, not waited for
+            assert live.drain()
+            for n in range(3):
+                bus.publish('sale_recorded', {'n': n})
+            assert live.closed
+            assert bus.subscriber_count() == 0
+
+            bus.subscribe()
+            bus.subscribe()
+            with pytest.raises(CapacityError):
+                bus.subscribe()
+
+            logger.info("Event bus tests passed")
+        except Exception as e:
+            logger.error(f"Event bus tests failed: {str(e)}")
+            raise
+
+    def test_event_stream_endpoint(self, app, client):
+        """TC-EV-04: Mutations are streamed to connected clients."""
+        try:
+            app.config['EVENTS_HEARTBEAT_SECONDS'] = 0.05
+            response = client.get('/api/events', buffered=False)
+            assert response.status_code == 200
+            assert response.mimetype == 'text/event-stream'
+            stream = iter(response.response)
+            assert next(stream) == b'retry: 3000\n\n'
+
+            client.post('/api/items/NS101/sell', json={'quantity': 2})
+            events = parse_events([next(stream), next(stream)])
+            assert [event_type for _, event_type, _ in events] == ['item_changed', 'sale_recorded']
+            assert events[0][2]['item']['quantity'] == 8
+            assert events[1][2]['stock_code'] == 'NS101'
+            assert next(stream) == b': keepalive\n\n'
+            response.close()
+
+            # Resume by query parameter
+            response = client.get(f'/api/events?last_event_id={events[0][0]}', buffered=False)
+            stream = iter(response.response)
+            next(stream)
+            assert parse_events([next(stream)])[0][1] == 'sale_recorded'
+            response.close()
+
+            assert client.get('/api/events?last_event_id=abc').status_code == 400
+
+            # Under the sync server the stream is left to the ASGI front end
+            app.config['EVENTS_SYNC_STREAM'] = False
+            assert client.get('/api/events').status_code == 503
+
+            logger.info("Event stream endpoint tests passed")
+        except Exception as e:
+            logger.error(f"Event stream endpoint tests failed: {str(e)}")
+            raise
+
+    def test_asgi_event_stream(self, app):
+        """TC-EV-05: The ASGI front end streams events without a pool thread."""
+        # The ASGI front end streams even where the Flask route does not
+        app.config['EVENTS_SYNC_STREAM'] = False
+
+        async def scenario():
+            asgi_app = AsgiStockApp(app, io_workers=1)
+            await asgi_app.startup()
+            sent = []
+            disconnect = asyncio.Event()
+
+            async def receive():
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {'type': 'http', 'method': 'GET', 'path': '/api/events',
+                     'query_string': b'', 'headers': []}
+            try:
+                # The request body read completes immediately for a GET
+                messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+                async def first_receive():
+                    return messages.pop(0) if messages else await receive()
+
+                stream = asyncio.create_task(asgi_app(scope, first_receive, send))
+                await asyncio.sleep(0.1)
+                with app.app_context():
+                    from app import get_event_bus
+                    bus = get_event_bus()
+                # Publish from another thread, as a request handler would
+                await asyncio.get_running_loop().run_in_executor(
+                    None, bus.publish, 'sale_recorded', {'stock_code': 'NS100'})
+                await asyncio.sleep(0.1)
+                disconnect.set()
+                await asyncio.wait_for(stream, 2)
+            finally:
+                await asgi_app.shutdown()
+
+            assert sent[0]['status'] == 200
+            events = parse_events(message.get('body', b'') for message in sent[1:])
+            assert events[0][2] == {'stock_code': 'NS100'}
+            assert bus.subscriber_count() == 0
+
+        try:
+            asyncio.run(scenario())
+            logger.info("ASGI event stream tests passed")
+        except Exception as e:
+            logger.error(f"ASGI event stream tests failed: {str(e)}")
+            raise
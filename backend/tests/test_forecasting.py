@@ -0,0 +1,114 @@
+import pandas as pd
+import pytest
+from datetime import date, timedelta
+from models.nav_sys import NavSys
+from utils.exceptions import ValidationError
+from utils.file_handler import StockFileHandler
+from utils.forecasting import DemandForecaster
+from utils.sale_handler import SalesHandler
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+def naive_level(daily_units: dict, start: date, end: date, alpha: float) -> float:
+    """Reference: smooth day by day, zero-filling days without sales."""
+    level = None
+    day = start
+    while day <= end:
+        units = daily_units.get(day, 0)
+        level = units if level is None else alpha * units + (1 - alpha) * level
+        day += timedelta(days=1)
+    return level
+
+def sales_frame(sales):
+    return pd.DataFrame({
+        'date': pd.to_datetime([sale[0] for sale in sales]),
+        'stock_code': [sale[1] for sale in sales],
+        'quantity': [sale[2] for sale in sales],
+    })
+
+class TestDemandForecaster:
+    """Test suite for exponential smoothing forecasts and days of cover."""
+
+    def test_matches_daily_smoothing(self):
+        """TC-FC-01: Sparse fit equals day-by-day smoothing with zero days."""
+        try:
+            sales = [
+                (date(2024, 1, 1), 'NS101', 4), (date(2024, 1, 1), 'NS101', 2),
+                (date(2024, 1, 3), 'NS101', 5), (date(2024, 1, 4), 'NS102', 1),
+                (date(2024, 1, 8), 'NS101', 3),
+            ]
+            forecaster = DemandForecaster(alpha=0.3)
+            forecaster.fit(sales_frame(sales))
+
+            today = date(2024, 1, 10)
+            demand = dict(zip(forecaster._codes, forecaster.daily_demand(today)))
+            expected = naive_level({date(2024, 1, 1): 6, date(2024, 1, 3): 5,
+                                    date(2024, 1, 8): 3},
+                                   date(2024, 1, 1), today, 0.3)
+            assert demand['NS101'] == pytest.approx(expected)
+
+            # TC-FC-02: Incremental updates equal a refit
+            incremental = DemandForecaster(alpha=0.3)
+            incremental.fit(sales_frame(sales[:3]))
+            for sale_date, code, units in sales[3:]:
+                incremental.record_sale(code, units, sale_date)
+            assert list(incremental.daily_demand(today)) == pytest.approx(
+                list(forecaster.daily_demand(today)))
+
+            with pytest.raises(ValidationError):
+                DemandForecaster(alpha=0)
+
+            logger.info("Smoothing tests passed")
+        except Exception as e:
+            logger.error(f"Smoothing tests failed: {str(e)}")
+            raise
+
+    def test_at_risk(self, tmp_path):
+        """TC-FC-03: At-risk SKUs are ordered by days of cover."""
+        try:
+            file_handler = StockFileHandler(str(tmp_path / "stock_items.csv"))
+            sales_handler = SalesHandler(str(tmp_path / "sales_history.csv"))
+            file_handler.save_item(NavSys("NS101", 10, 100.0, "TomTom"))
+            file_handler.save_item(NavSys("NS102", 3, 100.0, "Garmin"))
+            file_handler.save_item(NavSys("NS103", 90, 100.0, "Garmin"))
+
+            forecaster = DemandForecaster(alpha=0.5)
+            sales_handler.add_listener(forecaster.on_sale)
+            file_handler.add_listener(forecaster.on_storage_event)
+            forecaster.sync(file_handler, sales_handler)
+
+            for code, units in (("NS101", 4), ("NS102", 2), ("NS103", 2)):
+                sales_handler.record_sale(code, units, 100.0, "TomTom")
+            # Listener updates keep the forecaster in sync without a refit
+            assert forecaster._sales_version == sales_handler.data_version()
+
+            risky = forecaster.at_risk(lead_time_days=7)
+            assert [item['stock_code'] for item in risky] == ["NS102", "NS101"]
+            assert risky[0]['days_of_cover'] == pytest.approx(1.5)
+
+            # Restocking through storage removes the risk
+            nav = file_handler.get_item("NS102")
+            nav.increase_stock(50)
+            file_handler.save_item(nav)
+            assert [item['stock_code'] for item in forecaster.at_risk(7)] == ["NS101"]
+
+            logger.info("At-risk tests passed")
+        except Exception as e:
+            logger.error(f"At-risk tests failed: {str(e)}")
+            raise
+
+    def test_at_risk_endpoint(self, client):
+        """TC-FC-04: Batch endpoint returns at-risk SKUs."""
+        try:
+            client.post('/api/items/NS100/sell', json={'quantity': 4})
+            response = client.get('/api/forecast/at-risk?lead_time_days=7')
+            assert response.status_code == 200
+            assert [item['stock_code'] for item in response.get_json()['items']] == ["NS100"]
+
+            assert client.get('/api/forecast/at-risk?lead_time_days=-1').status_code == 400
+
+            logger.info("At-risk endpoint tests passed")
+        except Exception as e:
+            logger.error(f"At-risk endpoint tests failed: {str(e)}")
+            raise
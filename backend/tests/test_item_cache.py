@@ -0,0 +1,160 @@
+import multiprocessing
+from utils.item_cache import ENTRY_OVERHEAD_BYTES, ItemCache
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+ROWS = {f"NS{i}": ['NavSys', f"NS{i}", str(10 + i), f"{100 + i}.0", 'Garmin'] for i in range(10)}
+
+class TestItemCache:
+    """Test suite for the two-level item cache."""
+
+    def test_lru_and_generations(self):
+        """TC-IC-01: The in-process level evicts by size and invalidates on writes."""
+        try:
+            loads = []
+            def load_row(code):
+                loads.append(code)
+                return ROWS.get(code)
+
+            cache = ItemCache(max_bytes=3 * (ENTRY_OVERHEAD_BYTES + 30))
+            for code in ['NS1', 'NS2', 'NS3', 'NS1', 'NS4']:
+                cache.get(code, load_row)
+            assert loads == ['NS1', 'NS2', 'NS3', 'NS4']
+            stats = cache.stats()
+            assert stats['l1_hits'] == 1 and stats['evictions'] == 1 and stats['l1_entries'] == 3
+            # NS2 was least recently used
+            cache.get('NS2', load_row)
+            assert loads[-1] == 'NS2'
+
+            # Copies are handed out: changing one does not change the cache
+            item = cache.get('NS1', load_row)
+            item.price = 1.0
+            assert cache.get('NS1', load_row).price == 101.0
+            assert cache.get('NOPE', load_row) is None
+
+            cache.on_storage_event({'event': 'saved', 'stock_code': 'NS9', 'row': ROWS['NS9'],
+                                    'previous': ROWS['NS9']})
+            loads.clear()
+            cache.get('NS1', load_row)
+            assert loads == ['NS1'] and cache.generation == 1
+
+            logger.info("Item cache LRU tests passed")
+        except Exception as e:
+            logger.error(f"Item cache LRU tests failed: {str(e)}")
+            raise
+
+    def test_shared_level(self, tmp_path):
+        """TC-IC-02: Processes share rows and see each other's writes without re-reading storage."""
+        first = second = None
+        try:
+            loads = []
+            def load_row(code):
+                loads.append(code)
+                return ROWS.get(code)
+
+            path = tmp_path / "cache.sqlite3"
+            first, second = ItemCache(str(path)), ItemCache(str(path))
+            assert first.get('NS1', load_row).quantity == 11
+            assert second.get('NS1', load_row).quantity == 11
+            assert loads == ['NS1'] and second.stats()['l2_hits'] == 1
+
+            # A write by one process reaches the other through the shared level
+            sold = ['NavSys', 'NS1', '5', '101.0', 'Garmin']
+            first.on_storage_event({'event': 'batch', 'changes': [
+                {'event': 'saved', 'stock_code': 'NS1', 'row': sold, 'previous': ROWS['NS1']},
+                {'event': 'deleted', 'stock_code': 'NS2', 'row': None, 'previous': ROWS['NS2']},
+            ]})
+            assert second.generation == first.generation == 1
+            assert second.get('NS1', load_row).quantity == 5
+            assert loads == ['NS1'] and second.stats()['invalidations'] == 1
+
+            # An unchanged SKU's entry is revalidated, not reloaded
+            second.get('NS3', load_row)
+            first.on_storage_event({'event': 'saved', 'stock_code': 'NS1', 'row': ROWS['NS1'],
+                                    'previous': sold})
+            second.get('NS3', load_row)
+            assert loads == ['NS1', 'NS3'] and second.stats()['l2_hits'] == 3
+
+            # TC-IC-03: A restart keeps the shared rows and generation
+            first.close()
+            first = ItemCache(str(path))
+            assert first.generation == 2
+            assert first.get('NS3', load_row).stock_code == 'NS3'
+            assert loads == ['NS1', 'NS3']
+
+            logger.info("Shared item cache tests passed")
+        except Exception as e:
+            logger.error(f"Shared item cache tests failed: {str(e)}")
+            raise
+        finally:
+            for cache in (first, second):
+                if cache is not None:
+                    cache.close()
+
+    def test_cache_endpoints(self, client):
+        """TC-IC-04: Item lookups go through the cache and report their hit rate."""
+        try:
+            for _ in range(3):
+                assert client.post('/api/items/NS105/sell', json={'quantity': 1}).status_code == 200
+            stats = client.get('/api/admin/cache/stats').get_json()
+            assert stats['lookups'] >= 3 and stats['l1_hits'] + stats['l2_hits'] >= 2
+            assert stats['generation'] >= 3 and stats['writes'] >= 3
+            assert client.put('/api/items/NS105', json={'price': 99.0}).get_json()['item']['quantity'] == 27
+            assert client.delete('/api/admin/cache').status_code == 200
+            assert client.get('/api/admin/cache/stats').get_json()['l1_entries'] == 0
+
+            logger.info("Item cache endpoint tests passed")
+        except Exception as e:
+            logger.error(f"Item cache endpoint tests failed: {str(e)}")
+            raise
+
+    def test_source_check_and_fork(self, tmp_path):
+        """TC-IC-05: L2 is emptied for a changed stock file and opened anew after fork."""
+        cache = None
+        try:
+            loads = []
+            def load_row(code):
+                loads.append(code)
+                return ROWS.get(code)
+
+            path = tmp_path / "cache.sqlite3"
+            cache = ItemCache(str(path))
+            assert cache._db is None
+            signature = [(1, 100, 5)]
+            cache.get('NS1', load_row, lambda: signature[0])
+            cache.on_storage_event({'event': 'saved', 'stock_code': 'NS2', 'row': ROWS['NS2'],
+                                    'previous': None, 'signature': (2, 100, 6)})
+            signature[0] = (2, 100, 6)
+            cache.close()
+            cache = ItemCache(str(path))
+            assert cache.get('NS2', load_row, lambda: signature[0]).stock_code == 'NS2'
+            assert loads == ['NS1']
+
+            # Replaced behind the cache's back: the stored rows are dropped
+            signature[0] = (3, 90, 7)
+            cache.close()
+            cache = ItemCache(str(path))
+            cache.get('NS2', load_row, lambda: signature[0])
+            assert loads == ['NS1', 'NS2'] and cache.stats()['l2_entries'] == 1
+
+            def lookup(results):
+                results.put((cache.get('NS2', lambda code: None).stock_code,
+                             cache.stats()['l2_entries'], cache._db is not parent_db))
+
+            parent_db = cache._db
+            context = multiprocessing.get_context('fork')
+            results = context.Queue()
+            child = context.Process(target=lookup, args=(results,))
+            child.start()
+            assert results.get(timeout=30) == ('NS2', 1, True)
+            child.join(30)
+            assert child.exitcode == 0
+
+            logger.info("Item cache source check tests passed")
+        except Exception as e:
+            logger.error(f"Item cache source check tests failed: {str(e)}")
+            raise
+        finally:
+            if cache is not None:
+                cache.close()
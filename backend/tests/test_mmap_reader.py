@@ -0,0 +1,148 @@
+import os
+import pytest
+from models.nav_sys import NavSys
+from utils.exceptions import ValidationError
+from utils.file_handler import StockFileHandler
+from utils.mmap_reader import MappedStockReader
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class TestMappedReader:
+    """Test suite for the memory-mapped stock file reader."""
+
+    def test_point_and_page_reads(self, tmp_path):
+        """TC-MM-01: Single rows and pages are read from the line index."""
+        try:
+            path = tmp_path / "stock_items.csv"
+            path.write_text(
+                "item_type,stock_code,quantity,price,brand\n"
+                "NavSys,NS101,10,199.99,TomTom\n"
+                'NavSys,"NS,102",20,99.5,"Garmin ""Pro"""\n'
+                "NavSys,NS103,30,49.0,GeoVision\n",
+                encoding='utf-8')
+            reader = MappedStockReader(str(path))
+
+            assert reader.count() == 3
+            assert reader.get_row("NS103") == ["NavSys", "NS103", "30", "49.0", "GeoVision"]
+            assert reader.get_row("NS,102")[4] == 'Garmin "Pro"'
+            assert reader.get_row("NS999") is None
+            assert [row[1] for row in reader.get_rows(1, 5)] == ["NS,102", "NS103"]
+            assert reader.get_rows(10, 5) == []
+
+            # TC-MM-02: A replacement file that extends the old one is indexed
+            # incrementally, keeping the code index; other changes rebuild
+            codes = reader._codes
+            replacement = tmp_path / "replacement.csv"
+            replacement.write_bytes(path.read_bytes() + b"NavSys,NS104,40,10.0,TomTom\n")
+            os.replace(replacement, path)
+            assert reader.get_row("NS104")[2] == "40"
+            assert reader.count() == 4 and reader._codes is codes
+
+            with open(path, 'a', encoding='utf-8') as file:
+                file.write("NavSys,NS105,50,10.0,TomTom\n")
+            assert reader.get_row("NS105")[2] == "50"
+            assert reader.count() == 5 and reader._codes is not codes
+
+            path.write_text(
+                "item_type,stock_code,quantity,price,brand\n"
+                "NavSys,NS201,1,5.0,TomTom\n",
+                encoding='utf-8')
+            assert reader.get_row("NS101") is None
+            assert reader.get_row("NS201")[2] == "1"
+            assert reader.count() == 1
+            reader.close()
+
+            logger.info("Mapped reader tests passed")
+        except Exception as e:
+            logger.error(f"Mapped reader tests failed: {str(e)}")
+            raise
+
+    def test_file_handler_mmap_mode(self, tmp_path):
+        """TC-MM-03: StockFileHandler serves items and pages through the mapped reader."""
+        try:
+            with pytest.raises(ValidationError):
+                StockFileHandler(str(tmp_path / "stock_items.csv"), reader='bogus')
+
+            file_handler = StockFileHandler(str(tmp_path / "stock_items.csv"), reader='mmap')
+            assert file_handler.get_item("NS101") is None
+            for i in range(5):
+                file_handler.save_item(NavSys(f"NS10{i}", 10 + i, 100.0 + i, "TomTom"))
+
+            item = file_handler.get_item("NS103")
+            assert item.quantity == 13 and item.brand == "TomTom"
+
+            item.sell_stock(3)
+            file_handler.save_item(item)
+            assert file_handler.get_item("NS103").quantity == 10
+
+            items, total = file_handler.load_page(3, 10)
+            assert total == 5
+            assert [i.stock_code for i in items] == ["NS103", "NS104"]
+
+            file_handler.delete_item("NS100")
+            assert file_handler.get_item("NS100") is None
+
+            logger.info("File handler mmap mode tests passed")
+        except Exception as e:
+            logger.error(f"File handler mmap mode tests failed: {str(e)}")
+            raise
+
+    def test_storage_order_page_endpoint(self, app, client):
+        """TC-MM-04: Storage-order pages without aggregates skip the full load."""
+        try:
+            app.extensions['stock_file_handler'] = StockFileHandler(
+                str(app.config['CSV_FILE']), reader='mmap')
+
+            response = client.get('/api/items?sort_by=none&page=2&per_page=4'
+                                  '&exclude=statistics,available_brands&fields=stock_code')
+            assert response.status_code == 200
+            data = response.get_json()
+            assert [item['stock_code'] for item in data['items']] == ["NS104", "NS105", "NS106", "NS107"]
+            assert data['pagination']['total_items'] == 15
+            assert 'statistics' not in data
+
+            response = client.post('/api/items/NS105/sell', json={'quantity': 5})
+            assert response.status_code == 200
+            assert response.get_json()['item']['quantity'] == 25
+
+            logger.info("Storage order page endpoint tests passed")
+        except Exception as e:
+            logger.error(f"Storage order page endpoint tests failed: {str(e)}")
+            raise
+
+    def test_page_skips_invalid_rows(self, tmp_path, monkeypatch):
+        """TC-MM-05: Storage-order pages count and page over the rows that decode only."""
+        try:
+            for reader in ('csv', 'mmap'):
+                file_handler = StockFileHandler(str(tmp_path / f"{reader}.csv"), reader=reader)
+                for i in range(5):
+                    file_handler.save_item(NavSys(f"NS10{i}", 10 + i, 100.0 + i, "TomTom"))
+                rows = file_handler.load_all_items()
+                rows.insert(1, ["NavSys", "NS999", "-1", "1.0", "TomTom"])
+                file_handler._write_rows(rows)
+                assert len(file_handler.load_items()) == 5
+
+                items, total = file_handler.load_page(0, 2)
+                assert total == 5
+                assert [i.stock_code for i in items] == ["NS100", "NS101"]
+                items, _ = file_handler.load_page(2, 10)
+                assert [i.stock_code for i in items] == ["NS102", "NS103", "NS104"]
+
+                # Writes carry the invalid rows over, checking only the rows they wrote
+                checked = []
+                decodes = StockFileHandler._decodes
+                monkeypatch.setattr(StockFileHandler, '_decodes',
+                                    staticmethod(lambda row: checked.append(row) or decodes(row)))
+                file_handler.save_item(NavSys("NS105", 1, 1.0, "TomTom"))
+                file_handler.delete_item("NS100")
+                items, total = file_handler.load_page(0, 10)
+                assert total == 5
+                assert [i.stock_code for i in items] == ["NS101", "NS102", "NS103", "NS104", "NS105"]
+                assert len(checked) == 1
+                monkeypatch.undo()
+
+            logger.info("Invalid row page tests passed")
+        except Exception as e:
+            logger.error(f"Invalid row page tests failed: {str(e)}")
+            raise
@@ -0,0 +1,118 @@
+import pytest
+from utils.analytics import SalesAnalytics
+from utils.exceptions import ValidationError
+from utils.file_handler import StockFileHandler
+from utils.parallel_csv import line_aligned_ranges, parse_columns, use_parallel
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SCHEMA = [('code', 'str'), ('quantity', 'int'), ('price', 'float'), ('brand', 'category')]
+
+class TestParallelCsv:
+    """Test suite for the parallel CSV loader."""
+
+    def test_chunked_parse(self, tmp_path):
+        """TC-PL-01: Chunks start on line boundaries and merge back in file order."""
+        try:
+            path = tmp_path / "items.csv"
+            lines = [f"NS{i},{i},{i}.5,{'Garmin' if i % 3 else 'TomTom'}" for i in range(200)]
+            lines[17] = "NS17,seven,1.0,Garmin"
+            lines[150] = "NS150,1"
+            path.write_text("code,quantity,price,brand\n" + "\n".join(lines) + "\n", encoding='utf-8')
+
+            ranges = line_aligned_ranges(str(path), 7, start=len("code,quantity,price,brand\n"))
+            data = path.read_bytes()
+            assert ranges[-1][1] == len(data)
+            assert all(data[start - 1:start] == b'\n' for start, _ in ranges)
+
+            serial = parse_columns(str(path), SCHEMA)
+            parallel = parse_columns(str(path), SCHEMA, workers=2, min_parallel_bytes=0)
+            # The size check honours the same override
+            assert not use_parallel(len(data), 2)
+            assert use_parallel(len(data), 2, min_parallel_bytes=0)
+            assert not use_parallel(len(data), 1, min_parallel_bytes=0)
+            for parsed in (serial, parallel):
+                assert len(parsed) == 198 and parsed.records == 200
+                assert parsed.column('code')[17] == 'NS18'
+                assert parsed.columns['quantity'].sum() == sum(range(200)) - 17 - 150
+                assert parsed.column('brand')[:3] == ['TomTom', 'Garmin', 'Garmin']
+
+                # TC-PL-02: Invalid lines are reported with their line numbers
+                assert [(line, message) for _, line, _, message in parsed.errors] == [
+                    (19, "Invalid int value for quantity: 'seven'"),
+                    (152, "Expected 4 fields, got 2"),
+                ]
+
+            # Records spanning lines cannot be split by line
+            path.write_text('code,quantity,price,brand\n"NS\n1",1,1.0,Garmin\n', encoding='utf-8')
+            with pytest.raises(ValidationError):
+                parse_columns(str(path), SCHEMA)
+
+            logger.info("Chunked parse tests passed")
+        except Exception as e:
+            logger.error(f"Chunked parse tests failed: {str(e)}")
+            raise
+
+    def test_cold_loads(self, tmp_path, monkeypatch):
+        """TC-PL-03: Stock rows and the sales frame load the same in parallel."""
+        try:
+            monkeypatch.setattr('utils.parallel_csv.MIN_PARALLEL_BYTES', 0)
+            stock = tmp_path / "stock.csv"
+            stock.write_text("item_type,stock_code,quantity,price,brand\n"
+                             + "".join(f"NavSys,NS{i},{i % 90},{100 + i}.50,Brand{i % 4}\n" for i in range(300))
+                             + "NavSys,BROKEN\n\n", encoding='utf-8')
+            serial = StockFileHandler(str(stock)).load_all_items()
+            parallel_handler = StockFileHandler(str(stock), parallel_load=2)
+            assert parallel_handler.load_all_items() == serial
+            assert len(parallel_handler.load_items()) == 300
+
+            sales = tmp_path / "sales.csv"
+            sales.write_text("date,stock_code,quantity,price,brand,revenue\n"
+                             + "".join(f"2024-0{i % 9 + 1}-1{i % 10},NS{i % 7},{i % 5 + 1},10.0,"
+                                       f"Brand{i % 3},{(i % 5 + 1) * 10.0}\n" for i in range(400)),
+                             encoding='utf-8')
+            expected = SalesAnalytics(str(sales))
+            actual = SalesAnalytics(str(sales), parallel_load=2)
+            assert actual.frame().equals(expected.frame())
+            assert actual.revenue_by_period('month') == expected.revenue_by_period('month')
+            assert actual.sku_velocity() == expected.sku_velocity()
+
+            logger.info("Parallel cold load tests passed")
+        except Exception as e:
+            logger.error(f"Parallel cold load tests failed: {str(e)}")
+            raise
+
+    def test_pool_after_fork(self, tmp_path, monkeypatch):
+        """TC-PL-04: A process forked from one with a parse pool builds its own."""
+        try:
+            import multiprocessing
+            from utils import parallel_csv
+
+            monkeypatch.setattr('utils.parallel_csv.MIN_PARALLEL_BYTES', 0)
+            stock = tmp_path / "stock.csv"
+            stock.write_text("item_type,stock_code,quantity,price,brand\n"
+                             + "".join(f"NavSys,NS{i},{i % 90},10.0,Garmin\n" for i in range(200)),
+                             encoding='utf-8')
+            # The parent's pool exists before the fork, as in a preloaded gunicorn master
+            assert len(StockFileHandler(str(stock), parallel_load=2).load_all_items()) == 200
+            parent_pool = parallel_csv._pool['executor']
+
+            def load(results):
+                rows = StockFileHandler(str(stock), parallel_load=2).load_all_items()
+                results.put((len(rows), parallel_csv._pool['executor'] is not parent_pool))
+                # multiprocessing children exit without running atexit hooks
+                parallel_csv.shutdown_pool()
+
+            context = multiprocessing.get_context('fork')
+            results = context.Queue()
+            child = context.Process(target=load, args=(results,))
+            child.start()
+            assert results.get(timeout=60) == (200, True)
+            child.join(timeout=10)
+            assert child.exitcode == 0
+
+            logger.info("Parse pool fork tests passed")
+        except Exception as e:
+            logger.error(f"Parse pool fork tests failed: {str(e)}")
+            raise
@@ -0,0 +1,92 @@
+import pytest
+from utils.partitioned import PartitionedCatalog, partition_of
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+QUERIES = [
+    '/api/items?per_page=4&page=2',
+    '/api/items?sort_by=price&sort_order=desc&per_page=5',
+    '/api/items?sort_by=brand&per_page=15',
+    '/api/items?sort_by=brand&sort_order=desc&per_page=6&page=2',
+    '/api/items?brand=garmin&sort_by=quantity',
+    '/api/items?search=ns11&sort_by=none',
+]
+
+class TestPartitionedCatalog:
+    """Test suite for scatter/gather listings over partition workers."""
+
+    def test_partitioned_listing_matches_local(self, app, client):
+        """TC-PC-01: Partitioned listings equal single-process ones, before and after writes."""
+        catalog = None
+        try:
+            def compare():
+                app.config['CATALOG_PARTITIONS'] = 0
+                expected = [client.get(url).get_json() for url in QUERIES]
+                app.config['CATALOG_PARTITIONS'] = 3
+                actual = [client.get(url).get_json() for url in QUERIES]
+                for want, got in zip(expected, actual):
+                    assert got['items'] == want['items']
+                    assert got['pagination'] == want['pagination']
+                    assert got['available_brands'] == want['available_brands']
+                    assert got['statistics'] == pytest.approx(want['statistics'])
+
+            compare()
+            with app.app_context():
+                from app import get_partitioned_catalog
+                catalog = get_partitioned_catalog()
+            assert isinstance(catalog, PartitionedCatalog)
+            assert len({partition_of(f"NS{i}", 3) for i in range(100, 115)}) == 3
+
+            # TC-PC-02: Updates, adds and deletes reach the owning partition
+            client.post('/api/items/NS101/sell', json={'quantity': 9})
+            client.put('/api/items/NS105', json={'price': 1.5})
+            client.post('/api/items', json={'stock_code': 'NS200', 'quantity': 3,
+                                            'price': 99.0, 'brand': 'Garmin'})
+            client.delete('/api/items/NS103')
+            compare()
+            # Bulk repricing arrives as one batch per partition
+            client.post('/api/items/reprice', json={'rule': {'uplift_percent': 5}})
+            compare()
+
+            logger.info("Partitioned catalogue tests passed")
+        except Exception as e:
+            logger.error(f"Partitioned catalogue tests failed: {str(e)}")
+            raise
+        finally:
+            if catalog is not None:
+                catalog.close()
+
+    def test_partitioned_skips_invalid_rows(self, tmp_path):
+        """TC-PC-03: An invalid stock row is skipped, as in load_items, instead of failing queries."""
+        from models.nav_sys import NavSys
+        from utils.file_handler import StockFileHandler
+
+        catalog = None
+        try:
+            handler = StockFileHandler(str(tmp_path / "stock.csv"))
+            handler.save_item(NavSys("NS1", 5, 100.0, "Garmin"))
+            handler.save_item(NavSys("NS2", 5, 100.0, "TomTom"))
+            with open(handler.filename, 'a', newline='', encoding='utf-8') as file:
+                file.write("NavSys,NS3,-4,100.0,Garmin\n")
+            assert [item.stock_code for item in handler.load_items()] == ['NS1', 'NS2']
+
+            catalog = PartitionedCatalog(handler, workers=2)
+            result = catalog.query(limit=10)
+            assert [item['stock_code'] for item in result['items']] == ['NS1', 'NS2']
+            assert result['total_items'] == 2
+
+            # Changes forwarded to the workers still apply around the skipped row
+            item = handler.get_item("NS1")
+            item.sell_stock(2)
+            handler.save_item(item)
+            result = catalog.query(limit=10)
+            assert [item['quantity'] for item in result['items']] == [3, 5]
+
+            logger.info("Partitioned invalid row tests passed")
+        except Exception as e:
+            logger.error(f"Partitioned invalid row tests failed: {str(e)}")
+            raise
+        finally:
+            if catalog is not None:
+                catalog.close()
@@ -0,0 +1,173 @@
+import time
+from datetime import datetime
+import pytest
+from models.nav_sys import NavSys
+from models.stock_item import StockItem
+from utils.analytics import SalesAnalytics
+from utils.exceptions import ValidationError
+from utils.pricing import PriceBook, RateSchedule, install
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class TestPricing:
+    """Test suite for price history and VAT-rate versioning."""
+
+    def test_schedules_and_persistence(self, tmp_path):
+        """TC-PR-01: Intervals are found by time and replayed after a restart."""
+        try:
+            schedule = RateSchedule()
+            schedule.set(200.0, 2.0)
+            schedule.set(100.0, 1.0)
+            schedule.set(200.0, 3.0)
+            assert schedule.starts == [100.0, 200.0]
+            assert schedule.value_at(50.0, 'before') == 'before'
+            assert schedule.value_at(150.0) == 1.0 and schedule.value_at(200.0) == 3.0
+            # Lockless readers keep a consistent pair while set() publishes new lists
+            starts, values = schedule.snapshot()
+            schedule.set(50.0, 0.5)
+            schedule.set(200.0, 4.0)
+            assert (starts, values) == ([100.0, 200.0], [1.0, 3.0])
+            assert schedule.snapshot() == ([50.0, 100.0, 200.0], [0.5, 1.0, 4.0])
+
+            path = tmp_path / "pricing.jsonl"
+            book = PriceBook(str(path))
+            now = time.time()
+            assert book.set_prices({f"NS{i}": 10.0 + i for i in range(1000)}, now - 100) == 1000
+            # One batch is one appended write
+            assert len(path.read_text().splitlines()) == 1000 and book.version == 1
+            book.set_prices([("NS1", 20.0)], now - 50)
+            book.set_vat_rate(20, now - 60)
+            book.set_vat_rate(5, now - 60, stock_code="NS2")
+
+            with pytest.raises(ValidationError):
+                book.set_prices({"NS1": 30.0}, now + 3600)
+            with pytest.raises(ValidationError):
+                book.set_prices({"NS1": 0})
+            with pytest.raises(ValidationError):
+                book.set_vat_rate(120)
+            with pytest.raises(ValidationError):
+                book.set_prices({"NS1": float('nan')})
+            # Rejected before anything is appended to the history
+            lines = len(path.read_text().splitlines())
+            for start in ('nan', 'inf', float('-inf'), 1e300):
+                with pytest.raises(ValidationError):
+                    book.set_vat_rate(20, start)
+            assert len(path.read_text().splitlines()) == lines
+
+            reloaded = PriceBook(str(path))
+            for each in (book, reloaded):
+                assert each.price_at("NS1", now - 200, default=99.0) == 99.0
+                assert each.price_at("NS1", now - 70) == 11.0
+                assert each.price_at("NS1") == 20.0
+                assert each.vat_rate("NS1", now - 70) == 17.5
+                assert each.vat_rate("NS1") == 20.0
+                assert each.vat_rate("NS2") == 5.0
+                rates = each.vat_rates(["NS1", "NS2", "NS2"], [now - 70, now - 70, now])
+                assert rates.tolist() == [17.5, 17.5, 5.0]
+            assert [entry['value'] for entry in reloaded.price_history("NS1")] == [11.0, 20.0]
+
+            logger.info("Pricing schedule tests passed")
+        except Exception as e:
+            logger.error(f"Pricing schedule tests failed: {str(e)}")
+            raise
+
+    def test_items_resolve_rates_at_a_time(self, tmp_path):
+        """TC-PR-02: Items and revenue reports use the rate in effect at the time."""
+        try:
+            item = NavSys("NS1", 5, 100.0, "Garmin")
+            assert item.get_VAT() == 17.5
+            book = PriceBook(str(tmp_path / "pricing.jsonl"))
+            install(book)
+            try:
+                change_at = datetime(2024, 3, 1).timestamp()
+                book.set_vat_rate(20, change_at)
+                assert item.get_VAT(datetime(2024, 2, 29, 12)) == 17.5
+                assert item.get_VAT() == 20.0
+                assert item.get_price_with_VAT() == pytest.approx(120.0)
+
+                sales = tmp_path / "sales.csv"
+                sales.write_text("date,stock_code,quantity,price,brand,revenue\n"
+                                 "2024-02-29,NS1,1,100.0,Garmin,100.0\n"
+                                 "2024-03-01,NS1,1,100.0,Garmin,100.0\n", encoding='utf-8')
+                analytics = SalesAnalytics(str(sales))
+                assert [(row['vat'], row['revenue_with_vat'])
+                        for row in analytics.revenue_by_period('month')] == [(17.5, 117.5)] * 2
+                analytics.pricing = book
+                assert [(row['vat'], row['revenue_with_vat'])
+                        for row in analytics.revenue_by_period('month')] == [(17.5, 117.5), (20.0, 120.0)]
+                # A new change invalidates the cached report
+                book.set_vat_rate(10, change_at, stock_code="NS1")
+                assert analytics.revenue_by_period('month')[1]['vat'] == 10.0
+            finally:
+                install(None)
+            assert StockItem.pricing is None
+
+            logger.info("Point-in-time pricing tests passed")
+        except Exception as e:
+            logger.error(f"Point-in-time pricing tests failed: {str(e)}")
+            raise
+
+    def test_pricing_api(self, client, app):
+        """TC-PR-03: A VAT change applies to every item without rewriting the stock file."""
+        try:
+            before = app.config['CSV_FILE'].read_bytes()
+            response = client.put('/api/pricing/vat', json={'rate': 20})
+            assert response.status_code == 200
+            assert app.config['CSV_FILE'].read_bytes() == before
+            item = client.get('/api/items?search=NS100').get_json()['items'][0]
+            assert item['price_with_vat'] == pytest.approx(100.0 * 1.2)
+            assert client.get('/api/pricing/vat').get_json()['current_rate'] == 20.0
+            assert client.put('/api/pricing/vat', json={'rate': -1}).status_code == 400
+
+            # TC-PR-04: Price changes are recorded and looked up by time
+            changed_at = time.time()
+            assert client.put('/api/items/NS101', json={'price': 150.0}).status_code == 200
+            pricing = client.get('/api/items/NS101/pricing').get_json()
+            assert pricing['price'] == 150.0 and pricing['vat_rate'] == 20.0
+            assert [entry['value'] for entry in pricing['history']] == [101.0, 150.0]
+            earlier = client.get(f'/api/items/NS101/pricing?at={changed_at}').get_json()
+            assert earlier['price'] == 101.0 and earlier['price_with_vat'] == pytest.approx(121.2)
+            # Before the first record: the current price
+            assert client.get('/api/items/NS101/pricing?at=2020-01-01').get_json()['price'] == 150.0
+            assert client.get('/api/items/NS101/pricing?at=yesterday').status_code == 400
+            assert client.get('/api/items/NOPE/pricing').status_code == 404
+
+            logger.info("Pricing API tests passed")
+        except Exception as e:
+            logger.error(f"Pricing API tests failed: {str(e)}")
+            raise
+
+    def test_shared_book(self, tmp_path):
+        """TC-PR-05: Books sharing a file see each other's changes; a first change keeps the old price."""
+        try:
+            path = str(tmp_path / "pricing.jsonl")
+            first, second = PriceBook(path), PriceBook(path)
+
+            # A SKU never priced through the book: the replaced price stays in effect before the change
+            first.on_storage_event({'event': 'update', 'stock_code': 'NS1',
+                                    'row': ['NavSys', 'NS1', '5', '120.0', 'Garmin'],
+                                    'previous': ['NavSys', 'NS1', '5', '100.0', 'Garmin']})
+            yesterday = time.time() - 86400
+            assert first.price_at('NS1', yesterday, default=120.0) == 100.0
+            assert first.price_at('NS1') == 120.0
+
+            version = second.version
+            second.refresh()
+            assert second.version > version and second.price_at('NS1', yesterday) == 100.0
+            assert second.next_vat_change() is None
+            second.set_vat_rate(20, time.time() + 3600)
+            second.set_vat_rate(5, time.time() + 1800, stock_code='NS1')
+            assert second.next_vat_change() == second._vat_overrides['NS1'].starts[0]
+            assert second.next_vat_change(time.time() + 2000) == second._vat.starts[0]
+            # Changing catches up first, so the other book's lines are kept
+            first.set_prices({'NS2': 50.0})
+            assert first.vat_rate(at=time.time() + 7200) == 20.0
+            second.refresh()
+            assert second.price_at('NS2') == 50.0
+            assert PriceBook(path).price_history('NS1') == first.price_history('NS1')
+
+            logger.info("Shared price book tests passed")
+        except Exception as e:
+            logger.error(f"Shared price book tests failed: {str(e)}")
+            raise
@@ -0,0 +1,44 @@
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class TestProfiling:
+    """Test suite for sampling request profiling."""
+
+    def test_sampling_and_toggle(self, app, client):
+        """TC-PF-01: Sampled requests are aggregated per route; off means no samples."""
+        try:
+            client.get('/api/items')
+            assert client.get('/api/admin/profile').get_json()['routes'] == {}
+
+            response = client.put('/api/admin/profile', json={'enabled': True, 'sample_rate': 1.0,
+                                                               'modes': ['cpu', 'memory']})
+            assert response.get_json()['settings']['enabled']
+            for _ in range(2):
+                client.get('/api/items?sort_by=price')
+            client.post('/api/items/NS100/sell', json={'quantity': 1})
+
+            report = client.get('/api/admin/profile?route=/api/items&limit=5').get_json()
+            listing = report['routes']['GET /api/items']
+            assert listing['samples'] == 2 and len(listing['hot_functions']) == 5
+            assert any('get_items' in entry['function'] for entry in listing['hot_functions'])
+            assert listing['peak_traced_bytes'] > 0
+            assert 'POST /api/items/<stock_code>/sell' in report['routes']
+
+            # TC-PF-02: Dumps go to the configured directory
+            app.extensions['request_profiler'].dump_dir = str(app.config['CSV_FILE'].parent / 'profiles')
+            files = client.post('/api/admin/profile/dump').get_json()['files']
+            assert any(path.endswith('.pstats') for path in files)
+            assert any(path.endswith('.txt') for path in files)
+
+            assert client.put('/api/admin/profile', json={'sample_rate': 2}).status_code == 400
+            assert client.put('/api/admin/profile', json={'modes': ['disk']}).status_code == 400
+            client.put('/api/admin/profile', json={'enabled': False})
+            client.delete('/api/admin/profile')
+            client.get('/api/items')
+            assert client.get('/api/admin/profile').get_json()['routes'] == {}
+
+            logger.info("Profiling tests passed")
+        except Exception as e:
+            logger.error(f"Profiling tests failed: {str(e)}")
+            raise
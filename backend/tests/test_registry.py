@@ -0,0 +1,79 @@
+import pytest
+from models import StockItem, NavSys, ITEM_TYPES, get_item_type, item_type_schemas
+from utils.file_handler import StockFileHandler
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class DashCam(StockItem, type_tag='TestDashCam'):
+    """Item type with two extra columns, registered for these tests."""
+
+    columns = ('brand', 'resolution')
+
+    def get_stock_name(self) -> str:
+        return "Dash camera"
+
+class TestItemTypeRegistry:
+    """Test suite for the item type registry and row decoders."""
+
+    def test_registration(self):
+        """TC-RG-01: Subclasses register themselves by type tag."""
+        try:
+            assert ITEM_TYPES['NavSys'] is NavSys
+            assert get_item_type('TestDashCam') is DashCam
+            assert item_type_schemas()['NavSys'] == (
+                'item_type', 'stock_code', 'quantity', 'price', 'brand'
+            )
+
+            # TC-RG-02: Unknown tags and clashing tags are rejected
+            with pytest.raises(ValueError):
+                get_item_type('Wiper')
+            with pytest.raises(ValueError):
+                class OtherNav(StockItem, type_tag='NavSys'):
+                    pass
+
+            logger.info("Registration tests passed")
+        except Exception as e:
+            logger.error(f"Registration tests failed: {str(e)}")
+            raise
+
+    def test_row_round_trip(self):
+        """TC-RG-03: from_row and to_row are inverses and keep validation."""
+        try:
+            nav = NavSys.from_row(['NavSys', 'NS101', '10', '199.99', 'TomTom'])
+            assert nav.quantity == 10
+            assert nav.price == 199.99
+            assert nav.brand == 'TomTom'
+            assert nav.to_row() == ['NavSys', 'NS101', 10, 199.99, 'TomTom']
+
+            for row in (['NavSys', 'NS101', '-1', '199.99', 'TomTom'],
+                        ['NavSys', 'NS101', '10', 'abc', 'TomTom'],
+                        ['NavSys', 'NS101', '10', '199.99', '  '],
+                        ['NavSys', 'NS101', '10']):
+                with pytest.raises(ValueError):
+                    NavSys.from_row(row)
+
+            logger.info("Row round trip tests passed")
+        except Exception as e:
+            logger.error(f"Row round trip tests failed: {str(e)}")
+            raise
+
+    def test_mixed_catalogue(self, tmp_path):
+        """TC-RG-04: Mixed item types load through one dispatch table."""
+        try:
+            file_handler = StockFileHandler(str(tmp_path / "stock_items.csv"))
+            file_handler.save_item(NavSys("NS101", 10, 199.99, "TomTom"))
+            file_handler.save_item(DashCam.from_row(['TestDashCam', 'DC1', '4', '89.5', 'Nextbase', '4K']))
+            with open(file_handler.filename, 'a', newline='', encoding='utf-8') as file:
+                file.write("Wiper,W1,3,9.99,Bosch\n")
+
+            items = {item.stock_code: item for item in file_handler.load_items()}
+            assert set(items) == {"NS101", "DC1"}
+            assert isinstance(items["DC1"], DashCam)
+            assert items["DC1"]._resolution == "4K"
+            assert items["DC1"].get_stock_name() == "Dash camera"
+
+            logger.info("Mixed catalogue tests passed")
+        except Exception as e:
+            logger.error(f"Mixed catalogue tests failed: {str(e)}")
+            raise
@@ -0,0 +1,177 @@
+import pytest
+from models import StockItem
+from models.nav_sys import NavSys
+from utils.exceptions import ValidationError
+from utils.file_handler import StockFileHandler
+from utils.reorder import ReorderIndex
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class ReorderCam(StockItem, type_tag='TestReorderCam'):
+    """Item type whose brand is not the first extra column, registered for these tests."""
+
+    columns = ('resolution', 'brand')
+
+    def get_stock_name(self) -> str:
+        return "Dash camera"
+
+class TestReorderIndex:
+    """Test suite for the low-stock reorder index."""
+
+    def test_thresholds_and_ordering(self):
+        """TC-RO-01: Items below threshold are listed most urgent first."""
+        try:
+            index = ReorderIndex(default_threshold=10)
+            index.upsert("NS101", 3, "TomTom")
+            index.upsert("NS102", 9, "Garmin")
+            index.upsert("NS103", 50, "Garmin")
+
+            low = index.low_stock()
+            assert [item['stock_code'] for item in low] == ["NS101", "NS102"]
+            assert low[0]['shortfall'] == 7
+            assert index.low_count() == 2
+
+            # TC-RO-02: Brand override, then SKU override wins over brand
+            index.update_thresholds(brand={"Garmin": 60})
+            assert index.is_low("NS103")
+            index.update_thresholds(sku={"NS103": 20})
+            assert not index.is_low("NS103")
+            assert index.threshold_for("NS102", "Garmin") == 60
+
+            # TC-RO-03: Removing an override restores the brand threshold
+            index.update_thresholds(sku={"NS103": None})
+            assert index.is_low("NS103")
+
+            # TC-RO-04: Invalid thresholds are rejected without changes
+            with pytest.raises(ValidationError):
+                index.update_thresholds(default=-1, brand={"TomTom": 5})
+            assert index.get_thresholds()['default'] == 10
+            assert "TomTom" not in index.get_thresholds()['brand']
+
+            # A limit takes the first codes of a large bucket in order, filtered by brand
+            bucket = ReorderIndex(default_threshold=10)
+            for i in range(500, 0, -1):
+                bucket.upsert(f"SKU{i:04d}", 9, "Garmin" if i % 2 else "TomTom")
+            bucket.upsert("SKU9999", 1, "TomTom")
+            assert [item['stock_code'] for item in bucket.low_stock(limit=3)] == \
+                ["SKU9999", "SKU0001", "SKU0002"]
+            assert [item['stock_code'] for item in bucket.low_stock(limit=2, brand="TomTom")] == \
+                ["SKU9999", "SKU0002"]
+            assert len(bucket.low_stock(brand="Garmin")) == 250
+
+            logger.info("Reorder threshold tests passed")
+        except Exception as e:
+            logger.error(f"Reorder threshold tests failed: {str(e)}")
+            raise
+
+    def test_crossing_events(self):
+        """TC-RO-05: Listeners fire only when an item crosses its threshold."""
+        try:
+            index = ReorderIndex(default_threshold=10)
+            events = []
+            index.add_listener(events.append)
+
+            index.upsert("NS101", 20, "TomTom")
+            index.upsert("NS101", 8, "TomTom")
+            index.upsert("NS101", 5, "TomTom")
+            index.upsert("NS101", 30, "TomTom")
+
+            assert [event['type'] for event in events] == ['low_stock', 'restocked']
+            assert events[0]['quantity'] == 8
+
+            logger.info("Reorder event tests passed")
+        except Exception as e:
+            logger.error(f"Reorder event tests failed: {str(e)}")
+            raise
+
+    def test_storage_updates(self, tmp_path):
+        """TC-RO-06: Sells and restocks saved through storage update the index."""
+        try:
+            file_handler = StockFileHandler(str(tmp_path / "stock_items.csv"))
+            nav = NavSys("NS101", 12, 199.99, "TomTom")
+            file_handler.save_item(nav)
+
+            index = ReorderIndex(default_threshold=10, thresholds_file=str(tmp_path / "t.json"))
+            file_handler.add_listener(index.on_storage_event)
+            index.sync(file_handler)
+            assert not index.is_low("NS101")
+
+            nav.sell_stock(5)
+            file_handler.save_item(nav)
+            assert index.is_low("NS101")
+
+            nav.increase_stock(20)
+            file_handler.save_item(nav)
+            assert not index.is_low("NS101")
+
+            file_handler.delete_item("NS101")
+            assert len(index) == 0
+
+            # Thresholds persist across instances
+            index.update_thresholds(brand={"TomTom": 15})
+            reloaded = ReorderIndex(thresholds_file=str(tmp_path / "t.json"))
+            assert reloaded.get_thresholds()['brand'] == {"TomTom": 15}
+
+            logger.info("Reorder storage tests passed")
+        except Exception as e:
+            logger.error(f"Reorder storage tests failed: {str(e)}")
+            raise
+
+    def test_shared_thresholds(self, tmp_path):
+        """TC-RO-08: Thresholds saved by another process apply at the next sync; brands follow the schema."""
+        try:
+            file_handler = StockFileHandler(str(tmp_path / "stock_items.csv"))
+            file_handler.save_item(NavSys("NS101", 12, 199.99, "TomTom"))
+            file_handler.save_item(ReorderCam.from_row(['TestReorderCam', 'CAM1', '12', '80.0', '4K', 'Nextbase']))
+
+            # Two workers, each with its own index over the same files
+            thresholds_file = str(tmp_path / "t.json")
+            first = ReorderIndex(default_threshold=10, thresholds_file=thresholds_file)
+            second = ReorderIndex(default_threshold=10, thresholds_file=thresholds_file)
+            first.sync(file_handler)
+            second.sync(file_handler)
+            assert not first.is_low("CAM1")
+
+            second.update_thresholds(brand={"Nextbase": 15})
+            assert second.is_low("CAM1")
+            first.sync(file_handler)
+            assert first.get_thresholds()['brand'] == {"Nextbase": 15}
+            assert [item['stock_code'] for item in first.low_stock(brand="Nextbase")] == ["CAM1"]
+
+            # An update in one worker keeps the overrides saved by the other
+            first.update_thresholds(sku={"NS101": 20})
+            second.sync(file_handler)
+            assert second.get_thresholds()['brand'] == {"Nextbase": 15}
+            assert second.low_codes() == {"NS101", "CAM1"}
+
+            logger.info("Shared threshold tests passed")
+        except Exception as e:
+            logger.error(f"Shared threshold tests failed: {str(e)}")
+            raise
+
+    def test_low_stock_endpoint(self, client):
+        """TC-RO-07: Low-stock endpoint and thresholds API."""
+        try:
+            response = client.get('/api/items/low-stock')
+            assert response.status_code == 200
+            data = response.get_json()
+            assert [item['stock_code'] for item in data['items']] == ["NS100"]
+
+            response = client.put('/api/reorder/thresholds', json={'brand': {'Garmin': 30}})
+            assert response.status_code == 200
+
+            response = client.get('/api/items/low-stock?brand=Garmin')
+            codes = [item['stock_code'] for item in response.get_json()['items']]
+            assert codes == ["NS101", "NS104"]
+
+            response = client.get('/api/items')
+            assert response.get_json()['statistics']['low_stock_items'] == 3
+
+            response = client.put('/api/reorder/thresholds', json={'default': 'ten'})
+            assert response.status_code == 400
+
+            logger.info("Low stock endpoint tests passed")
+        except Exception as e:
+            logger.error(f"Low stock endpoint tests failed: {str(e)}")
+            raise
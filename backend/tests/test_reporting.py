@@ -0,0 +1,112 @@
+import threading
+import time
+from utils.reporting import ReportSnapshot, SnapshotPublisher
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class TestReporting:
+    """Test suite for report snapshots."""
+
+    def test_publisher(self):
+        """TC-RS-01: Snapshots are reused while unchanged and rebuilt when too stale."""
+        publisher = None
+        try:
+            state = {'data': 1, 'builds': 0}
+
+            def build(previous):
+                if previous is not None and previous.sources == (state['data'],):
+                    return previous
+                state['builds'] += 1
+                return ReportSnapshot(state['builds'], (state['data'],), None, 0, '', '', {}, {})
+
+            publisher = SnapshotPublisher(build, interval=3600, max_staleness=0.2)
+            first = publisher.latest()
+            assert first.version == 1 and publisher.refresh() is first
+            state['data'] = 2
+            # Within the staleness bound the old snapshot is served
+            assert publisher.latest() is first
+            time.sleep(0.25)
+            assert publisher.latest().sources == (2,) and publisher.builds == 2
+
+            # Stale readers arriving together rebuild once between them
+            calls = []
+
+            def slow_build(previous):
+                calls.append(previous)
+                time.sleep(0.1)
+                return build(previous)
+
+            publisher.build = slow_build
+            time.sleep(0.25)
+            readers = [threading.Thread(target=publisher.latest) for _ in range(8)]
+            for reader in readers:
+                reader.start()
+            for reader in readers:
+                reader.join()
+            assert len(calls) == 1
+            publisher.build = build
+
+            # TC-RS-02: The background thread publishes on its own
+            publisher.interval, publisher.max_staleness = 0.05, 3600
+            publisher.start()
+            state['data'] = 3
+            deadline = time.time() + 5
+            while publisher.latest().sources != (3,) and time.time() < deadline:
+                time.sleep(0.02)
+            assert publisher.latest().sources == (3,) and publisher.status()['running']
+
+            logger.info("Snapshot publisher tests passed")
+        except Exception as e:
+            logger.error(f"Snapshot publisher tests failed: {str(e)}")
+            raise
+        finally:
+            if publisher is not None:
+                publisher.stop()
+
+    def test_reporting_mode(self, app, client):
+        """TC-RS-03: Exports and reports are served from the snapshot with bounded staleness."""
+        try:
+            app.config['REPORTING_MODE'] = True
+            app.config['REPORT_SNAPSHOT_INTERVAL'] = 3600
+            live_export = client.get('/api/items/export')
+            assert live_export.headers['X-Snapshot-Version'] == '1'
+
+            client.post('/api/items/NS100/sell', json={'quantity': 2})
+            # The snapshot is older than the sale but within its staleness bound
+            assert client.get('/api/items/export').data == live_export.data
+            assert client.get('/api/sales/summary').get_json()['total_sales'] == 0
+
+            status = client.post('/api/admin/reporting/refresh').get_json()
+            assert status['version'] == 2 and status['item_count'] == 15
+            export = client.get('/api/items/export')
+            assert b'NS100,' in export.data and export.data != live_export.data
+            assert client.get('/api/sales/summary').get_json()['total_sales'] == 2
+            assert client.get('/api/sales/history').headers['X-Snapshot-Version'] == '2'
+            sales = client.get('/api/sales/export').data.decode('utf-8')
+            assert 'NS100,2' in sales
+
+            # A scheduled VAT rate taking effect changes the export, with no new pricing version
+            effective_from = time.time() + 0.5
+            assert client.put('/api/pricing/vat', json={'rate': 20, 'effective_from': effective_from}
+                              ).status_code == 200
+            assert client.post('/api/admin/reporting/refresh').get_json()['version'] == 3
+            assert client.post('/api/admin/reporting/refresh').get_json()['version'] == 3
+            time.sleep(max(0.0, effective_from - time.time()) + 0.1)
+            assert client.post('/api/admin/reporting/refresh').get_json()['version'] == 4
+            export = client.get('/api/items/export')
+            assert b',120.0,' in export.data
+
+            # Matching the live export once reporting mode is switched off
+            app.config['REPORTING_MODE'] = False
+            assert client.get('/api/items/export').data == export.data
+            assert client.get('/api/admin/reporting').status_code == 404
+
+            logger.info("Reporting mode tests passed")
+        except Exception as e:
+            logger.error(f"Reporting mode tests failed: {str(e)}")
+            raise
+        finally:
+            publisher = app.extensions.get('report_publisher')
+            if publisher is not None:
+                publisher.stop()
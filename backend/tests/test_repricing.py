@@ -0,0 +1,115 @@
+import pytest
+from models.nav_sys import NavSys
+from utils.exceptions import ValidationError
+from utils.file_handler import StockFileHandler
+from utils.repricing import RepricingRule, reprice, select_items
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class TestRepricing:
+    """Test suite for vectorized bulk repricing."""
+
+    def test_rules(self):
+        """TC-RP-01: Uplift by brand, .99 endings and floor/ceiling apply in order."""
+        try:
+            rule = RepricingRule(uplift_percent=10, brand_uplift={'Garmin': 50}, ending=0.99,
+                                 floor=50, ceiling=200)
+            prices = rule.apply([100.0, 100.0, 10.0, 300.0], ['TomTom', 'Garmin', 'TomTom', 'TomTom'])
+            assert prices.tolist() == [109.99, 149.99, 50.0, 200.0]
+
+            with pytest.raises(ValidationError):
+                RepricingRule(uplift_percent=-50).apply([0.01], [''])
+            with pytest.raises(ValidationError):
+                RepricingRule.from_dict({})
+            with pytest.raises(ValidationError):
+                RepricingRule.from_dict({'floor': 10, 'ceiling': 5})
+            with pytest.raises(ValidationError):
+                RepricingRule.from_dict({'uplift_percent': 'ten'})
+            # float() accepts these; they would write nan/inf prices
+            for value in ('nan', 'inf', '-inf'):
+                with pytest.raises(ValidationError):
+                    RepricingRule.from_dict({'uplift_percent': value})
+                with pytest.raises(ValidationError):
+                    RepricingRule.from_dict({'brand_uplift': {'Garmin': value}})
+                with pytest.raises(ValidationError):
+                    RepricingRule.from_dict({'floor': value})
+            with pytest.raises(ValidationError):
+                RepricingRule(ceiling=float('nan'))
+            with pytest.raises(ValidationError):
+                RepricingRule(uplift_percent=10).apply([float('inf')], [''])
+
+            logger.info("Repricing rule tests passed")
+        except Exception as e:
+            logger.error(f"Repricing rule tests failed: {str(e)}")
+            raise
+
+    def test_reprice_endpoint(self, client, app):
+        """TC-RP-02: A filtered reprice is previewed, then saved in one write."""
+        try:
+            before = app.config['CSV_FILE'].read_bytes()
+            body = {'brand': 'Garmin', 'rule': {'uplift_percent': 10, 'ending': 0.99}}
+            preview = client.post('/api/items/reprice', json={**body, 'dry_run': True}).get_json()
+            assert preview['matched'] == 5 and preview['changed'] == 5
+            assert preview['changes'][0] == {'stock_code': 'NS101', 'brand': 'Garmin',
+                                             'old_price': 101.0, 'new_price': 110.99}
+            assert app.config['CSV_FILE'].read_bytes() == before
+
+            changes_before = client.get('/api/changes').get_json()['last_seq']
+            result = client.post('/api/items/reprice', json={**body, 'diff_limit': 2}).get_json()
+            assert result['changed'] == 5 and len(result['changes']) == 2 and result['truncated']
+            item = client.get('/api/items?search=NS104').get_json()['items'][0]
+            assert item['price'] == 113.99
+            # Other brands and quantities are untouched
+            assert client.get('/api/items?search=NS100').get_json()['items'][0]['price'] == 100.0
+
+            # TC-RP-03: One batch reaches the change feed and the price history
+            feed = client.get(f'/api/changes?since={changes_before}').get_json()['changes']
+            assert [record['op'] for record in feed] == ['price_change'] * 5
+            history = client.get('/api/items/NS104/pricing').get_json()['history']
+            assert [entry['value'] for entry in history] == [104.0, 113.99]
+
+            response = client.post('/api/items/reprice',
+                                   json={'brand': 'Garmin', 'rule': {'uplift_percent': -100}})
+            assert response.status_code == 400
+            before = app.config['CSV_FILE'].read_bytes()
+            response = client.post('/api/items/reprice', json={'rule': {'uplift_percent': 'nan'}})
+            assert response.status_code == 400
+            assert app.config['CSV_FILE'].read_bytes() == before
+
+            logger.info("Reprice endpoint tests passed")
+        except Exception as e:
+            logger.error(f"Reprice endpoint tests failed: {str(e)}")
+            raise
+
+    def test_reprice_keeps_concurrent_changes(self, tmp_path):
+        """TC-RP-04: Only prices are written over the current rows; brands match as in the listing."""
+        try:
+            handler = StockFileHandler(str(tmp_path / "stock.csv"))
+            handler.save_item(NavSys("NS1", 5, 100.0, "Garmin"))
+            handler.save_item(NavSys("NS2", 5, 100.0, "TomTom"))
+
+            rows = handler.load_all_items()
+            assert [item.stock_code for item in select_items(rows, brands=['garmin'])] == ['NS1']
+            assert [item.stock_code for item in select_items(rows, brands=['GAR', 'tom'])] == ['NS1', 'NS2']
+            assert [item.stock_code for item in select_items(rows, search='tomtom')] == ['NS2']
+
+            # A sale saved after the items were read keeps its quantity
+            stale = select_items(rows, brands=['garmin'])
+            sold = handler.get_item("NS1")
+            sold.sell_stock(2)
+            handler.save_item(sold)
+            stale[0]._price = 120.0
+            assert handler.save_items(stale, fields=('price',)) == 1
+            assert handler.get_item("NS1").quantity == 3 and handler.get_item("NS1").price == 120.0
+            with pytest.raises(ValidationError):
+                handler.save_items(stale, fields=('colour',))
+
+            result = reprice(handler, RepricingRule(uplift_percent=10), brands=['garmin'])
+            assert result['changed'] == 1
+            assert handler.get_item("NS1").quantity == 3 and handler.get_item("NS1").price == 132.0
+
+            logger.info("Concurrent reprice tests passed")
+        except Exception as e:
+            logger.error(f"Concurrent reprice tests failed: {str(e)}")
+            raise
@@ -0,0 +1,215 @@
+import threading
+import pytest
+from utils.exceptions import FileOperationError
+from utils.sale_handler import SalesHandler
+from utils.sales_writer import SalesWriter, today
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class TestSalesWriter:
+    """Test suite for the buffered sales writer."""
+
+    def test_always_mode_is_durable_on_return(self, tmp_path):
+        """TC-SW-01: In 'always' mode a sale is in the file when record_sale returns."""
+        try:
+            path = tmp_path / "sales_history.csv"
+            sales_handler = SalesHandler(str(path), durability='always')
+            sales_handler.record_sale("NS101", 2, 100.0, "TomTom")
+
+            lines = path.read_text().splitlines()
+            assert lines[-1] == f"{today()},NS101,2,100.0,TomTom,200.0"
+
+            # TC-SW-02: Concurrent sales are all written, each line intact
+            def sell():
+                for _ in range(50):
+                    sales_handler.record_sale("NS102", 1, 9.99, "Garmin")
+            threads = [threading.Thread(target=sell) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            lines = path.read_text().splitlines()
+            assert len(lines) == 1 + 1 + 400
+            assert all(line.endswith(",NS102,1,9.99,Garmin,9.99") for line in lines[2:])
+
+            sales_handler.close()
+            with pytest.raises(FileOperationError):
+                sales_handler.record_sale("NS101", 1, 1.0, "TomTom")
+
+            logger.info("Always mode writer tests passed")
+        except Exception as e:
+            logger.error(f"Always mode writer tests failed: {str(e)}")
+            raise
+
+    def test_buffered_mode_flushes_for_readers(self, tmp_path):
+        """TC-SW-03: Buffered sales stay in memory until a flush, a reader or the row limit."""
+        try:
+            path = tmp_path / "sales_history.csv"
+            sales_handler = SalesHandler(str(path), durability='os',
+                                         flush_rows=10_000, flush_interval=60)
+            for _ in range(3):
+                sales_handler.record_sale("NS101", 1, 50.0, "TomTom")
+            assert len(path.read_text().splitlines()) == 1
+            assert sales_handler._writer.buffered_rows() == 3
+
+            # Reports flush first, so they never miss a recorded sale
+            history = sales_handler.get_sales_history()
+            assert history['by_brand'][0]['sales'] == 3
+            assert len(path.read_text().splitlines()) == 4
+            sales_handler.close()
+
+            logger.info("Buffered mode writer tests passed")
+        except Exception as e:
+            logger.error(f"Buffered mode writer tests failed: {str(e)}")
+            raise
+
+    def test_torn_row_is_cut_on_open(self, tmp_path):
+        """TC-SW-04: A partial last line left by a crash is removed before appending."""
+        try:
+            path = tmp_path / "sales_history.csv"
+            path.write_text("date,stock_code,quantity,price,brand,revenue\n"
+                            "2024-01-01,NS101,1,10.0,TomTom,10.0\n"
+                            "2024-01-02,NS1")
+            writer = SalesWriter(str(path))
+            writer.append(["2024-01-03", "NS102", 1, 5.0, "Garmin", 5.0])
+            writer.close()
+
+            assert path.read_text().splitlines()[1:] == [
+                "2024-01-01,NS101,1,10.0,TomTom,10.0",
+                "2024-01-03,NS102,1,5.0,Garmin,5.0",
+            ]
+
+            logger.info("Torn row recovery tests passed")
+        except Exception as e:
+            logger.error(f"Torn row recovery tests failed: {str(e)}")
+            raise
+
+    def test_failed_write_is_not_duplicated(self, tmp_path, monkeypatch):
+        """TC-SW-05: A write that failed before any byte is retried; a partial or unsynced one is not."""
+        try:
+            import os
+            path = tmp_path / "sales_history.csv"
+            writer = SalesWriter(str(path))
+            real_write, real_fsync = os.write, os.fsync
+
+            def failed_write(fd, data):
+                raise OSError("disk full")
+            monkeypatch.setattr(os, 'write', failed_write)
+            with pytest.raises(FileOperationError):
+                writer.append(["2024-01-01", "NS101", 1, 10.0, "TomTom", 10.0])
+            monkeypatch.setattr(os, 'write', real_write)
+            assert path.read_text() == "" and writer.buffered_rows() == 1
+            writer.flush()
+
+            # The file is shared with other processes: a partial row is marked and ended, never cut
+            calls = []
+            def partial_write(fd, data):
+                calls.append(len(data))
+                if len(calls) == 1:
+                    return real_write(fd, bytes(data[:5]))
+                if len(calls) == 2:
+                    raise OSError("disk full")
+                return real_write(fd, data)
+            monkeypatch.setattr(os, 'write', partial_write)
+            with pytest.raises(FileOperationError):
+                writer.append(["2024-01-03", "NS103", 1, 10.0, "TomTom", 10.0])
+            monkeypatch.setattr(os, 'write', real_write)
+            assert writer.buffered_rows() == 0
+
+            def failed_fsync(fd):
+                raise OSError("I/O error")
+            monkeypatch.setattr(os, 'fsync', failed_fsync)
+            with pytest.raises(FileOperationError):
+                writer.append(["2024-01-02", "NS102", 1, 5.0, "Garmin", 5.0])
+            monkeypatch.setattr(os, 'fsync', real_fsync)
+            assert writer.buffered_rows() == 0
+            writer.close()
+
+            assert path.read_text().splitlines() == [
+                "2024-01-01,NS101,1,10.0,TomTom,10.0",
+                "2024-,#torn",
+                "2024-01-02,NS102,1,5.0,Garmin,5.0",
+            ]
+
+            # Sales history still loads, without the torn row
+            history_path = tmp_path / "history.csv"
+            history_path.write_text("date,stock_code,quantity,price,brand,revenue\n" + path.read_text())
+            sales_handler = SalesHandler(str(history_path))
+            history = sales_handler.get_sales_history()
+            assert [day['date'] for day in history['daily']] == ["2024-01-01", "2024-01-02"]
+            assert sum(brand['revenue'] for brand in history['by_brand']) == 15.0
+            assert len(sales_handler.get_all_sales()) == 3
+
+            logger.info("Failed write recovery tests passed")
+        except Exception as e:
+            logger.error(f"Failed write recovery tests failed: {str(e)}")
+            raise
+
+    def test_sigterm_flush_does_not_take_the_lock(self, tmp_path, monkeypatch):
+        """TC-SW-06: SIGTERM during a write hands the flush to another thread."""
+        try:
+            import os
+            import signal
+            from utils import sales_writer
+
+            path = tmp_path / "sales_history.csv"
+            writer = SalesWriter(str(path), durability='batched', flush_interval=3600)
+            writer.append(["2024-01-01", "NS101", 1, 10.0, "TomTom", 10.0])
+            killed = threading.Event()
+            monkeypatch.setattr(os, 'kill', lambda pid, signum: killed.set())
+            monkeypatch.setattr(signal, 'signal', lambda signum, handler: None)
+
+            # The interrupted thread holds the I/O lock; the handler must still return
+            with writer._io_lock:
+                sales_writer._on_sigterm(signal.SIGTERM, None)
+                assert not killed.is_set()
+            assert killed.wait(5)
+            assert path.read_text().splitlines() == ["2024-01-01,NS101,1,10.0,TomTom,10.0"]
+            writer.close()
+
+            logger.info("SIGTERM flush tests passed")
+        except Exception as e:
+            logger.error(f"SIGTERM flush tests failed: {str(e)}")
+            raise
+
+    def test_forked_writer(self, tmp_path):
+        """TC-SW-07: A forked writer flushes on its own thread and leaves the parent's rows to it."""
+        writer = None
+        try:
+            import multiprocessing
+            path = tmp_path / "sales_history.csv"
+            writer = SalesWriter(str(path), durability='batched', flush_interval=0.05)
+            writer._wake.set()
+            writer.flush()
+            # Held in the parent's buffer across the fork
+            with writer._io_lock:
+                writer.append(["2024-01-01", "NS101", 1, 10.0, "TomTom", 10.0])
+
+                def child():
+                    writer.append(["2024-01-02", "NS102", 1, 5.0, "Garmin", 5.0])
+                    import time
+                    deadline = time.time() + 5
+                    while writer.buffered_rows() and time.time() < deadline:
+                        time.sleep(0.02)
+                    os._exit(0 if not writer.buffered_rows() else 1)
+
+                import os
+                context = multiprocessing.get_context('fork')
+                process = context.Process(target=child)
+                process.start()
+                process.join(10)
+                assert process.exitcode == 0
+            writer.flush()
+            assert sorted(path.read_text().splitlines()) == [
+                "2024-01-01,NS101,1,10.0,TomTom,10.0",
+                "2024-01-02,NS102,1,5.0,Garmin,5.0",
+            ]
+
+            logger.info("Forked writer tests passed")
+        except Exception as e:
+            logger.error(f"Forked writer tests failed: {str(e)}")
+            raise
+        finally:
+            if writer is not None:
+                writer.close()
@@ -0,0 +1,166 @@
+import pytest
+from models.nav_sys import NavSys
+from utils.exceptions import FileOperationError
+from utils.file_handler import StockFileHandler
+from utils.snapshot import InventorySnapshot, load_snapshot, main, write_snapshot
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class TestSnapshot:
+    """Test suite for binary inventory snapshots."""
+
+    def test_round_trip(self, tmp_path):
+        """TC-SN-01: Rows survive a snapshot round trip, shared strings stored once."""
+        try:
+            rows = [
+                ["NavSys", "NS101", "10", "199.99", "TomTom"],
+                ["NavSys", "NS102", "0", "5.5", "TomTom"],
+                ["NavSys", "NS,103", "100", "1.0", "Gärmin \"Pro\""],
+            ]
+            path = tmp_path / "stock.snap"
+            assert write_snapshot(rows, str(path), (1, 2, 3)) == 3
+
+            snapshot = load_snapshot(str(path))
+            assert snapshot.rows() == rows
+            assert snapshot.signature == (1, 2, 3)
+            assert snapshot.quantity.tolist() == [10, 0, 100]
+            assert snapshot.strings.count("TomTom") == 1
+            assert snapshot.codes()[2] == "NS,103"
+
+            # TC-SN-02: Corruption and truncation are detected
+            data = bytearray(path.read_bytes())
+            data[-3] ^= 0xFF
+            path.write_bytes(bytes(data))
+            with pytest.raises(FileOperationError):
+                load_snapshot(str(path))
+            path.write_bytes(bytes(data[:-10]))
+            with pytest.raises(FileOperationError):
+                load_snapshot(str(path))
+
+            # TC-SN-03: Rows that cannot be encoded are skipped, as load_items skips them
+            assert write_snapshot([rows[0], ["NavSys", "NS9", "many", "1.0", "X"], ["NavSys", "NS8"],
+                                   rows[1]], str(path), (0, 0, 0)) == 2
+            assert load_snapshot(str(path)).rows() == rows[:2]
+
+            logger.info("Snapshot round trip tests passed")
+        except Exception as e:
+            logger.error(f"Snapshot round trip tests failed: {str(e)}")
+            raise
+
+    def test_file_handler_uses_fresh_snapshot(self, tmp_path, monkeypatch):
+        """TC-SN-04: The handler loads from a matching snapshot and ignores a stale one."""
+        try:
+            csv_path = str(tmp_path / "stock_items.csv")
+            snap_path = str(tmp_path / "stock_items.snap")
+            file_handler = StockFileHandler(csv_path, snapshot_file=snap_path)
+            for i in range(3):
+                file_handler.save_item(NavSys(f"NS10{i}", 10 + i, 100.0 + i, "TomTom"))
+            assert file_handler.compact() == 3
+
+            # A fresh handler must not parse the CSV while the snapshot matches
+            cold = StockFileHandler(csv_path, snapshot_file=snap_path)
+            monkeypatch.setattr('utils.file_handler.csv.reader', None)
+            assert [row[1] for row in cold.load_all_items()] == ["NS100", "NS101", "NS102"]
+            monkeypatch.undo()
+
+            # After a write the snapshot is stale and the CSV is read instead
+            file_handler.save_item(NavSys("NS103", 1, 9.99, "Garmin"))
+            stale = StockFileHandler(csv_path, snapshot_file=snap_path)
+            assert len(stale.load_all_items()) == 4
+
+            # Recompacting at startup makes it usable again
+            assert stale.refresh_snapshot()
+            assert not stale.refresh_snapshot()
+            monkeypatch.setattr('utils.file_handler.csv.reader', None)
+            assert len(StockFileHandler(csv_path, snapshot_file=snap_path).load_all_items()) == 4
+            monkeypatch.undo()
+
+            # TC-SN-05: A handler with snapshot_every recompacts while it runs
+            writer = StockFileHandler(csv_path, snapshot_file=snap_path, snapshot_every=2)
+            writer.save_item(NavSys("NS104", 2, 9.99, "Garmin"))
+            assert len(StockFileHandler(csv_path, snapshot_file=snap_path).load_all_items()) == 5
+            assert writer.refresh_snapshot()
+            writer.save_item(NavSys("NS105", 3, 9.99, "Garmin"))
+            writer.delete_item("NS100")
+            writer.wait_for_recompaction()
+            monkeypatch.setattr('utils.file_handler.csv.reader', None)
+            assert [row[1] for row in StockFileHandler(csv_path, snapshot_file=snap_path).load_all_items()] == \
+                ["NS101", "NS102", "NS103", "NS104", "NS105"]
+            monkeypatch.undo()
+
+            # The script takes paths relative to the working directory
+            monkeypatch.chdir(tmp_path)
+            assert main(["stock_items.csv", "copy.snap"]) == 0
+            assert len(load_snapshot(str(tmp_path / "copy.snap"))) == 5
+
+            logger.info("Snapshot file handler tests passed")
+        except Exception as e:
+            logger.error(f"Snapshot file handler tests failed: {str(e)}")
+            raise
+
+    def test_recompaction_off_the_write_path(self, tmp_path, monkeypatch):
+        """TC-SN-06: Writes recompact in the background, past bad rows, once per snapshot_every."""
+        try:
+            csv_path = str(tmp_path / "stock_items.csv")
+            snap_path = str(tmp_path / "stock_items.snap")
+            file_handler = StockFileHandler(csv_path, snapshot_file=snap_path, snapshot_every=2)
+            file_handler.save_item(NavSys("NS100", 1, 9.99, "Garmin"))
+            with open(csv_path, 'a', encoding='utf-8') as file:
+                file.write("NavSys,NS999,many,1.0,Garmin\n")
+
+            import utils.file_handler
+            calls = []
+
+            def counting_write_snapshot(rows, *args, **kwargs):
+                calls.append(len(rows))
+                return write_snapshot(rows, *args, **kwargs)
+
+            monkeypatch.setattr(utils.file_handler, 'write_snapshot', counting_write_snapshot)
+            file_handler._writes_since_snapshot = 0
+            for i in range(6):
+                file_handler.save_item(NavSys(f"NS10{i + 1}", 1, 9.99, "Garmin"))
+                file_handler.wait_for_recompaction()
+            assert len(calls) == 3
+            # The bad row is left out of the snapshot instead of failing every compaction
+            assert len(load_snapshot(snap_path)) == 7
+
+            logger.info("Background recompaction tests passed")
+        except Exception as e:
+            logger.error(f"Background recompaction tests failed: {str(e)}")
+            raise
+
+    def test_cold_load_from_columns(self, tmp_path, monkeypatch):
+        """TC-SN-07: A cold handler reads items and SKUs from the snapshot columns, not rebuilt rows."""
+        try:
+            csv_path = str(tmp_path / "stock_items.csv")
+            snap_path = str(tmp_path / "stock_items.snap")
+            file_handler = StockFileHandler(csv_path, snapshot_file=snap_path)
+            for i in range(3):
+                file_handler.save_item(NavSys(f"NS10{i}", 10 + i, 100.0 + i, "TomTom"))
+            with open(csv_path, 'a', encoding='utf-8') as file:
+                file.write("Unknown,XX1,1,1.0,Brand\n")
+            assert file_handler.compact() == 4
+            expected = [item.to_dict() for item in file_handler.load_items()]
+
+            def no_rows(self):
+                raise AssertionError("rows() rebuilt on a read")
+
+            cold = StockFileHandler(csv_path, snapshot_file=snap_path)
+            monkeypatch.setattr('utils.file_handler.csv.reader', None)
+            monkeypatch.setattr(InventorySnapshot, 'rows', no_rows)
+            cold.warm()
+            assert [item.to_dict() for item in cold.load_items()] == expected
+            assert cold.get_item("NS101").quantity == 11
+            assert cold.get_item("NS999") is None
+            monkeypatch.undo()
+
+            # The first write loads the rows, and the snapshot stops serving reads
+            assert cold.delete_item("NS101")
+            assert cold.get_item("NS101") is None
+            assert [item.stock_code for item in cold.load_items()] == ["NS100", "NS102"]
+
+            logger.info("Snapshot cold load tests passed")
+        except Exception as e:
+            logger.error(f"Snapshot cold load tests failed: {str(e)}")
+            raise
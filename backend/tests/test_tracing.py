@@ -0,0 +1,81 @@
+import json
+import logging
+from utils.logger import JsonFormatter, RequestContextFilter, setup_logger
+from utils.tracing import count, current_trace, phase
+
+logger = setup_logger(__name__)
+
+def completed(caplog, level=logging.INFO):
+    """Get the request records logged by the tracer at `level`."""
+    return [record for record in caplog.records
+            if record.name == 'utils.tracing' and record.levelno == level]
+
+class TestTracing:
+    """Test suite for request tracing and structured logs."""
+
+    def test_request_trace(self, app, caplog):
+        """TC-TR-01: Requests carry an ID and log their phases and row counts."""
+        try:
+            client = app.test_client()
+            caplog.set_level(logging.INFO, logger='utils.tracing')
+            response = client.post('/api/items/NS100/sell', json={'quantity': 1},
+                                   headers={'X-Request-ID': 'checkout-42'})
+            assert response.status_code == 200
+            assert response.headers['X-Request-ID'] == 'checkout-42'
+
+            record = completed(caplog)[-1]
+            assert record.route == 'POST /api/items/<stock_code>/sell' and record.status == 200
+            assert {'lookup', 'mutate', 'persist', 'record_sale'} <= set(record.phases_ms)
+            assert record.counts['rows_written'] == 15
+            assert record.duration_ms >= record.phases_ms['persist']
+
+            # A generated ID when the client sends none
+            generated = client.get('/api/items/NS101').headers['X-Request-ID']
+            assert len(generated) == 32 and generated != 'checkout-42'
+
+            logger.info("Request trace tests passed")
+        except Exception as e:
+            logger.error(f"Request trace tests failed: {str(e)}")
+            raise
+
+    def test_slow_request(self, app, caplog):
+        """TC-TR-02: Requests over SLOW_REQUEST_MS are logged as warnings with their spans."""
+        try:
+            app.config['SLOW_REQUEST_MS'] = 0.001
+            caplog.set_level(logging.INFO, logger='utils.tracing')
+            app.test_client().put('/api/items/NS102', json={'price': 120.0})
+
+            record = completed(caplog, logging.WARNING)[-1]
+            assert record.getMessage().startswith('Slow request PUT /api/items/<stock_code>')
+            spans = [span['phase'] for span in record.trace]
+            assert 'lookup' in spans and 'persist' in spans
+            assert all(span['duration_ms'] >= 0 for span in record.trace)
+
+            logger.info("Slow request tests passed")
+        except Exception as e:
+            logger.error(f"Slow request tests failed: {str(e)}")
+            raise
+
+    def test_json_format(self):
+        """TC-TR-03: JSON records include the request ID, route and extra fields."""
+        try:
+            record = logging.LogRecord('utils.tracing', logging.INFO, __file__, 1,
+                                       "%s %s in %.1f ms", ('GET /api/items', 200, 1.5), None)
+            record.status = 200
+            record.phases_ms = {'load': 0.5}
+            RequestContextFilter().filter(record)
+            entry = json.loads(JsonFormatter().format(record))
+            assert entry['message'] == 'GET /api/items 200 in 1.5 ms'
+            assert entry['level'] == 'INFO' and entry['phases_ms'] == {'load': 0.5}
+            # Outside a request there is no request ID to report
+            assert 'request_id' not in entry
+
+            # TC-TR-04: phase() and count() do nothing outside a request
+            with phase('load'):
+                count('rows_loaded', 3)
+            assert current_trace() is None
+
+            logger.info("JSON log format tests passed")
+        except Exception as e:
+            logger.error(f"JSON log format tests failed: {str(e)}")
+            raise
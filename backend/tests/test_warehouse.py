@@ -0,0 +1,153 @@
+import threading
+from asgi import AsgiStockApp
+from models import StockItem
+from utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class WarehouseCam(StockItem, type_tag='TestWarehouseCam'):
+    """Item type with a brand and a further column, registered for these tests."""
+
+    columns = ('brand', 'resolution')
+
+    def get_stock_name(self) -> str:
+        return "Dash camera"
+
+class TestWarehouses:
+    """Test suite for warehouse-sharded inventory."""
+
+    def test_branch_stock_and_aggregation(self, app, client):
+        """TC-WH-01: Branch stock is kept per shard and aggregated in listings."""
+        try:
+            app.config['WAREHOUSES'] = ['main', 'north', 'south']
+
+            # A SKU new to a branch takes price and brand from another warehouse
+            response = client.post('/api/warehouses/north/items/NS100/restock', json={'quantity': 40})
+            assert response.status_code == 200
+            assert response.get_json()['item']['brand'] == 'TomTom'
+            client.post('/api/warehouses/south/items/NS100/restock', json={'quantity': 100})
+            response = client.post('/api/warehouses/north/items/NS100/sell', json={'quantity': 15})
+            assert response.get_json()['item']['quantity'] == 25
+
+            inventory = client.get('/api/inventory?stock_code=NS100').get_json()
+            assert inventory == {'stock_code': 'NS100', 'quantity': 130,
+                                 'warehouses': {'main': 5, 'north': 25, 'south': 100}}
+            items = client.get('/api/inventory').get_json()['items']
+            assert len(items) == 15
+            assert next(i for i in items if i['stock_code'] == 'NS101')['warehouses'] == {'main': 10}
+
+            summary = client.get('/api/warehouses').get_json()['warehouses']
+            assert [(w['name'], w['items'], w['units']) for w in summary][1:] == \
+                [('north', 1, 25), ('south', 1, 100)]
+            assert (app.config['CSV_FILE'].parent / 'stock_items.north.csv').exists()
+
+            # TC-WH-02: Limits and stock checks apply per warehouse
+            assert client.post('/api/warehouses/south/items/NS100/restock',
+                               json={'quantity': 1}).status_code == 400
+            assert client.post('/api/warehouses/north/items/NS100/sell',
+                               json={'quantity': 26}).status_code == 400
+            assert client.post('/api/warehouses/north/items/NEW1/restock',
+                               json={'quantity': 1}).status_code == 400
+            assert client.post('/api/warehouses/east/items/NS100/sell',
+                               json={'quantity': 1}).status_code == 404
+            assert client.get('/api/warehouses/east/items').status_code == 404
+            assert client.post('/api/warehouses/north/items/NS100/restock',
+                               json={'quantity': 1, 'brand': '  '}).status_code == 400
+
+
+            # Branch sales are recorded and branch changes have their own feed
+            history = client.get('/api/sales/history').get_json()
+            assert sum(day['sales'] for day in history['daily']) == 15
+            changes = client.get('/api/changes?warehouse=north').get_json()['changes']
+            assert [change['op'] for change in changes] == ['add', 'sell']
+
+            # TC-WH-05: A SKU copied to a branch keeps its registered item type
+            with app.app_context():
+                from app import get_file_handler, get_warehouses
+                get_file_handler().save_item(WarehouseCam.from_row(
+                    ['TestWarehouseCam', 'CAM1', '5', '80.0', 'Nextbase', '4K']))
+                item = get_warehouses().restock('north', 'CAM1', 3, brand='Garmin')
+            assert isinstance(item, WarehouseCam)
+            assert item.to_row() == ['TestWarehouseCam', 'CAM1', 3, 80.0, 'Garmin', '4K']
+
+            # Under ASGI only branch writes bypass the single writer queue
+            asgi_app = AsgiStockApp(app)
+            assert asgi_app._is_branch_write('/api/warehouses/north/items/NS100/sell')
+            assert not asgi_app._is_branch_write('/api/warehouses/main/items/NS100/sell')
+            assert not asgi_app._is_branch_write('/api/items/NS100/sell')
+
+            logger.info("Warehouse stock tests passed")
+        except Exception as e:
+            logger.error(f"Warehouse stock tests failed: {str(e)}")
+            raise
+
+    def test_concurrent_shard_writes(self, app):
+        """TC-WH-03: Concurrent sells in one shard are serialized; shards write independently."""
+        try:
+            app.config['WAREHOUSES'] = ['main', 'north', 'south']
+            with app.app_context():
+                from app import get_warehouses
+                warehouses = get_warehouses()
+                for name in ('north', 'south'):
+                    warehouses.restock(name, 'NS105', 100)
+
+            def sell(name):
+                with app.app_context():
+                    for _ in range(10):
+                        get_warehouses().sell(name, 'NS105', 1)
+
+            threads = [threading.Thread(target=sell, args=(name,))
+                       for name in ('north', 'south') for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            with app.app_context():
+                assert warehouses.locations('NS105') == {'main': 30, 'north': 70, 'south': 70}
+
+            # One unreadable shard row is skipped rather than failing every listing
+            from utils.warehouse import shard_path
+            with open(shard_path(app.config['CSV_FILE'], 'south'), 'a', encoding='utf-8') as file:
+                file.write("NavSys,NS999,lots,1.0,Garmin\n")
+            summary = {entry['name']: entry for entry in warehouses.summary()}
+            assert summary['south']['items'] == 1 and summary['south']['units'] == 70
+            totals = {entry['stock_code']: entry for entry in warehouses.aggregate()}
+            assert 'NS999' not in totals and totals['NS105']['quantity'] == 170
+            assert totals['NS105']['brand'] == 'GeoVision'
+
+            logger.info("Concurrent shard write tests passed")
+        except Exception as e:
+            logger.error(f"Concurrent shard write tests failed: {str(e)}")
+            raise
+
+    def test_branch_listeners(self, app, client):
+        """TC-WH-06: Branch writes reach the event bus, their own item cache and reorder index."""
+        try:
+            app.config['WAREHOUSES'] = ['main', 'north']
+            with app.app_context():
+                from app import get_event_bus, get_file_handler, get_warehouses
+                subscription = get_event_bus().subscribe()
+                shard = get_warehouses().shard('north')
+                assert shard.item_cache is not None
+                assert shard.item_cache is not get_file_handler().item_cache
+
+            client.post('/api/warehouses/north/items/NS100/restock', json={'quantity': 40})
+            client.post('/api/warehouses/north/items/NS100/sell', json={'quantity': 35})
+            events = [event.decode('utf-8') for event in subscription.drain()]
+            subscription.close()
+            assert sum('"warehouse":"north"' in event for event in events if 'item_changed' in event) == 2
+            with app.app_context():
+                assert shard.get_item('NS100').quantity == 5
+
+            # Each warehouse has its own low stock list, under the shared thresholds
+            low = client.get('/api/items/low-stock?warehouse=north').get_json()
+            assert [item['stock_code'] for item in low['items']] == ['NS100']
+            assert client.get('/api/items/low-stock?warehouse=main').get_json() == \
+                client.get('/api/items/low-stock').get_json()
+            assert client.get('/api/items/low-stock?warehouse=east').status_code == 404
+
+            logger.info("Branch listener tests passed")
+        except Exception as e:
+            logger.error(f"Branch listener tests failed: {str(e)}")
+            raise
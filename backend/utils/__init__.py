@@ -1,5 +1,6 @@
 # utils/__init__.py
 
+import logging
 from .logger import setup_logger
 from .exceptions import StockError
 from .file_handler import StockFileHandler
@@ -10,8 +11,7 @@ __all__ = [
     'StockFileHandler'
 ]
 
-# Initialize logger for the utils package
-logger = setup_logger(__name__)
+# Logging is configured by the app factory or the entry script, not on import
+logger = logging.getLogger(__name__)
 
-# Log utils package initialization
-logger.info("Utils package initialized")
+logger.debug("Utils package initialized")
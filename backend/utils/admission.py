@@ -0,0 +1,529 @@
+# utils/admission.py
+
+"""
+Admission control: per-client rate limits and prioritised concurrency.
+
+Every request is put in a traffic class by its endpoint:
+
+    checkout  selling stock (highest priority)
+    write     other changes to items, prices and thresholds
+    read      lookups and listings
+    report    exports, sales reports and bulk repricing (lowest priority)
+
+Health probes, the event stream and /api/admin/ are never limited.
+
+A request passes two checks before it runs:
+
+1. The client's token bucket. Buckets refill at `rate` tokens per second
+   up to `burst`. Each class costs a number of tokens, so one client
+   pulling exports runs out long before one selling. An empty bucket
+   gets 429 with Retry-After set to the time until it has enough tokens.
+2. A concurrency slot. At most `max_concurrent` requests run at once,
+   and each class can have a lower limit of its own (reports default to
+   2). A request that cannot start waits in a queue that is served
+   strictly by class priority, so a sale queued behind a pile of
+   reports starts at the next free slot. A request that waits longer
+   than its class's queue timeout, or finds its class's queue full,
+   gets 429.
+
+Because reports cannot hold more than their own slots, and sales jump
+the queue, checkout latency stays bounded however many reports arrive.
+
+Under asgi.py both checks run on the event loop before a request is
+given a pool thread or a place in the writer queue (admit_async), and
+max_concurrent is capped at the pool's size: a request queued for a
+slot costs a coroutine, and every admitted request has a thread to run
+on. The before_request hook then lets the request through.
+
+Buckets and slots live in the process, so both checks only work where
+every request runs in one multithreaded process: the development server
+or the asgi.py front end, which is the production entry point and has
+admission control on (ProductionConfig). Under prefork sync workers
+(gunicorn.conf.py) each worker runs one request at a time with buckets
+of its own: the concurrency limits never engage and a client gets
+WORKERS times its rate. There (PreforkConfig) ADMISSION_SUPPORTED is
+False and admission control cannot be switched on.
+"""
+
+import asyncio
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from flask import current_app, g, jsonify, request
+from werkzeug.datastructures import EnvironHeaders
+from utils.exceptions import CapacityError, ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Highest priority first
+TRAFFIC_CLASSES = ('checkout', 'write', 'read', 'report')
+PRIORITY = {name: rank for rank, name in enumerate(TRAFFIC_CLASSES)}
+
+# Endpoints outside the default method-based classes (GET is read, others write)
+DEFAULT_ROUTE_CLASSES = {
+    'api.sell_item': 'checkout',
+    'api.sell_warehouse_item': 'checkout',
+    'api.export_items': 'report',
+    'api.export_sales': 'report',
+    'api.reprice_items': 'report',
+    'api.get_sales_history': 'report',
+    'api.get_sales_report': 'report',
+    'api.get_sales_summary': 'report',
+    'api.get_at_risk_items': 'report',
+}
+EXEMPT_ENDPOINTS = ('api.health', 'api.ready', 'api.stream_events', 'static')
+EXEMPT_PREFIX = '/api/admin/'
+
+DEFAULT_COSTS = {'checkout': 1, 'write': 1, 'read': 1, 'report': 10}
+DEFAULT_CLASS_LIMITS = {'report': 2}
+DEFAULT_QUEUE_TIMEOUTS = {'checkout': 5.0, 'write': 2.0, 'read': 1.0, 'report': 0.5}
+
+# Set in the WSGI environ by a front end that has already admitted the request
+ADMITTED_ENVIRON_KEY = 'stock.admission_class'
+
+
+class AdmissionRejected(CapacityError):
+    """A request refused by admission control, with the seconds to wait before retrying."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def retry_after_header(seconds: float) -> str:
+    """Format a Retry-After value in whole seconds (60 if the wait is unbounded)."""
+    if not math.isfinite(seconds):
+        seconds = 60
+    return str(max(1, math.ceil(seconds)))
+
+
+def _wake(future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class TokenBuckets:
+    """Per-client token buckets; the least recently seen clients are dropped past max_clients."""
+
+    def __init__(self, rate: float, burst: float, max_clients: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: 'OrderedDict[str, List[float]]' = OrderedDict()  # client -> [tokens, updated]
+        self._lock = threading.Lock()
+
+    def take(self, client: str, cost: float) -> float:
+        """
+        Take `cost` tokens from the client's bucket.
+
+        Returns:
+            float: 0 if taken, otherwise the seconds until enough tokens are available
+        """
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = [self.burst, now]
+                if len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                return 0.0
+            if self.rate <= 0 or cost > self.burst:
+                return float('inf')
+            return (cost - bucket[0]) / self.rate
+
+    def clients(self) -> int:
+        return len(self._buckets)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class ConcurrencyLimiter:
+    """Concurrency slots handed out to waiting requests strictly by class priority."""
+
+    def __init__(self, max_concurrent: int, class_limits: Optional[Dict[str, int]] = None,
+                 max_queue: int = 64):
+        self.max_concurrent = max_concurrent
+        self.class_limits = dict(class_limits or {})
+        self.max_queue = max_queue
+        self.running = 0
+        self.in_flight = {name: 0 for name in TRAFFIC_CLASSES}
+        self.queued = {name: 0 for name in TRAFFIC_CLASSES}
+        self._waiters: List[tuple] = []  # (priority, seq, traffic class)
+        self._async_wakers: Dict[tuple, tuple] = {}  # waiter -> (loop, future)
+        self._seq = 0
+        self._condition = threading.Condition()
+
+    def _can_start(self, traffic_class: str) -> bool:
+        limit = self.class_limits.get(traffic_class)
+        return (self.running < self.max_concurrent
+                and (limit is None or self.in_flight[traffic_class] < limit))
+
+    def _first_startable(self) -> Optional[tuple]:
+        for waiter in sorted(self._waiters):
+            if self._can_start(waiter[2]):
+                return waiter
+        return None
+
+    def _start(self, traffic_class: str) -> None:
+        self.running += 1
+        self.in_flight[traffic_class] += 1
+
+    def _notify(self) -> None:
+        """Wake every waiting thread and coroutine to recheck (condition held)."""
+        self._condition.notify_all()
+        for loop, future in self._async_wakers.values():
+            loop.call_soon_threadsafe(_wake, future)
+        self._async_wakers.clear()
+
+    def _enqueue(self, traffic_class: str, timeout: float) -> tuple:
+        if self.queued[traffic_class] >= self.max_queue:
+            raise AdmissionRejected(f"Too many queued {traffic_class} requests", timeout or 1.0)
+        self._seq += 1
+        waiter = (PRIORITY[traffic_class], self._seq, traffic_class)
+        self._waiters.append(waiter)
+        self.queued[traffic_class] += 1
+        return waiter
+
+    def _dequeue(self, waiter: tuple) -> None:
+        self._waiters.remove(waiter)
+        self.queued[waiter[2]] -= 1
+        # The next waiter in line may be startable now
+        self._notify()
+
+    @staticmethod
+    def _timed_out(traffic_class: str, timeout: float) -> AdmissionRejected:
+        return AdmissionRejected(f"Server busy: {traffic_class} request timed out "
+                                 f"after {timeout:g} s in the queue", timeout or 1.0)
+
+    def acquire(self, traffic_class: str, timeout: float) -> float:
+        """
+        Wait for a slot for a request of `traffic_class`.
+
+        Raises:
+            AdmissionRejected: If the class's queue is full or the wait times out
+
+        Returns:
+            float: Seconds spent queued
+        """
+        with self._condition:
+            if not self._waiters and self._can_start(traffic_class):
+                self._start(traffic_class)
+                return 0.0
+            waiter = self._enqueue(traffic_class, timeout)
+            started = time.monotonic()
+            deadline = started + timeout
+            try:
+                while self._first_startable() is not waiter:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._timed_out(traffic_class, timeout)
+                    self._condition.wait(remaining)
+                self._start(traffic_class)
+                return time.monotonic() - started
+            finally:
+                self._dequeue(waiter)
+
+    async def acquire_async(self, traffic_class: str, timeout: float) -> float:
+        """
+        Like acquire(), but wait on the running event loop instead of blocking a thread.
+
+        Raises:
+            AdmissionRejected: If the class's queue is full or the wait times out
+
+        Returns:
+            float: Seconds spent queued
+        """
+        loop = asyncio.get_running_loop()
+        with self._condition:
+            if not self._waiters and self._can_start(traffic_class):
+                self._start(traffic_class)
+                return 0.0
+            waiter = self._enqueue(traffic_class, timeout)
+        started = time.monotonic()
+        deadline = started + timeout
+        try:
+            while True:
+                with self._condition:
+                    if self._first_startable() is waiter:
+                        self._start(traffic_class)
+                        return time.monotonic() - started
+                    woken = loop.create_future()
+                    self._async_wakers[waiter] = (loop, woken)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self._timed_out(traffic_class, timeout)
+                try:
+                    await asyncio.wait_for(woken, remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._condition:
+                self._async_wakers.pop(waiter, None)
+                self._dequeue(waiter)
+
+    def release(self, traffic_class: str) -> None:
+        """Free a slot taken by acquire()."""
+        with self._condition:
+            self.running -= 1
+            self.in_flight[traffic_class] -= 1
+            self._notify()
+
+    def reconfigure(self, max_concurrent: Optional[int] = None,
+                    class_limits: Optional[Dict[str, int]] = None) -> None:
+        with self._condition:
+            if max_concurrent is not None:
+                self.max_concurrent = max_concurrent
+            if class_limits is not None:
+                self.class_limits = dict(class_limits)
+            self._notify()
+
+
+class AdmissionController:
+    """Flask extension applying token buckets and prioritised concurrency limits."""
+
+    def __init__(self, app=None):
+        self.enabled = False
+        # False where requests are spread over processes that do not share this state
+        self.supported = True
+        self.route_classes = dict(DEFAULT_ROUTE_CLASSES)
+        self.costs = dict(DEFAULT_COSTS)
+        self.queue_timeouts = dict(DEFAULT_QUEUE_TIMEOUTS)
+        self.client_header: Optional[str] = None
+        # Threads available to run admitted requests, where fewer than max_concurrent
+        self.max_concurrent_cap: Optional[int] = None
+        self.buckets = TokenBuckets(rate=50.0, burst=100.0)
+        self.limiter = ConcurrencyLimiter(max_concurrent=32, class_limits=DEFAULT_CLASS_LIMITS)
+        self._lock = threading.Lock()
+        self._reset_counters()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        """Read ADMISSION_* settings and register the request hooks."""
+        config = app.config
+        self.route_classes.update(config.get('ADMISSION_ROUTE_CLASSES', {}))
+        self.costs.update(config.get('ADMISSION_COSTS', {}))
+        self.queue_timeouts.update(config.get('ADMISSION_QUEUE_TIMEOUTS', {}))
+        self.client_header = config.get('ADMISSION_CLIENT_HEADER')
+        self.buckets.max_clients = config.get('ADMISSION_MAX_CLIENTS', 10000)
+        self.limiter.max_queue = config.get('ADMISSION_MAX_QUEUE', 64)
+        self.supported = config.get('ADMISSION_SUPPORTED', True)
+        enabled = config.get('ADMISSION_ENABLED', False)
+        if enabled and not self.supported:
+            logger.warning("Admission control left off: it needs every request in one "
+                           "multithreaded process; serve through asgi.py to use it")
+            enabled = False
+        self.configure(enabled=enabled,
+                       rate=config.get('ADMISSION_RATE', 50.0),
+                       burst=config.get('ADMISSION_BURST', 100.0),
+                       max_concurrent=config.get('ADMISSION_MAX_CONCURRENT', 32),
+                       class_limits=config.get('ADMISSION_CLASS_LIMITS', DEFAULT_CLASS_LIMITS))
+        app.extensions['admission_controller'] = self
+        app.before_request(self.admit)
+        app.teardown_request(self.release)
+
+    def configure(self, enabled: Optional[bool] = None, rate: Optional[float] = None,
+                  burst: Optional[float] = None, max_concurrent: Optional[int] = None,
+                  class_limits: Optional[Dict[str, int]] = None) -> Dict:
+        """
+        Change settings at runtime; None leaves a setting as it is.
+
+        Raises:
+            ValidationError: If a rate, burst or limit is out of range, a class
+                is unknown, or enabling is asked for where it is not supported
+        """
+        if enabled and not self.supported:
+            raise ValidationError("Admission control needs every request in one multithreaded "
+                                  "process; these workers each keep their own limits. "
+                                  "Serve through asgi.py to use it")
+        if rate is not None and float(rate) <= 0:
+            raise ValidationError("rate must be greater than 0")
+        if burst is not None and float(burst) < 1:
+            raise ValidationError("burst must be at least 1")
+        if max_concurrent is not None and int(max_concurrent) < 1:
+            raise ValidationError("max_concurrent must be at least 1")
+        if (max_concurrent is not None and self.max_concurrent_cap is not None
+                and int(max_concurrent) > self.max_concurrent_cap):
+            raise ValidationError(f"max_concurrent cannot exceed the {self.max_concurrent_cap} "
+                                  f"threads serving requests")
+        if class_limits is not None:
+            unknown = [name for name in class_limits if name not in TRAFFIC_CLASSES]
+            if unknown:
+                raise ValidationError(f"Unknown traffic classes: {', '.join(unknown)}")
+            class_limits = {name: int(limit) for name, limit in class_limits.items()}
+            if any(limit < 1 for limit in class_limits.values()):
+                raise ValidationError("Class limits must be at least 1")
+        if rate is not None:
+            self.buckets.rate = float(rate)
+        if burst is not None:
+            self.buckets.burst = float(burst)
+        self.limiter.reconfigure(int(max_concurrent) if max_concurrent is not None else None,
+                                 class_limits)
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        return self.settings()
+
+    def cap_concurrency(self, cap: int) -> None:
+        """Keep max_concurrent at or below `cap`, the threads that run admitted requests."""
+        self.max_concurrent_cap = cap
+        if self.limiter.max_concurrent > cap:
+            logger.info(f"Admission max_concurrent lowered from {self.limiter.max_concurrent} "
+                        f"to the {cap} threads serving requests")
+            self.limiter.reconfigure(max_concurrent=cap)
+
+    def settings(self) -> Dict:
+        return {
+            'enabled': self.enabled,
+            'supported': self.supported,
+            'rate': self.buckets.rate,
+            'burst': self.buckets.burst,
+            'max_concurrent': self.limiter.max_concurrent,
+            'max_concurrent_cap': self.max_concurrent_cap,
+            'class_limits': dict(self.limiter.class_limits),
+            'costs': dict(self.costs),
+            'queue_timeouts': dict(self.queue_timeouts),
+        }
+
+    def classify(self) -> Optional[str]:
+        """Get the current request's traffic class, or None if it is never limited."""
+        return self.classify_endpoint(request.endpoint, request.method, request.path)
+
+    def classify_endpoint(self, endpoint: Optional[str], method: str, path: str) -> Optional[str]:
+        """Get the traffic class of a request to `endpoint`, or None if it is never limited."""
+        if endpoint is None or endpoint in EXEMPT_ENDPOINTS:
+            return None
+        if path.startswith(EXEMPT_PREFIX) or method == 'OPTIONS':
+            return None
+        traffic_class = self.route_classes.get(endpoint)
+        if traffic_class is None:
+            traffic_class = 'read' if method in ('GET', 'HEAD') else 'write'
+        return traffic_class
+
+    def client_id(self, environ: Optional[Dict] = None) -> str:
+        """Identify the client by the configured header (set by a trusted proxy) or address."""
+        if environ is None:
+            environ = request.environ
+        if self.client_header:
+            client = EnvironHeaders(environ).get(self.client_header)
+            if client:
+                return client[:128]
+        return environ.get('REMOTE_ADDR') or 'unknown'
+
+    # --- request hooks ---------------------------------------------------
+
+    def admit(self):
+        """before_request hook: refuse the request with 429 or take a slot for it."""
+        if not self.enabled or request.environ.get(ADMITTED_ENVIRON_KEY):
+            return None
+        traffic_class = self.classify()
+        if traffic_class is None:
+            return None
+        try:
+            self._take_tokens(traffic_class, self.client_id())
+        except AdmissionRejected as e:
+            return self._reject(str(e), e.retry_after)
+        try:
+            queued = self.limiter.acquire(traffic_class, self.queue_timeouts.get(traffic_class, 1.0))
+        except AdmissionRejected as e:
+            self._shed(traffic_class, f"{request.method} {request.path}", e)
+            return self._reject(str(e), e.retry_after)
+        g._admission_class = traffic_class
+        self._admitted(traffic_class, queued)
+        return None
+
+    async def admit_async(self, traffic_class: str, client: str, description: str) -> None:
+        """
+        Take tokens and a slot for a request from a front end running on an event loop.
+
+        The caller passes the request on with ADMITTED_ENVIRON_KEY set and
+        calls limiter.release(traffic_class) once the response is sent.
+
+        Raises:
+            AdmissionRejected: If the client is over its rate or the request is shed
+        """
+        self._take_tokens(traffic_class, client)
+        try:
+            queued = await self.limiter.acquire_async(traffic_class,
+                                                      self.queue_timeouts.get(traffic_class, 1.0))
+        except AdmissionRejected as e:
+            self._shed(traffic_class, description, e)
+            raise
+        self._admitted(traffic_class, queued)
+
+    def _take_tokens(self, traffic_class: str, client: str) -> None:
+        wait = self.buckets.take(client, self.costs.get(traffic_class, 1))
+        if wait:
+            with self._lock:
+                self._counters[traffic_class]['rate_limited'] += 1
+            raise AdmissionRejected(f"Rate limit exceeded for {traffic_class} requests", wait)
+
+    def _shed(self, traffic_class: str, description: str, error: AdmissionRejected) -> None:
+        with self._lock:
+            self._counters[traffic_class]['shed'] += 1
+        logger.warning("Shed %s request %s: %s", traffic_class, description, error)
+
+    def _admitted(self, traffic_class: str, queued: float) -> None:
+        counters = self._counters[traffic_class]
+        with self._lock:
+            counters['admitted'] += 1
+            counters['queued_seconds'] += queued
+            counters['max_queued_seconds'] = max(counters['max_queued_seconds'], queued)
+
+    def release(self, exception=None) -> None:
+        """teardown_request hook: free the request's slot."""
+        traffic_class = g.pop('_admission_class', None)
+        if traffic_class is not None:
+            self.limiter.release(traffic_class)
+
+    def _reject(self, message: str, retry_after: float):
+        response = jsonify({'error': message})
+        response.headers['Retry-After'] = retry_after_header(retry_after)
+        return response, 429
+
+    # --- statistics ------------------------------------------------------
+
+    def _reset_counters(self) -> None:
+        self._counters = {name: {'admitted': 0, 'rate_limited': 0, 'shed': 0,
+                                 'queued_seconds': 0.0, 'max_queued_seconds': 0.0}
+                          for name in TRAFFIC_CLASSES}
+
+    def stats(self) -> Dict:
+        """Get settings, running and queued requests and counters per traffic class."""
+        limiter = self.limiter
+        with self._lock:
+            classes = {}
+            for name, counters in self._counters.items():
+                admitted = counters['admitted']
+                classes[name] = {
+                    'in_flight': limiter.in_flight[name],
+                    'queued': limiter.queued[name],
+                    'admitted': admitted,
+                    'rate_limited': counters['rate_limited'],
+                    'shed': counters['shed'],
+                    'mean_queued_ms': round(counters['queued_seconds'] * 1000 / admitted, 3) if admitted else 0.0,
+                    'max_queued_ms': round(counters['max_queued_seconds'] * 1000, 3),
+                }
+        return {'settings': self.settings(), 'running': limiter.running,
+                'clients': self.buckets.clients(), 'classes': classes}
+
+    def reset(self) -> None:
+        """Refill every client's bucket and zero the counters."""
+        self.buckets.clear()
+        with self._lock:
+            self._reset_counters()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Get the current app's admission controller."""
+    return current_app.extensions['admission_controller']
@@ -0,0 +1,291 @@
+# utils/analytics.py
+
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from utils.exceptions import FileOperationError, ValidationError
+from utils.parallel_csv import parse_columns, use_parallel
+from utils.pricing import DEFAULT_VAT_RATE
+
+logger = logging.getLogger(__name__)
+
+# Column dtypes for sales_history.csv; codes and brands repeat heavily
+SALES_DTYPES = {
+    'stock_code': 'category',
+    'quantity': 'int64',
+    'price': 'float64',
+    'brand': 'category',
+    'revenue': 'float64',
+}
+
+PERIODS = {'week': 'W', 'month': 'M'}
+
+# The same columns for the parallel loader
+SALES_SCHEMA = [('date', 'category'), ('stock_code', 'category'), ('quantity', 'int'),
+                ('price', 'float'), ('brand', 'category'), ('revenue', 'float')]
+
+
+class SalesAnalytics:
+    """
+    Sales reporting engine backed by a pandas DataFrame.
+
+    The sales file is parsed once per data version (its inode, size and
+    mtime) and every report computed from that version is cached, so
+    repeated dashboard requests cost a dictionary lookup until the next
+    sale is recorded. pandas is imported on first use only.
+
+    before_read, if given, is called before the file is examined; the
+    sales handler uses it to flush buffered rows. With parallel_load
+    workers, a large file is parsed by utils.parallel_csv instead of
+    pandas' single-threaded reader.
+
+    pricing, if set to a utils.pricing.PriceBook, supplies the VAT rate in
+    effect on each sale's date; without one the standard 17.5% applies.
+    """
+
+    def __init__(self, file_path: str, before_read: Optional[Callable[[], None]] = None,
+                 parallel_load: int = 0):
+        self.file_path = file_path
+        self.before_read = before_read
+        self.parallel_load = parallel_load
+        self._frame = None
+        self._version: Optional[Tuple[int, int, int]] = None
+        self._reports: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+        self.pricing = None
+
+    def data_version(self) -> Tuple[int, int, int]:
+        """Get (inode, size, mtime) identifying the current sales data."""
+        if self.before_read is not None:
+            self.before_read()
+        stat = os.stat(self.file_path)
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def frame(self):
+        """Get the sales DataFrame for the current data version."""
+        return self._versioned_frame()[1]
+
+    def _versioned_frame(self) -> Tuple[Tuple[int, int, int], object]:
+        """Get the current data version and its DataFrame, read together."""
+        version = self.data_version()
+        with self._lock:
+            if self._frame is None or version != self._version:
+                self._frame = self._load()
+                self._version = version
+                self._reports = {}
+            return self._version, self._frame
+
+    def _load(self):
+        """Read the sales file with typed columns and parsed dates."""
+        import pandas as pd
+
+        if use_parallel(os.path.getsize(self.file_path), self.parallel_load):
+            return self._load_parallel()
+        try:
+            # No NA parsing: 'N/A' (the fallback brand), 'NA' or 'NULL' are real values
+            frame = pd.read_csv(self.file_path, dtype=SALES_DTYPES,
+                                keep_default_na=False, na_values=[])
+            # Converted explicitly so an empty file still gets a datetime column
+            frame['date'] = pd.to_datetime(frame['date'], format='%Y-%m-%d')
+            logger.info(f"Loaded {len(frame)} sales rows for analytics")
+            return frame
+        except ValueError as e:
+            # A malformed row (a torn write, a hand edit): parse row by row
+            # instead, skipping the rows that do not fit
+            logger.warning(f"Sales data has malformed rows ({str(e)}); loading the valid ones")
+            return self._load_parallel(workers=0)
+        except Exception as e:
+            logger.error(f"Error loading sales data: {str(e)}")
+            raise FileOperationError(f"Failed to load sales data: {str(e)}")
+
+    def _load_parallel(self, workers: Optional[int] = None):
+        """
+        Build the sales DataFrame from columns parsed on the parallel loader.
+
+        Rows that do not fit the schema or have an invalid date are skipped
+        and logged. workers defaults to parallel_load; 0 parses in-thread.
+        """
+        import pandas as pd
+
+        if workers is None:
+            workers = self.parallel_load
+        try:
+            parsed = parse_columns(self.file_path, SALES_SCHEMA, workers)
+            # Dates repeat: parse each distinct one once, then index by code
+            dates = pd.to_datetime(pd.Index(parsed.categories['date']), format='%Y-%m-%d',
+                                   errors='coerce')
+            frame = pd.DataFrame({
+                'date': dates[parsed.columns['date']] if len(parsed) else pd.DatetimeIndex([]),
+                'stock_code': pd.Categorical.from_codes(parsed.columns['stock_code'],
+                                                        parsed.categories['stock_code']),
+                'quantity': parsed.columns['quantity'],
+                'price': parsed.columns['price'],
+                'brand': pd.Categorical.from_codes(parsed.columns['brand'],
+                                                   parsed.categories['brand']),
+                'revenue': parsed.columns['revenue'],
+            })
+            if dates.hasnans:
+                valid = frame['date'].notna()
+                logger.error(f"Skipping {int((~valid).sum())} sales rows with an invalid date")
+                frame = frame[valid].reset_index(drop=True)
+            logger.info(f"Loaded {len(frame)} sales rows for analytics in parallel")
+            return frame
+        except Exception as e:
+            logger.error(f"Error loading sales data: {str(e)}")
+            raise FileOperationError(f"Failed to load sales data: {str(e)}")
+
+    def _cached(self, key: Tuple, build):
+        """Return a cached report for the current data version, building it if needed."""
+        version, frame = self._versioned_frame()
+        with self._lock:
+            report = self._reports.get(key) if self._version == version else None
+        if report is None:
+            report = build(frame)
+            with self._lock:
+                # A newer frame may have been loaded while this report was built
+                if self._version == version:
+                    self._reports[key] = report
+        return report
+
+    # --- reports ---------------------------------------------------------
+
+    def sales_history(self) -> Dict:
+        """Get daily and per-brand totals in the shape of SalesHandler.get_sales_history."""
+        def build(frame):
+            daily = frame.groupby('date', sort=False).agg(
+                sales=('quantity', 'sum'), revenue=('revenue', 'sum'))
+            by_brand = frame.groupby('brand', sort=False, observed=True).agg(
+                sales=('quantity', 'sum'), revenue=('revenue', 'sum'))
+            return {
+                'daily': [
+                    {'date': row.Index.strftime('%Y-%m-%d'), 'sales': int(row.sales),
+                     'revenue': float(row.revenue)}
+                    for row in daily.itertuples()
+                ],
+                'by_brand': [
+                    {'brand': row.Index, 'sales': int(row.sales), 'revenue': float(row.revenue)}
+                    for row in by_brand.itertuples()
+                ],
+            }
+        report = self._cached(('history',), build)
+        return {key: list(value) for key, value in report.items()}
+
+    def summary(self) -> Dict:
+        """Get overall totals and the best selling brands and items."""
+        def build(frame):
+            if frame.empty:
+                return {'total_sales': 0, 'total_revenue': 0.0, 'transactions': 0,
+                        'average_order_value': 0.0, 'first_sale': None, 'last_sale': None,
+                        'top_brands': [], 'top_items': []}
+            brands = frame.groupby('brand', observed=True)['revenue'].sum().nlargest(5)
+            items = frame.groupby('stock_code', observed=True)['quantity'].sum().nlargest(5)
+            return {
+                'total_sales': int(frame['quantity'].sum()),
+                'total_revenue': float(frame['revenue'].sum()),
+                'transactions': int(len(frame)),
+                'average_order_value': float(frame['revenue'].mean()),
+                'first_sale': frame['date'].min().strftime('%Y-%m-%d'),
+                'last_sale': frame['date'].max().strftime('%Y-%m-%d'),
+                'top_brands': [{'brand': brand, 'revenue': float(value)}
+                               for brand, value in brands.items()],
+                'top_items': [{'stock_code': code, 'sales': int(value)}
+                              for code, value in items.items()],
+            }
+        return dict(self._cached(('summary',), build))
+
+    def _vat_rates(self, frame):
+        """Get the VAT rate in effect for each sale, dated at the start of its day."""
+        import numpy as np
+        import pandas as pd
+
+        if self.pricing is None:
+            return np.full(len(frame), DEFAULT_VAT_RATE)
+        # Few distinct days: convert each to local epoch seconds once
+        codes, days = pd.factorize(frame['date'])
+        starts = np.array([datetime.combine(day.date(), datetime.min.time()).timestamp()
+                           for day in days], dtype='float64')
+        return self.pricing.vat_rates(np.asarray(frame['stock_code'], dtype=object),
+                                      starts[codes] if len(starts) else np.zeros(0))
+
+    def revenue_by_period(self, period: str = 'month') -> List[Dict]:
+        """
+        Get units, revenue and VAT per calendar week or month.
+
+        Sale prices exclude VAT; each sale is charged the rate in effect on
+        its date.
+
+        Raises:
+            ValidationError: If period is not 'week' or 'month'
+        """
+        if period not in PERIODS:
+            raise ValidationError(f"Period must be one of: {', '.join(PERIODS)}")
+
+        def build(frame):
+            vat = frame['revenue'].to_numpy() * self._vat_rates(frame) / 100
+            grouped = frame.assign(vat=vat).groupby(frame['date'].dt.to_period(PERIODS[period])).agg(
+                sales=('quantity', 'sum'), revenue=('revenue', 'sum'), vat=('vat', 'sum'))
+            return [
+                {'period': str(row.Index), 'start': row.Index.start_time.strftime('%Y-%m-%d'),
+                 'sales': int(row.sales), 'revenue': float(row.revenue),
+                 'vat': round(float(row.vat), 2), 'revenue_with_vat': round(float(row.revenue + row.vat), 2)}
+                for row in grouped.itertuples()
+            ]
+        version = self.pricing.version if self.pricing is not None else 0
+        return list(self._cached(('period', period, version), build))
+
+    def brand_month_pivot(self) -> Dict:
+        """Get revenue per brand per month as a month list and one series per brand."""
+        def build(frame):
+            pivot = frame.pivot_table(
+                index=frame['date'].dt.to_period('M'), columns='brand',
+                values='revenue', aggfunc='sum', fill_value=0.0, observed=True)
+            return {
+                'months': [str(month) for month in pivot.index],
+                'brands': {brand: [float(value) for value in pivot[brand]]
+                           for brand in pivot.columns},
+            }
+        return dict(self._cached(('brand_month',), build))
+
+    def sku_velocity(self) -> List[Dict]:
+        """Get units sold per day for each SKU over its active selling period."""
+        def build(frame):
+            grouped = frame.groupby('stock_code', observed=True).agg(
+                units=('quantity', 'sum'), revenue=('revenue', 'sum'),
+                first_sale=('date', 'min'), last_sale=('date', 'max'))
+            days = (grouped['last_sale'] - grouped['first_sale']).dt.days + 1
+            grouped['units_per_day'] = grouped['units'] / days
+            grouped = grouped.sort_values('units_per_day', ascending=False)
+            return [
+                {'stock_code': row.Index, 'units': int(row.units), 'revenue': float(row.revenue),
+                 'first_sale': row.first_sale.strftime('%Y-%m-%d'),
+                 'last_sale': row.last_sale.strftime('%Y-%m-%d'),
+                 'units_per_day': float(row.units_per_day)}
+                for row in grouped.itertuples()
+            ]
+        return list(self._cached(('velocity',), build))
+
+    def moving_average(self, window: int = 7) -> List[Dict]:
+        """
+        Get daily revenue with a trailing moving average over `window` days.
+
+        Days without sales count as zero revenue.
+
+        Raises:
+            ValidationError: If window is not a positive integer
+        """
+        if not isinstance(window, int) or window < 1:
+            raise ValidationError("Window must be a positive integer")
+
+        def build(frame):
+            if frame.empty:
+                return []
+            daily = frame.groupby('date')['revenue'].sum().asfreq('D', fill_value=0.0)
+            averaged = daily.rolling(window, min_periods=1).mean()
+            return [
+                {'date': date.strftime('%Y-%m-%d'), 'revenue': float(daily[date]),
+                 'moving_average': float(value)}
+                for date, value in averaged.items()
+            ]
+        return list(self._cached(('moving_average', window), build))
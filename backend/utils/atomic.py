@@ -0,0 +1,154 @@
+# utils/atomic.py
+
+"""
+Crash-safe whole-file writes.
+
+atomic_write() writes to a temporary file in the target's directory and
+renames it over the target, so readers (and a crash) see either the old
+file or the new one, never a truncated mix. How much is fsynced is set by
+the durability mode:
+
+    always   fsync the file before the rename and the directory after it;
+             the write is on disk when atomic_write returns
+    batched  rename at once; a background thread fsyncs written files and
+             their directories every BATCH_INTERVAL_SECONDS, so bursts of
+             writes share one sync and a crash loses at most that window
+    os       never fsync; the operating system writes back when it likes
+"""
+
+import atexit
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Set
+from utils.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_MODES = ('always', 'batched', 'os')
+BATCH_INTERVAL_SECONDS = 1.0
+
+
+def validate_durability(durability: str) -> str:
+    """
+    Check a durability mode name.
+
+    Raises:
+        ValidationError: If the mode is unknown
+    """
+    if durability not in DURABILITY_MODES:
+        raise ValidationError(f"Durability must be one of: {', '.join(DURABILITY_MODES)}")
+    return durability
+
+
+def fsync_directory(directory: str) -> None:
+    """Flush a directory entry (e.g. a rename) to disk where the OS supports it."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # Directories cannot be opened on Windows
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _BatchSyncer:
+    """Background thread that fsyncs recently written files in batches."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, path: str) -> None:
+        with self._lock:
+            self._pending.add(path)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='atomic-batch-sync',
+                                                daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self) -> None:
+        """fsync every pending file and directory now."""
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        directories = set()
+        for path in pending:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except OSError as e:
+                logger.warning(f"Batched fsync of {path} failed: {str(e)}")
+            directories.add(os.path.dirname(path) or '.')
+        for directory in directories:
+            fsync_directory(directory)
+
+
+_batch_syncer = _BatchSyncer(BATCH_INTERVAL_SECONDS)
+atexit.register(_batch_syncer.flush)
+
+
+def schedule_sync(path: str) -> None:
+    """Have the batch syncer fsync a file written in place (e.g. appended to)."""
+    _batch_syncer.add(str(path))
+
+
+def flush_batched() -> None:
+    """Sync all writes made in batched mode that are still pending."""
+    _batch_syncer.flush()
+
+
+@contextmanager
+def atomic_write(path, mode: str = 'w', durability: str = 'always', **open_args):
+    """
+    Open a temporary file that replaces `path` when the block exits cleanly.
+
+    If the block raises, the temporary file is removed and `path` is left
+    untouched.
+
+    Usage:
+        with atomic_write(path, newline='', encoding='utf-8') as file:
+            csv.writer(file).writerows(rows)
+    """
+    validate_durability(durability)
+    target = Path(path)
+    fd, temp = tempfile.mkstemp(prefix=f'.{target.name}.', suffix='.tmp', dir=target.parent)
+    try:
+        with os.fdopen(fd, mode, **open_args) as file:
+            # mkstemp creates the file owner-only; keep the permissions of the file replaced
+            try:
+                os.chmod(temp, os.stat(target).st_mode & 0o7777)
+            except FileNotFoundError:
+                os.chmod(temp, 0o644)
+            yield file
+            file.flush()
+            if durability == 'always':
+                os.fsync(file.fileno())
+        os.replace(temp, target)
+    except BaseException:
+        try:
+            os.unlink(temp)
+        except OSError:
+            pass
+        raise
+
+    if durability == 'always':
+        fsync_directory(str(target.parent))
+    elif durability == 'batched':
+        _batch_syncer.add(str(target))
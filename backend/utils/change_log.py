@@ -0,0 +1,309 @@
+# utils/change_log.py
+
+"""
+Durable, sequence-numbered log of inventory changes.
+
+Each line of the log is one JSON record:
+
+    {"seq": 42, "ts": 1760870000.0, "op": "sell", "stock_code": "NS101",
+     "item": {...}, "changes": {"quantity": [10, 8]}}
+
+op is one of add, restock, sell, price_change, brand_change, update (a
+save that changed several of these at once) or delete; item is the item
+after the change (None for delete) and changes maps each changed field to
+its [old, new] value.
+
+Sequence numbers are contiguous, so the byte offset of every retained
+record is kept in an array indexed by seq - first_seq and read(since)
+seeks straight to the first record a consumer has not seen: a sync costs
+time proportional to the changes returned, not to the inventory size.
+
+The log keeps at least `retain` records; once it holds twice that many it
+is rewritten with only the newest `retain`. A consumer whose position has
+been dropped that way must resync from /api/items/export.
+
+Several server processes (preforked gunicorn workers) can share one log.
+Appends, compaction and reads take an exclusive flock on a `.lock` file
+next to the log. Under that lock a process first indexes the records the
+others appended since it last looked (or re-indexes the whole file if
+another process compacted it), so sequence numbers stay contiguous
+whichever process writes next.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from models.registry import get_item_type
+from utils.atomic import atomic_write, schedule_sync, validate_durability
+from utils.exceptions import FileOperationError
+
+logger = logging.getLogger(__name__)
+
+# Columns of a stock row (see StockFileHandler) compared to classify a change
+QUANTITY, PRICE, BRAND = 2, 3, 4
+
+
+def classify_change(row: Optional[List[str]],
+                    previous: Optional[List[str]]) -> Tuple[Optional[str], Dict]:
+    """
+    Work out what kind of change turned `previous` into `row`.
+
+    Returns:
+        Tuple[Optional[str], Dict]: The op name (None if nothing changed)
+        and a dict of field -> [old, new] for the fields that changed
+    """
+    if previous is None:
+        return 'add', {}
+    if row is None:
+        return 'delete', {}
+
+    changes = {}
+    kinds = []
+    old_quantity, new_quantity = int(previous[QUANTITY]), int(row[QUANTITY])
+    if new_quantity != old_quantity:
+        changes['quantity'] = [old_quantity, new_quantity]
+        kinds.append('restock' if new_quantity > old_quantity else 'sell')
+    old_price, new_price = float(previous[PRICE]), float(row[PRICE])
+    if new_price != old_price:
+        changes['price'] = [old_price, new_price]
+        kinds.append('price_change')
+    old_brand = previous[BRAND] if len(previous) > BRAND else None
+    new_brand = row[BRAND] if len(row) > BRAND else None
+    if new_brand != old_brand:
+        changes['brand'] = [old_brand, new_brand]
+        kinds.append('brand_change')
+    if row[0] != previous[0]:
+        changes['item_type'] = [previous[0], row[0]]
+        kinds.append('update')
+
+    if not kinds:
+        return None, {}
+    return (kinds[0] if len(kinds) == 1 else 'update'), changes
+
+
+class ChangeLog:
+    """Append-only JSON Lines change log with seq -> offset lookup."""
+
+    def __init__(self, file_path: str, durability: str = 'always', retain: int = 100000):
+        """
+        Args:
+            file_path (str): Path of the log file (created on first append)
+            durability (str): fsync policy of appends, see utils.atomic
+            retain (int): Records kept when the log is compacted
+        """
+        self.file_path = str(file_path)
+        self.durability = validate_durability(durability)
+        self.retain = max(1, retain)
+        self.first_seq = 1
+        self._offsets = array('q')  # Byte offset of record first_seq + i
+        self._end = 0
+        self._inode = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._lock_fd = None
+        self._lock_pid = None
+        with self._locked():
+            logger.info(f"Loaded change log with {len(self._offsets)} records (last seq {self.last_seq})")
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the newest record (first_seq - 1 when empty)."""
+        return self.first_seq + len(self._offsets) - 1
+
+    # --- persistence -----------------------------------------------------
+
+    @contextmanager
+    def _locked(self):
+        """Hold the log for this thread and process, caught up with other processes' writes."""
+        with self._lock:
+            # flock belongs to the open file, so each process opens its own after fork
+            if self._lock_pid != os.getpid():
+                try:
+                    self._lock_fd = os.open(self.file_path + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+                except OSError as e:
+                    logger.error(f"Error opening change log lock: {str(e)}")
+                    raise FileOperationError(f"Failed to open change log lock: {str(e)}")
+                self._lock_pid = os.getpid()
+                self._file = None
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                self._catch_up()
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _catch_up(self) -> None:
+        """Index records appended by other processes, starting over if the file was replaced."""
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            stat = None
+        if stat is None or stat.st_ino != self._inode or stat.st_size < self._end:
+            # Compacted (or removed) by another process: index it from the start
+            self.close()
+            self.first_seq = 1
+            self._offsets = array('q')
+            self._end = 0
+            self._inode = stat.st_ino if stat is not None else None
+        if stat is not None and stat.st_size > self._end:
+            self._index()
+
+    def _index(self) -> None:
+        """Index the records after the last indexed one, dropping a record torn by a crash."""
+        try:
+            with open(self.file_path, 'rb') as file:
+                file.seek(self._end)
+                data = file.read()
+        except OSError as e:
+            logger.error(f"Error loading change log: {str(e)}")
+            raise FileOperationError(f"Failed to load change log: {str(e)}")
+
+        offset = 0
+        while offset < len(data):
+            newline = data.find(b'\n', offset)
+            if newline == -1:
+                break
+            try:
+                record = json.loads(data[offset:newline])
+            except ValueError:
+                break
+            if not self._offsets:
+                self.first_seq = record['seq']
+            elif record['seq'] != self.last_seq + 1:
+                raise FileOperationError(f"Change log sequence is not contiguous: {self.file_path}")
+            self._offsets.append(self._end + offset)
+            offset = newline + 1
+
+        if offset < len(data):
+            # Appends hold the lock, so an incomplete record is left by a crash
+            logger.warning(f"Truncating {len(data) - offset} bytes of incomplete change log record")
+            with open(self.file_path, 'r+b') as file:
+                file.truncate(self._end + offset)
+        self._end += offset
+
+    def _open(self):
+        """Get the append handle, opening it on first use."""
+        if self._file is None:
+            self._file = open(self.file_path, 'ab')
+            self._inode = os.fstat(self._file.fileno()).st_ino
+        return self._file
+
+    def _compact(self) -> None:
+        """Rewrite the log with only the newest `retain` records."""
+        keep = len(self._offsets) - self.retain
+        start = self._offsets[keep]
+        with open(self.file_path, 'rb') as file:
+            file.seek(start)
+            data = file.read(self._end - start)
+        self.close()
+        with atomic_write(self.file_path, 'wb', durability=self.durability) as file:
+            file.write(data)
+        self._inode = os.stat(self.file_path).st_ino
+        self.first_seq += keep
+        self._offsets = array('q', (offset - start for offset in self._offsets[keep:]))
+        self._end -= start
+        logger.info(f"Compacted change log to seq {self.first_seq}..{self.last_seq}")
+
+    # --- log -------------------------------------------------------------
+
+    def append(self, op: str, stock_code: str, item: Optional[Dict],
+               changes: Optional[Dict] = None) -> Dict:
+        """Append one change record and return it."""
+        return self.append_many([(op, stock_code, item, changes)])[0]
+
+    def append_many(self, entries: List[Tuple[str, str, Optional[Dict], Optional[Dict]]]) -> List[Dict]:
+        """Append (op, stock_code, item, changes) records in one write and one fsync."""
+        if not entries:
+            return []
+        with self._locked():
+            now = time.time()
+            records = []
+            lines = []
+            for index, (op, stock_code, item, changes) in enumerate(entries):
+                record = {
+                    'seq': self.last_seq + 1 + index,
+                    'ts': now,
+                    'op': op,
+                    'stock_code': stock_code,
+                    'item': item,
+                    'changes': changes or {},
+                }
+                records.append(record)
+                lines.append((json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8'))
+            try:
+                file = self._open()
+                file.write(b''.join(lines))
+                file.flush()
+                if self.durability == 'always':
+                    os.fsync(file.fileno())
+                elif self.durability == 'batched':
+                    schedule_sync(self.file_path)
+                for line in lines:
+                    self._offsets.append(self._end)
+                    self._end += len(line)
+                if len(self._offsets) >= 2 * self.retain:
+                    self._compact()
+            except OSError as e:
+                logger.error(f"Error appending to change log: {str(e)}")
+                raise FileOperationError(f"Failed to append to change log: {str(e)}")
+        return records
+
+    def record_change(self, row: Optional[List[str]], previous: Optional[List[str]],
+                      stock_code: str) -> Optional[Dict]:
+        """Classify and append a storage change; no-op saves are not logged."""
+        records = self.record_changes([(row, previous, stock_code)])
+        return records[0] if records else None
+
+    def record_changes(self, changes: List[Tuple[Optional[List[str]], Optional[List[str]], str]]) -> List[Dict]:
+        """Classify and append a batch of (row, previous, stock_code) changes in one write."""
+        entries = []
+        for row, previous, stock_code in changes:
+            op, fields = classify_change(row, previous)
+            if op is not None:
+                item = get_item_type(row[0]).from_row(row).to_dict() if row is not None else None
+                entries.append((op, stock_code, item, fields))
+        return self.append_many(entries)
+
+    def read(self, since: int = 0, limit: int = 1000) -> Optional[Tuple[List[Dict], bool]]:
+        """
+        Get up to `limit` records with seq greater than `since`.
+
+        Returns:
+            Optional[Tuple[List[Dict], bool]]: The records and whether more
+            follow, or None if records after `since` are no longer retained
+            (or `since` is ahead of the log) and the consumer must resync
+        """
+        with self._locked():
+            if since > self.last_seq or since < self.first_seq - 1:
+                return None
+            start = since - self.first_seq + 1
+            stop = min(start + limit, len(self._offsets))
+            if start >= stop:
+                return [], False
+            if self._file is not None:
+                self._file.flush()
+            try:
+                with open(self.file_path, 'rb') as file:
+                    file.seek(self._offsets[start])
+                    end = self._offsets[stop] if stop < len(self._offsets) else self._end
+                    data = file.read(end - self._offsets[start])
+            except OSError as e:
+                logger.error(f"Error reading change log: {str(e)}")
+                raise FileOperationError(f"Failed to read change log: {str(e)}")
+            has_more = stop < len(self._offsets)
+        return [json.loads(line) for line in data.splitlines()], has_more
+
+    def close(self) -> None:
+        """Close the append handle (reopened by the next append)."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self) -> int:
+        return len(self._offsets)
@@ -0,0 +1,78 @@
+# utils/compression.py
+
+import gzip
+import logging
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIMETYPES = (
+    'application/json',
+    'text/csv',
+    'text/plain',
+    'text/html',
+)
+
+
+class ResponseCompressor:
+    """Compress eligible responses with brotli or gzip based on Accept-Encoding."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        """Register the response hook; settings are read from app.config per request."""
+        app.after_request(self.compress_response)
+
+    def available_encodings(self) -> list:
+        """Get supported encodings in order of preference."""
+        return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    def choose_encoding(self, accept_encodings) -> str:
+        """Pick the best encoding the client accepts, or '' for identity."""
+        return accept_encodings.best_match(self.available_encodings()) or ''
+
+    def compress(self, data: bytes, encoding: str, config) -> bytes:
+        """Compress a payload with the given encoding."""
+        if encoding == 'br':
+            return brotli.compress(data, quality=config.get('COMPRESS_BROTLI_LEVEL', 4))
+        return gzip.compress(data, compresslevel=config.get('COMPRESS_GZIP_LEVEL', 6), mtime=0)
+
+    def compress_response(self, response):
+        """after_request hook: compress the body when it is worth it."""
+        config = current_app.config
+        if not config.get('COMPRESS_ENABLED', True):
+            return response
+
+        # Streamed bodies (file downloads, event streams) are left untouched
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in config.get('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES)):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding(request.accept_encodings)
+        if not encoding:
+            return response
+
+        data = response.get_data()
+        if len(data) < config.get('COMPRESS_MIN_SIZE', 500):
+            return response
+
+        try:
+            compressed = self.compress(data, encoding, config)
+        except Exception as e:
+            logger.error(f"Error compressing response: {str(e)}")
+            return response
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        response.headers['Content-Length'] = str(len(compressed))
+        return response
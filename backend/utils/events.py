@@ -0,0 +1,184 @@
+# utils/events.py
+
+import json
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+from models.registry import get_item_type
+from utils.exceptions import CapacityError
+
+logger = logging.getLogger(__name__)
+
+
+def format_event(event_id: int, event_type: str, data: Dict) -> bytes:
+    """Encode one server-sent event."""
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n".encode('utf-8')
+
+
+class Subscription:
+    """
+    One subscriber's bounded queue of encoded events.
+
+    A subscriber that falls max_queue events behind is closed rather than
+    allowed to hold up publishers or grow without bound; it reconnects
+    with its last event ID and catches up from the bus history.
+    """
+
+    def __init__(self, bus: 'EventBus', max_queue: int):
+        self.bus = bus
+        self.max_queue = max_queue
+        self.closed = False
+        self._queue: deque = deque()
+        self._condition = threading.Condition()
+        self._waker: Optional[Callable[[], None]] = None
+
+    def set_waker(self, waker: Callable[[], None]) -> None:
+        """Set a callback run (from the publishing thread) when events arrive."""
+        self._waker = waker
+
+    def _offer(self, data: bytes) -> bool:
+        """Queue an event; returns False if the subscriber is closed or overflowed."""
+        with self._condition:
+            if self.closed:
+                return False
+            if len(self._queue) >= self.max_queue:
+                self.closed = True
+            else:
+                self._queue.append(data)
+            self._condition.notify_all()
+        if self._waker is not None:
+            self._waker()
+        return not self.closed
+
+    def _preload(self, events: List[bytes]) -> None:
+        """Queue replayed events; the queue bound applies only to live events."""
+        with self._condition:
+            self._queue.extend(events)
+
+    def get(self, timeout: float) -> Optional[bytes]:
+        """Wait up to `timeout` seconds for the next event; None on timeout or close."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._queue or self.closed, timeout)
+            return self._queue.popleft() if self._queue else None
+
+    def drain(self) -> List[bytes]:
+        """Take every queued event without waiting."""
+        with self._condition:
+            events = list(self._queue)
+            self._queue.clear()
+            return events
+
+    def close(self) -> None:
+        """Stop receiving events."""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+        if self._waker is not None:
+            self._waker()
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """
+    In-process publish/subscribe for live inventory and sales updates.
+
+    Every event gets a sequence ID and is encoded once; the last
+    history_size encoded events are kept in a ring buffer so a client
+    reconnecting with Last-Event-ID is replayed what it missed. If that
+    ID has already dropped out of the buffer (or is from before a server
+    restart) the client receives a 'reset' event and should refetch.
+
+    Events are published within one process; run the ASGI server (one
+    process, many connections) when dashboards must see every write.
+    """
+
+    def __init__(self, history_size: int = 1000, max_queue: int = 500,
+                 max_subscribers: int = 1000):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self._history: deque = deque(maxlen=history_size)  # (id, encoded event)
+        self._last_id = 0
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+
+    def publish(self, event_type: str, data: Dict) -> int:
+        """Publish an event to every subscriber and return its ID."""
+        with self._lock:
+            self._last_id += 1
+            event_id = self._last_id
+            encoded = format_event(event_id, event_type, data)
+            self._history.append((event_id, encoded))
+            # Offered under the lock so every subscriber sees events in ID order
+            dropped = [subscription for subscription in self._subscribers
+                       if not subscription._offer(encoded)]
+            for subscription in dropped:
+                self._subscribers.remove(subscription)
+        if dropped:
+            logger.warning(f"Disconnected {len(dropped)} slow event subscribers")
+        return event_id
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Subscription:
+        """
+        Add a subscriber, queueing the events it missed after last_event_id.
+
+        Raises:
+            CapacityError: If max_subscribers are already connected
+        """
+        subscription = Subscription(self, self.max_queue)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise CapacityError("Too many event subscribers")
+            if last_event_id is not None:
+                oldest = self._history[0][0] if self._history else self._last_id + 1
+                if last_event_id > self._last_id or last_event_id < oldest - 1:
+                    subscription._preload([format_event(self._last_id, 'reset', {
+                        'reason': 'Missed events are no longer available; refetch state'})])
+                else:
+                    subscription._preload([encoded for event_id, encoded in self._history
+                                           if event_id > last_event_id])
+            self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a subscriber (no error if already removed)."""
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+        subscription.closed = True
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    # --- storage listeners -----------------------------------------------
+
+    def on_storage_event(self, change: Dict, warehouse: Optional[str] = None) -> None:
+        """
+        StockFileHandler listener: publish item_changed, or one items_changed
+        listing the stock codes of a bulk save.
+
+        A branch warehouse's shard passes its name, which the event carries
+        as 'warehouse'; events of the default warehouse have none.
+        """
+        if change['event'] == 'batch':
+            codes = [each['stock_code'] for each in change['changes']]
+            data = {'stock_codes': codes, 'count': len(codes)}
+            if warehouse:
+                data['warehouse'] = warehouse
+            self.publish('items_changed', data)
+            return
+        data = {'stock_code': change['stock_code'], 'deleted': change['event'] == 'deleted'}
+        if warehouse:
+            data['warehouse'] = warehouse
+        if change['row'] is not None:
+            row = change['row']
+            data['item'] = get_item_type(row[0]).from_row(row).to_dict()
+        self.publish('item_changed', data)
+
+    def on_sale(self, event: Dict) -> None:
+        """SalesHandler listener: publish sale_recorded."""
+        self.publish('sale_recorded', {
+            key: event[key] for key in ('date', 'stock_code', 'quantity', 'price',
+                                        'brand', 'revenue')
+        })
@@ -19,3 +19,7 @@ class DatabaseError(Exception):
 class ConfigurationError(Exception):
     """Custom exception for configuration-related errors."""
     pass
+
+class CapacityError(Exception):
+    """Custom exception for work refused because a capacity limit is reached."""
+    pass
@@ -1,149 +1,539 @@
 # utils/file_handler.py
 
 import csv
+import fcntl
 import logging
-from typing import List, Dict, Union, Tuple, Optional
+import threading
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from typing import Callable, List, Dict, Union, Tuple, Optional
 import os
-from utils.exceptions import FileOperationError, StockError
+from utils.exceptions import FileOperationError, StockError, ValidationError
 from models.types import StockItemProtocol
+from models.registry import ITEM_TYPES, get_item_type, item_type_schemas
+from utils.atomic import atomic_write, validate_durability
+from utils.change_log import ChangeLog
+from utils.item_cache import ItemCache
+from utils.mmap_reader import MappedStockReader
+from utils.parallel_csv import parse_columns, use_parallel
+from utils.snapshot import InventorySnapshot, load_snapshot, read_signature, write_snapshot
+from utils.tracing import count, phase
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+READER_MODES = ('csv', 'mmap')
+
 class StockFileHandler:
-    def __init__(self, filename: str = "stock_items.csv"):
-        """Initialize file handler with CSV file path."""
+    def __init__(self, filename: str = "stock_items.csv", reader: str = 'csv',
+                 snapshot_file: Optional[str] = None, durability: str = 'always',
+                 change_log: Optional[ChangeLog] = None, parallel_load: int = 0,
+                 item_cache: Optional[ItemCache] = None, snapshot_every: int = 0):
+        """
+        Initialize file handler with CSV file path.
+
+        Args:
+            filename (str): CSV file name or path
+            reader (str): 'csv' parses the whole file for every read;
+                'mmap' serves single items and pages from a memory-mapped
+                line index and parses only the rows requested
+            snapshot_file (str): Binary snapshot written by compact(); used
+                instead of parsing the CSV while it matches the CSV's signature
+            durability (str): fsync policy of writes, see utils.atomic
+            change_log (ChangeLog): Log every add, update and delete is
+                appended to after it is written, for incremental sync
+            parallel_load (int): Worker processes used to parse a large
+                file on a cold load (see utils.parallel_csv); 0 parses in-thread
+            item_cache (ItemCache): Two-level cache get_item serves items
+                from; kept current by this handler's writes
+            snapshot_every (int): Recompact the snapshot on a background
+                thread after this many writes through this handler, so it
+                does not stay stale for the life of the process; 0 leaves
+                it to refresh_snapshot()
+        """
+        if reader not in READER_MODES:
+            raise ValidationError(f"Reader must be one of: {', '.join(READER_MODES)}")
         # Create data directory in backend folder
         self.data_dir = Path(__file__).parent.parent / 'data'
         self.data_dir.mkdir(exist_ok=True)
         self.filename = self.data_dir / filename
+        # Parsed rows, reused while the file signature is unchanged
+        self._rows_cache: Optional[List[List[str]]] = None
+        self._rows_signature: Optional[Tuple[int, int, int]] = None
+        # (signature, sorted positions) of the rows that do not decode, for load_page
+        self._invalid_rows: Optional[Tuple[Tuple[int, int, int], List[int]]] = None
+        # (callback, accepts batches) notified after every successful write
+        self._listeners: List[Tuple[Callable[[Dict], None], bool]] = []
+        self.reader = reader
+        self._mapped: Optional[MappedStockReader] = None
+        self.snapshot_file = Path(snapshot_file) if snapshot_file else None
+        # The snapshot matching the file, kept until the rows are loaded from it:
+        # until then reads are served from its columns
+        self._snapshot: Optional[InventorySnapshot] = None
+        self.snapshot_every = max(0, snapshot_every)
+        self._writes_since_snapshot = 0
+        self._recompact_thread: Optional[threading.Thread] = None
+        self.durability = validate_durability(durability)
+        self.change_log = change_log
+        self.parallel_load = parallel_load
+        self.item_cache = item_cache
+        if item_cache is not None:
+            self.add_listener(item_cache.on_storage_event, batches=True)
+        # Serializes read-modify-write of the file between threads and processes
+        self._write_lock = threading.RLock()
+        self._lock_fd = None
+        self._lock_pid = None
+        self._lock_depth = 0
         self._ensure_file_exists()
 
+    def _mapped_reader(self) -> MappedStockReader:
+        """Get the memory-mapped reader, creating it on first use."""
+        if self._mapped is None:
+            self._mapped = MappedStockReader(str(self.filename))
+        return self._mapped
+
+    def add_listener(self, callback: Callable[[Dict], None], batches: bool = False) -> None:
+        """
+        Register a callback for storage changes.
+
+        The callback receives a dict with 'event' ('saved' or 'deleted'),
+        'stock_code', 'row' (new row or None), 'previous' (old row or None)
+        and 'signature' (file signature after the write).
+
+        A bulk save (save_items) calls it once per changed item, unless
+        batches is True: then it receives one dict with 'event' 'batch',
+        'changes' (the per-item dicts) and 'signature'.
+        """
+        self._listeners.append((callback, batches))
+
+    def _notify(self, event: str, stock_code: str, row, previous) -> None:
+        """Send a storage change to every listener; listener errors are logged only."""
+        change = {
+            'event': event,
+            'stock_code': stock_code,
+            'row': row,
+            'previous': previous,
+            'signature': self._rows_signature,
+        }
+        for callback, _ in self._listeners:
+            try:
+                callback(change)
+            except Exception as e:
+                logger.error("Error in storage listener: %s", e)
+
+    def _notify_batch(self, changes: List[Dict]) -> None:
+        """Send the changes of one bulk save to every listener."""
+        batch = {'event': 'batch', 'changes': changes, 'signature': self._rows_signature}
+        for callback, batches in self._listeners:
+            try:
+                if batches:
+                    callback(batch)
+                else:
+                    for change in changes:
+                        callback(change)
+            except Exception as e:
+                logger.error("Error in storage listener: %s", e)
+
+    def file_signature(self) -> Tuple[int, int, int]:
+        """Get the signature of the file as it is on disk now."""
+        return self._file_signature()
+
+    def _file_signature(self) -> Tuple[int, int, int]:
+        """Get (inode, size, mtime) identifying the current file contents."""
+        stat = os.stat(self.filename)
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _remember_rows(self, rows: List[List[str]]) -> None:
+        """Cache rows just written so the next load skips the re-read."""
+        self._rows_cache = rows
+        self._rows_signature = self._file_signature()
+        if self.snapshot_file and self.snapshot_every:
+            self._writes_since_snapshot += 1
+            running = self._recompact_thread is not None and self._recompact_thread.is_alive()
+            if self._writes_since_snapshot >= self.snapshot_every and not running:
+                # Counted from here whether or not it succeeds, so a failing
+                # compaction is retried after another snapshot_every writes
+                self._writes_since_snapshot = 0
+                self._recompact_thread = threading.Thread(
+                    target=self._recompact, args=(rows, self._rows_signature),
+                    name='snapshot-recompact', daemon=True)
+                self._recompact_thread.start()
+
+    def _recompact(self, rows: List[List[str]], signature: Tuple[int, int, int]) -> None:
+        """
+        Write rows saved with `signature` to the snapshot, off the write lock.
+
+        The cached rows are never modified, so writes can go on meanwhile;
+        a snapshot they have already made stale is simply not used.
+        Failures are logged only.
+        """
+        try:
+            write_snapshot(rows, self.snapshot_file, signature, self.durability)
+        except Exception as e:
+            logger.warning("Snapshot %s not recompacted: %s", self.snapshot_file, e)
+
+    def wait_for_recompaction(self, timeout: Optional[float] = None) -> None:
+        """Wait for a background recompaction in progress to finish."""
+        thread = self._recompact_thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def invalidate_cache(self) -> None:
+        """Drop cached rows and the loaded snapshot so the next load re-reads the files."""
+        self._rows_cache = None
+        self._rows_signature = None
+        self._snapshot = None
+
     def _ensure_file_exists(self):
         """Create the CSV file with headers if it doesn't exist."""
         if not self.filename.exists():
             self._write_headers()
-            logger.info(f"Created new stock items file at {self.filename}")
+            logger.info("Created new stock items file at %s", self.filename)
+
+    @contextmanager
+    def write_lock(self):
+        """
+        Hold the file against writes by other threads and processes.
+
+        Every write re-reads the rows and rewrites the file under it, so a
+        caller holding it around a read and its write loses no concurrent
+        change. Reentrant within a thread.
+        """
+        with self._write_lock:
+            # flock belongs to the open file, so each process opens its own after fork
+            if self._lock_pid != os.getpid():
+                try:
+                    self._lock_fd = os.open(str(self.filename) + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+                except OSError as e:
+                    logger.error("Error opening stock file lock: %s", e)
+                    raise FileOperationError(f"Failed to open stock file lock: {str(e)}")
+                self._lock_pid = os.getpid()
+                self._lock_depth = 0
+            if self._lock_depth == 0:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _write_rows(self, rows: List[List[str]]) -> None:
+        """Replace the file with headers and rows in one atomic write."""
+        with phase('persist'), atomic_write(self.filename, newline='', encoding='utf-8',
+                                            durability=self.durability) as file:
+            writer = csv.writer(file)
+            writer.writerow(['item_type', 'stock_code', 'quantity', 'price', 'brand'])
+            writer.writerows(rows)
+        count('rows_written', len(rows))
 
     def _write_headers(self):
         """Write CSV headers."""
-        headers = ['item_type', 'stock_code', 'quantity', 'price', 'brand']
         try:
-            with open(self.filename, 'w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow(headers)
+            self._write_rows([])
+            self.invalidate_cache()
         except IOError as e:
-            logger.error(f"Error writing headers: {str(e)}")
+            logger.error("Error writing headers: %s", e)
             raise FileOperationError(f"Failed to write headers: {str(e)}")
 
     def save_item(self, item: StockItemProtocol) -> Tuple[bool, str]:
         """Save a stock item to CSV file."""
         try:
             data = item.to_dict()
-            row = [
-                type(item).__name__,
-                data['stock_code'],
-                data['quantity'],
-                data['price'],
-                data.get('brand', '')
-            ]
-
-            # Read existing data
-            existing_data = self.load_all_items()
-
-            # Update or append
-            updated = False
-            for i, existing_item in enumerate(existing_data):
-                if existing_item[1] == data['stock_code']:  # Match stock_code
-                    existing_data[i] = row
-                    updated = True
-                    logger.info(f"Updated existing item: {data['stock_code']}")
-                    break
-
-            if not updated:
-                existing_data.append(row)
-                logger.info(f"Added new item: {data['stock_code']}")
-
-            # Write all data back
-            with open(self.filename, 'w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                writer.writerow(['item_type', 'stock_code', 'quantity', 'price', 'brand'])
-                writer.writerows(existing_data)
+            row = [str(value) for value in item.to_row()]
+
+            with self.write_lock():
+                # Read existing data
+                existing_data = self.load_all_items()
+                before = self._rows_signature
+
+                # Update or append
+                updated = False
+                previous = None
+                for i, existing_item in enumerate(existing_data):
+                    if existing_item[1] == data['stock_code']:  # Match stock_code
+                        previous = existing_item
+                        existing_data[i] = row
+                        position = i
+                        updated = True
+                        logger.info("Updated existing item: %s", data['stock_code'])
+                        break
+
+                if not updated:
+                    existing_data.append(row)
+                    position = len(existing_data) - 1
+                    logger.info("Added new item: %s", data['stock_code'])
+
+                # Write all data back
+                self._write_rows(existing_data)
+                self._remember_rows(existing_data)
+                self._track_invalid_rows(before, written={position: row})
+                if self.change_log is not None:
+                    self.change_log.record_change(row, previous, data['stock_code'])
+                self._notify('saved', data['stock_code'], row, previous)
 
             return True, "Item saved successfully"
 
         except Exception as e:
-            logger.error(f"Error saving item: {str(e)}")
+            logger.error("Error saving item: %s", e)
             raise FileOperationError(f"Failed to save item: {str(e)}")
 
+    def save_items(self, items: List[StockItemProtocol],
+                   fields: Optional[Tuple[str, ...]] = None) -> int:
+        """
+        Save many existing stock items with one rewrite of the file.
+
+        Unlike save_item, only items already in the file are accepted, so a
+        bulk change cannot silently add SKUs. Items whose row is unchanged
+        are skipped.
+
+        Args:
+            fields (tuple): Columns to take from the items, e.g. ('price',);
+                the rest of each row stays as currently stored, so changes
+                written since the items were read survive. None saves whole rows.
+
+        Raises:
+            StockError: If an item is not in the file
+            ValidationError: If a field is not a column of an item's type
+            FileOperationError: If the file cannot be written
+
+        Returns:
+            int: Number of rows changed
+        """
+        with self.write_lock():
+            rows = self.load_all_items()
+            before = self._rows_signature
+            positions = {row[1]: index for index, row in enumerate(rows) if len(row) > 1}
+            missing = [item.stock_code for item in items if item.stock_code not in positions]
+            if missing:
+                raise StockError(f"Items not found: {', '.join(missing[:10])}")
+            updates = [(item.stock_code, positions[item.stock_code],
+                        self._updated_row(item, rows[positions[item.stock_code]], fields))
+                       for item in items]
+            try:
+                rows = list(rows)
+                changes = []
+                written = {}
+                for stock_code, index, row in updates:
+                    previous = rows[index]
+                    if row != previous:
+                        rows[index] = row
+                        written[index] = row
+                        changes.append({'event': 'saved', 'stock_code': stock_code,
+                                        'row': row, 'previous': previous})
+                if not changes:
+                    return 0
+                self._write_rows(rows)
+                self._remember_rows(rows)
+                self._track_invalid_rows(before, written=written)
+                for change in changes:
+                    change['signature'] = self._rows_signature
+                if self.change_log is not None:
+                    self.change_log.record_changes([(change['row'], change['previous'], change['stock_code'])
+                                                    for change in changes])
+                self._notify_batch(changes)
+                logger.info("Saved %s items in one write", len(changes))
+                return len(changes)
+            except Exception as e:
+                logger.error("Error saving items: %s", e)
+                raise FileOperationError(f"Failed to save items: {str(e)}")
+
+    @staticmethod
+    def _updated_row(item: StockItemProtocol, stored: List[str],
+                     fields: Optional[Tuple[str, ...]]) -> List[str]:
+        """Get the row saving `fields` of an item (all of them if None) gives over the stored row."""
+        row = [str(value) for value in item.to_row()]
+        if fields is None:
+            return row
+        schemas = item_type_schemas()
+        item_schema, stored_schema = schemas.get(row[0], ()), schemas.get(stored[0], ())
+        updated = list(stored)
+        for field in fields:
+            if field not in item_schema or field not in stored_schema:
+                raise ValidationError(f"{field} is not a column of {item.stock_code}")
+            updated[stored_schema.index(field)] = row[item_schema.index(field)]
+        return updated
+
     def load_all_items(self) -> List[List[str]]:
-        """Load all items from CSV file."""
+        """
+        Load all items from CSV file.
+
+        Rows are cached and reused until the file's inode, size or mtime
+        changes, so repeated loads of an unchanged file skip the parse.
+        The returned list is a copy and may be modified by the caller.
+        """
         try:
             if not os.path.exists(self.filename):
                 self._ensure_file_exists()
                 return []
 
-            with open(self.filename, 'r', newline='', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                next(reader)  # Skip headers
-                return [row for row in reader]
+            signature = self._file_signature()
+            if self._rows_cache is not None and self._rows_signature == signature:
+                return list(self._rows_cache)
+
+            with phase('load'):
+                rows = self._load_snapshot_rows(signature)
+                if rows is None and use_parallel(signature[1], self.parallel_load):
+                    rows = self._load_rows_parallel()
+                if rows is None:
+                    with open(self.filename, 'r', newline='', encoding='utf-8') as file:
+                        reader = csv.reader(file)
+                        next(reader, None)  # Skip headers
+                        rows = [row for row in reader]
+            count('rows_loaded', len(rows))
+
+            # The rows now serve every read
+            self._snapshot = None
+            self._rows_cache = rows
+            self._rows_signature = signature
+            return list(rows)
         except Exception as e:
-            logger.error(f"Error loading items: {str(e)}")
+            logger.error("Error loading items: %s", e)
             raise FileOperationError(f"Failed to load items: {str(e)}")
 
+    def _load_snapshot_rows(self, signature: Tuple[int, int, int]) -> Optional[List[List[str]]]:
+        """Get rows from the snapshot if it was compacted from the file as it is now."""
+        snapshot = self._fresh_snapshot(signature)
+        return snapshot.rows() if snapshot is not None else None
+
+    def _fresh_snapshot(self, signature: Tuple[int, int, int]) -> Optional[InventorySnapshot]:
+        """Get the snapshot if it was compacted from the file as it is now, loading it on first use."""
+        if not self.snapshot_file:
+            return None
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.signature == signature:
+            return snapshot
+        self._snapshot = None
+        if read_signature(self.snapshot_file) != signature:
+            return None
+        try:
+            snapshot = load_snapshot(self.snapshot_file)
+        except FileOperationError as e:
+            logger.warning("Ignoring unusable snapshot %s: %s", self.snapshot_file, e)
+            return None
+        self._snapshot = snapshot
+        return snapshot
+
+    def _unloaded_snapshot(self) -> Optional[InventorySnapshot]:
+        """Get the fresh snapshot while the current rows have not been loaded yet, else None."""
+        if not self.snapshot_file or not os.path.exists(self.filename):
+            return None
+        signature = self._file_signature()
+        if self._rows_cache is not None and self._rows_signature == signature:
+            return None
+        return self._fresh_snapshot(signature)
+
+    def warm(self) -> None:
+        """Load the inventory into memory: only the snapshot while it is fresh, otherwise the rows."""
+        if self._unloaded_snapshot() is None:
+            self.load_all_items()
+
+    def _load_rows_parallel(self) -> Optional[List[List[str]]]:
+        """Parse the file on the parallel loader, keeping every row's text; None if unsuitable."""
+        widths = {len(columns) for columns in item_type_schemas().values()}
+        if len(widths) != 1:
+            return None  # Mixed row widths: most rows would not fit one schema
+        schema = [('item_type', 'category'), ('stock_code', 'str'),
+                  ('quantity', 'str'), ('price', 'str')]
+        schema += [(f'column{index}', 'category') for index in range(len(schema), widths.pop())]
+        try:
+            return parse_columns(str(self.filename), schema, self.parallel_load).rows()
+        except ValidationError as e:
+            logger.warning("Parallel load not possible, parsing serially: %s", e)
+            return None
+
+    def compact(self) -> int:
+        """
+        Write the current rows to the binary snapshot file.
+
+        Returns:
+            int: Number of items written
+        """
+        if not self.snapshot_file:
+            raise FileOperationError("No snapshot file configured")
+        rows = self.load_all_items()
+        written = write_snapshot(rows, self.snapshot_file, self._rows_signature, self.durability)
+        self._writes_since_snapshot = 0
+        return written
+
+    def refresh_snapshot(self) -> bool:
+        """
+        Recompact the snapshot if the file has changed since it was written.
+
+        Every write leaves the snapshot stale, so cold loads parse the CSV
+        until this (or compact()) runs again; warm_up() calls it at startup.
+
+        Returns:
+            bool: True if a new snapshot was written
+        """
+        if not self.snapshot_file:
+            return False
+        with self.write_lock():
+            self._ensure_file_exists()
+            if read_signature(self.snapshot_file) == self._file_signature():
+                return False
+            try:
+                self.compact()
+            except FileOperationError as e:
+                logger.warning("Snapshot %s not refreshed: %s", self.snapshot_file, e)
+                return False
+        return True
+
     def item_exists(self, stock_code: str) -> bool:
         """Check if an item with given stock code exists."""
         try:
             items = self.load_all_items()
             return any(item[1] == stock_code for item in items)
         except Exception as e:
-            logger.error(f"Error checking item existence: {str(e)}")
+            logger.error("Error checking item existence: %s", e)
             raise FileOperationError(f"Failed to check item existence: {str(e)}")
 
     def create_item_from_row(self, row: List[str]) -> StockItemProtocol:
         """Create appropriate item instance from CSV row."""
         try:
-            # Import here to avoid circular imports
-            from models.nav_sys import NavSys
-
-            if len(row) < 5:
+            if not row:
                 raise ValueError("Invalid row format")
-
-            item_type, stock_code, quantity, price, brand = row
-
-            try:
-                quantity = int(quantity)
-                price = float(price)
-            except ValueError:
-                raise ValueError("Invalid quantity or price format")
-
-            if quantity < 0:
-                raise ValueError("Quantity cannot be negative")
-            if price < 0:
-                raise ValueError("Price cannot be negative")
-
-            if item_type == 'NavSys':
-                return NavSys(stock_code, quantity, price, brand)
-            else:
-                raise ValueError(f"Unknown item type: {item_type}")
-
+            return get_item_type(row[0]).from_row(row)
         except Exception as e:
-            logger.error(f"Error creating item from row: {str(e)}")
+            logger.error("Error creating item from row: %s", e)
             raise FileOperationError(f"Failed to create item from row: {str(e)}")
 
     def load_items(self):
-        """Load and create all item instances from CSV."""
+        """
+        Load and create all item instances from CSV.
+
+        Rows are dispatched through the item type registry's decoders,
+        looked up once per load rather than per row.
+        """
         try:
+            snapshot = self._unloaded_snapshot()
+            if snapshot is not None:
+                # A cold load: hydrated from the columns without building rows
+                with phase('load'):
+                    items = snapshot.items()
+                count('rows_loaded', len(snapshot))
+                return items
+            decoders = {tag: item_class.from_row for tag, item_class in ITEM_TYPES.items()}
+            rows = self.load_all_items()
+            signature = self._rows_signature if self._rows_cache is rows else None
             items = []
-            for row in self.load_all_items():
+            invalid = []
+            for position, row in enumerate(rows):
                 try:
-                    item = self.create_item_from_row(row)
-                    items.append(item)
+                    decoder = decoders.get(row[0]) if row else None
+                    if decoder is None:
+                        raise ValueError(f"Unknown item type: {row[0] if row else ''}")
+                    items.append(decoder(row))
                 except Exception as e:
-                    logger.error(f"Skipping invalid row: {row}. Error: {str(e)}")
+                    invalid.append(position)
+                    logger.error("Skipping invalid row: %s. Error: %s", row, e)
+            if signature is not None:
+                # Every row was decoded anyway: load_page can reuse the result
+                self._invalid_rows = (signature, invalid)
             return items
         except Exception as e:
-            logger.error(f"Error loading items: {str(e)}")
+            logger.error("Error loading items: %s", e)
             raise FileOperationError(f"Failed to load items: {str(e)}")
 
     def delete_item(self, stock_code: str) -> bool:
@@ -154,31 +544,162 @@ class StockFileHandler:
             bool: True if item was deleted, False if not found
         """
         try:
-            items = self.load_all_items()
-            initial_count = len(items)
-            items = [item for item in items if item[1] != stock_code]
+            with self.write_lock():
+                items = self.load_all_items()
+                before = self._rows_signature
+                removed = [item for item in items if item[1] == stock_code]
+                removed_positions = [position for position, item in enumerate(items)
+                                     if item[1] == stock_code]
+                items = [item for item in items if item[1] != stock_code]
 
-            if len(items) == initial_count:
-                logger.info(f"Item not found for deletion: {stock_code}")
-                return False
+                if not removed:
+                    logger.info("Item not found for deletion: %s", stock_code)
+                    return False
 
-            with open(self.filename, 'w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                writer.writerow(['item_type', 'stock_code', 'quantity', 'price', 'brand'])
-                writer.writerows(items)
+                self._write_rows(items)
+                self._remember_rows(items)
+                self._track_invalid_rows(before, removed=removed_positions)
+                if self.change_log is not None:
+                    self.change_log.record_change(None, removed[0], stock_code)
+                self._notify('deleted', stock_code, None, removed[0])
 
-            logger.info(f"Successfully deleted item: {stock_code}")
+            logger.info("Successfully deleted item: %s", stock_code)
             return True
 
         except Exception as e:
-            logger.error(f"Error deleting item: {str(e)}")
+            logger.error("Error deleting item: %s", e)
             raise FileOperationError(f"Failed to delete item: {str(e)}")
 
     def get_item(self, stock_code: str) -> Optional[StockItemProtocol]:
         """Get a specific item by stock code."""
         try:
+            if self.item_cache is not None:
+                return self.item_cache.get(stock_code, self._find_row, self._file_signature)
+            if self.reader == 'mmap':
+                row = self._mapped_reader().get_row(stock_code)
+                return self.create_item_from_row(row) if row else None
             items = self.load_items()
             return next((item for item in items if item.stock_code == stock_code), None)
         except Exception as e:
-            logger.error(f"Error getting item: {str(e)}")
+            logger.error("Error getting item: %s", e)
             raise FileOperationError(f"Failed to get item: {str(e)}")
+
+    def _find_row(self, stock_code: str) -> Optional[List[str]]:
+        """Read one item's row from storage, without hydrating the others."""
+        if self.reader == 'mmap':
+            return self._mapped_reader().get_row(stock_code)
+        snapshot = self._unloaded_snapshot()
+        if snapshot is not None:
+            return snapshot.find_row(stock_code)
+        return next((row for row in self.load_all_items() if len(row) > 1 and row[1] == stock_code), None)
+
+    @staticmethod
+    def _decodes(row: List[str]) -> bool:
+        """Check whether a row decodes to an item."""
+        try:
+            get_item_type(row[0]).from_row(row)
+            return True
+        except Exception:
+            return False
+
+    def _invalid_positions(self) -> List[int]:
+        """
+        Get the sorted positions of the rows that do not decode to items.
+
+        load_items records them as it goes and this handler's writes carry
+        them over, checking only the rows they wrote; every row is checked
+        only for a file nothing here has loaded, e.g. one another process wrote.
+        """
+        signature = self._file_signature()
+        known = self._invalid_rows
+        if known is not None and known[0] == signature:
+            return known[1]
+        if self.reader == 'mmap':
+            mapped = self._mapped_reader()
+            rows = mapped.get_rows(0, mapped.count())
+        else:
+            rows = self.load_all_items()
+        invalid = [position for position, row in enumerate(rows) if not self._decodes(row)]
+        self._invalid_rows = (signature, invalid)
+        return invalid
+
+    def _track_invalid_rows(self, before: Optional[Tuple[int, int, int]],
+                            written: Optional[Dict[int, List[str]]] = None,
+                            removed: Optional[List[int]] = None) -> None:
+        """
+        Carry the invalid row positions over a write made from the rows of `before`.
+
+        Args:
+            before: Signature of the rows the write started from
+            written (dict): Position -> row written there (positions after the write)
+            removed (list): Sorted positions of the rows deleted (positions before it)
+        """
+        known = self._invalid_rows
+        if known is None or known[0] != before:
+            self._invalid_rows = None
+            return
+        invalid = known[1]
+        if removed:
+            gone = set(removed)
+            invalid = [position - bisect_left(removed, position) for position in invalid
+                       if position not in gone]
+        if written:
+            invalid = set(invalid)
+            for position, row in written.items():
+                if self._decodes(row):
+                    invalid.discard(position)
+                else:
+                    invalid.add(position)
+            invalid = sorted(invalid)
+        self._invalid_rows = (self._rows_signature, invalid)
+
+    @staticmethod
+    def _row_position(invalid: List[int], index: int) -> int:
+        """Get the position of item number `index`, skipping the sorted invalid positions."""
+        position = index
+        while True:
+            skipped = bisect_right(invalid, position)
+            if index + skipped == position:
+                return position
+            position = index + skipped
+
+    def load_page(self, start: int, limit: int) -> Tuple[List[StockItemProtocol], int]:
+        """
+        Load `limit` items in file order starting at item `start`.
+
+        Rows that do not decode are skipped and not counted, as in load_items.
+
+        Returns:
+            Tuple[List[StockItemProtocol], int]: The page of items and the total item count
+        """
+        try:
+            start = max(start, 0)
+            invalid = self._invalid_positions()
+            if self.reader == 'mmap':
+                mapped = self._mapped_reader()
+                row_count = mapped.count()
+            else:
+                all_rows = self.load_all_items()
+                row_count = len(all_rows)
+            total = row_count - len(invalid)
+            # Only the rows of this page are read and decoded
+            first = self._row_position(invalid, start)
+            end = self._row_position(invalid, start + limit) if start + limit < total else row_count
+            if self.reader == 'mmap':
+                rows = mapped.get_rows(first, end - first)
+            else:
+                rows = all_rows[first:end]
+            skip = set(invalid[bisect_left(invalid, first):bisect_left(invalid, end)])
+            items = []
+            for position, row in enumerate(rows, first):
+                if position in skip:
+                    continue
+                try:
+                    items.append(get_item_type(row[0]).from_row(row))
+                except Exception as e:
+                    # The file changed since its invalid rows were found
+                    logger.error("Skipping invalid row: %s. Error: %s", row, e)
+            return items, total
+        except Exception as e:
+            logger.error("Error loading page: %s", e)
+            raise FileOperationError(f"Failed to load page: {str(e)}")
@@ -0,0 +1,230 @@
+# utils/forecasting.py
+
+import logging
+import threading
+from datetime import date
+from typing import Dict, List, Optional
+from utils.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+EPOCH = date(1970, 1, 1)
+
+
+def epoch_day(value: date) -> int:
+    """Get the number of days since 1970-01-01."""
+    return (value - EPOCH).days
+
+
+class DemandForecaster:
+    """
+    Per-SKU demand forecasts and days of cover by exponential smoothing.
+
+    Daily demand is smoothed with level = alpha * units + (1 - alpha) * level.
+    A day without sales only multiplies the level by (1 - alpha), so each
+    SKU stores its level as of its last sale day and the decay for the
+    quiet days since is applied when the level is read. That makes the
+    model exact on daily aggregates while a new sale only touches its own
+    SKU (O(1)), and reads are vectorized across all SKUs with NumPy.
+    """
+
+    def __init__(self, alpha: float = 0.3):
+        import numpy as np
+
+        if not 0 < alpha <= 1:
+            raise ValidationError("Smoothing factor must be in (0, 1]")
+        self.alpha = alpha
+        self._np = np
+        self._codes: List[str] = []
+        self._slots: Dict[str, int] = {}
+        self._level = np.zeros(0)
+        self._last_day = np.zeros(0, dtype=np.int64)
+        self._first_day = np.zeros(0, dtype=np.int64)
+        self._quantity = np.zeros(0)
+        self._in_stock_file = np.zeros(0, dtype=bool)
+        self._sales_version = None
+        self._stock_signature = None
+        self._lock = threading.RLock()
+
+    # --- storage ---------------------------------------------------------
+
+    def _slot(self, stock_code: str) -> int:
+        """Get the array position of a SKU, growing the arrays if it is new."""
+        slot = self._slots.get(stock_code)
+        if slot is not None:
+            return slot
+        slot = len(self._codes)
+        if slot >= len(self._level):
+            self._grow(max(16, 2 * len(self._level)))
+        self._codes.append(stock_code)
+        self._slots[stock_code] = slot
+        return slot
+
+    def _grow(self, capacity: int) -> None:
+        np = self._np
+        extra = capacity - len(self._level)
+        self._level = np.concatenate([self._level, np.zeros(extra)])
+        self._last_day = np.concatenate([self._last_day, np.full(extra, -1, dtype=np.int64)])
+        self._first_day = np.concatenate([self._first_day, np.full(extra, -1, dtype=np.int64)])
+        self._quantity = np.concatenate([self._quantity, np.zeros(extra)])
+        self._in_stock_file = np.concatenate([self._in_stock_file, np.zeros(extra, dtype=bool)])
+
+    def _reset_sales(self) -> None:
+        self._level[:] = 0.0
+        self._last_day[:] = -1
+        self._first_day[:] = -1
+
+    # --- fitting ---------------------------------------------------------
+
+    def fit(self, frame, version=None) -> None:
+        """
+        Fit levels from a sales DataFrame (columns date, stock_code, quantity).
+
+        Sales are aggregated per day and SKU, then replayed one calendar day
+        at a time with each day's update applied to all SKUs sold that day
+        in a single vector operation.
+        """
+        np = self._np
+        with self._lock:
+            self._reset_sales()
+            if not frame.empty:
+                daily = (frame.groupby(['date', 'stock_code'], observed=True)['quantity']
+                         .sum().reset_index().sort_values('date', kind='stable'))
+                days = (daily['date'].values.astype('datetime64[D]')
+                        .astype(np.int64))
+                # Map each distinct code to its slot once, then slots per row by indexing
+                codes, uniques = daily['stock_code'].factorize()
+                unique_slots = np.fromiter((self._slot(str(code)) for code in uniques),
+                                           dtype=np.int64, count=len(uniques))
+                slots = unique_slots[codes]
+                units = daily['quantity'].values.astype(float)
+
+                unique_days, starts = np.unique(days, return_index=True)
+                ends = list(starts[1:]) + [len(days)]
+                for day, start, end in zip(unique_days, starts, ends):
+                    self._apply(slots[start:end], int(day), units[start:end])
+            self._sales_version = version
+            logger.info(f"Fitted demand forecasts for {len(self._codes)} SKUs")
+
+    def _apply(self, slots, day: int, units) -> None:
+        """Apply one day's sales (one entry per SKU) to the smoothed levels."""
+        np = self._np
+        last = self._last_day[slots]
+        first = self._first_day[slots]
+
+        # The first day a SKU sells initializes its level; more sales that day add to it
+        initial = (last < 0) | (first == day)
+        seen = ~initial
+        if initial.any():
+            init_slots = slots[initial]
+            self._level[init_slots] = np.where(last[initial] < 0, 0.0, self._level[init_slots]) + units[initial]
+            self._first_day[init_slots] = day
+        if seen.any():
+            seen_slots = slots[seen]
+            decay = (1.0 - self.alpha) ** (day - last[seen])
+            self._level[seen_slots] = self._level[seen_slots] * decay + self.alpha * units[seen]
+        self._last_day[slots] = day
+
+    def record_sale(self, stock_code: str, quantity: int, sale_date: date) -> None:
+        """Fold one new sale into its SKU's level."""
+        np = self._np
+        with self._lock:
+            slot = self._slot(stock_code)
+            self._apply(np.array([slot]), epoch_day(sale_date), np.array([float(quantity)]))
+
+    def set_quantities(self, rows: List[List[str]], signature=None) -> None:
+        """Load current stock quantities from stock file rows."""
+        with self._lock:
+            self._quantity[:] = 0.0
+            self._in_stock_file[:] = False
+            for row in rows:
+                try:
+                    slot = self._slot(row[1])
+                    self._quantity[slot] = int(row[2])
+                    self._in_stock_file[slot] = True
+                except (IndexError, ValueError):
+                    logger.error(f"Skipping invalid row in forecaster: {row}")
+            self._stock_signature = signature
+
+    # --- listeners and sync ----------------------------------------------
+
+    def on_sale(self, event: Dict) -> None:
+        """SalesHandler listener: update the SKU incrementally."""
+        with self._lock:
+            self.record_sale(event['stock_code'], event['quantity'],
+                             date.fromisoformat(event['date']))
+            self._sales_version = event.get('version')
+
+    def on_storage_event(self, change: Dict) -> None:
+        """StockFileHandler listener: track quantity changes."""
+        with self._lock:
+            slot = self._slot(change['stock_code'])
+            if change['event'] == 'deleted':
+                self._quantity[slot] = 0.0
+                self._in_stock_file[slot] = False
+            else:
+                self._quantity[slot] = int(change['row'][2])
+                self._in_stock_file[slot] = True
+            self._stock_signature = change.get('signature')
+
+    def sync(self, file_handler, sales_handler) -> None:
+        """Refit or reload only when another process changed the files."""
+        sales_version = sales_handler.data_version()
+        stock_signature = file_handler.file_signature()
+        with self._lock:
+            if sales_version != self._sales_version:
+                self.fit(sales_handler.analytics.frame(), sales_version)
+            if stock_signature != self._stock_signature:
+                self.set_quantities(file_handler.load_all_items(), stock_signature)
+
+    # --- queries ---------------------------------------------------------
+
+    def daily_demand(self, today: Optional[date] = None):
+        """Get the smoothed daily demand of every SKU as of `today`."""
+        np = self._np
+        today = epoch_day(today or date.today())
+        count = len(self._codes)
+        last = self._last_day[:count]
+        gap = np.maximum(today - last, 0)
+        demand = self._level[:count] * (1.0 - self.alpha) ** gap
+        demand[last < 0] = 0.0
+        return demand
+
+    def at_risk(self, lead_time_days: float, today: Optional[date] = None,
+                limit: Optional[int] = None) -> List[Dict]:
+        """
+        Get SKUs whose stock will run out within the lead time, soonest first.
+
+        Raises:
+            ValidationError: If lead_time_days is negative
+        """
+        np = self._np
+        if lead_time_days < 0:
+            raise ValidationError("Lead time must not be negative")
+        today = today or date.today()
+        with self._lock:
+            count = len(self._codes)
+            demand = self.daily_demand(today)
+            quantity = self._quantity[:count]
+            in_stock_file = self._in_stock_file[:count]
+
+            candidates = np.flatnonzero(in_stock_file & (demand > 0))
+            cover = quantity[candidates] / demand[candidates]
+            risky = cover < lead_time_days
+            candidates, cover = candidates[risky], cover[risky]
+            order = np.argsort(cover, kind='stable')
+            if limit is not None:
+                order = order[:limit]
+
+            today_number = epoch_day(today)
+            return [
+                {
+                    'stock_code': self._codes[candidates[i]],
+                    'quantity': int(quantity[candidates[i]]),
+                    'daily_demand': float(demand[candidates[i]]),
+                    'days_of_cover': float(cover[i]),
+                    'stockout_date': date.fromordinal(
+                        EPOCH.toordinal() + today_number + int(cover[i])).isoformat(),
+                }
+                for i in order
+            ]
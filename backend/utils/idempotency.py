@@ -0,0 +1,232 @@
+# utils/idempotency.py
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Dict, Optional
+from utils.atomic import validate_durability
+from utils.exceptions import FileOperationError
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL,
+                                      status INTEGER NOT NULL, body TEXT NOT NULL,
+                                      mimetype TEXT NOT NULL, created REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS responses_created ON responses (created);
+CREATE TABLE IF NOT EXISTS claims (key TEXT PRIMARY KEY, owner INTEGER NOT NULL,
+                                   claimed_at REAL NOT NULL);
+"""
+# PRAGMA synchronous per durability mode
+SYNCHRONOUS = {'always': 'FULL', 'batched': 'NORMAL', 'os': 'OFF'}
+# A claim older than this is taken over even if its process still runs
+CLAIM_TIMEOUT_SECONDS = 300.0
+CLAIM_POLL_SECONDS = 0.02
+
+_stores: 'weakref.WeakSet[IdempotencyStore]' = weakref.WeakSet()
+
+
+def request_fingerprint(method: str, path: str, body: bytes) -> str:
+    """Get a digest identifying a request, so a reused key with a different request is caught."""
+    digest = hashlib.sha256()
+    digest.update(method.encode('utf-8'))
+    digest.update(b' ')
+    digest.update(path.encode('utf-8'))
+    digest.update(b'\n')
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class IdempotencyStore:
+    """
+    Bounded, TTL-limited map of Idempotency-Key -> stored response.
+
+    Entries live in a SQLite file shared by every server process on the
+    host, so a retry that lands on another worker still finds the stored
+    response. Expired entries and the oldest ones beyond max_entries are
+    deleted as new ones are stored.
+
+    Requests with the same key are serialized: within a process with a
+    per-key lock, across processes with a claim row taken in a
+    BEGIN IMMEDIATE transaction. A retry that arrives while the original is
+    still running waits for it and then gets its response. A claim left by
+    a process that died (or older than CLAIM_TIMEOUT_SECONDS) is taken over.
+    """
+
+    def __init__(self, file_path: Optional[str] = None, ttl_seconds: float = 86400,
+                 max_entries: int = 10000, durability: str = 'always'):
+        """
+        Args:
+            file_path (str): SQLite file shared between processes; None keeps
+                the entries in this process only
+        """
+        self.file_path = str(file_path) if file_path else None
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.durability = validate_durability(durability)
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, list] = {}  # key -> [lock, waiters]
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        with self._lock:
+            self._connection()
+        _stores.add(self)
+
+    # --- persistence -----------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this process's connection; the caller holds the lock."""
+        # SQLite connections must not be used across fork(): each process opens its own
+        if self._db is None or self._pid != os.getpid():
+            try:
+                db = sqlite3.connect(self.file_path or ':memory:', timeout=30,
+                                     check_same_thread=False, isolation_level=None)
+                if self.file_path:
+                    db.execute('PRAGMA journal_mode=WAL')
+                db.execute(f"PRAGMA synchronous={SYNCHRONOUS[self.durability]}")
+                db.executescript(SCHEMA)
+            except sqlite3.Error as e:
+                logger.error(f"Error opening idempotency store: {str(e)}")
+                raise FileOperationError(f"Failed to open idempotency store: {str(e)}")
+            self._db, self._pid = db, os.getpid()
+        return self._db
+
+    def _after_fork(self) -> None:
+        # Another thread may have held the locks when the process forked
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._db = None
+
+    def _evict(self, db: sqlite3.Connection, now: float) -> None:
+        """Drop expired entries and the oldest ones beyond max_entries."""
+        db.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl_seconds,))
+        db.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                   "ORDER BY created DESC, rowid DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    # --- store -----------------------------------------------------------
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Get the stored entry for a key, or None if it is unknown or expired."""
+        try:
+            with self._lock:
+                row = self._connection().execute(
+                    "SELECT key, fingerprint, status, body, mimetype, created FROM responses "
+                    "WHERE key = ? AND created > ?", (key, time.time() - self.ttl_seconds)).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading idempotency key: {str(e)}")
+            raise FileOperationError(f"Failed to read idempotency key: {str(e)}")
+        if row is None:
+            return None
+        return dict(zip(('key', 'fingerprint', 'status', 'body', 'mimetype', 'created'), row))
+
+    def put(self, key: str, fingerprint: str, status: int, body: str,
+            mimetype: str = 'application/json') -> Dict:
+        """Store the response of a completed request."""
+        entry = {
+            'key': key,
+            'fingerprint': fingerprint,
+            'status': status,
+            'body': body,
+            'mimetype': mimetype,
+            'created': time.time(),
+        }
+        try:
+            with self._lock:
+                db = self._connection()
+                db.execute('BEGIN IMMEDIATE')
+                try:
+                    db.execute("INSERT OR REPLACE INTO responses "
+                               "(key, fingerprint, status, body, mimetype, created) "
+                               "VALUES (?, ?, ?, ?, ?, ?)",
+                               (key, fingerprint, status, body, mimetype, entry['created']))
+                    self._evict(db, entry['created'])
+                    db.execute('COMMIT')
+                except BaseException:
+                    db.execute('ROLLBACK')
+                    raise
+        except sqlite3.Error as e:
+            logger.error(f"Error saving idempotency key: {str(e)}")
+            raise FileOperationError(f"Failed to save idempotency key: {str(e)}")
+        return entry
+
+    def _try_claim(self, key: str) -> bool:
+        """Claim a key for this process unless a live claim by another process holds it."""
+        pid = os.getpid()
+        now = time.time()
+        with self._lock:
+            db = self._connection()
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                claim = db.execute("SELECT owner, claimed_at FROM claims WHERE key = ?",
+                                   (key,)).fetchone()
+                # This process holds the key's lock, so its own claim is a leftover
+                if (claim is not None and claim[0] != pid and _process_alive(claim[0])
+                        and now - claim[1] < CLAIM_TIMEOUT_SECONDS):
+                    db.execute('COMMIT')
+                    return False
+                db.execute("INSERT OR REPLACE INTO claims (key, owner, claimed_at) VALUES (?, ?, ?)",
+                           (key, pid, now))
+                db.execute('COMMIT')
+                return True
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+
+    def _release_claim(self, key: str) -> None:
+        with self._lock:
+            self._connection().execute("DELETE FROM claims WHERE key = ? AND owner = ?",
+                                       (key, os.getpid()))
+
+    @contextmanager
+    def locked(self, key: str):
+        """Hold the key, in this process and across processes, while a request with it runs."""
+        with self._lock:
+            holder = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            holder[1] += 1
+        try:
+            with holder[0]:
+                try:
+                    while not self._try_claim(key):
+                        time.sleep(CLAIM_POLL_SECONDS)
+                except sqlite3.Error as e:
+                    logger.error(f"Error claiming idempotency key: {str(e)}")
+                    raise FileOperationError(f"Failed to claim idempotency key: {str(e)}")
+                try:
+                    yield
+                finally:
+                    self._release_claim(key)
+        finally:
+            with self._lock:
+                holder[1] -= 1
+                if holder[1] == 0:
+                    del self._key_locks[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM responses WHERE created > ?",
+                (time.time() - self.ttl_seconds,)).fetchone()[0]
+
+
+def _reset_after_fork() -> None:
+    for store in list(_stores):
+        store._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
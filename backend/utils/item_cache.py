@@ -0,0 +1,390 @@
+# utils/item_cache.py
+
+"""
+Two-level cache of hydrated stock items for single-item lookups.
+
+    L1  in-process LRU of hydrated items, bounded by an estimate of their
+        size in bytes; the least recently used are evicted first
+    L2  SQLite file shared by every server process on the host, holding
+        each cached SKU's stock row
+
+Coherence rests on a generation number. Every write through a
+StockFileHandler bumps it and updates the written rows in L2 in the same
+transaction, so L2 always holds current rows. The generation is mirrored
+into a small memory-mapped file next to the database. Reading it costs no
+system call, so an L1 hit made under the current generation is served
+without touching SQLite or the CSV. An entry made under an older
+generation is checked against L2, which reports the generation the entry
+is now valid for in the same read. Only a SKU in neither level is looked
+up in the stock file. Its row is then added to L2 unless a write
+happened in the meantime.
+
+Items are handed out as shallow copies, so a caller changing the price or
+quantity of what it got does not change the cache.
+
+Like the change log and the in-process indexes, the cache assumes every
+writer of the stock file goes through a StockFileHandler using it. As a
+guard against writes that did not (a file restored or edited by hand, or
+an L2 commit lost in a crash), each write also records the stock file's
+signature in L2, and a lookup that reaches L2 empties it when the file
+on disk no longer matches.
+
+The SQLite connection and the generation map are opened on first use in
+each process, so a server preloading the app before forking never hands
+a connection over to its workers.
+"""
+
+import copy
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from models.registry import get_item_type
+from utils.exceptions import FileOperationError
+
+logger = logging.getLogger(__name__)
+
+GENERATION = struct.Struct('<Q')
+# Rough per-entry cost of the item object, its dict and the LRU links
+ENTRY_OVERHEAD_BYTES = 400
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS items (stock_code TEXT PRIMARY KEY, row TEXT NOT NULL,
+                                  generation INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0);
+"""
+
+_caches: 'weakref.WeakSet[ItemCache]' = weakref.WeakSet()
+
+
+def _row_size(row: List[str]) -> int:
+    return ENTRY_OVERHEAD_BYTES + sum(len(field) for field in row)
+
+
+class ItemCache:
+    """In-process LRU of items in front of a shared SQLite row cache."""
+
+    def __init__(self, shared_file: Optional[str] = None, max_bytes: int = 16 * 1024 * 1024):
+        """
+        Args:
+            shared_file (str): SQLite file shared between processes; None
+                keeps only the in-process level
+            max_bytes (int): Size budget of the in-process level
+        """
+        self.shared_file = str(shared_file) if shared_file else None
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()  # code -> (generation, item, size)
+        self._bytes = 0
+        self._local_generation = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._generation_map: Optional[mmap.mmap] = None
+        self._pid: Optional[int] = None  # process the shared level was opened in
+        self._stats = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0, 'evictions': 0,
+                       'invalidations': 0, 'writes': 0}
+        _caches.add(self)
+
+    # --- shared level ----------------------------------------------------
+
+    def _shared(self) -> Optional[sqlite3.Connection]:
+        """Get this process's L2 connection (None without L2); the caller holds the lock."""
+        if not self.shared_file:
+            return None
+        # SQLite connections must not be used across fork(): each process opens its own
+        if self._db is None or self._pid != os.getpid():
+            self._open_shared()
+            self._pid = os.getpid()
+        return self._db
+
+    def _after_fork(self) -> None:
+        # Another thread may have held the lock when the process forked
+        self._lock = threading.Lock()
+        self._db = None
+        self._generation_map = None
+
+    def _open_shared(self) -> None:
+        try:
+            self._db = self._connect()
+        except sqlite3.DatabaseError as e:
+            # Only a cache: start over rather than fail the server
+            logger.warning(f"Recreating unusable item cache {self.shared_file}: {str(e)}")
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(self.shared_file + suffix):
+                    os.remove(self.shared_file + suffix)
+            self._db = self._connect()
+        try:
+            path = self.shared_file + '.gen'
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size < GENERATION.size:
+                    os.write(fd, GENERATION.pack(0))
+                self._generation_map = mmap.mmap(fd, GENERATION.size)
+            finally:
+                os.close(fd)
+            # Either file may have been recreated: continue from the larger generation
+            self._db.execute('BEGIN IMMEDIATE')
+            generation = max(self._shared_generation(), GENERATION.unpack_from(self._generation_map)[0])
+            self._db.execute("UPDATE meta SET value = ? WHERE key = 'generation'", (generation,))
+            GENERATION.pack_into(self._generation_map, 0, generation)
+            self._db.execute('COMMIT')
+        except OSError as e:
+            logger.error(f"Error opening item cache generation file: {str(e)}")
+            raise FileOperationError(f"Failed to open item cache: {str(e)}")
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.shared_file, timeout=10, check_same_thread=False,
+                             isolation_level=None)
+        # A cache: readers never block the writer, and a commit lost in a crash
+        # leaves a stock file signature that no longer matches, which empties it
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=OFF')
+        db.executescript(SCHEMA)
+        return db
+
+    def _shared_generation(self) -> int:
+        return self._db.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    def _check_source(self, signature: Tuple) -> None:
+        """Empty L2 if it was last written for another version of the stock file."""
+        source = json.dumps(list(signature))
+        try:
+            found = self._db.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+            if found is not None and found[0] == source:
+                return
+            db = self._db
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                found = db.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+                if found is None or found[0] != source:
+                    if found is not None:
+                        logger.warning(f"Stock file changed outside the item cache; "
+                                       f"clearing {self.shared_file}")
+                    db.execute("DELETE FROM items")
+                    self._bump_generation(source)
+                db.execute('COMMIT')
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Item cache source check failed: {str(e)}")
+
+    def _bump_generation(self, source: Optional[str]) -> int:
+        """Advance the shared generation (and record the stock file signature) in the open transaction."""
+        generation = self._shared_generation() + 1
+        self._db.execute("UPDATE meta SET value = ? WHERE key = 'generation'", (generation,))
+        if source is not None:
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('source', ?)", (source,))
+        # Published before the commit: a reader seeing it early revalidates
+        # against the old snapshot and is stamped with the old generation
+        GENERATION.pack_into(self._generation_map, 0, generation)
+        return generation
+
+    @property
+    def generation(self) -> int:
+        """Get the current generation (shared between processes when L2 is enabled)."""
+        if self.shared_file:
+            if self._generation_map is None or self._pid != os.getpid():
+                with self._lock:
+                    self._shared()
+            return GENERATION.unpack_from(self._generation_map)[0]
+        return self._local_generation
+
+    # --- lookups ---------------------------------------------------------
+
+    def get(self, stock_code: str, load_row: Callable[[str], Optional[List[str]]],
+            source_signature: Optional[Callable[[], Tuple]] = None):
+        """
+        Get a copy of an item, or None if load_row finds no row for it.
+
+        Args:
+            load_row: Called on a miss in both levels to read the row from storage
+            source_signature: Gets the stock file's signature, checked against
+                the one L2 was written for before L2 is used
+        """
+        generation = self.generation
+        with self._lock:
+            entry = self._entries.get(stock_code)
+            if entry is not None and entry[0] == generation:
+                self._entries.move_to_end(stock_code)
+                self._stats['l1_hits'] += 1
+                return copy.copy(entry[1])
+
+            db = self._shared()
+            if db is not None:
+                if source_signature is not None:
+                    self._check_source(source_signature())
+                    generation = self.generation
+                found = self._lookup_shared(stock_code, entry)
+                if found is not None:
+                    return copy.copy(found)
+            if entry is not None:
+                self._stats['invalidations'] += 1
+                self._bytes -= self._entries.pop(stock_code)[2]
+            self._stats['misses'] += 1
+
+        row = load_row(stock_code)
+        if not row:
+            return None
+        item = get_item_type(row[0]).from_row(row)
+        with self._lock:
+            self._put(stock_code, generation, item, _row_size(row))
+            if self._shared() is not None:
+                self._store_shared(stock_code, row, generation)
+        return copy.copy(item)
+
+    def _lookup_shared(self, stock_code: str, entry: Optional[tuple]):
+        """Serve from L2 (or revalidate a stale L1 entry through it); None on a miss."""
+        try:
+            # One statement reads the generation and the row from the same snapshot
+            generation, text, row_generation = self._db.execute(
+                "SELECT meta.value, items.row, items.generation FROM meta "
+                "LEFT JOIN items ON items.stock_code = ? WHERE meta.key = 'generation'",
+                (stock_code,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Item cache lookup failed: {str(e)}")
+            return None
+        if text is None:
+            return None
+        if entry is not None and row_generation <= entry[0]:
+            # Unchanged since the entry was made: extend its validity
+            self._entries[stock_code] = (generation, entry[1], entry[2])
+            self._entries.move_to_end(stock_code)
+            self._stats['l2_hits'] += 1
+            return entry[1]
+        if entry is not None:
+            self._stats['invalidations'] += 1
+        row = json.loads(text)
+        item = get_item_type(row[0]).from_row(row)
+        self._put(stock_code, generation, item, _row_size(row))
+        self._stats['l2_hits'] += 1
+        return item
+
+    def _store_shared(self, stock_code: str, row: List[str], generation: int) -> None:
+        """Add a row read from storage to L2 unless a write happened since it was read."""
+        try:
+            self._db.execute(
+                "INSERT OR IGNORE INTO items (stock_code, row, generation) "
+                "SELECT ?, ?, value FROM meta WHERE key = 'generation' AND value = ?",
+                (stock_code, json.dumps(row, ensure_ascii=False), generation))
+        except sqlite3.Error as e:
+            logger.warning(f"Item cache store failed: {str(e)}")
+
+    def _put(self, stock_code: str, generation: int, item, size: int) -> None:
+        old = self._entries.pop(stock_code, None)
+        if old is not None:
+            self._bytes -= old[2]
+        self._entries[stock_code] = (generation, item, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self._stats['evictions'] += 1
+
+    # --- writes ----------------------------------------------------------
+
+    def on_storage_event(self, change: Dict) -> None:
+        """
+        StockFileHandler listener (batch-aware): bump the generation and
+        write the changed rows through to L2 in one transaction.
+        """
+        changes = change['changes'] if change['event'] == 'batch' else [change]
+        with self._lock:
+            for each in changes:
+                old = self._entries.pop(each['stock_code'], None)
+                if old is not None:
+                    self._bytes -= old[2]
+            self._stats['writes'] += len(changes)
+            if self._shared() is None:
+                self._local_generation += 1
+                return
+            try:
+                self._write_shared(changes, change.get('signature'))
+            except sqlite3.Error as e:
+                logger.error(f"Error updating shared item cache: {str(e)}")
+                self._clear_shared()
+
+    def _write_shared(self, changes: List[Dict], signature: Optional[Tuple]) -> None:
+        db = self._db
+        # IMMEDIATE takes the write lock first, so processes bump the generation in turn
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            generation = self._bump_generation(json.dumps(list(signature)) if signature else None)
+            deleted = [(each['stock_code'],) for each in changes if each['row'] is None]
+            saved = [(each['stock_code'], json.dumps(each['row'], ensure_ascii=False), generation)
+                     for each in changes if each['row'] is not None]
+            if deleted:
+                db.executemany("DELETE FROM items WHERE stock_code = ?", deleted)
+            if saved:
+                db.executemany("INSERT OR REPLACE INTO items (stock_code, row, generation) "
+                               "VALUES (?, ?, ?)", saved)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+
+    def _clear_shared(self) -> None:
+        """Empty L2 after a failed write-through, so it cannot serve stale rows."""
+        try:
+            self._db.execute("DELETE FROM items")
+        except sqlite3.Error as e:
+            logger.error(f"Error clearing shared item cache: {str(e)}")
+
+    # --- admin -----------------------------------------------------------
+
+    def clear(self) -> None:
+        """Drop every entry from both levels."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._shared() is not None:
+                self._clear_shared()
+
+    def stats(self) -> Dict:
+        """Get hit, miss and eviction counts and the size of each level."""
+        with self._lock:
+            shared = self._shared()
+            stats = dict(self._stats)
+            lookups = stats['l1_hits'] + stats['l2_hits'] + stats['misses']
+            stats.update({
+                'lookups': lookups,
+                'hit_rate': round((stats['l1_hits'] + stats['l2_hits']) / lookups, 4) if lookups else 0.0,
+                'l1_entries': len(self._entries),
+                'l1_bytes': self._bytes,
+                'l1_max_bytes': self.max_bytes,
+                'generation': self.generation,
+                'shared_file': self.shared_file,
+            })
+            if shared is not None:
+                try:
+                    stats['l2_entries'] = shared.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+                except sqlite3.Error as e:
+                    logger.warning(f"Item cache count failed: {str(e)}")
+            return stats
+
+    def close(self) -> None:
+        """Close the shared level's files (reopened if the cache is used again)."""
+        with self._lock:
+            if self._pid != os.getpid():
+                return  # Opened by the parent process, if at all
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+            if self._generation_map is not None:
+                self._generation_map.close()
+                self._generation_map = None
+
+
+def _reset_after_fork() -> None:
+    for cache in list(_caches):
+        cache._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,9 +1,43 @@
 # utils/logger.py
 
+import json
 import logging
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional
+from utils.tracing import current_trace
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the request ID and route of the request being traced."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace = current_trace()
+        record.request_id = trace.request_id if trace is not None else None
+        record.route = trace.route if trace is not None else None
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line, including `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
 
 class LoggerSetup:
     """Configure and manage application logging."""
@@ -57,9 +91,30 @@ class LoggerSetup:
         console_handler.setFormatter(console_format)
         logger.addHandler(console_handler)
 
+        for handler in logger.handlers:
+            handler.addFilter(RequestContextFilter())
+        self._text_formatters = [handler.formatter for handler in logger.handlers]
+        self.log_format = 'text'
+
         # Log initialization
         logger.info(f"Logger initialized. Log file: {log_file}")
 
+    def set_format(self, log_format: str) -> None:
+        """
+        Switch every handler between 'text' lines and 'json' records.
+
+        Raises:
+            ValueError: If the format is neither 'text' nor 'json'
+        """
+        if log_format not in ('text', 'json'):
+            raise ValueError("Log format must be 'text' or 'json'")
+        if log_format == self.log_format:
+            return
+        handlers = logging.getLogger().handlers
+        for handler, text_formatter in zip(handlers, self._text_formatters):
+            handler.setFormatter(JsonFormatter() if log_format == 'json' else text_formatter)
+        self.log_format = log_format
+
     @staticmethod
     def get_logger(name: str) -> logging.Logger:
         """
@@ -0,0 +1,194 @@
+# utils/mmap_reader.py
+
+import csv
+import logging
+import mmap
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+from utils.exceptions import FileOperationError
+
+logger = logging.getLogger(__name__)
+
+# Line start plus an unquoted stock_code (second column)
+CODE_PATTERN = re.compile(rb'^[^,\n]*,([^,"\r\n]*),', re.MULTILINE)
+# Bytes compared at a time when checking that a new file extends the old one
+COMPARE_CHUNK = 4 * 1024 * 1024
+
+
+class MappedStockReader:
+    """
+    Random-access reader for stock_items.csv over a memory map.
+
+    A line-offset index is built once with a vectorized newline scan; rows
+    are decoded from the mapped buffer only when asked for, so reading one
+    SKU or one page does not parse the rest of the file. The stock_code ->
+    line index is built lazily on the first point read.
+
+    When the file changes the index is refreshed. StockFileHandler replaces
+    the file on every write, so the previous version stays mapped until
+    the new one has been compared with it: if the new file starts with
+    every previously indexed byte (an item added at the end), only the
+    tail is indexed and the code index is kept; otherwise the index is
+    rebuilt. The comparison stops at the first differing chunk, so a
+    rewrite near the top of the file costs little more than the rebuild.
+    A file changed in place (same inode) is always rebuilt, as its old
+    bytes are no longer available to compare.
+
+    Assumes no quoted field spans multiple lines, which holds for files
+    written by StockFileHandler.
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._offsets = None          # numpy int64 array: start of each data line, plus end
+        self._indexed_end = 0         # bytes covered by the index
+        self._codes: Optional[Dict[bytes, int]] = None  # encoded stock_code -> line
+        self._lock = threading.RLock()
+
+    # --- index maintenance -----------------------------------------------
+
+    def _stat_signature(self) -> Tuple[int, int, int]:
+        stat = os.stat(self.path)
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def refresh(self) -> None:
+        """Bring the mapping and index up to date with the file on disk."""
+        with self._lock:
+            try:
+                signature = self._stat_signature()
+                if signature == self._signature:
+                    return
+                replaced = self._signature is not None and signature[0] != self._signature[0]
+                # Keep the previous version mapped until it has been compared
+                previous_map, previous_file = self._map, self._file
+                self._map = self._file = None
+                try:
+                    self._remap()
+                    if replaced and self._extends(previous_map):
+                        self._index_from(self._indexed_end, incremental=True)
+                    else:
+                        self._index_from(0, incremental=False)
+                finally:
+                    if previous_map is not None:
+                        previous_map.close()
+                    if previous_file is not None:
+                        previous_file.close()
+                self._signature = signature
+            except (OSError, ValueError) as e:
+                logger.error(f"Error mapping stock file: {str(e)}")
+                raise FileOperationError(f"Failed to map stock file: {str(e)}")
+
+    def _extends(self, previous: Optional[mmap.mmap]) -> bool:
+        """Check whether the mapped file starts with every byte indexed from `previous`."""
+        import numpy as np
+
+        end = self._indexed_end
+        if previous is None or self._map is None or len(self._map) < end or len(previous) < end:
+            return False
+        old = np.frombuffer(previous, dtype=np.uint8, count=end)
+        new = np.frombuffer(self._map, dtype=np.uint8, count=end)
+        for start in range(0, end, COMPARE_CHUNK):
+            if not np.array_equal(old[start:start + COMPARE_CHUNK], new[start:start + COMPARE_CHUNK]):
+                return False
+        return True
+
+    def _remap(self) -> None:
+        self.close()
+        self._file = open(self.path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def _index_from(self, start: int, incremental: bool) -> None:
+        """Index complete lines from byte `start` to the end of the map."""
+        import numpy as np
+
+        data = self._map if self._map is not None else b''
+        if not incremental:
+            # Skip the header line
+            header_end = data.find(b'\n') + 1 if len(data) else 0
+            start = header_end if header_end > 0 else len(data)
+            self._offsets = np.array([start], dtype=np.int64)
+            self._codes = None
+
+        buffer = np.frombuffer(data, dtype=np.uint8, offset=start) if len(data) > start else np.zeros(0, np.uint8)
+        # Only complete (newline-terminated) lines are indexed
+        line_ends = np.flatnonzero(buffer == 0x0A).astype(np.int64) + (start + 1)
+        first_new = len(self._offsets) - 1
+        self._offsets = np.concatenate([self._offsets, line_ends])
+        self._indexed_end = int(self._offsets[-1])
+
+        if self._codes is not None:
+            self._index_codes(first_new)
+        logger.info(f"Indexed stock file: {len(self)} rows "
+                    f"({'appended' if incremental else 'full rebuild'})")
+
+    def _index_codes(self, first_line: int) -> None:
+        """Add the stock codes of lines from `first_line` on to the code index."""
+        import numpy as np
+
+        start, end = int(self._offsets[first_line]), self._indexed_end
+        data = self._map if self._map is not None else b''
+        codes = CODE_PATTERN.findall(data, start, end)
+        if len(codes) == len(self) - first_line:
+            # The pattern matches at most once per line, so every line matched in order
+            self._codes.update(zip(codes, range(first_line, len(self))))
+            return
+
+        # Quoted codes are not matched by the pattern; locate matches, parse the rest
+        matches = list(CODE_PATTERN.finditer(data, start, end))
+        lines = np.searchsorted(self._offsets, [m.start() for m in matches], side='right') - 1
+        self._codes.update(zip((m.group(1) for m in matches), lines.tolist()))
+        matched = set(lines.tolist())
+        for line in range(first_line, len(self)):
+            if line not in matched:
+                row = self._parse(line)
+                if len(row) > 1:
+                    self._codes[row[1].encode('utf-8')] = line
+
+    # --- reads -----------------------------------------------------------
+
+    def _parse(self, line: int) -> List[str]:
+        raw = self._map[self._offsets[line]:self._offsets[line + 1]]
+        text = raw.decode('utf-8').rstrip('\r\n')
+        if '"' not in text:
+            return text.split(',')
+        return next(csv.reader([text]), [])
+
+    def __len__(self) -> int:
+        return 0 if self._offsets is None else len(self._offsets) - 1
+
+    def count(self) -> int:
+        """Get the number of data rows."""
+        self.refresh()
+        return len(self)
+
+    def get_row(self, stock_code: str) -> Optional[List[str]]:
+        """Get the row for one SKU, or None if it is not in the file."""
+        with self._lock:
+            self.refresh()
+            if self._codes is None:
+                self._codes = {}
+                self._index_codes(0)
+            line = self._codes.get(stock_code.encode('utf-8'))
+            return self._parse(line) if line is not None else None
+
+    def get_rows(self, start: int, count: int) -> List[List[str]]:
+        """Get `count` rows in file order starting at row `start`."""
+        with self._lock:
+            self.refresh()
+            end = min(max(start, 0) + count, len(self))
+            return [self._parse(line) for line in range(max(start, 0), end)]
+
+    def close(self) -> None:
+        """Release the memory map and file handle."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
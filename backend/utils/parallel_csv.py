@@ -0,0 +1,339 @@
+# utils/parallel_csv.py
+
+"""
+Parallel CSV parsing into typed columns.
+
+The file is cut into byte ranges of roughly equal size, each moved forward
+to the start of the next line, and every range is parsed by csv.reader in
+a worker process. Workers send back columns rather than rows, because
+pickling millions of small row lists costs as much as parsing them:
+
+    int, float  numpy arrays
+    category    numpy codes plus the distinct values (brands, dates, types)
+    str         one newline-joined string, split again by the parent
+
+The parent concatenates the chunks in file order, remapping category codes
+onto one shared set of values.
+
+A line whose field count or numeric values do not fit the schema does not
+fail the load. It is reported in `errors` with its line number, like
+StockFileHandler.load_items skips invalid rows, and its fields are kept so
+callers that preserve rows verbatim can put it back.
+
+Line-aligned splitting assumes one record per line. If a quoted field
+spans lines, parse_columns raises ValidationError and the caller should
+fall back to its serial parser.
+"""
+
+import atexit
+import csv
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+from utils.exceptions import FileOperationError, ValidationError
+
+logger = logging.getLogger(__name__)
+
+COLUMN_KINDS = ('str', 'category', 'int', 'float')
+NUMERIC_DTYPES = {'int': 'int64', 'float': 'float64'}
+
+# Files smaller than this are parsed in-process; a pool round trip does not pay off
+MIN_PARALLEL_BYTES = 32 * 1024 * 1024
+
+Schema = Sequence[Tuple[str, str]]
+
+_pool: Dict = {'executor': None, 'workers': 0, 'pid': None}
+_pool_lock = threading.Lock()
+
+
+def line_aligned_ranges(path: str, parts: int, start: int = 0) -> List[Tuple[int, int]]:
+    """
+    Split the bytes from `start` to the end of the file into up to `parts`
+    ranges that each begin at the start of a line.
+    """
+    size = os.path.getsize(path)
+    if start >= size:
+        return []
+    step = max((size - start) // max(parts, 1), 1)
+    bounds = [start]
+    with open(path, 'rb') as file:
+        for _ in range(parts - 1):
+            position = bounds[-1] + step
+            if position >= size:
+                break
+            file.seek(position - 1)
+            # Reading from the byte before: a range starting right after a newline stays put
+            file.readline()
+            position = file.tell()
+            if position >= size:
+                break
+            if position > bounds[-1]:
+                bounds.append(position)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _header_end(path: str) -> int:
+    """Get the byte offset just after the header line."""
+    with open(path, 'rb') as file:
+        file.readline()
+        return file.tell()
+
+
+def _encode_columns(rows: List[List[str]], schema: Schema) -> Dict:
+    """Encode rows (all of schema width and valid) as typed column payloads."""
+    import numpy as np
+
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    payload = {}
+    for (name, kind), values in zip(schema, columns):
+        if kind in NUMERIC_DTYPES:
+            payload[name] = np.array(values, dtype=str).astype(NUMERIC_DTYPES[kind]) \
+                if values else np.zeros(0, dtype=NUMERIC_DTYPES[kind])
+        elif kind == 'category':
+            mapping: Dict[str, int] = {}
+            codes = np.fromiter((mapping.setdefault(value, len(mapping)) for value in values),
+                                dtype=np.int32, count=len(values))
+            payload[name] = (list(mapping), codes)
+        else:
+            payload[name] = (len(values), '\n'.join(values))
+    return payload
+
+
+def _row_error(fields: List[str], schema: Schema) -> Optional[str]:
+    """Describe why a row does not fit the schema, or None if it does."""
+    if len(fields) != len(schema):
+        return f"Expected {len(schema)} fields, got {len(fields)}"
+    for value, (name, kind) in zip(fields, schema):
+        try:
+            if kind == 'int':
+                int(value)
+            elif kind == 'float':
+                float(value)
+        except ValueError:
+            return f"Invalid {kind} value for {name}: {value!r}"
+    return None
+
+
+def _parse_range(path: str, start: int, end: int, schema: Schema) -> Dict:
+    """
+    Parse one byte range into column payloads.
+
+    Returns:
+        Dict: 'columns' (name -> payload), 'records' (number of records)
+        and 'odd' (list of (record index in range, fields, message))
+    """
+    with open(path, 'rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode('utf-8')
+    rows = list(csv.reader(io.StringIO(text, newline='')))
+    lines = text.count('\n') + (1 if text and not text.endswith('\n') else 0)
+    if len(rows) != lines:
+        raise ValidationError("CSV has records spanning several lines; parse it serially")
+
+    odd = []
+    width = len(schema)
+    if any(len(fields) != width for fields in rows):
+        good = []
+        for index, fields in enumerate(rows):
+            if len(fields) == width:
+                good.append(fields)
+            else:
+                odd.append((index, fields, _row_error(fields, schema)))
+    else:
+        good = rows
+    try:
+        columns = _encode_columns(good, schema)
+    except ValueError:
+        # A numeric value failed to convert: find the offending lines, encode the rest
+        odd_indexes = {index for index, _, _ in odd}
+        checked = []
+        for index, fields in enumerate(rows):
+            if index in odd_indexes:
+                continue
+            message = _row_error(fields, schema)
+            if message is None:
+                checked.append(fields)
+            else:
+                odd.append((index, fields, message))
+        odd.sort(key=lambda entry: entry[0])
+        columns = _encode_columns(checked, schema)
+    return {'columns': columns, 'records': len(rows), 'odd': odd}
+
+
+class ParsedColumns:
+    """Typed columns parsed from a CSV file, plus the lines that did not fit."""
+
+    def __init__(self, schema: Schema, columns: Dict, categories: Dict[str, List[str]],
+                 errors: List[Tuple[int, int, List[str], str]], records: int):
+        self.schema = list(schema)
+        # name -> list of str (str), numpy codes (category) or numpy array (int/float)
+        self.columns = columns
+        # name -> distinct values indexed by the codes of a category column
+        self.categories = categories
+        # (row index among all records, file line number, fields, message)
+        self.errors = errors
+        self.records = records
+
+    def __len__(self) -> int:
+        """Number of rows that fit the schema."""
+        name = self.schema[0][0]
+        return len(self.columns[name])
+
+    def column(self, name: str):
+        """Get a column's values; category columns are expanded to a list of str."""
+        if name in self.categories:
+            lookup = self.categories[name]
+            return [lookup[code] for code in self.columns[name].tolist()]
+        return self.columns[name]
+
+    def rows(self) -> List[List[str]]:
+        """
+        Rebuild every record as a list of strings, in file order, including
+        the ones reported in errors. Only meaningful for schemas of str and
+        category columns, whose text is kept exactly.
+        """
+        columns = [self.column(name) for name, _ in self.schema]
+        rows = [list(fields) for fields in zip(*columns)]
+        for index, _, fields, _ in self.errors:
+            rows.insert(index, fields)
+        return rows
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    """Get the shared parse pool, (re)creating it when the worker count changes."""
+    with _pool_lock:
+        if _pool['pid'] != os.getpid():
+            # Inherited through fork (e.g. a gunicorn worker of a preloaded
+            # master): the pool's manager thread stayed in the parent
+            _forget_pool()
+        if _pool['executor'] is None or _pool['workers'] != workers:
+            if _pool['executor'] is not None:
+                _pool['executor'].shutdown(wait=False)
+            # spawn: forking a threaded server process can deadlock the child
+            _pool['executor'] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool['workers'] = workers
+            _pool['pid'] = os.getpid()
+        return _pool['executor']
+
+
+def _forget_pool() -> None:
+    """Drop the pool reference without touching the pool, which belongs to another process."""
+    _pool.update(executor=None, workers=0, pid=None)
+
+
+def _after_fork_in_child() -> None:
+    global _pool_lock
+    # The lock may have been held by another thread of the parent when it forked
+    _pool_lock = threading.Lock()
+    _forget_pool()
+
+
+def shutdown_pool() -> None:
+    """Stop the shared parse pool."""
+    with _pool_lock:
+        if _pool['executor'] is not None and _pool['pid'] == os.getpid():
+            _pool['executor'].shutdown(wait=True)
+        _forget_pool()
+
+
+atexit.register(shutdown_pool)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def parse_columns(path: str, schema: Schema, workers: int = 0,
+                  min_parallel_bytes: Optional[int] = None) -> ParsedColumns:
+    """
+    Parse a CSV file with a header line into typed columns.
+
+    Args:
+        path (str): CSV file
+        schema: (column name, kind) per field, kind one of COLUMN_KINDS
+        workers (int): Worker processes; 0 or 1, or a file smaller than
+            min_parallel_bytes (default MIN_PARALLEL_BYTES), parses in this process
+
+    Raises:
+        ValidationError: If the schema is invalid or a record spans lines
+        FileOperationError: If the file cannot be read
+    """
+    for name, kind in schema:
+        if kind not in COLUMN_KINDS:
+            raise ValidationError(f"Unknown column kind for {name}: {kind}")
+    try:
+        start = _header_end(path)
+        size = os.path.getsize(path)
+        parallel = use_parallel(size, workers, min_parallel_bytes)
+        ranges = line_aligned_ranges(path, workers * 4 if parallel else 1, start)
+        if parallel:
+            executor = _get_executor(workers)
+            futures = [executor.submit(_parse_range, path, begin, end, list(schema))
+                       for begin, end in ranges]
+            chunks = [future.result() for future in futures]
+        else:
+            chunks = [_parse_range(path, begin, end, schema) for begin, end in ranges]
+    except OSError as e:
+        logger.error(f"Error reading {path}: {str(e)}")
+        raise FileOperationError(f"Failed to read {path}: {str(e)}")
+
+    parsed = _merge_chunks(chunks, schema)
+    for _, line, fields, message in parsed.errors:
+        if fields:  # Blank lines are skipped silently, as csv.reader callers do
+            logger.error(f"Skipping invalid line {line} of {path}: {message}")
+    logger.info(f"Parsed {parsed.records} records of {path} in {len(ranges)} chunks"
+                f"{' in parallel' if parallel else ''}")
+    return parsed
+
+
+def use_parallel(size: int, workers: int, min_parallel_bytes: Optional[int] = None) -> bool:
+    """
+    Check whether a file of `size` bytes is worth parsing with `workers` processes.
+
+    min_parallel_bytes overrides MIN_PARALLEL_BYTES, as it does for parse_columns.
+    """
+    if min_parallel_bytes is None:
+        min_parallel_bytes = MIN_PARALLEL_BYTES
+    return workers > 1 and size >= min_parallel_bytes
+
+
+def _merge_chunks(chunks: List[Dict], schema: Schema) -> ParsedColumns:
+    """Concatenate chunk payloads in file order."""
+    import numpy as np
+
+    columns: Dict = {}
+    categories: Dict[str, List[str]] = {}
+    for name, kind in schema:
+        if kind in NUMERIC_DTYPES:
+            parts = [chunk['columns'][name] for chunk in chunks]
+            columns[name] = np.concatenate(parts) if parts else np.zeros(0, dtype=NUMERIC_DTYPES[kind])
+        elif kind == 'category':
+            index: Dict[str, int] = {}
+            parts = []
+            for chunk in chunks:
+                chunk_values, codes = chunk['columns'][name]
+                remap = np.array([index.setdefault(value, len(index)) for value in chunk_values]
+                                 or [0], dtype=np.int32)
+                parts.append(remap[codes])
+            columns[name] = np.concatenate(parts) if parts else np.zeros(0, dtype=np.int32)
+            categories[name] = list(index)
+        else:
+            merged: List[str] = []
+            for chunk in chunks:
+                count, joined = chunk['columns'][name]
+                if count:
+                    merged.extend(joined.split('\n'))
+            columns[name] = merged
+
+    errors = []
+    records = 0
+    for chunk in chunks:
+        for index, fields, message in chunk['odd']:
+            # Record index is the data line index: line 1 is the header
+            errors.append((records + index, records + index + 2, fields, message))
+        records += chunk['records']
+    return ParsedColumns(schema, columns, categories, errors, records)
@@ -0,0 +1,320 @@
+# utils/partitioned.py
+
+"""
+Hash-partitioned, multi-process execution of catalogue queries.
+
+The catalogue is split by crc32(stock_code) % N across N long-lived worker
+processes. Each worker parses the stock file in parallel with the others
+but hydrates and keeps in memory only its own partition, so hydrating,
+filtering and aggregating run on N cores instead of behind one GIL.
+
+A listing query is scattered to every worker. Each one filters its
+partition, computes partial statistics and sorts its matches, returning
+only its first offset + per_page. The parent adds the statistics up and
+k-way merges the sorted partial pages with heapq.merge. Ties are ordered
+by row position in the file, so pages match a single-process stable sort.
+
+Workers stay current without re-reading the file after every write. The
+parent forwards each storage change, numbered in order, to every worker.
+The partition owning the SKU applies an update in place. Every other
+worker only records the file's new signature. Adds make the owner reload;
+deletes (which renumber rows) make every worker reload. A worker that
+misses a change, or finds the file changed by another process, reloads
+before its next query.
+"""
+
+import atexit
+import csv
+import heapq
+import logging
+import multiprocessing
+import os
+import threading
+import weakref
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from models.registry import get_item_type
+from models.stock_item import StockItem
+from utils.pricing import PriceBook, install as install_price_book
+
+logger = logging.getLogger(__name__)
+
+_catalogs: 'weakref.WeakSet[PartitionedCatalog]' = weakref.WeakSet()
+
+
+def partition_of(stock_code: str, count: int) -> int:
+    """Get the partition a stock code belongs to."""
+    return zlib.crc32(stock_code.encode('utf-8')) % count
+
+
+# --- worker side ---------------------------------------------------------
+
+# State of the partition owned by this worker process
+_partition: Dict = {
+    'path': None,
+    'index': 0,
+    'count': 1,
+    'items': {},          # stock_code -> (row position, item)
+    'signature': None,
+    'version': 0,
+    'stale': True,
+}
+
+
+def _init_worker(path: str, index: int, count: int,
+                 pricing_file: Optional[str] = None, default_vat: float = 17.5) -> None:
+    _partition.update(path=path, index=index, count=count)
+    if pricing_file:
+        # VAT for to_dict comes from the parent's price book, re-read when its file changes
+        install_price_book(PriceBook(pricing_file, default_vat=default_vat))
+
+
+def _file_signature(path: str) -> Tuple[int, int, int]:
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _hydrate(row: List[str]):
+    """Build the item for a stock row, or None (logged) if the row is invalid."""
+    try:
+        return get_item_type(row[0]).from_row(row)
+    except Exception as e:
+        # Skipped as in StockFileHandler.load_items, so one bad row cannot fail every listing
+        logger.error("Skipping invalid row in partition %s: %s. Error: %s", _partition['index'], row, e)
+        return None
+
+
+def _load_partition() -> None:
+    """Parse the stock file, hydrating only this worker's rows."""
+    state = _partition
+    signature = _file_signature(state['path'])
+    index, count = state['index'], state['count']
+    items = {}
+    with open(state['path'], 'r', newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        next(reader, None)  # Header
+        for position, row in enumerate(reader):
+            if len(row) > 1 and partition_of(row[1], count) == index:
+                item = _hydrate(row)
+                if item is not None:
+                    items[row[1]] = (position, item)
+    state.update(items=items, signature=signature, stale=False)
+
+
+def _ensure_current() -> None:
+    if _partition['stale'] or _partition['signature'] != _file_signature(_partition['path']):
+        _load_partition()
+
+
+def _apply_change(version: int, signature, action: str,
+                  stock_code: str, row: Optional[List[str]]) -> None:
+    """
+    Apply storage change number `version` to this worker's partition.
+
+    action is 'update' (owner replaces the item in place), 'reload' (the
+    worker re-reads the file) or 'signature' (another partition changed).
+    """
+    state = _partition
+    if state['version'] != version - 1 or state['stale']:
+        state['stale'] = True
+    elif action == 'reload' or (action == 'update' and stock_code not in state['items']):
+        state['stale'] = True
+    elif action == 'update':
+        position, _ = state['items'][stock_code]
+        item = _hydrate(row)
+        if item is None:
+            del state['items'][stock_code]
+        else:
+            state['items'][stock_code] = (position, item)
+    state['version'] = version
+    if not state['stale']:
+        state['signature'] = signature
+
+
+def _apply_batch(version: int, signature, rows: List[List[str]]) -> None:
+    """Apply a bulk update (storage change number `version`) to this worker's partition."""
+    state = _partition
+    if state['version'] != version - 1 or state['stale']:
+        state['stale'] = True
+    else:
+        items = state['items']
+        for row in rows:
+            if row[1] not in items:
+                state['stale'] = True
+                break
+            position, _ = items[row[1]]
+            item = _hydrate(row)
+            if item is None:
+                del items[row[1]]
+            else:
+                items[row[1]] = (position, item)
+    state['version'] = version
+    if not state['stale']:
+        state['signature'] = signature
+
+
+def _matches(item, search: str, brand: str) -> bool:
+    if search and not (search in item.stock_code.lower() or
+                       search in item.get_stock_name().lower() or
+                       search in getattr(item, 'brand', '').lower() or
+                       search in item.get_stock_description().lower()):
+        return False
+    if brand and not (hasattr(item, 'brand') and brand in item.brand.lower()):
+        return False
+    return True
+
+
+def _query_partition(search: str, brand: str, sort_by: str, reverse: bool, limit: int,
+                     statistics: bool, brands: bool,
+                     low_codes: Optional[FrozenSet[str]]) -> Dict:
+    """Filter, aggregate and sort this worker's partition."""
+    _ensure_current()
+    if StockItem.pricing is not None:
+        StockItem.pricing.refresh()
+    entries = _partition['items'].values()
+    if search or brand:
+        entries = [(position, item) for position, item in entries if _matches(item, search, brand)]
+    else:
+        entries = list(entries)
+
+    # Merge keys: (sort value, tie-break) so the merged order equals a stable sort by row
+    if sort_by == 'none':
+        keyed = [((position, position), item) for position, item in entries]
+    else:
+        keyed = [((getattr(item, sort_by, item.stock_code), -position if reverse else position), item)
+                 for position, item in entries]
+    page = heapq.nlargest(limit, keyed, key=lambda e: e[0]) if reverse and sort_by != 'none' \
+        else heapq.nsmallest(limit, keyed, key=lambda e: e[0])
+
+    result = {
+        'page': [(key, item.to_dict()) for key, item in page],
+        'count': len(entries),
+    }
+    if statistics:
+        result['total_value'] = sum(item.price * item.quantity for _, item in entries)
+        result['total_value_vat'] = sum(item.get_price_with_VAT() * item.quantity
+                                        for _, item in entries)
+        if low_codes is not None:
+            result['low_stock_items'] = sum(1 for _, item in entries
+                                            if item.stock_code in low_codes)
+    if brands:
+        result['brands'] = {item.brand for _, item in _partition['items'].values()
+                            if hasattr(item, 'brand') and item.brand and item.brand.strip()}
+    return result
+
+
+# --- parent side ---------------------------------------------------------
+
+class PartitionedCatalog:
+    """Scatter/gather front end over one single-worker process pool per partition."""
+
+    def __init__(self, file_handler, workers: Optional[int] = None,
+                 pricing_file: Optional[str] = None, default_vat: float = 17.5):
+        """
+        Args:
+            file_handler (StockFileHandler): Handler whose file is partitioned;
+                its storage changes are forwarded to the workers
+            workers (int): Number of partitions/processes; defaults to the CPU count
+            pricing_file (str): Price book file the workers resolve VAT rates from
+        """
+        self.path = str(file_handler.filename)
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        # spawn: forking a threaded server process can deadlock the child
+        context = multiprocessing.get_context('spawn')
+        self._executors = [
+            ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_init_worker,
+                                initargs=(self.path, index, self.workers, pricing_file, default_vat))
+            for index in range(self.workers)
+        ]
+        self._version = 0
+        self._lock = threading.Lock()
+        file_handler.add_listener(self.on_storage_event, batches=True)
+        _catalogs.add(self)
+        logger.info(f"Started {self.workers} catalogue partition workers")
+
+    def on_storage_event(self, change: Dict) -> None:
+        """StockFileHandler listener: forward the change to every partition in order."""
+        if change['event'] == 'batch':
+            self._forward_batch(change)
+            return
+        owner = partition_of(change['stock_code'], self.workers)
+        if change['event'] == 'deleted':
+            owner_action = other_action = 'reload'
+        elif change['previous'] is None:
+            owner_action, other_action = 'reload', 'signature'
+        else:
+            owner_action, other_action = 'update', 'signature'
+        # Submitted under the lock so each worker receives changes in version order
+        with self._lock:
+            self._version += 1
+            for index, executor in enumerate(self._executors):
+                executor.submit(_apply_change, self._version, change['signature'],
+                                owner_action if index == owner else other_action,
+                                change['stock_code'], change['row'] if index == owner else None)
+
+    def _forward_batch(self, batch: Dict) -> None:
+        """Send each partition the updated rows it owns as one message."""
+        rows: List[List[List[str]]] = [[] for _ in range(self.workers)]
+        for change in batch['changes']:
+            rows[partition_of(change['stock_code'], self.workers)].append(change['row'])
+        with self._lock:
+            self._version += 1
+            for executor, owned in zip(self._executors, rows):
+                executor.submit(_apply_batch, self._version, batch['signature'], owned)
+
+    def query(self, search: str = '', brand: str = '', sort_by: str = 'stock_code',
+              reverse: bool = False, offset: int = 0, limit: int = 10,
+              statistics: bool = True, brands: bool = True,
+              low_codes: Optional[FrozenSet[str]] = None) -> Dict:
+        """
+        Run a filtered, sorted, paginated listing across all partitions.
+
+        Args:
+            search (str): Lowercase text matched against code, name, brand and description
+            brand (str): Lowercase text matched against the brand
+            sort_by (str): Item attribute to sort by, or 'none' for file order
+            low_codes (frozenset): Codes below their reorder threshold; when
+                given, the statistics count how many of the matches they include
+
+        Returns:
+            Dict: 'items' (the page as dicts), 'total_items' and, if
+            requested, 'statistics' and 'brands'
+        """
+        args = (search, brand, sort_by, reverse, offset + limit, statistics, brands, low_codes)
+        futures = [executor.submit(_query_partition, *args) for executor in self._executors]
+        parts = [future.result() for future in futures]
+
+        merged = heapq.merge(*[part['page'] for part in parts], key=lambda e: e[0],
+                             reverse=reverse and sort_by != 'none')
+        result = {
+            'items': [item for _, item in islice(merged, offset, offset + limit)],
+            'total_items': sum(part['count'] for part in parts),
+        }
+        if statistics:
+            result['statistics'] = {
+                'total_items': result['total_items'],
+                'total_value': sum(part['total_value'] for part in parts),
+                'total_value_vat': sum(part['total_value_vat'] for part in parts),
+            }
+            if low_codes is not None:
+                result['statistics']['low_stock_items'] = sum(part['low_stock_items']
+                                                              for part in parts)
+        if brands:
+            result['brands'] = sorted(set().union(*(part['brands'] for part in parts)))
+        return result
+
+    def close(self) -> None:
+        """Stop the worker processes."""
+        for executor in self._executors:
+            executor.shutdown(wait=True, cancel_futures=True)
+        _catalogs.discard(self)
+
+
+def _close_all() -> None:
+    for catalog in list(_catalogs):
+        catalog.close()
+
+
+atexit.register(_close_all)
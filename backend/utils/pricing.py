@@ -0,0 +1,409 @@
+# utils/pricing.py
+
+"""
+Effective-dated prices and VAT rates.
+
+Every SKU's price history is a list of intervals, each starting at an
+'effective from' time (epoch seconds) and lasting until the next one.
+VAT rates are held the same way: one standard schedule for every item
+plus optional per-SKU overrides. A VAT change is therefore a single new
+interval, whatever the size of the catalogue, and lookups at any moment
+bisect the interval start times.
+
+The book is persisted as an append-only JSON Lines file of intervals
+(replayed on startup). A batch of prices is appended in one write with
+one fsync. Other processes sharing the file pick up its new lines on
+refresh(), and every change first catches up with them.
+
+Prices can only take effect now or in the past (the stock file holds the
+current selling price); VAT rates may also be scheduled ahead.
+"""
+
+import json
+import logging
+import math
+import os
+import threading
+import time
+from bisect import bisect_right
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from utils.atomic import schedule_sync, validate_durability
+from utils.exceptions import FileOperationError, ValidationError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VAT_RATE = 17.5
+
+Timestamp = Union[float, int, str, datetime, None]
+
+
+def to_timestamp(value: Timestamp) -> float:
+    """
+    Convert epoch seconds, an ISO 8601 string or a datetime to epoch seconds.
+
+    None means now; naive times are local time.
+
+    Raises:
+        ValidationError: If the value cannot be read as a time, or is not
+            finite or out of range (it would break the sorted interval starts)
+    """
+    if value is None:
+        return time.time()
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        timestamp = float(value)
+    else:
+        try:
+            timestamp = float(value)
+        except (TypeError, ValueError):
+            try:
+                return datetime.fromisoformat(str(value)).timestamp()
+            except ValueError:
+                raise ValidationError(f"Invalid time: {value!r}; use ISO 8601 or epoch seconds")
+    if not math.isfinite(timestamp):
+        raise ValidationError(f"Invalid time: {value!r}; use ISO 8601 or epoch seconds")
+    try:
+        datetime.fromtimestamp(timestamp)
+    except (OverflowError, OSError, ValueError):
+        raise ValidationError(f"Time out of range: {value!r}")
+    return timestamp
+
+
+def format_timestamp(timestamp: float) -> str:
+    """Format epoch seconds as local ISO 8601."""
+    return datetime.fromtimestamp(timestamp).isoformat(timespec='seconds')
+
+
+class RateSchedule:
+    """
+    Values in effect from sorted start times, looked up by bisection.
+
+    Lookups take no lock: set() builds new start and value lists and
+    publishes them together in one assignment, so a reader always sees a
+    matching pair. The published lists are never modified.
+    """
+
+    __slots__ = ('_intervals',)
+
+    def __init__(self):
+        self._intervals: Tuple[List[float], List[float]] = ([], [])
+
+    @property
+    def starts(self) -> List[float]:
+        return self._intervals[0]
+
+    @property
+    def values(self) -> List[float]:
+        return self._intervals[1]
+
+    def snapshot(self) -> Tuple[List[float], List[float]]:
+        """Get the start times and values as one consistent pair (do not modify them)."""
+        return self._intervals
+
+    def set(self, effective_from: float, value: float) -> None:
+        """Add an interval starting at effective_from (replacing one that starts at the same time)."""
+        starts, values = self._intervals
+        index = bisect_right(starts, effective_from)
+        if index and starts[index - 1] == effective_from:
+            values = list(values)
+            values[index - 1] = value
+            self._intervals = (starts, values)
+        else:
+            self._intervals = (starts[:index] + [effective_from] + starts[index:],
+                               values[:index] + [value] + values[index:])
+
+    def value_at(self, timestamp: float, default: Optional[float] = None) -> Optional[float]:
+        """Get the value in effect at timestamp, or default before the first interval."""
+        starts, values = self._intervals
+        index = bisect_right(starts, timestamp)
+        return values[index - 1] if index else default
+
+    def next_start(self, timestamp: float) -> Optional[float]:
+        """Get the start of the first interval after timestamp, or None."""
+        starts = self._intervals[0]
+        index = bisect_right(starts, timestamp)
+        return starts[index] if index < len(starts) else None
+
+    def intervals(self) -> List[Dict]:
+        """Get the intervals as dicts with ISO start and end times (end None while open)."""
+        starts, values = self._intervals
+        ends = starts[1:] + [None]
+        return [
+            {'effective_from': format_timestamp(start),
+             'effective_to': format_timestamp(end) if end is not None else None,
+             'value': value}
+            for start, end, value in zip(starts, ends, values)
+        ]
+
+    def __len__(self) -> int:
+        return len(self._intervals[0])
+
+
+class PriceBook:
+    """Point-in-time price and VAT lookups for every SKU."""
+
+    def __init__(self, file_path: Optional[str] = None, default_vat: float = DEFAULT_VAT_RATE,
+                 durability: str = 'always'):
+        self.file_path = str(file_path) if file_path else None
+        self.default_vat = default_vat
+        self.durability = validate_durability(durability)
+        self._prices: Dict[str, RateSchedule] = {}
+        self._vat = RateSchedule()
+        self._vat_overrides: Dict[str, RateSchedule] = {}
+        # Bumped on every change; report caches key on it
+        self.version = 0
+        self._signature = None
+        self._offset = 0  # bytes of the file applied so far
+        self._lock = threading.Lock()
+        self._load()
+
+    # --- persistence -----------------------------------------------------
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _load(self) -> None:
+        """Replay the persisted intervals."""
+        if not self.file_path or not os.path.exists(self.file_path):
+            return
+        self._replay()
+        logger.info(f"Loaded price history for {len(self._prices)} SKUs")
+
+    def _replay(self) -> None:
+        """Apply the complete lines written after the part of the file already applied."""
+        signature = self._file_signature()
+        try:
+            with open(self.file_path, 'rb') as file:
+                file.seek(self._offset)
+                data = file.read()
+        except FileNotFoundError:
+            data = b''
+        except OSError as e:
+            logger.error(f"Error loading pricing history: {str(e)}")
+            raise FileOperationError(f"Failed to load pricing history: {str(e)}")
+        # A line still being appended by another process is applied next time
+        data = data[:data.rfind(b'\n') + 1]
+        try:
+            for line in data.decode('utf-8').splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping unreadable pricing record: {line[:80]!r}")
+                    continue
+                self._apply(record)
+        except (KeyError, TypeError, UnicodeDecodeError) as e:
+            logger.error(f"Error loading pricing history: {str(e)}")
+            raise FileOperationError(f"Failed to load pricing history: {str(e)}")
+        self._offset += len(data)
+        self._signature = signature
+        self.version += 1
+
+    def _catch_up(self) -> None:
+        """Apply what other processes appended; the caller holds the lock."""
+        signature = self._file_signature()
+        if signature == self._signature:
+            return
+        if (signature is None or self._signature is None or signature[0] != self._signature[0]
+                or signature[1] < self._offset):
+            # Replaced or truncated: load it afresh, then swap, so lookups never see half a book
+            fresh = PriceBook(self.file_path, self.default_vat, self.durability)
+            self._prices, self._vat, self._vat_overrides = (
+                fresh._prices, fresh._vat, fresh._vat_overrides)
+            self._offset, self._signature = fresh._offset, fresh._signature
+            self.version += 1
+        else:
+            self._replay()
+
+    def refresh(self) -> None:
+        """Apply changes other processes have made to the book's file."""
+        if self.file_path and self._file_signature() != self._signature:
+            with self._lock:
+                self._catch_up()
+
+    def _apply(self, record: Dict) -> None:
+        if record['kind'] == 'price':
+            schedules = self._prices
+        elif record['code'] is None:
+            self._vat.set(record['from'], record['value'])
+            return
+        else:
+            schedules = self._vat_overrides
+        schedule = schedules.get(record['code'])
+        if schedule is None:
+            schedule = schedules[record['code']] = RateSchedule()
+        schedule.set(record['from'], record['value'])
+
+    def _record(self, records: List[Dict]) -> None:
+        """Persist and apply records as one batch."""
+        with self._lock:
+            if not self.file_path:
+                for record in records:
+                    self._apply(record)
+                self.version += 1
+                return
+            data = ''.join(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+                           for record in records).encode('utf-8')
+            try:
+                # One O_APPEND write, so lines of concurrent writers never interleave
+                with open(self.file_path, 'ab', buffering=0) as file:
+                    file.write(data)
+                    if self.durability == 'always':
+                        os.fsync(file.fileno())
+                if self.durability == 'batched':
+                    schedule_sync(self.file_path)
+            except OSError as e:
+                logger.error(f"Error saving pricing history: {str(e)}")
+                raise FileOperationError(f"Failed to save pricing history: {str(e)}")
+            # The file is the record: apply its new lines, other processes' included
+            self._catch_up()
+
+    # --- changes ---------------------------------------------------------
+
+    def set_prices(self, prices: Union[Dict[str, float], Iterable[Tuple[str, float]]],
+                   effective_from: Timestamp = None) -> int:
+        """
+        Record new prices for many SKUs as one batch.
+
+        Raises:
+            ValidationError: If a price is not a finite number greater than 0,
+                or effective_from is in the future
+
+        Returns:
+            int: Number of prices recorded
+        """
+        start = to_timestamp(effective_from)
+        if start > time.time() + 1:
+            raise ValidationError("Prices cannot take effect in the future")
+        items = prices.items() if isinstance(prices, dict) else prices
+        records = []
+        for stock_code, price in items:
+            price = float(price)
+            if not math.isfinite(price) or price <= 0:
+                raise ValidationError(f"Price for {stock_code} must be greater than 0")
+            records.append({'kind': 'price', 'code': stock_code, 'from': start, 'value': price})
+        if records:
+            self._record(records)
+        return len(records)
+
+    def set_vat_rate(self, rate: float, effective_from: Timestamp = None,
+                     stock_code: Optional[str] = None) -> None:
+        """
+        Set the standard VAT rate (or one SKU's override) from a time on.
+
+        Raises:
+            ValidationError: If the rate is not between 0 and 100
+        """
+        rate = float(rate)
+        if not 0 <= rate <= 100:
+            raise ValidationError("VAT rate must be between 0 and 100")
+        start = to_timestamp(effective_from)
+        self._record([{'kind': 'vat', 'code': stock_code, 'from': start, 'value': rate}])
+        logger.info(f"VAT rate for {stock_code or 'all items'} set to {rate} "
+                    f"from {format_timestamp(start)}")
+
+    def on_storage_event(self, change: Dict) -> None:
+        """
+        StockFileHandler listener: record a price interval when a saved price
+        changes; a bulk save is recorded as one batch.
+
+        The first change recorded for a SKU also records the price it
+        replaces as in effect since the start of time, so lookups before the
+        change still find it.
+        """
+        changes = change['changes'] if change['event'] == 'batch' else [change]
+        self.refresh()
+        now = time.time()
+        records = []
+        for each in changes:
+            row, previous = each['row'], each['previous']
+            if row is not None and (previous is None or float(previous[3]) != float(row[3])):
+                if previous is not None and each['stock_code'] not in self._prices:
+                    records.append({'kind': 'price', 'code': each['stock_code'], 'from': 0.0,
+                                    'value': float(previous[3])})
+                records.append({'kind': 'price', 'code': each['stock_code'], 'from': now,
+                                'value': float(row[3])})
+        if records:
+            self._record(records)
+
+    # --- lookups ---------------------------------------------------------
+
+    def vat_rate(self, stock_code: Optional[str] = None, at: Timestamp = None) -> float:
+        """Get the VAT rate in effect for a SKU at a time (default now)."""
+        timestamp = to_timestamp(at)
+        override = self._vat_overrides.get(stock_code) if stock_code else None
+        if override is not None:
+            rate = override.value_at(timestamp)
+            if rate is not None:
+                return rate
+        return self._vat.value_at(timestamp, self.default_vat)
+
+    def next_vat_change(self, at: Timestamp = None) -> Optional[float]:
+        """
+        Get the time of the first scheduled VAT change (standard or any
+        override) after a time (default now), or None if none is scheduled.
+
+        Lookups made for "now" stay valid until then, even at the same version.
+        """
+        timestamp = to_timestamp(at)
+        starts = [schedule.next_start(timestamp)
+                  for schedule in [self._vat, *self._vat_overrides.values()]]
+        starts = [start for start in starts if start is not None]
+        return min(starts) if starts else None
+
+    def price_at(self, stock_code: str, at: Timestamp = None,
+                 default: Optional[float] = None) -> Optional[float]:
+        """Get a SKU's price at a time, or default if no price was recorded by then."""
+        schedule = self._prices.get(stock_code)
+        if schedule is None:
+            return default
+        return schedule.value_at(to_timestamp(at), default)
+
+    def vat_rates(self, stock_codes, timestamps):
+        """
+        Get the VAT rate for each (stock_code, timestamp) pair as a numpy array.
+
+        The standard schedule is resolved for all pairs with one searchsorted,
+        then each SKU override with one more over that SKU's pairs.
+        """
+        import numpy as np
+
+        timestamps = np.asarray(timestamps, dtype='float64')
+        vat_starts, vat_values = self._vat.snapshot()
+        if vat_starts:
+            starts = np.array(vat_starts)
+            values = np.array([self.default_vat] + vat_values)
+            rates = values[np.searchsorted(starts, timestamps, side='right')]
+        else:
+            rates = np.full(len(timestamps), self.default_vat)
+        if self._vat_overrides:
+            codes = np.asarray(stock_codes, dtype=object)
+            for stock_code, override in list(self._vat_overrides.items()):
+                mask = codes == stock_code
+                if mask.any():
+                    override_starts, override_values = override.snapshot()
+                    index = np.searchsorted(np.array(override_starts), timestamps[mask], side='right')
+                    values = np.array([np.nan] + override_values)[index]
+                    rates[mask] = np.where(np.isnan(values), rates[mask], values)
+        return rates
+
+    def price_history(self, stock_code: str) -> List[Dict]:
+        """Get a SKU's price intervals, oldest first."""
+        schedule = self._prices.get(stock_code)
+        return schedule.intervals() if schedule is not None else []
+
+    def vat_schedule(self, stock_code: Optional[str] = None) -> List[Dict]:
+        """Get the standard VAT intervals, or one SKU's override intervals."""
+        schedule = self._vat_overrides.get(stock_code) if stock_code else self._vat
+        return schedule.intervals() if schedule is not None else []
+
+
+def install(price_book: Optional[PriceBook]) -> None:
+    """Make StockItem.get_VAT and get_price_with_VAT resolve through a price book (None: 17.5)."""
+    from models.stock_item import StockItem
+    StockItem.pricing = price_book
@@ -0,0 +1,269 @@
+# utils/profiling.py
+
+"""
+Sampling request profiler.
+
+When enabled, a fraction of requests (sample_rate) runs under cProfile
+and/or tracemalloc. The results are aggregated per route ("GET
+/api/items"). For each route you get the hottest functions with their
+callers, and the allocation sites that grew the most while the request
+ran. The aggregates can be read back or dumped to the logs directory as
+.pstats and text files.
+
+Both profilers are process-wide, so at most one request is profiled at a
+time. A sampled request that finds another one being profiled runs
+unprofiled. The profile can include work done by other threads while it
+was recorded.
+
+Settings live on the profiler and can be changed at runtime. When
+profiling is off, each request costs one attribute check.
+"""
+
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+from flask import current_app, g, request
+from utils.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('cpu', 'memory')
+# Frames kept per allocation traceback
+TRACEMALLOC_FRAMES = 10
+
+
+def _function_name(key) -> str:
+    filename, line, name = key
+    return f"{os.path.basename(filename)}:{line}({name})" if line else name
+
+
+class RouteProfile:
+    """Aggregated samples of one route."""
+
+    def __init__(self):
+        self.samples = 0
+        self.total_seconds = 0.0
+        self.stats: Optional[pstats.Stats] = None
+        self.allocations: Dict[str, List[int]] = {}  # site -> [bytes, blocks]
+        self.peak_bytes = 0
+
+    def add_cpu(self, profile: cProfile.Profile) -> None:
+        if self.stats is None:
+            self.stats = pstats.Stats(profile, stream=io.StringIO())
+        else:
+            self.stats.add(profile)
+
+    def add_memory(self, before, after, peak: int) -> None:
+        for stat in after.compare_to(before, 'lineno'):
+            if stat.size_diff <= 0:
+                continue
+            frame = stat.traceback[0]
+            site = f"{frame.filename}:{frame.lineno}"
+            totals = self.allocations.setdefault(site, [0, 0])
+            totals[0] += stat.size_diff
+            totals[1] += stat.count_diff
+        self.peak_bytes = max(self.peak_bytes, peak)
+
+    def hot_functions(self, limit: int) -> List[Dict]:
+        """Get the functions with the most cumulative time, each with its top callers."""
+        if self.stats is None:
+            return []
+        entries = sorted(self.stats.stats.items(), key=lambda entry: entry[1][3], reverse=True)
+        functions = []
+        for key, (_, calls, total_time, cumulative_time, callers) in entries[:limit]:
+            top_callers = sorted(callers.items(), key=lambda caller: caller[1][3], reverse=True)[:3]
+            functions.append({
+                'function': _function_name(key),
+                'calls': calls,
+                'total_seconds': round(total_time, 6),
+                'cumulative_seconds': round(cumulative_time, 6),
+                'per_sample_seconds': round(cumulative_time / self.samples, 6) if self.samples else 0.0,
+                'callers': [_function_name(caller) for caller, _ in top_callers],
+            })
+        return functions
+
+    def allocation_sites(self, limit: int) -> List[Dict]:
+        """Get the allocation sites that grew the most, summed over samples."""
+        sites = sorted(self.allocations.items(), key=lambda entry: entry[1][0], reverse=True)
+        return [{'site': site, 'bytes': size, 'blocks': blocks}
+                for site, (size, blocks) in sites[:limit]]
+
+    def summary(self, limit: int) -> Dict:
+        return {
+            'samples': self.samples,
+            'mean_seconds': round(self.total_seconds / self.samples, 6) if self.samples else 0.0,
+            'hot_functions': self.hot_functions(limit),
+            'allocation_sites': self.allocation_sites(limit),
+            'peak_traced_bytes': self.peak_bytes,
+        }
+
+
+class RequestProfiler:
+    """Flask extension sampling requests under cProfile and tracemalloc."""
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.sample_rate = 0.0
+        self.modes = ('cpu',)
+        self.top_n = 25
+        self.dump_dir = 'logs'
+        self._routes: Dict[str, RouteProfile] = {}
+        self._lock = threading.Lock()
+        # Held by the request being profiled
+        self._active = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        """Read PROFILE_* settings and register the request hooks."""
+        self.configure(enabled=app.config.get('PROFILE_ENABLED', False),
+                       sample_rate=app.config.get('PROFILE_SAMPLE_RATE', 0.01),
+                       modes=app.config.get('PROFILE_MODES', ('cpu',)))
+        self.top_n = app.config.get('PROFILE_TOP_N', 25)
+        self.dump_dir = str(app.config.get('PROFILE_DUMP_DIR', 'logs'))
+        app.extensions['request_profiler'] = self
+        app.before_request(self.start_sample)
+        app.teardown_request(self.finish_sample)
+
+    def configure(self, enabled: Optional[bool] = None, sample_rate: Optional[float] = None,
+                  modes: Optional[List[str]] = None) -> Dict:
+        """
+        Change settings at runtime; None leaves a setting as it is.
+
+        Raises:
+            ValidationError: If sample_rate is not between 0 and 1 or a mode is unknown
+        """
+        if sample_rate is not None:
+            sample_rate = float(sample_rate)
+            if not 0 <= sample_rate <= 1:
+                raise ValidationError("sample_rate must be between 0 and 1")
+            self.sample_rate = sample_rate
+        if modes is not None:
+            modes = tuple(modes)
+            unknown = [mode for mode in modes if mode not in PROFILE_MODES]
+            if unknown or not modes:
+                raise ValidationError(f"modes must be a non-empty list of: {', '.join(PROFILE_MODES)}")
+            self.modes = modes
+        if enabled is not None:
+            self.enabled = bool(enabled)
+        return self.settings()
+
+    def settings(self) -> Dict:
+        return {'enabled': self.enabled, 'sample_rate': self.sample_rate,
+                'modes': list(self.modes), 'top_n': self.top_n}
+
+    # --- request hooks ---------------------------------------------------
+
+    def start_sample(self) -> None:
+        """before_request hook: start profiling if this request is sampled."""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return
+        if request.path.startswith('/api/admin/profile'):
+            return
+        if not self._active.acquire(blocking=False):
+            return  # Another request holds the process-wide profilers
+        sample = {'started': time.perf_counter(), 'profile': None, 'memory': None}
+        # Set first: the teardown hook releases the lock whatever happens below
+        g._profile_sample = sample
+        if 'memory' in self.modes and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            sample['memory'] = tracemalloc.take_snapshot()
+        if 'cpu' in self.modes:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                sample['profile'] = profile
+            except ValueError:
+                pass  # Another profiler (e.g. a debugger) is active
+
+    def finish_sample(self, exception=None) -> None:
+        """teardown_request hook: stop profiling and add the sample to its route."""
+        sample = g.pop('_profile_sample', None)
+        if sample is None:
+            return
+        try:
+            if sample['profile'] is not None:
+                sample['profile'].disable()
+            elapsed = time.perf_counter() - sample['started']
+            after = peak = None
+            if sample['memory'] is not None:
+                after = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            rule = request.url_rule.rule if request.url_rule is not None else request.path
+            route = f"{request.method} {rule}"
+            with self._lock:
+                profile = self._routes.setdefault(route, RouteProfile())
+                profile.samples += 1
+                profile.total_seconds += elapsed
+                if sample['profile'] is not None:
+                    profile.add_cpu(sample['profile'])
+                if after is not None:
+                    profile.add_memory(sample['memory'], after, peak)
+        except Exception as e:
+            logger.error(f"Error recording profile sample: {str(e)}")
+        finally:
+            self._active.release()
+
+    # --- results ---------------------------------------------------------
+
+    def report(self, route: Optional[str] = None, limit: Optional[int] = None) -> Dict:
+        """Get the aggregated samples of every route (or those containing `route`)."""
+        limit = limit or self.top_n
+        with self._lock:
+            routes = {name: profile.summary(limit) for name, profile in self._routes.items()
+                      if route is None or route in name}
+        return {'settings': self.settings(), 'routes': routes}
+
+    def reset(self) -> None:
+        """Drop every aggregated sample."""
+        with self._lock:
+            self._routes = {}
+
+    def dump(self, directory: Optional[str] = None) -> List[str]:
+        """
+        Write each route's stats to the dump directory: a .pstats file
+        (for pstats or snakeviz) and a text report with its allocation sites.
+
+        Returns:
+            List[str]: Paths written
+        """
+        directory = directory or self.dump_dir
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        written = []
+        with self._lock:
+            for route, profile in self._routes.items():
+                name = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_')
+                base = os.path.join(directory, f"profile_{name}_{stamp}")
+                text = io.StringIO()
+                text.write(f"{route}: {profile.samples} samples, "
+                           f"mean {profile.total_seconds / max(profile.samples, 1):.6f} s\n\n")
+                if profile.stats is not None:
+                    profile.stats.dump_stats(base + '.pstats')
+                    written.append(base + '.pstats')
+                    profile.stats.stream = text
+                    profile.stats.sort_stats('cumulative').print_stats(self.top_n)
+                    profile.stats.print_callers(self.top_n)
+                if profile.allocations:
+                    text.write("Allocation sites (bytes, blocks):\n")
+                    for site in profile.allocation_sites(self.top_n):
+                        text.write(f"  {site['bytes']:>12} {site['blocks']:>8}  {site['site']}\n")
+                with open(base + '.txt', 'w', encoding='utf-8') as file:
+                    file.write(text.getvalue())
+                written.append(base + '.txt')
+        logger.info(f"Wrote {len(written)} profile files to {directory}")
+        return written
+
+
+def get_profiler() -> RequestProfiler:
+    """Get the current app's request profiler."""
+    return current_app.extensions['request_profiler']
@@ -0,0 +1,352 @@
+# utils/reorder.py
+
+import heapq
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+from models.registry import item_type_schemas
+from utils.atomic import atomic_write, validate_durability
+from utils.exceptions import FileOperationError, ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+def row_brand(row: List[str], schemas: Dict[str, Tuple[str, ...]]) -> str:
+    """Get a stock row's brand by its item type's schema ('' if it has none)."""
+    schema = schemas.get(row[0], ())
+    if 'brand' not in schema:
+        return ''
+    index = schema.index('brand')
+    return row[index] if len(row) > index else ''
+
+
+class ReorderIndex:
+    """
+    Index of items that have fallen below their reorder threshold.
+
+    Each item is bucketed by its margin (quantity - threshold); items with a
+    negative margin need reordering. Quantities are capped at 100, so there
+    are only a couple of hundred possible buckets. Listing the k low items
+    walks the non-empty negative buckets, most urgent first, and picks at
+    most k codes from each with a bounded heap (O(b log k) for a bucket of
+    b items) rather than sorting whole buckets.
+
+    Thresholds resolve per SKU first, then per brand, then the default.
+    Thresholds saved by another process are picked up by sync(), which
+    reloads the thresholds file whenever its signature changes.
+    """
+
+    def __init__(self, default_threshold: int = 10, thresholds_file: Optional[str] = None,
+                 durability: str = 'always'):
+        self.default_threshold = default_threshold
+        self.thresholds_file = Path(thresholds_file) if thresholds_file else None
+        self.durability = validate_durability(durability)
+        self._sku_thresholds: Dict[str, int] = {}
+        self._brand_thresholds: Dict[str, int] = {}
+        self._items: Dict[str, Tuple[int, str]] = {}  # stock_code -> (quantity, brand)
+        self._margins: Dict[str, int] = {}
+        self._buckets: Dict[int, Set[str]] = {}
+        self._brand_members: Dict[str, Set[str]] = {}
+        self._low_count = 0
+        self._listeners: List[Callable[[Dict], None]] = []
+        self._signature = None
+        self._thresholds_signature = None
+        self._lock = threading.RLock()
+        self._load_thresholds()
+
+    # --- thresholds ------------------------------------------------------
+
+    def _thresholds_file_signature(self):
+        try:
+            stat = os.stat(self.thresholds_file)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _load_thresholds(self) -> None:
+        """Load persisted thresholds, if any."""
+        if not self.thresholds_file or not self.thresholds_file.exists():
+            return
+        try:
+            signature = self._thresholds_file_signature()
+            with open(self.thresholds_file, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            self.default_threshold = int(data.get('default', self.default_threshold))
+            self._sku_thresholds = {k: int(v) for k, v in data.get('sku', {}).items()}
+            self._brand_thresholds = {k: int(v) for k, v in data.get('brand', {}).items()}
+            self._thresholds_signature = signature
+        except (IOError, ValueError) as e:
+            logger.error(f"Error loading reorder thresholds: {str(e)}")
+            raise FileOperationError(f"Failed to load reorder thresholds: {str(e)}")
+
+    def _reload_thresholds(self) -> None:
+        """Reload thresholds changed by another process and re-bucket every item."""
+        if not self.thresholds_file or self._thresholds_file_signature() == self._thresholds_signature:
+            return
+        with self._lock:
+            if self._thresholds_file_signature() == self._thresholds_signature:
+                return
+            try:
+                self._load_thresholds()
+            except FileOperationError:
+                return  # Logged; keep the thresholds we have
+            for code in self._items:
+                self._place(code)
+            logger.info("Reloaded reorder thresholds changed by another process")
+
+    def _save_thresholds(self) -> None:
+        """Persist thresholds next to the stock file."""
+        if not self.thresholds_file:
+            return
+        try:
+            with atomic_write(self.thresholds_file, encoding='utf-8',
+                              durability=self.durability) as file:
+                json.dump(self.get_thresholds(), file, ensure_ascii=False, indent=2)
+            self._thresholds_signature = self._thresholds_file_signature()
+        except IOError as e:
+            logger.error(f"Error saving reorder thresholds: {str(e)}")
+            raise FileOperationError(f"Failed to save reorder thresholds: {str(e)}")
+
+    @staticmethod
+    def _validate_threshold(value) -> int:
+        """Validate a threshold value."""
+        if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            raise ValidationError("Threshold must be a non-negative integer")
+        return value
+
+    def get_thresholds(self) -> Dict:
+        """Get the default, per-SKU and per-brand thresholds."""
+        with self._lock:
+            return {
+                'default': self.default_threshold,
+                'sku': dict(self._sku_thresholds),
+                'brand': dict(self._brand_thresholds),
+            }
+
+    def update_thresholds(self, default: Optional[int] = None,
+                          sku: Optional[Dict] = None, brand: Optional[Dict] = None) -> Dict:
+        """
+        Change thresholds and re-bucket only the affected items.
+
+        A value of None in the sku or brand mapping removes that override.
+
+        Raises:
+            ValidationError: If any threshold is not a non-negative integer
+        """
+        sku = sku or {}
+        brand = brand or {}
+        # Validate everything before changing anything
+        if default is not None:
+            self._validate_threshold(default)
+        for value in list(sku.values()) + list(brand.values()):
+            if value is not None:
+                self._validate_threshold(value)
+
+        with self._lock:
+            # Apply the change on top of any saved by another process
+            self._reload_thresholds()
+            affected: Set[str] = set()
+            if default is not None and default != self.default_threshold:
+                self.default_threshold = default
+                affected.update(self._items)
+            for code, value in sku.items():
+                self._set_override(self._sku_thresholds, code, value)
+                affected.add(code)
+            for name, value in brand.items():
+                self._set_override(self._brand_thresholds, name, value)
+                affected.update(self._brand_members.get(name, ()))
+
+            for code in affected:
+                if code in self._items:
+                    self._place(code)
+            self._save_thresholds()
+            logger.info(f"Updated reorder thresholds for {len(affected)} items")
+            return self.get_thresholds()
+
+    @staticmethod
+    def _set_override(overrides: Dict[str, int], key: str, value: Optional[int]) -> None:
+        if value is None:
+            overrides.pop(key, None)
+        else:
+            overrides[key] = value
+
+    def threshold_for(self, stock_code: str, brand: str = '') -> int:
+        """Resolve the threshold for an item: SKU, then brand, then default."""
+        if stock_code in self._sku_thresholds:
+            return self._sku_thresholds[stock_code]
+        if brand in self._brand_thresholds:
+            return self._brand_thresholds[brand]
+        return self.default_threshold
+
+    # --- index maintenance -----------------------------------------------
+
+    def add_listener(self, callback: Callable[[Dict], None]) -> None:
+        """
+        Register a callback fired when an item crosses its threshold.
+
+        The callback receives a dict with 'type' ('low_stock' when an item
+        drops below its threshold, 'restocked' when it recovers, or
+        'removed' when a low item is deleted), 'stock_code', 'quantity'
+        and 'threshold'.
+        """
+        self._listeners.append(callback)
+
+    def _fire(self, event_type: str, stock_code: str, quantity: int, threshold: int) -> None:
+        event = {
+            'type': event_type,
+            'stock_code': stock_code,
+            'quantity': quantity,
+            'threshold': threshold,
+        }
+        for callback in self._listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error(f"Error in reorder listener: {str(e)}")
+
+    def _unplace(self, stock_code: str) -> Optional[int]:
+        """Remove an item from its bucket and return its old margin."""
+        margin = self._margins.pop(stock_code, None)
+        if margin is None:
+            return None
+        bucket = self._buckets[margin]
+        bucket.discard(stock_code)
+        if not bucket:
+            del self._buckets[margin]
+        if margin < 0:
+            self._low_count -= 1
+        return margin
+
+    def _place(self, stock_code: str) -> None:
+        """(Re)bucket an item and fire an event if it crossed its threshold."""
+        quantity, brand = self._items[stock_code]
+        threshold = self.threshold_for(stock_code, brand)
+        margin = quantity - threshold
+
+        old_margin = self._unplace(stock_code)
+        self._margins[stock_code] = margin
+        self._buckets.setdefault(margin, set()).add(stock_code)
+        if margin < 0:
+            self._low_count += 1
+
+        was_low = old_margin is not None and old_margin < 0
+        if margin < 0 and not was_low:
+            self._fire('low_stock', stock_code, quantity, threshold)
+        elif margin >= 0 and was_low:
+            self._fire('restocked', stock_code, quantity, threshold)
+
+    def upsert(self, stock_code: str, quantity: int, brand: str = '') -> None:
+        """Add or update an item's quantity and brand."""
+        with self._lock:
+            previous = self._items.get(stock_code)
+            if previous is not None and previous[1] != brand:
+                self._brand_members.get(previous[1], set()).discard(stock_code)
+            self._items[stock_code] = (quantity, brand)
+            self._brand_members.setdefault(brand, set()).add(stock_code)
+            self._place(stock_code)
+
+    def remove(self, stock_code: str) -> None:
+        """Remove an item from the index."""
+        with self._lock:
+            item = self._items.pop(stock_code, None)
+            if item is None:
+                return
+            self._brand_members.get(item[1], set()).discard(stock_code)
+            margin = self._unplace(stock_code)
+            if margin is not None and margin < 0:
+                self._fire('removed', stock_code, item[0], self.threshold_for(stock_code, item[1]))
+
+    def rebuild(self, rows: List[List[str]], signature=None) -> None:
+        """Rebuild the whole index from stock file rows (no events fired)."""
+        with self._lock:
+            self._items.clear()
+            self._margins.clear()
+            self._buckets.clear()
+            self._brand_members.clear()
+            self._low_count = 0
+            listeners, self._listeners = self._listeners, []
+            schemas = item_type_schemas()
+            try:
+                for row in rows:
+                    try:
+                        self.upsert(row[1], int(row[2]), row_brand(row, schemas))
+                    except (IndexError, ValueError):
+                        logger.error(f"Skipping invalid row in reorder index: {row}")
+            finally:
+                self._listeners = listeners
+            self._signature = signature
+            logger.info(f"Rebuilt reorder index: {len(self._items)} items, {self._low_count} low")
+
+    def on_storage_event(self, change: Dict) -> None:
+        """StockFileHandler listener keeping the index in step with writes."""
+        with self._lock:
+            row = change['row']
+            if change['event'] == 'deleted':
+                self.remove(change['stock_code'])
+            elif row is not None:
+                self.upsert(row[1], int(row[2]), row_brand(row, item_type_schemas()))
+            self._signature = change.get('signature')
+
+    def sync(self, file_handler) -> None:
+        """Reload changed thresholds, and rebuild from storage if the file was changed by someone else."""
+        self._reload_thresholds()
+        signature = file_handler.file_signature()
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    self.rebuild(file_handler.load_all_items(), signature)
+
+    # --- queries ---------------------------------------------------------
+
+    def is_low(self, stock_code: str) -> bool:
+        """Check whether an item is below its threshold."""
+        margin = self._margins.get(stock_code)
+        return margin is not None and margin < 0
+
+    def low_codes(self) -> FrozenSet[str]:
+        """Get the codes of all items below threshold."""
+        with self._lock:
+            return frozenset(code for margin, codes in self._buckets.items() if margin < 0
+                             for code in codes)
+
+    def low_count(self) -> int:
+        """Get the number of items below threshold."""
+        return self._low_count
+
+    def low_stock(self, limit: Optional[int] = None, brand: Optional[str] = None) -> List[Dict]:
+        """
+        Get items below their threshold, most urgent (largest shortfall) first.
+
+        Args:
+            limit (int): Maximum number of items to return
+            brand (str): Only return items of this brand
+        """
+        results = []
+        with self._lock:
+            members = self._brand_members.get(brand, set()) if brand is not None else None
+            for margin in sorted(m for m in self._buckets if m < 0):
+                codes = self._buckets[margin]
+                if members is not None:
+                    codes = codes & members
+                if limit is None:
+                    codes = sorted(codes)
+                else:
+                    codes = heapq.nsmallest(limit - len(results), codes)
+                for code in codes:
+                    quantity, item_brand = self._items[code]
+                    results.append({
+                        'stock_code': code,
+                        'brand': item_brand,
+                        'quantity': quantity,
+                        'threshold': quantity - margin,
+                        'shortfall': -margin,
+                    })
+                if limit is not None and len(results) >= limit:
+                    return results
+        return results
+
+    def __len__(self) -> int:
+        return len(self._items)
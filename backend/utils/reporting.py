@@ -0,0 +1,207 @@
+# utils/reporting.py
+
+"""
+Read-replica snapshots for reporting and export endpoints.
+
+A background thread rebuilds an immutable ReportSnapshot every
+`interval` seconds. A snapshot holds the rendered item and sales CSV
+exports and the sales history and summary reports. A rebuild reuses the
+previous snapshot when the stock file, the sales file and the price book
+are all unchanged. Requests read the current snapshot reference without
+taking a lock, so a long export never holds up a sale.
+
+Staleness is bounded: a snapshot older than `max_staleness` seconds
+(the publisher thread is behind or has died) is rebuilt by the request
+that finds it, one request at a time.
+"""
+
+import csv
+import io
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ITEMS_EXPORT_HEADER = ['Stock Code', 'Name', 'Description', 'Quantity',
+                       'Price', 'Price with VAT', 'Brand']
+SALES_EXPORT_HEADER = ['Date', 'Stock Code', 'Quantity', 'Price', 'Brand', 'Revenue']
+
+
+def items_csv(items: Iterable) -> str:
+    """Render stock items in the /api/items/export CSV layout."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(ITEMS_EXPORT_HEADER)
+    for item in items:
+        writer.writerow([
+            item.stock_code,
+            item.get_stock_name(),
+            item.get_stock_description(),
+            item.quantity,
+            item.price,
+            item.get_price_with_VAT(),
+            getattr(item, 'brand', 'N/A')
+        ])
+    return output.getvalue()
+
+
+def sales_csv(rows: List[List[str]]) -> str:
+    """Render SalesHandler.get_all_sales() rows in the /api/sales/export CSV layout."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(SALES_EXPORT_HEADER)
+    writer.writerows(rows)
+    return output.getvalue()
+
+
+class ReportSnapshot:
+    """One immutable, versioned copy of the report and export data."""
+
+    __slots__ = ('version', 'built_at', 'sources', 'change_seq', 'item_count',
+                 'items_csv', 'sales_csv', 'sales_history', 'sales_summary')
+
+    def __init__(self, version: int, sources: Tuple, change_seq: Optional[int], item_count: int,
+                 items_export: str, sales_export: str, sales_history: Dict, sales_summary: Dict):
+        self.version = version
+        self.built_at = time.time()
+        # (stock file signature, sales data version, price book version) it was built from
+        self.sources = sources
+        self.change_seq = change_seq
+        self.item_count = item_count
+        self.items_csv = items_export
+        self.sales_csv = sales_export
+        self.sales_history = sales_history
+        self.sales_summary = sales_summary
+
+
+def build_snapshot(file_handler, sales_handler,
+                   previous: Optional[ReportSnapshot] = None) -> ReportSnapshot:
+    """
+    Build a snapshot from the stock and sales handlers, or return
+    `previous` if none of its sources have changed.
+    """
+    from models.stock_item import StockItem
+
+    pricing = StockItem.pricing
+    if pricing is not None:
+        pricing.refresh()
+    # The export's VAT prices also change when a scheduled rate takes effect,
+    # with no new version: the time of the next change marks the rate period
+    sources = (file_handler.file_signature(), sales_handler.data_version(),
+               (pricing.version, pricing.next_vat_change()) if pricing is not None else 0)
+    if previous is not None and previous.sources == sources:
+        return previous
+    # Taken before the load: replaying from here may repeat, never miss, a change
+    change_seq = file_handler.change_log.last_seq if file_handler.change_log else None
+    items = file_handler.load_items()
+    sales_rows = sales_handler.get_all_sales()
+    return ReportSnapshot(
+        version=previous.version + 1 if previous is not None else 1,
+        sources=sources,
+        change_seq=change_seq,
+        item_count=len(items),
+        items_export=items_csv(items),
+        sales_export=sales_csv(sales_rows),
+        sales_history=sales_handler.get_sales_history(),
+        sales_summary=sales_handler.get_sales_summary(),
+    )
+
+
+class SnapshotPublisher:
+    """Background thread publishing ReportSnapshots for lock-free reads."""
+
+    def __init__(self, build: Callable[[Optional[ReportSnapshot]], ReportSnapshot],
+                 interval: float = 5.0, max_staleness: float = 30.0):
+        """
+        Args:
+            build: Called with the current snapshot (or None); returns the
+                next one, or the same one if nothing changed
+            interval (float): Seconds between rebuilds
+            max_staleness (float): Age in seconds past which a reader
+                rebuilds the snapshot itself
+        """
+        self.build = build
+        self.interval = interval
+        self.max_staleness = max_staleness
+        self._snapshot: Optional[ReportSnapshot] = None
+        # When the current snapshot was last confirmed to match its sources
+        self._checked_at = 0.0
+        self._build_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.builds = 0
+        self.failures = 0
+
+    def start(self) -> None:
+        """Start the publisher thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='report-snapshots', daemon=True)
+            self._thread.start()
+            logger.info(f"Publishing report snapshots every {self.interval} s")
+
+    def stop(self) -> None:
+        """Stop the publisher thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Error publishing report snapshot: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def refresh(self) -> ReportSnapshot:
+        """Rebuild the snapshot now (a no-op rebuild if its sources are unchanged)."""
+        with self._build_lock:
+            return self._rebuild()
+
+    def _rebuild(self) -> ReportSnapshot:
+        """Build and publish the next snapshot (build lock held)."""
+        started = time.time()
+        snapshot = self.build(self._snapshot)
+        if snapshot is not self._snapshot:
+            self.builds += 1
+            logger.info("Published report snapshot %s in %.2f s",
+                        snapshot.version, time.time() - started)
+        # Reference swap: readers see the old or the new snapshot, never a mix
+        self._snapshot = snapshot
+        self._checked_at = started
+        return snapshot
+
+    def latest(self) -> ReportSnapshot:
+        """Get the current snapshot, rebuilding it first if it is older than max_staleness."""
+        snapshot = self._snapshot
+        if snapshot is not None and time.time() - self._checked_at <= self.max_staleness:
+            return snapshot
+        with self._build_lock:
+            # Checked and rebuilt under one hold: readers that waited here get
+            # the snapshot the first one built instead of rebuilding in turn
+            if self._snapshot is not None and time.time() - self._checked_at <= self.max_staleness:
+                return self._snapshot
+            return self._rebuild()
+
+    def age(self) -> float:
+        """Seconds since the current snapshot was last confirmed current."""
+        return time.time() - self._checked_at if self._snapshot is not None else 0.0
+
+    def status(self) -> Dict:
+        """Get the current snapshot's version and age and the publisher's counters."""
+        snapshot = self._snapshot
+        return {
+            'version': snapshot.version if snapshot else None,
+            'built_at': snapshot.built_at if snapshot else None,
+            'age_seconds': round(self.age(), 3),
+            'item_count': snapshot.item_count if snapshot else None,
+            'interval_seconds': self.interval,
+            'max_staleness_seconds': self.max_staleness,
+            'running': self._thread is not None and self._thread.is_alive(),
+            'builds': self.builds,
+            'failures': self.failures,
+        }
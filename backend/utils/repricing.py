@@ -0,0 +1,206 @@
+# utils/repricing.py
+
+"""
+Bulk repricing of stock items by rule.
+
+A rule is applied to every selected item in one vectorized numpy pass,
+in this order:
+
+    uplift          price * (1 + percent / 100), with a per-brand percent
+                    taking the place of the general one
+    ending          nearest price with these pence, e.g. 0.99 -> 109.99
+    floor, ceiling  clipped into [floor, ceiling]
+
+The results are rounded to pence and must all be greater than 0 (the
+StockItem.price rule) before anything is written. The new prices are
+then saved with a single rewrite of the stock file, made under the stock
+file's write lock from the rows as they are then, so a sale recorded
+meanwhile keeps its quantity.
+"""
+
+import logging
+import math
+from typing import Dict, List, Optional
+from models.registry import get_item_type
+from utils.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Changes listed in a repricing result unless the caller asks for more
+DEFAULT_DIFF_LIMIT = 1000
+
+
+def _number(data: Dict, key: str) -> Optional[float]:
+    value = data.get(key)
+    if value is None:
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValidationError(f"{key} must be a number")
+    if not math.isfinite(number):
+        raise ValidationError(f"{key} must be a finite number")
+    return number
+
+
+class RepricingRule:
+    """Price transformation applied to arrays of prices and brands."""
+
+    def __init__(self, uplift_percent: float = 0.0, brand_uplift: Optional[Dict[str, float]] = None,
+                 ending: Optional[float] = None, floor: Optional[float] = None,
+                 ceiling: Optional[float] = None):
+        """
+        Raises:
+            ValidationError: If a value is not finite, an uplift takes prices
+                to zero or below, the ending is not between 0 and 1, or floor
+                exceeds ceiling
+        """
+        self.uplift_percent = float(uplift_percent)
+        self.brand_uplift = {brand: float(percent) for brand, percent in (brand_uplift or {}).items()}
+        values = [self.uplift_percent, *self.brand_uplift.values(),
+                  *(value for value in (ending, floor, ceiling) if value is not None)]
+        if not all(math.isfinite(value) for value in values):
+            raise ValidationError("Rule values must be finite numbers")
+        for percent in [self.uplift_percent, *self.brand_uplift.values()]:
+            if percent <= -100:
+                raise ValidationError("Uplift percent must be greater than -100")
+        if ending is not None and not 0 <= ending < 1:
+            raise ValidationError("Ending must be between 0 and 1, e.g. 0.99")
+        if floor is not None and ceiling is not None and floor > ceiling:
+            raise ValidationError("Floor must not exceed ceiling")
+        self.ending = ending
+        self.floor = floor
+        self.ceiling = ceiling
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RepricingRule':
+        """
+        Build a rule from request JSON: uplift_percent, brand_uplift
+        ({brand: percent}), ending, floor and ceiling, all optional.
+
+        Raises:
+            ValidationError: If a value is not a number or the rule is invalid
+        """
+        brand_uplift = data.get('brand_uplift') or {}
+        if not isinstance(brand_uplift, dict):
+            raise ValidationError("brand_uplift must map brands to percentages")
+        rule = cls(uplift_percent=_number(data, 'uplift_percent') or 0.0,
+                   brand_uplift={brand: _number(brand_uplift, brand) for brand in brand_uplift},
+                   ending=_number(data, 'ending'), floor=_number(data, 'floor'),
+                   ceiling=_number(data, 'ceiling'))
+        if not (rule.uplift_percent or rule.brand_uplift or rule.ending is not None
+                or rule.floor is not None or rule.ceiling is not None):
+            raise ValidationError("Rule must set at least one of uplift_percent, brand_uplift, "
+                                  "ending, floor or ceiling")
+        return rule
+
+    def apply(self, prices, brands):
+        """
+        Get the new prices for arrays of current prices and brands.
+
+        Raises:
+            ValidationError: If any new price is not a finite number greater than 0
+        """
+        import numpy as np
+
+        prices = np.asarray(prices, dtype='float64')
+        percent = np.full(len(prices), self.uplift_percent)
+        if self.brand_uplift:
+            brands = np.asarray(brands, dtype=object)
+            for brand, brand_percent in self.brand_uplift.items():
+                percent[brands == brand] = brand_percent
+        new_prices = prices * (1 + percent / 100)
+        if self.ending is not None:
+            new_prices = np.round(new_prices - self.ending) + self.ending
+        if self.floor is not None or self.ceiling is not None:
+            new_prices = np.clip(new_prices, self.floor, self.ceiling)
+        new_prices = np.round(new_prices, 2)
+        invalid = np.flatnonzero(~np.isfinite(new_prices) | (new_prices <= 0))
+        if len(invalid):
+            raise ValidationError(f"Price must be greater than 0; the rule gives {new_prices[invalid[0]]} "
+                                  f"for {len(invalid)} item(s)")
+        return new_prices
+
+
+def select_items(rows: List[List[str]], brands: Optional[List[str]] = None,
+                 search: Optional[str] = None, stock_codes: Optional[List[str]] = None) -> List:
+    """
+    Hydrate the stock rows matching every given filter, with the semantics
+    of the /api/items listing: brand (case-insensitive substring of the
+    item's brand, any of `brands`), search (case-insensitive, in stock
+    code, name, brand or description) and stock_codes. Invalid rows are
+    skipped, as in StockFileHandler.load_items.
+    """
+    brand_filters = [brand.lower() for brand in brands if brand] if brands else None
+    code_set = set(stock_codes) if stock_codes else None
+    search = search.lower() if search else None
+    items = []
+    for row in rows:
+        if not row or (code_set is not None and (len(row) < 2 or row[1] not in code_set)):
+            continue
+        try:
+            item = get_item_type(row[0]).from_row(row)
+        except ValueError:
+            logger.error(f"Skipping invalid row in repricing: {row}")
+            continue
+        brand = getattr(item, 'brand', '').lower()
+        if brand_filters is not None and not any(each in brand for each in brand_filters):
+            continue
+        if search and not (search in item.stock_code.lower() or search in item.get_stock_name().lower()
+                           or search in brand or search in item.get_stock_description().lower()):
+            continue
+        items.append(item)
+    return items
+
+
+def reprice(file_handler, rule: RepricingRule, brands: Optional[List[str]] = None,
+            search: Optional[str] = None, stock_codes: Optional[List[str]] = None,
+            dry_run: bool = False, diff_limit: int = DEFAULT_DIFF_LIMIT) -> Dict:
+    """
+    Apply a rule to the selected items and save the changed ones in one write.
+
+    Raises:
+        ValidationError: If the rule gives a price of 0 or less (nothing is saved)
+
+    Returns:
+        Dict: 'matched' and 'changed' counts, 'dry_run', 'changes' (up to
+        diff_limit of {stock_code, brand, old_price, new_price}) and
+        'truncated'
+    """
+    if dry_run:
+        return _reprice(file_handler, rule, brands, search, stock_codes, dry_run, diff_limit)
+    # Prices are worked out from the rows the write replaces
+    with file_handler.write_lock():
+        return _reprice(file_handler, rule, brands, search, stock_codes, dry_run, diff_limit)
+
+
+def _reprice(file_handler, rule: RepricingRule, brands: Optional[List[str]], search: Optional[str],
+             stock_codes: Optional[List[str]], dry_run: bool, diff_limit: int) -> Dict:
+    import numpy as np
+
+    items = select_items(file_handler.load_all_items(), brands, search, stock_codes)
+    prices = np.fromiter((item.price for item in items), dtype='float64', count=len(items))
+    item_brands = [getattr(item, 'brand', '') for item in items]
+    new_prices = rule.apply(prices, item_brands)
+    changed = np.flatnonzero(new_prices != prices)
+
+    diff = [{'stock_code': items[index].stock_code, 'brand': item_brands[index],
+             'old_price': float(prices[index]), 'new_price': float(new_prices[index])}
+            for index in changed[:diff_limit].tolist()]
+    if not dry_run and len(changed):
+        updated = []
+        for index in changed.tolist():
+            item = items[index]
+            # Validated above for the whole batch; the setter would log once per item
+            item._price = float(new_prices[index])
+            updated.append(item)
+        file_handler.save_items(updated, fields=('price',))
+    logger.info(f"Repriced {len(changed)} of {len(items)} matched items"
+                f"{' (dry run)' if dry_run else ''}")
+    return {
+        'matched': len(items),
+        'changed': int(len(changed)),
+        'dry_run': dry_run,
+        'changes': diff,
+        'truncated': len(changed) > diff_limit,
+    }
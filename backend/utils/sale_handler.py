@@ -2,17 +2,59 @@
 
 import csv
 import os
-from datetime import datetime
-from typing import List, Dict
+from typing import Callable, List, Dict, Tuple
 import logging
+from utils.analytics import SalesAnalytics
+from utils.atomic import atomic_write, validate_durability
 from utils.exceptions import FileOperationError
+from utils.sales_writer import SalesWriter, today
+from utils.tracing import phase
 
 logger = logging.getLogger(__name__)
 
 class SalesHandler:
-    def __init__(self, file_path: str = 'data/sales_history.csv'):
+    def __init__(self, file_path: str = 'data/sales_history.csv', durability: str = 'always',
+                 flush_rows: int = 1000, flush_interval: float = 1.0, parallel_load: int = 0):
         self.file_path = file_path
+        self.durability = validate_durability(durability)
         self._ensure_file_exists()
+        # Sales are appended through a long-lived buffered writer
+        self._writer = SalesWriter(file_path, durability, flush_rows, flush_interval)
+        # Reports are computed (and cached per data version) by the analytics engine,
+        # which flushes buffered sales before it looks at the file
+        self.analytics = SalesAnalytics(file_path, before_read=self._writer.flush,
+                                        parallel_load=parallel_load)
+        # Callbacks notified after every recorded sale
+        self._listeners: List[Callable[[Dict], None]] = []
+
+    def add_listener(self, callback: Callable[[Dict], None]) -> None:
+        """
+        Register a callback for recorded sales.
+
+        The callback receives a dict with 'event' ('sale_recorded'), 'date',
+        'stock_code', 'quantity', 'price', 'brand', 'revenue' and 'version'
+        (the data_version() the file has once this sale is written).
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, row: list, version: Tuple[int, int]) -> None:
+        """Send a recorded sale to every listener; listener errors are logged only."""
+        sale_date, stock_code, quantity, price, brand, revenue = row
+        event = {
+            'event': 'sale_recorded',
+            'date': sale_date,
+            'stock_code': stock_code,
+            'quantity': quantity,
+            'price': price,
+            'brand': brand,
+            'revenue': revenue,
+            'version': version,
+        }
+        for callback in self._listeners:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.error("Error in sales listener: %s", e)
 
     def _ensure_file_exists(self):
         """Create the CSV file with headers if it doesn't exist."""
@@ -24,91 +66,87 @@ class SalesHandler:
         """Write CSV headers."""
         headers = ['date', 'stock_code', 'quantity', 'price', 'brand', 'revenue']
         try:
-            with open(self.file_path, 'w', newline='') as file:
+            with atomic_write(self.file_path, newline='', durability=self.durability) as file:
                 writer = csv.writer(file)
                 writer.writerow(headers)
         except IOError as e:
-            logger.error(f"Error writing sales headers: {str(e)}")
+            logger.error("Error writing sales headers: %s", e)
             raise FileOperationError(f"Failed to write sales headers: {str(e)}")
 
+    def data_version(self) -> Tuple[int, int]:
+        """Get (inode, size) of the sales file after flushing buffered sales."""
+        self._writer.flush()
+        stat = os.stat(self.file_path)
+        return stat.st_ino, stat.st_size
+
+    def flush(self) -> None:
+        """Write buffered sales to the file."""
+        self._writer.flush()
+
+    def close(self) -> None:
+        """Flush buffered sales and close the sales file."""
+        self._writer.close()
+
     def record_sale(self, stock_code: str, quantity: int, price: float, brand: str) -> None:
-        """Record a new sale in the CSV file."""
+        """
+        Record a new sale in the CSV file.
+
+        The row is durable on return in 'always' durability mode; otherwise
+        it is buffered and written by the writer's flush policy.
+        """
         try:
             revenue = quantity * price
-            sale_date = datetime.now().strftime('%Y-%m-%d')
+            row = [today(), stock_code, quantity, price, brand, revenue]
+            with phase('record_sale'):
+                version = self._writer.append(row)
 
-            row = [sale_date, stock_code, quantity, price, brand, revenue]
-
-            with open(self.file_path, 'a', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow(row)
-
-            logger.info(f"Recorded sale: {stock_code}, {quantity} units")
+            logger.info("Recorded sale: %s, %s units", stock_code, quantity)
+            self._notify(row, version)
         except Exception as e:
-            logger.error(f"Error recording sale: {str(e)}")
+            logger.error("Error recording sale: %s", e)
             raise FileOperationError(f"Failed to record sale: {str(e)}")
 
     def get_sales_history(self) -> Dict:
         """Get formatted sales history for analytics."""
         try:
-            daily_sales = {}
-            brand_sales = {}
-
-            with open(self.file_path, 'r', newline='') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    # Daily sales
-                    date = row['date']
-                    if date not in daily_sales:
-                        daily_sales[date] = {'sales': 0, 'revenue': 0.0}
-
-                    daily_sales[date]['sales'] += int(row['quantity'])
-                    daily_sales[date]['revenue'] += float(row['revenue'])
-
-                    # Brand sales
-                    brand = row['brand']
-                    if brand not in brand_sales:
-                        brand_sales[brand] = {'sales': 0, 'revenue': 0.0}
-
-                    brand_sales[brand]['sales'] += int(row['quantity'])
-                    brand_sales[brand]['revenue'] += float(row['revenue'])
-
-            # Format data for frontend
-            sales_data = {
-                'daily': [
-                    {'date': date, 'sales': data['sales'], 'revenue': data['revenue']}
-                    for date, data in daily_sales.items()
-                ],
-                'by_brand': [
-                    {'brand': brand, 'sales': data['sales'], 'revenue': data['revenue']}
-                    for brand, data in brand_sales.items()
-                ]
-            }
-
-            return sales_data
-
+            return self.analytics.sales_history()
         except Exception as e:
-            logger.error(f"Error getting sales history: {str(e)}")
+            logger.error("Error getting sales history: %s", e)
             raise FileOperationError(f"Failed to get sales history: {str(e)}")
 
+    def get_sales_summary(self) -> Dict:
+        """Get overall sales totals and best sellers."""
+        try:
+            return self.analytics.summary()
+        except Exception as e:
+            logger.error("Error getting sales summary: %s", e)
+            raise FileOperationError(f"Failed to get sales summary: {str(e)}")
+
     def get_all_sales(self) -> List[List[str]]:
         """Get all sales data formatted for CSV export."""
         try:
             # First row is headers
             rows = [['Date', 'Stock Code', 'Quantity', 'Price', 'Brand', 'Total Revenue']]
 
+            self._writer.flush()
             with open(self.file_path, 'r', newline='') as file:
                 reader = csv.DictReader(file)
                 for row in reader:
-                    rows.append([
-                        row['date'],
-                        row['stock_code'],
-                        row['quantity'],
-                        f"${float(row['price']):.2f}",
-                        row['brand'],
-                        f"${float(row['revenue']):.2f}"
-                    ])
+                    try:
+                        if None in row or None in row.values():
+                            raise ValueError("Wrong number of fields")
+                        rows.append([
+                            row['date'],
+                            row['stock_code'],
+                            row['quantity'],
+                            f"${float(row['price']):.2f}",
+                            row['brand'],
+                            f"${float(row['revenue']):.2f}"
+                        ])
+                    except ValueError:
+                        # A torn or hand-edited row
+                        logger.error("Skipping invalid sales row: %s", row)
             return rows
         except Exception as e:
-            logger.error(f"Error getting sales data: {str(e)}")
+            logger.error("Error getting sales data: %s", e)
             raise FileOperationError(f"Failed to get sales data: {str(e)}")
@@ -0,0 +1,314 @@
+# utils/sales_writer.py
+
+"""
+Buffered, append-only writer for sales_history.csv.
+
+The file stays open for the life of the writer and rows are encoded into
+an in-memory buffer. When they reach the disk depends on the durability
+mode (the same names as utils.atomic):
+
+    always   append() returns only after the row is written and fsynced.
+             Concurrent appends share one fsync (group commit), so an
+             acknowledged sale survives a crash.
+    batched  a background thread writes and fsyncs the buffer every
+             flush_interval seconds, or sooner once flush_rows rows wait.
+    os       like batched, without the fsync.
+
+Buffered rows are flushed at interpreter exit and on SIGTERM, and every
+reader of the file flushes first so reports never miss a recorded sale.
+
+Several processes may append to the file (gunicorn workers forked from a
+master that opened the writer). A forked writer drops the rows it
+inherited, which are the parent's to write, and starts its own
+background thread on first use.
+
+A write that fails part way leaves the start of a row in the file. That
+row is ended with TORN_ROW_MARKER, so loaders skip it as malformed
+instead of reading a truncated value.
+"""
+
+import atexit
+import csv
+import logging
+import os
+import signal
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from typing import List, Tuple
+from utils.atomic import validate_durability
+from utils.exceptions import FileOperationError
+
+logger = logging.getLogger(__name__)
+
+# Ends a row cut short by a failed write: the row then has too many fields
+# or a last field (revenue) that is not a number
+TORN_ROW_MARKER = b',#torn\n'
+
+_writers: 'weakref.WeakSet[SalesWriter]' = weakref.WeakSet()
+
+# Date string cache: valid until the next local midnight
+_today = {'value': None, 'expires': 0.0}
+
+
+def today() -> str:
+    """Get today's date as YYYY-MM-DD, formatted once per day."""
+    now = time.time()
+    if now >= _today['expires']:
+        current = date.today()
+        midnight = datetime.combine(current + timedelta(days=1), datetime.min.time())
+        _today['value'] = current.isoformat()
+        _today['expires'] = midnight.timestamp()
+    return _today['value']
+
+
+def flush_all() -> None:
+    """Flush every open sales writer."""
+    for writer in list(_writers):
+        try:
+            writer.flush()
+        except Exception as e:
+            logger.error(f"Error flushing sales writer on shutdown: {str(e)}")
+
+
+def _flush_and_exit(signum: int) -> None:
+    flush_all()
+    os.kill(os.getpid(), signum)
+
+
+def _on_sigterm(signum, frame) -> None:
+    """Flush buffered sales, then terminate as the default handler would."""
+    # The interrupted thread may hold a writer's I/O lock, so the flush runs
+    # on another thread and this handler returns to let it finish
+    signal.signal(signum, signal.SIG_DFL)
+    threading.Thread(target=_flush_and_exit, args=(signum,), name='sales-flush',
+                     daemon=True).start()
+
+
+def _install_signal_flush() -> None:
+    """Flush on SIGTERM unless the server in charge has installed its own handler."""
+    if threading.current_thread() is not threading.main_thread():
+        return
+    try:
+        if signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+            signal.signal(signal.SIGTERM, _on_sigterm)
+    except (ValueError, OSError, AttributeError):
+        pass
+
+
+def _reset_after_fork() -> None:
+    for writer in list(_writers):
+        writer._after_fork()
+
+
+atexit.register(flush_all)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class SalesWriter:
+    """Long-lived buffered appender for the sales history file."""
+
+    def __init__(self, file_path: str, durability: str = 'always',
+                 flush_rows: int = 1000, flush_interval: float = 1.0):
+        self.file_path = file_path
+        self.durability = validate_durability(durability)
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+
+        self._buffer: deque = deque()
+        # csv.writer only needs an object with write(); lines land in the buffer
+        self._encoder = csv.writer(SimpleNamespace(write=self._buffer.append))
+        self._buffer_lock = threading.Lock()   # guards the buffer and counters
+        self._io_lock = threading.Lock()       # serializes writes to the file
+        self._appended = 0                     # rows appended so far
+        self._written = 0                      # rows written (and synced, per mode)
+        self._buffered_bytes = 0
+        self._unended = b''                    # a torn row's ending not written yet
+        self._closed = False
+
+        try:
+            self._recover()
+            # Unbuffered: a failed write leaves nothing behind to be written again later
+            self._file = open(file_path, 'ab', buffering=0)
+            stat = os.fstat(self._file.fileno())
+        except OSError as e:
+            logger.error(f"Error opening sales file: {str(e)}")
+            raise FileOperationError(f"Failed to open sales file: {str(e)}")
+        self._inode = stat.st_ino
+        self._end = stat.st_size
+
+        self._wake = threading.Event()
+        self._thread = None
+        self._start_thread()
+        _writers.add(self)
+        _install_signal_flush()
+
+    def _start_thread(self) -> None:
+        """Start the background flush thread (modes 'batched' and 'os')."""
+        if self.durability != 'always':
+            self._thread = threading.Thread(target=self._run, name='sales-writer', daemon=True)
+            self._thread.start()
+
+    def _after_fork(self) -> None:
+        # Threads do not survive fork, and another one may have held the locks
+        self._buffer_lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        # Buffered rows belong to the parent, which writes them
+        self._buffer.clear()
+        self._buffered_bytes = 0
+        self._written = self._appended
+
+    def _recover(self) -> None:
+        """Cut a torn last line left by a crash mid-write (it was never acknowledged)."""
+        try:
+            with open(self.file_path, 'rb+') as file:
+                size = file.seek(0, os.SEEK_END)
+                if size == 0:
+                    return
+                file.seek(size - 1)
+                if file.read(1) == b'\n':
+                    return
+                # Find the last complete line
+                position = size
+                while position > 0:
+                    step = min(4096, position)
+                    file.seek(position - step)
+                    newline = file.read(step).rfind(b'\n')
+                    if newline >= 0:
+                        position = position - step + newline + 1
+                        break
+                    position -= step
+                file.truncate(position)
+                logger.warning(f"Dropped {size - position} bytes of a torn sales row "
+                               f"from {self.file_path}")
+        except FileNotFoundError:
+            pass
+
+    def append(self, row: List) -> Tuple[int, int]:
+        """
+        Append one sales row.
+
+        Returns:
+            Tuple[int, int]: (inode, size) the file will have once this row
+            is written, which identifies the data version including it
+        """
+        with self._buffer_lock:
+            if self._closed:
+                raise FileOperationError("Sales writer is closed")
+            if self._thread is None and self.durability != 'always':
+                self._start_thread()  # Forked: the parent's thread stayed behind
+            self._encoder.writerow(row)
+            line = self._buffer[-1]
+            size = len(line) if line.isascii() else len(line.encode('utf-8'))
+            self._buffered_bytes += size
+            self._end += size
+            self._appended += 1
+            sequence = self._appended
+            position = (self._inode, self._end)
+            pending = len(self._buffer)
+
+        if self.durability == 'always':
+            self._write_through(sequence)
+        elif pending >= self.flush_rows:
+            self._wake.set()
+        return position
+
+    def _write_through(self, sequence: int) -> None:
+        """Make sure row number `sequence` is on disk, writing the buffer if needed."""
+        with self._io_lock:
+            if self._written < sequence:
+                self._write_buffer()
+
+    def _write_buffer(self) -> None:
+        """Write buffered rows to the file; the caller holds the I/O lock."""
+        with self._buffer_lock:
+            if not self._buffer and not self._unended:
+                return
+            data = ''.join(self._buffer)
+            self._buffer.clear()
+            sequence = self._appended
+            written_bytes, self._buffered_bytes = self._buffered_bytes, 0
+        fd = self._file.fileno()
+        encoded = self._unended + data.encode('utf-8')
+        payload = memoryview(encoded)
+        try:
+            while payload:
+                payload = payload[os.write(fd, payload):]
+            self._unended = b''
+        except OSError as e:
+            # Other processes append to the file too, so it is never truncated here
+            if len(payload) == len(encoded):
+                # Nothing landed: keep the rows for the next attempt
+                with self._buffer_lock:
+                    self._buffer.appendleft(data)
+                    self._buffered_bytes += written_bytes
+            else:
+                # Part landed: writing the rows again would repeat it, so they are
+                # dropped, and a torn row is marked and ended so later rows stay whole
+                self._written = sequence
+                landed = len(encoded) - len(payload)
+                torn = encoded[encoded.rfind(b'\n', 0, landed) + 1:landed]
+                self._unended = b''
+                if torn:
+                    # An odd number of quotes leaves a quoted field open: close it first
+                    ending = (b'"' if torn.count(b'"') % 2 else b'') + TORN_ROW_MARKER
+                    try:
+                        if os.write(fd, ending) != len(ending):
+                            raise OSError("short write")
+                    except OSError:
+                        # Written ahead of the next rows instead
+                        self._unended = ending
+                logger.error(f"Dropped {written_bytes} bytes of sales rows after a partial write")
+            logger.error(f"Error writing sales rows: {str(e)}")
+            raise FileOperationError(f"Failed to write sales rows: {str(e)}")
+        # The rows are in the file now: a failed fsync must not write them again
+        self._written = sequence
+        if self.durability != 'os':
+            try:
+                os.fsync(fd)
+            except OSError as e:
+                logger.error(f"Error syncing sales rows: {str(e)}")
+                raise FileOperationError(f"Sales rows written but not synced: {str(e)}")
+
+        # Other processes may append too; re-base the expected end on the real size
+        size = os.fstat(fd).st_size
+        with self._buffer_lock:
+            self._end = size + self._buffered_bytes
+        logger.debug("Wrote %d bytes of sales rows", written_bytes)
+
+    def flush(self) -> None:
+        """Write all buffered rows now."""
+        with self._io_lock:
+            if not self._closed:
+                self._write_buffer()
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except FileOperationError:
+                pass  # Logged already; retried on the next round
+
+    def buffered_rows(self) -> int:
+        """Get the number of rows not yet written to the file."""
+        return len(self._buffer)
+
+    def close(self) -> None:
+        """Flush and close the file."""
+        with self._io_lock:
+            with self._buffer_lock:
+                if self._closed:
+                    return
+                self._closed = True
+            self._write_buffer()
+            self._file.close()
+        self._wake.set()
+        _writers.discard(self)
@@ -0,0 +1,345 @@
+# utils/snapshot.py
+
+"""
+Binary inventory snapshots.
+
+A snapshot is a compacted copy of stock_items.csv that loads with one read:
+
+    header   magic, format version, record count, the CSV signature it was
+             compacted from, and CRC-32s of the sections below
+    meta     JSON: item type tags and the number of extra columns
+    records  fixed-width NumPy structured records (type, quantity, price
+             and string references, including the price's CSV text so rows
+             round-trip exactly)
+    strings  UTF-8 string table of NUL-separated entries; records refer to
+             entries by index, so repeated brands are stored once
+
+The CSV stays the interchange format and the source of truth: a snapshot
+is only used while the CSV still has the signature recorded in its header.
+Any write makes it stale. utils.runtime.warm_up recompacts a stale
+snapshot when the server starts (StockFileHandler.refresh_snapshot), and
+a handler given snapshot_every recompacts it after that many writes.
+
+Run as a script to compact a stock file:
+    python -m utils.snapshot data/stock_items.csv data/stock_items.snap
+"""
+
+import gc
+import json
+import logging
+import os
+import struct
+import sys
+import zlib
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+from utils.atomic import atomic_write
+from utils.exceptions import FileOperationError
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'STKSNAP1'
+FORMAT_VERSION = 1
+# magic, version, meta length, record count, csv inode/size/mtime_ns,
+# strings length, meta/records/strings CRC-32
+HEADER = struct.Struct('<8sHIQQQQQIII')
+
+
+@contextmanager
+def gc_paused():
+    """
+    Pause the cyclic garbage collector.
+
+    Building a million small lists or tuples otherwise triggers repeated
+    collections that cost more than the build itself.
+    """
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def record_dtype(extra_columns: int):
+    """Get the structured dtype of a record with `extra_columns` string columns."""
+    import numpy as np
+
+    fields = [('type', '<u2'), ('columns', '<u2'), ('quantity', '<i8'), ('price', '<f8'),
+              ('code', '<u4'), ('price_text', '<u4')]
+    fields += [(f'extra{i}', '<u4') for i in range(extra_columns)]
+    return np.dtype(fields)
+
+
+class InventorySnapshot:
+    """
+    A loaded snapshot: columnar NumPy arrays plus the string table.
+
+    quantity and price are available as arrays without touching Python
+    objects. items() hydrates stock items straight from the columns and
+    row()/find_row() rebuild single rows, so a cold load that only reads
+    never builds the CSV-style rows; rows() rebuilds them all for
+    StockFileHandler's row cache, which writes need.
+    """
+
+    def __init__(self, records, strings: List[str], types: List[str], extra_columns: int,
+                 signature: Tuple[int, int, int]):
+        self.records = records
+        self.strings = strings
+        self.types = types
+        self.extra_columns = extra_columns
+        self.signature = signature
+        self._code_index: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @property
+    def quantity(self):
+        return self.records['quantity']
+
+    @property
+    def price(self):
+        return self.records['price']
+
+    def _column(self, name: str) -> List[str]:
+        return list(map(self.strings.__getitem__, self.records[name].tolist()))
+
+    def codes(self) -> List[str]:
+        """Get every stock code in record order."""
+        return self._column('code')
+
+    def row(self, index: int) -> List[str]:
+        """Rebuild the CSV row of one record."""
+        record = self.records[index]
+        strings = self.strings
+        row = [self.types[record['type']], strings[record['code']], str(int(record['quantity'])),
+               strings[record['price_text']]]
+        row += [strings[record[f'extra{i}']] for i in range(self.extra_columns)]
+        return row[:int(record['columns'])]
+
+    def find_row(self, stock_code: str) -> Optional[List[str]]:
+        """Get one SKU's row (the first, as a scan of the CSV would), or None."""
+        if self._code_index is None:
+            codes = self.codes()
+            # Reversed so the first of any repeated codes wins
+            self._code_index = dict(zip(reversed(codes), range(len(codes) - 1, -1, -1)))
+        index = self._code_index.get(stock_code)
+        return self.row(index) if index is not None else None
+
+    def items(self) -> List:
+        """
+        Hydrate the stock items straight from the columns.
+
+        Records that do not decode are skipped and logged, as
+        StockFileHandler.load_items skips rows.
+        """
+        from models.registry import ITEM_TYPES
+
+        records = self.records
+        strings = self.strings
+        classes = [ITEM_TYPES.get(tag) for tag in self.types]
+        extras = [records[f'extra{i}'].tolist() for i in range(self.extra_columns)]
+        items = []
+        with gc_paused():
+            columns = zip(records['type'].tolist(), records['columns'].tolist(), self.codes(),
+                          records['quantity'].tolist(), records['price'].tolist())
+            for index, (type_id, width, code, quantity, price) in enumerate(columns):
+                item_class = classes[type_id]
+                try:
+                    if item_class is None:
+                        raise ValueError(f"Unknown item type: {self.types[type_id]}")
+                    if width < 4 + len(item_class.columns):
+                        raise ValueError("Invalid row format")
+                    items.append(item_class.from_values(
+                        code, quantity, price,
+                        [strings[extras[i][index]] for i in range(len(item_class.columns))]))
+                except Exception as e:
+                    logger.error("Skipping invalid row: %s. Error: %s", self.row(index), e)
+        return items
+
+    def rows(self) -> List[List[str]]:
+        """Rebuild the CSV rows (as lists of strings) in record order."""
+        records = self.records
+        with gc_paused():
+            columns = [
+                map(self.types.__getitem__, records['type'].tolist()),
+                self.codes(),
+                map(str, records['quantity'].tolist()),
+                self._column('price_text'),
+            ]
+            columns += [self._column(f'extra{i}') for i in range(self.extra_columns)]
+            widths = records['columns']
+            if len(widths) and (widths == 4 + self.extra_columns).all():
+                return list(map(list, zip(*columns)))
+            return [list(row[:width]) for row, width in zip(zip(*columns), widths.tolist())]
+
+
+def write_snapshot(rows: List[List[str]], path: str,
+                   signature: Tuple[int, int, int], durability: str = 'always') -> int:
+    """
+    Write rows to a snapshot file, replacing any previous snapshot.
+
+    Rows that cannot be encoded (a quantity or price that does not parse, a
+    missing column, a NUL character) are skipped and logged, as
+    StockFileHandler.load_items skips rows it cannot decode.
+
+    Args:
+        rows: Stock file rows without the header
+        path: Snapshot file path
+        signature: (inode, size, mtime_ns) of the CSV the rows came from
+        durability: fsync policy, see utils.atomic
+
+    Returns:
+        int: Number of records written
+
+    Raises:
+        FileOperationError: If the file cannot be written
+    """
+    import numpy as np
+
+    extra_columns = max((len(row) - 4 for row in rows), default=0)
+    types: Dict[str, int] = {}
+    string_ids: Dict[str, int] = {}
+    strings: List[str] = []
+
+    def intern(value: str) -> int:
+        index = string_ids.get(value)
+        if index is None:
+            if '\0' in value:
+                raise ValueError("NUL characters cannot be stored")
+            index = string_ids[value] = len(strings)
+            strings.append(value)
+        return index
+
+    # Encode column by column, then fill the record array in vector assignments
+    type_ids, widths, quantities, prices, price_texts, codes = [], [], [], [], [], []
+    extras: List[List[int]] = [[] for _ in range(extra_columns)]
+    empty = intern('')
+    with gc_paused():
+        for line, row in enumerate(rows, start=2):
+            # Every column is encoded before any is appended, so a bad row leaves no trace
+            try:
+                quantity, price = int(row[2]), float(row[3])
+                refs = (intern(row[1]), intern(row[3]))
+                extra_refs = [intern(row[4 + i]) if 4 + i < len(row) else empty
+                              for i in range(extra_columns)]
+            except (IndexError, ValueError) as e:
+                logger.error("Skipping line %s in snapshot: %s. Error: %s", line, row, e)
+                continue
+            quantities.append(quantity)
+            prices.append(price)
+            codes.append(refs[0])
+            price_texts.append(refs[1])
+            type_ids.append(types.setdefault(row[0], len(types)))
+            widths.append(len(row))
+            for i, ref in enumerate(extra_refs):
+                extras[i].append(ref)
+
+    records = np.zeros(len(quantities), dtype=record_dtype(extra_columns))
+    if len(records):
+        records['type'] = type_ids
+        records['columns'] = widths
+        records['quantity'] = quantities
+        records['price'] = prices
+        records['code'] = codes
+        records['price_text'] = price_texts
+        for i, refs in enumerate(extras):
+            records[f'extra{i}'] = refs
+
+    meta = json.dumps({'types': list(types), 'extra_columns': extra_columns}).encode('utf-8')
+    record_bytes = records.tobytes()
+    string_bytes = '\0'.join(strings).encode('utf-8')
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, len(meta), len(records), *signature,
+                         len(string_bytes), zlib.crc32(meta), zlib.crc32(record_bytes),
+                         zlib.crc32(string_bytes))
+
+    try:
+        with atomic_write(path, 'wb', durability=durability) as file:
+            file.write(header)
+            file.write(meta)
+            file.write(record_bytes)
+            file.write(string_bytes)
+    except OSError as e:
+        logger.error(f"Error writing snapshot: {str(e)}")
+        raise FileOperationError(f"Failed to write snapshot: {str(e)}")
+    logger.info(f"Wrote snapshot of {len(records)} items to {path}")
+    return len(records)
+
+
+def read_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    """Get the CSV signature recorded in a snapshot header, or None if unreadable."""
+    try:
+        with open(path, 'rb') as file:
+            header = file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return None
+        fields = HEADER.unpack(header)
+        return tuple(fields[4:7]) if fields[0] == MAGIC else None
+    except OSError:
+        return None
+
+
+def load_snapshot(path: str) -> InventorySnapshot:
+    """
+    Load a snapshot with a single read and verify its checksums.
+
+    Raises:
+        FileOperationError: If the file is missing, truncated or corrupt
+    """
+    import numpy as np
+
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except OSError as e:
+        raise FileOperationError(f"Failed to read snapshot: {str(e)}")
+
+    if len(data) < HEADER.size:
+        raise FileOperationError("Snapshot is truncated")
+    (magic, version, meta_length, count, inode, size, mtime_ns, strings_length,
+     meta_crc, records_crc, strings_crc) = HEADER.unpack_from(data)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise FileOperationError("Not a supported snapshot file")
+
+    meta_start = HEADER.size
+    records_start = meta_start + meta_length
+    meta_view = memoryview(data)[meta_start:records_start]
+    if zlib.crc32(meta_view) != meta_crc:
+        raise FileOperationError("Snapshot checksum mismatch in metadata")
+    meta = json.loads(bytes(meta_view))
+
+    dtype = record_dtype(meta['extra_columns'])
+    strings_start = records_start + count * dtype.itemsize
+    if len(data) != strings_start + strings_length:
+        raise FileOperationError("Snapshot is truncated")
+    view = memoryview(data)
+    if zlib.crc32(view[records_start:strings_start]) != records_crc:
+        raise FileOperationError("Snapshot checksum mismatch in records")
+    if zlib.crc32(view[strings_start:]) != strings_crc:
+        raise FileOperationError("Snapshot checksum mismatch in string table")
+
+    records = np.frombuffer(data, dtype=dtype, count=count, offset=records_start)
+    strings = data[strings_start:].decode('utf-8').split('\0')
+    return InventorySnapshot(records, strings, meta['types'], meta['extra_columns'],
+                             (inode, size, mtime_ns))
+
+
+def main(argv: List[str]) -> int:
+    """Compact a stock CSV file into a snapshot."""
+    if len(argv) != 2:
+        print("Usage: python -m utils.snapshot <stock_items.csv> <snapshot file>")
+        return 2
+    from utils.file_handler import StockFileHandler
+
+    # Relative paths are from the working directory, not the handler's data directory
+    csv_path, snapshot_path = map(os.path.abspath, argv)
+    count = StockFileHandler(csv_path, snapshot_file=snapshot_path).compact()
+    print(f"Compacted {count} items into {argv[1]}")
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,152 @@
+# utils/tracing.py
+
+"""
+Per-request tracing: request IDs, phase timings and slow-request logs.
+
+RequestTracer gives every request a trace. The trace holds a request ID
+(taken from the X-Request-ID header or generated) and the route. Code on
+the request's path times named phases and counts rows:
+
+    with phase('persist'):
+        self._write_rows(rows)
+    count('rows_written', len(rows))
+
+When the request ends, one 'request completed' record is logged. It
+carries the status, duration, total time per phase and counts as extra
+fields, which the JSON log format writes out (utils/logger.py). A request
+slower than SLOW_REQUEST_MS is logged as a warning with its full trace:
+every phase span in order, with its start offset and duration.
+
+phase() and count() do nothing outside a traced request, so storage code
+can call them unconditionally.
+"""
+
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from flask import request
+
+logger = logging.getLogger(__name__)
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+
+class Trace:
+    """Timings and counts collected during one request."""
+
+    __slots__ = ('request_id', 'route', 'started', 'spans', 'phases', 'counts', 'depth')
+
+    def __init__(self, request_id: str, route: str):
+        self.request_id = request_id
+        self.route = route
+        self.started = time.perf_counter()
+        self.spans: List[tuple] = []  # (name, depth, start offset s, duration s)
+        self.phases: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.depth = 0
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def phase_ms(self) -> Dict[str, float]:
+        return {name: round(seconds * 1000, 3) for name, seconds in self.phases.items()}
+
+    def spans_ms(self) -> List[Dict]:
+        return [{'phase': name, 'depth': depth, 'start_ms': round(start * 1000, 3),
+                 'duration_ms': round(duration * 1000, 3)}
+                for name, depth, start, duration in self.spans]
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar('trace', default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    """Get the trace of the request being handled, or None."""
+    return _current.get()
+
+
+@contextmanager
+def phase(name: str):
+    """Time a named phase of the current request (no-op outside a request)."""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    started = time.perf_counter()
+    trace.depth += 1
+    try:
+        yield
+    finally:
+        trace.depth -= 1
+        duration = time.perf_counter() - started
+        trace.spans.append((name, trace.depth, started - trace.started, duration))
+        trace.phases[name] = trace.phases.get(name, 0.0) + duration
+
+
+def count(name: str, value: int = 1) -> None:
+    """Add to a named counter of the current request (no-op outside a request)."""
+    trace = _current.get()
+    if trace is not None:
+        trace.counts[name] = trace.counts.get(name, 0) + value
+
+
+class RequestTracer:
+    """Flask extension opening a trace per request and logging it at the end."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        """Register the request hooks; SLOW_REQUEST_MS is read per request."""
+        self.app = app
+        app.before_request(self.start_trace)
+        app.after_request(self.add_request_id)
+        app.teardown_request(self.finish_trace)
+
+    def start_trace(self) -> None:
+        """before_request hook: open the request's trace."""
+        request_id = request.headers.get(REQUEST_ID_HEADER, '')[:64] or uuid.uuid4().hex
+        rule = request.url_rule.rule if request.url_rule is not None else request.path
+        trace = Trace(request_id, f"{request.method} {rule}")
+        request.environ['tracing.token'] = _current.set(trace)
+
+    def add_request_id(self, response):
+        """after_request hook: echo the request ID and note the status."""
+        trace = _current.get()
+        if trace is not None:
+            response.headers[REQUEST_ID_HEADER] = trace.request_id
+            request.environ['tracing.status'] = response.status_code
+        return response
+
+    def finish_trace(self, exception=None) -> None:
+        """teardown_request hook: log the trace and close it."""
+        token = request.environ.pop('tracing.token', None)
+        trace = _current.get()
+        if token is None or trace is None:
+            return
+        try:
+            duration = trace.elapsed_ms()
+            status = request.environ.pop('tracing.status', 500 if exception else None)
+            fields = {
+                'status': status,
+                'duration_ms': round(duration, 3),
+                'phases_ms': trace.phase_ms(),
+                'counts': trace.counts,
+            }
+            threshold = self.app.config.get('SLOW_REQUEST_MS', 500)
+            if threshold and duration >= threshold:
+                fields['trace'] = trace.spans_ms()
+                logger.warning("Slow request %s: %s in %.1f ms", trace.route, status, duration,
+                               extra=fields)
+            elif logger.isEnabledFor(logging.INFO):
+                logger.info("%s %s in %.1f ms", trace.route, status, duration, extra=fields)
+        finally:
+            try:
+                _current.reset(token)
+            except ValueError:
+                # Torn down in another context (e.g. a streamed response)
+                _current.set(None)
@@ -0,0 +1,231 @@
+# utils/warehouse.py
+
+import logging
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+from models.nav_sys import NavSys
+from models.registry import get_item_type, item_type_schemas
+from models.types import StockItemProtocol
+from utils.exceptions import StockError, ValidationError
+from utils.file_handler import StockFileHandler
+
+logger = logging.getLogger(__name__)
+
+WAREHOUSE_NAME = re.compile(r'^[A-Za-z0-9_-]{1,32}$')
+
+
+def validate_warehouse_name(name: str) -> str:
+    """
+    Check a warehouse name, which becomes part of its shard file names.
+
+    Raises:
+        ValidationError: If the name is not 1-32 letters, digits, '_' or '-'
+    """
+    if not isinstance(name, str) or not WAREHOUSE_NAME.match(name):
+        raise ValidationError(f"Invalid warehouse name: {name!r}")
+    return name
+
+
+def _with_values(item: StockItemProtocol, quantity: Optional[int] = None,
+                 price: Optional[float] = None, brand: Optional[str] = None) -> StockItemProtocol:
+    """
+    Copy an item with some values replaced, validated by its registered item type.
+
+    Raises:
+        ValidationError: If a value is invalid or the type has no brand column
+    """
+    item_class = get_item_type(item.type_tag) if item.type_tag else type(item)
+    row = [str(value) for value in item.to_row()]
+    if quantity is not None:
+        row[2] = str(quantity)
+    if price is not None:
+        row[3] = str(float(price))
+    if brand is not None:
+        if 'brand' not in item_class.columns:
+            raise ValidationError(f"{item_class.type_tag} items have no brand")
+        row[4 + item_class.columns.index('brand')] = brand
+    try:
+        return item_class.from_row(row)
+    except ValueError as e:
+        raise ValidationError(f"Invalid item {row[1]}: {str(e)}")
+
+
+def shard_path(base_file, warehouse: str) -> Path:
+    """Get a warehouse's file next to `base_file`: stock_items.csv -> stock_items.<warehouse>.csv"""
+    base = Path(base_file)
+    return base.with_name(f"{base.stem}.{validate_warehouse_name(warehouse)}{base.suffix}")
+
+
+class WarehouseInventory:
+    """
+    Stock partitioned by warehouse.
+
+    Every warehouse is a shard with its own StockFileHandler (so its own
+    file, row cache, line index and change log). Sells and restocks hold
+    only the write lock of the shard they touch, which also holds off
+    other processes and the /api/items routes on the default shard, so
+    writes to different branches run in parallel; the 100-unit limit
+    applies per warehouse. Listings merge the shards' cached rows,
+    skipping rows that cannot be read.
+    """
+
+    def __init__(self, shards: Dict[str, StockFileHandler], default: str):
+        if default not in shards:
+            raise ValidationError(f"Default warehouse {default!r} is not configured")
+        for name in shards:
+            validate_warehouse_name(name)
+        self.default = default
+        self._shards = dict(shards)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._shards)
+
+    def shard(self, warehouse: str) -> StockFileHandler:
+        """
+        Get a warehouse's file handler.
+
+        Raises:
+            ValidationError: If the warehouse is unknown
+        """
+        handler = self._shards.get(warehouse)
+        if handler is None:
+            raise ValidationError(f"Unknown warehouse: {warehouse}")
+        return handler
+
+    def lock(self, warehouse: str):
+        """Get the lock that serializes writes to a warehouse, across threads and processes."""
+        return self.shard(warehouse).write_lock()
+
+    # --- writes ----------------------------------------------------------
+
+    def sell(self, warehouse: str, stock_code: str, quantity: int) -> StockItemProtocol:
+        """
+        Sell from one warehouse's stock.
+
+        Raises:
+            ValidationError: If the warehouse is unknown or quantity is not positive
+            StockError: If the item is missing or the warehouse holds too few
+        """
+        if quantity <= 0:
+            raise ValidationError("Quantity must be greater than 0")
+        handler = self.shard(warehouse)
+        with handler.write_lock():
+            item = handler.get_item(stock_code)
+            if item is None:
+                raise StockError(f"Item {stock_code} not found in warehouse {warehouse}")
+            if quantity > item.quantity:
+                raise StockError(f"Cannot sell {quantity} items. Only {item.quantity} "
+                                 f"items available in warehouse {warehouse}")
+            item.sell_stock(quantity)
+            handler.save_item(item)
+        logger.info("Sold %s units of %s from %s", quantity, stock_code, warehouse)
+        return item
+
+    def restock(self, warehouse: str, stock_code: str, quantity: int,
+                price: Optional[float] = None, brand: Optional[str] = None) -> StockItemProtocol:
+        """
+        Add stock to one warehouse, creating the item there if it is new.
+
+        A new item takes price and brand from the arguments, falling back
+        to the item's record in any other warehouse.
+
+        Raises:
+            ValidationError: If the warehouse is unknown, quantity is not
+                positive or a new item has no known price and brand
+            StockError: If the warehouse would hold more than 100 units
+        """
+        if quantity <= 0:
+            raise ValidationError("Quantity must be greater than 0")
+        handler = self.shard(warehouse)
+        with handler.write_lock():
+            item = handler.get_item(stock_code)
+            if item is None:
+                if quantity > 100:
+                    raise StockError("Initial quantity cannot exceed 100 items")
+                template = self._find_elsewhere(stock_code, warehouse)
+                if template is not None:
+                    # Same item type and type-specific columns as elsewhere
+                    item = _with_values(template, quantity=quantity, price=price, brand=brand)
+                elif price is None or brand is None:
+                    raise ValidationError(f"Price and brand are required for new item {stock_code}")
+                else:
+                    item = NavSys(stock_code, quantity, float(price), brand)
+            else:
+                if brand is not None:
+                    item = _with_values(item, brand=brand)
+                item.increase_stock(quantity)
+                if price is not None:
+                    item.price = float(price)
+            handler.save_item(item)
+        logger.info("Restocked %s units of %s in %s", quantity, stock_code, warehouse)
+        return item
+
+    def _find_elsewhere(self, stock_code: str, exclude: str) -> Optional[StockItemProtocol]:
+        for name, handler in self._shards.items():
+            if name != exclude:
+                item = handler.get_item(stock_code)
+                if item is not None:
+                    return item
+        return None
+
+    # --- reads -----------------------------------------------------------
+
+    def summary(self) -> List[Dict]:
+        """Get each warehouse's SKU and unit counts."""
+        result = []
+        for name in self._shards:
+            rows = list(self._valid_rows(name))
+            result.append({
+                'name': name,
+                'default': name == self.default,
+                'items': len(rows),
+                'units': sum(quantity for _, quantity, _ in rows),
+            })
+        return result
+
+    def _valid_rows(self, warehouse: str):
+        """Yield (row, quantity, price) for a shard's rows, skipping and logging invalid ones."""
+        for row in self._shards[warehouse].load_all_items():
+            try:
+                yield row, int(row[2]), float(row[3])
+            except (IndexError, ValueError) as e:
+                logger.error("Skipping invalid row in warehouse %s: %s. Error: %s", warehouse, row, e)
+
+    def locations(self, stock_code: str) -> Dict[str, int]:
+        """Get an item's quantity in every warehouse that lists it."""
+        result = {}
+        for name, handler in self._shards.items():
+            item = handler.get_item(stock_code)
+            if item is not None:
+                result[name] = item.quantity
+        return result
+
+    def aggregate(self) -> List[Dict]:
+        """
+        Get every SKU with its total quantity and per-warehouse breakdown.
+
+        Price, brand and type come from the first warehouse (in configured
+        order, default first) that lists the SKU.
+        """
+        schemas = item_type_schemas()
+        merged: Dict[str, Dict] = {}
+        for name in [self.default] + [n for n in self._shards if n != self.default]:
+            for row, quantity, price in self._valid_rows(name):
+                entry = merged.get(row[1])
+                if entry is None:
+                    schema = schemas.get(row[0], ())
+                    brand_index = schema.index('brand') if 'brand' in schema else None
+                    merged[row[1]] = {
+                        'stock_code': row[1],
+                        'item_type': row[0],
+                        'price': price,
+                        'brand': row[brand_index] if brand_index is not None and len(row) > brand_index else None,
+                        'quantity': quantity,
+                        'warehouses': {name: quantity},
+                    }
+                else:
+                    entry['quantity'] += quantity
+                    entry['warehouses'][name] = quantity
+        return list(merged.values())
@@ -0,0 +1,26 @@
+# backend/wsgi.py
+
+"""
+Prefork WSGI entry point.
+
+Builds the app with PreforkConfig and warms the inventory and sales
+caches at import time. With gunicorn's preload_app (see gunicorn.conf.py) this import happens
+once in the master, so workers fork with the data already loaded and share
+those pages copy-on-write.
+
+Run with:
+    gunicorn -c gunicorn.conf.py
+
+The /api/events stream is not served through this entry point (it answers
+503), and admission control cannot be enabled here. The production entry
+point is asgi.py, which serves both; use this one only behind a proxy or
+load balancer that limits request rates itself.
+"""
+
+from app import create_app, get_file_handler, get_sales_handler
+from utils.runtime import warm_up
+
+application = create_app('prefork')
+
+with application.app_context():
+    warm_up(get_file_handler(), get_sales_handler())